@@ -1,21 +1,95 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
+from botocore.config import Config
 from app.config import settings
 
+#boto3 blocks on the network, async code hands its calls to this pool so the event loop keeps running
+_aws_pool = ThreadPoolExecutor(max_workers=settings.AWS_IO_WORKERS, thread_name_prefix="aws")
+
+
+async def run_aws(call, /, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_aws_pool, functools.partial(call, *args, **kwargs))
+
+
+#clients are thread safe once built and keep their connection pools, so every request, worker job
+#and thread of a process shares them. building one isn't thread safe, hence the lock
+_clients: dict[str, object] = {}
+_clients_lock = threading.Lock()
+_queue_urls: dict[str, str] = {}
+
+
+def _client_config(**s3) -> Config:
+    #room for every aws thread plus the default executor threads receipts use
+    return Config(
+        max_pool_connections=settings.AWS_MAX_POOL_CONNECTIONS,
+        retries={"mode": "standard"},
+        s3=s3 or None,
+    )
+
+
+def _shared_client(name: str, build):
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = build()
+    return client
+
 
 def get_sqs_client():
-    return boto3.client(
+    return _shared_client("sqs", lambda: boto3.client(
         "sqs",
         aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
         aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
         region_name=settings.AWS_REGION,
-        endpoint_url=settings.LOCALSTACK_ENDPOINT if settings.USE_LOCALSTACK else None
-    )
+        endpoint_url=settings.LOCALSTACK_ENDPOINT if settings.USE_LOCALSTACK else None,
+        config=_client_config(),
+    ))
 
 def get_s3_client():
-    return boto3.client(
+    return _shared_client("s3", lambda: boto3.client(
         "s3",
         aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
         aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
         region_name=settings.AWS_REGION,
-        endpoint_url=settings.LOCALSTACK_ENDPOINT if settings.USE_LOCALSTACK else None
-    )
\ No newline at end of file
+        endpoint_url=settings.LOCALSTACK_ENDPOINT if settings.USE_LOCALSTACK else None,
+        config=_client_config(),
+    ))
+
+def get_receipts_s3_client():
+    #receipts have their own bucket settings and endpoint
+    return _shared_client("s3-receipts", lambda: boto3.client(
+        "s3",
+        region_name=settings.AWS_REGION,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+        config=_client_config(addressing_style="virtual"),
+    ))
+
+
+def get_queue_url(client, queue_name: str) -> str:
+    """Queue url for a name, looked up once per process. Blocks on the first lookup."""
+    url = _queue_urls.get(queue_name)
+    if url is None:
+        url = _queue_urls[queue_name] = client.get_queue_url(QueueName=queue_name)["QueueUrl"]
+    return url
+
+async def get_queue_url_async(client, queue_name: str) -> str:
+    url = _queue_urls.get(queue_name)
+    if url is None:
+        url = await run_aws(get_queue_url, client, queue_name)
+    return url
+
+
+def reset_clients() -> None:
+    """Forget every shared client and queue url, they're rebuilt on next use."""
+    with _clients_lock:
+        _clients.clear()
+        _queue_urls.clear()
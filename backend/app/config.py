@@ -17,6 +17,16 @@ class OAuthProviders(BaseModel):
 class Settings(BaseSettings):
     DATABASE_URL: str
     FERNET_KEY: str | None = None
+    #comma separated keys retired by a rotation, only used to decrypt
+    FERNET_OLD_KEYS: str = ""
+    #aes-gcm key for new encrypted fields (urlsafe base64, 32 bytes). without it one is derived from FERNET_KEY
+    FIELD_ENCRYPTION_KEY: str | None = None
+    FIELD_ENCRYPTION_KEY_ID: int = 1
+    #comma separated "key_id:key" pairs retired by a rotation, only used to decrypt
+    FIELD_ENCRYPTION_OLD_KEYS: str = ""
+    #hmac key for address search tokens. without it one is derived from FERNET_KEY, so set it
+    #before rotating FERNET_KEY or rebuild the index with app.modules.trips.backfill_address_index
+    BLIND_INDEX_KEY: str | None = None
 
     USE_LOCALSTACK: bool = True
     AWS_ACCESS_KEY_ID: str = "test"
@@ -25,6 +35,12 @@ class Settings(BaseSettings):
     LOCALSTACK_ENDPOINT: str = "http://localhost:4566"
     REPORTS_QUEUE: str = "generate-reports-queue"
     REPORTS_BUCKET: str = "vellora-s3-bucket"
+    #threads running blocking boto3 calls for async code, and connections each shared client keeps
+    AWS_IO_WORKERS: int = 10
+    AWS_MAX_POOL_CONNECTIONS: int = 50
+    #reports one worker process renders at the same time, and the processes rendering their pdfs
+    REPORT_WORKER_CONCURRENCY: int = 4
+    REPORT_RENDER_WORKERS: int = 4
     
     #will change later(maybe)
     EMAIL_SENDER: str = "noreply@resend.dev"
@@ -48,6 +64,20 @@ class Settings(BaseSettings):
     AWS_ACCESS_KEY_ID: str | None = None
     AWS_SECRET_ACCESS_KEY: str | None = None
     RECEIPT_URL_EXPIRES_SECONDS: int = 900
+    RECEIPT_IMAGE_WORKERS: int = 2
+
+    #presigned urls and existence checks shared by receipt and report storage
+    STORAGE_CACHE_MAX_ENTRIES: int = 10_000
+    STORAGE_EXISTS_CACHE_SECONDS: int = 60
+
+    #how far a reported trip distance may drift from the recorded route before it's flagged
+    TRIP_DISTANCE_TOLERANCE: float = 0.25
+    TRIP_DISTANCE_SLACK_METERS: float = 500.0
+    TRIP_DISTANCE_REJECT: bool = False
+
+    DECRYPT_CACHE_MAX_ENTRIES: int = 20_000
+    DECRYPT_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    DECRYPT_POOL_WORKERS: int = 4
 
     model_config = SettingsConfigDict(
         env_file=".env",
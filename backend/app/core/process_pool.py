@@ -0,0 +1,67 @@
+import asyncio
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+_pools: list["ProcessPool"] = []
+
+
+class ProcessPool:
+    """Process pool for cpu bound work, started on first use and rebuilt when it breaks.
+
+    A worker process that dies (oom killer, a crash in a C extension) leaves a ProcessPoolExecutor
+    broken for good, every later submit raises BrokenProcessPool. The broken executor is dropped
+    and the call retried once on a fresh one, so the work has to be safe to run twice.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        _pools.append(self)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                #spawn, forking a process that already runs threads and an event loop isn't safe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            #a concurrent call that hit the same broken executor may have replaced it already
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn, *args):
+        #fn and args are pickled to the worker, fn has to be a top level function
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                return await loop.run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                self._discard(executor)
+                if attempt:
+                    raise
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def shutdown_pools() -> None:
+    """Stop every pool's worker processes, queued work is cancelled. Pools restart on next use."""
+    for pool in _pools:
+        pool.shutdown()
+
+
+atexit.register(shutdown_pools)
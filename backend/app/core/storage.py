@@ -1,14 +1,115 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import base64
+import hashlib
+from dataclasses import dataclass, field
 from typing import Optional
 
-import boto3
-from botocore.config import Config
+from botocore.exceptions import ClientError
 
+from app.aws_client import get_receipts_s3_client
 from app.config import settings
+from app.core.storage_cache import storage_cache
 from app.modules.expenses.exceptions import ReceiptStorageConfigError
 
+#s3 rejects multipart parts smaller than this, except the last one
+MIN_PART_BYTES = 5 * 1024 * 1024
+
+
+def _b64_sha256(data: bytes) -> str:
+    return base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+
+def head_sha256(head: dict) -> str | None:
+    """Hex SHA-256 of a whole object from a head_object response made with ChecksumMode ENABLED.
+
+    None when the object was stored without one, or with a checksum of its multipart parts.
+    """
+    checksum = head.get("ChecksumSHA256")
+    if not checksum or head.get("ChecksumType", "FULL_OBJECT") != "FULL_OBJECT" or "-" in checksum:
+        return None
+    return base64.b64decode(checksum).hex()
+
+
+@dataclass
+class ReceiptUpload:
+    """One object streamed to S3, part by part.
+
+    Every method blocks on the network, call them from a worker thread. Objects that fit in
+    a single part go up with one put_object, bigger ones as a multipart upload. Size and
+    sha256 of the whole object are tracked as parts go by, and S3 checks each part against
+    its own sha256.
+    """
+
+    _client: any
+    bucket: str
+    key: str
+    content_type: str
+    part_size: int = MIN_PART_BYTES
+    size: int = 0
+    _sha256: any = field(default_factory=hashlib.sha256)
+    _upload_id: str | None = None
+    _parts: list[dict] = field(default_factory=list)
+
+    @property
+    def checksum(self) -> str:
+        return self._sha256.hexdigest()
+
+    def upload_part(self, data: bytes) -> None:
+        if self._upload_id is None:
+            self._upload_id = self._client.create_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                ContentType=self.content_type,
+                ServerSideEncryption="AES256",
+                ChecksumAlgorithm="SHA256",
+            )["UploadId"]
+
+        self._sha256.update(data)
+        self.size += len(data)
+        part_number = len(self._parts) + 1
+        part_checksum = _b64_sha256(data)
+        response = self._client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=data,
+            ChecksumSHA256=part_checksum,
+        )
+        self._parts.append({"PartNumber": part_number, "ETag": response["ETag"], "ChecksumSHA256": part_checksum})
+
+    def complete(self, data: bytes = b"") -> None:
+        """Upload whatever is left and finish the object."""
+        if self._upload_id is None:
+            #everything fit in one part
+            self._sha256.update(data)
+            self.size += len(data)
+            self._client.put_object(
+                Bucket=self.bucket,
+                Key=self.key,
+                Body=data,
+                ContentType=self.content_type,
+                ServerSideEncryption="AES256",
+                ChecksumSHA256=base64.b64encode(self._sha256.digest()).decode(),
+            )
+            return
+
+        if data:
+            self.upload_part(data)
+        self._client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            MultipartUpload={"Parts": self._parts},
+        )
+
+    def abort(self) -> None:
+        #nothing is stored until complete, so only a started multipart upload needs cleaning up
+        if self._upload_id is not None:
+            self._client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+            self._upload_id = None
+
 
 @dataclass
 class ReceiptStorage:
@@ -22,18 +123,10 @@ class ReceiptStorage:
         if not settings.AWS_S3_BUCKET or not settings.AWS_REGION:
             raise ReceiptStorageConfigError("AWS_S3_BUCKET and AWS_REGION must be set to store receipts")
 
-        client = boto3.client(
-            "s3",
-            region_name=settings.AWS_REGION,
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-            config=Config(s3={"addressing_style": "virtual"}),
-        )
         return cls(
             bucket=settings.AWS_S3_BUCKET,
             region=settings.AWS_REGION,
-            _client=client,
+            _client=get_receipts_s3_client(),
             presign_seconds=settings.RECEIPT_URL_EXPIRES_SECONDS,
         )
 
@@ -50,9 +143,65 @@ class ReceiptStorage:
             ServerSideEncryption="AES256",
         )
 
-    def generate_presigned_url(self, key: str, expires_in: Optional[int] = None) -> str:
-        return self._client.generate_presigned_url(
-            "get_object",
-            Params={"Bucket": self.bucket, "Key": key},
+    def download_bytes(self, key: str) -> bytes:
+        return self._client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def start_upload(self, *, key: str, content_type: str) -> ReceiptUpload:
+        return ReceiptUpload(self._client, self.bucket, key, content_type)
+
+    def generate_presigned_post(
+        self,
+        *,
+        key: str,
+        content_type: str,
+        max_bytes: int,
+        checksum_sha256: str,
+        expires_in: Optional[int] = None,
+    ) -> dict:
+        """Presigned POST that lets a client upload exactly this key, with this content type, size limit
+        and hex SHA-256. S3 checks the body against the checksum and keeps it with the object."""
+        checksum = base64.b64encode(bytes.fromhex(checksum_sha256)).decode()
+        return self._client.generate_presigned_post(
+            Bucket=self.bucket,
+            Key=key,
+            Fields={
+                "Content-Type": content_type,
+                "x-amz-server-side-encryption": "AES256",
+                "x-amz-checksum-algorithm": "SHA256",
+                "x-amz-checksum-sha256": checksum,
+            },
+            Conditions=[
+                {"Content-Type": content_type},
+                {"x-amz-server-side-encryption": "AES256"},
+                {"x-amz-checksum-algorithm": "SHA256"},
+                {"x-amz-checksum-sha256": checksum},
+                ["content-length-range", 1, max_bytes],
+            ],
             ExpiresIn=expires_in or self.presign_seconds,
         )
+
+    def head(self, key: str) -> dict | None:
+        #checksum mode so the stored sha256 comes back, see head_sha256
+        try:
+            return self._client.head_object(Bucket=self.bucket, Key=key, ChecksumMode="ENABLED")
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def delete(self, key: str) -> None:
+        self._client.delete_object(Bucket=self.bucket, Key=key)
+        storage_cache.invalidate(self.bucket, key)
+
+    def generate_presigned_url(self, key: str, expires_in: Optional[int] = None) -> str:
+        expires_in = expires_in or self.presign_seconds
+        return storage_cache.signed_url(
+            self.bucket,
+            key,
+            expires_in,
+            lambda: self._client.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": self.bucket, "Key": key},
+                ExpiresIn=expires_in,
+            ),
+        )
@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable
+
+from app.config import settings
+
+#a cached url is handed out until this much of its lifetime has passed, so callers always get
+#at least a quarter of it
+URL_REUSE_FRACTION = 0.75
+
+
+@dataclass
+class _ObjectEntry:
+    #signed urls by their lifetime in seconds, as (url, reuse until)
+    urls: dict[int, tuple[str, float]] = field(default_factory=dict)
+    exists_until: float = 0.0
+
+
+class StorageCache:
+    """LRU of presigned GET urls and positive existence checks, per bucket and key.
+
+    Storage objects are built per request, so the cache lives at module level and is shared by
+    every ReceiptStorage and S3ReportStorageAdapter. Only "it exists" is cached: an object that
+    is missing now may be written by another process any moment. Deleting through either storage
+    invalidates the key. Thread safe, storage calls also run from worker threads.
+    """
+
+    def __init__(self, max_entries: int, exists_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.exists_seconds = exists_seconds
+        self._clock = clock
+        self._entries: OrderedDict[tuple[str, str], _ObjectEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, bucket: str, key: str) -> _ObjectEntry:
+        #callers hold the lock
+        entry = self._entries.get((bucket, key))
+        if entry is None:
+            entry = self._entries[(bucket, key)] = _ObjectEntry()
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end((bucket, key))
+        return entry
+
+    def get_url(self, bucket: str, key: str, expires_in: int) -> str | None:
+        if self.max_entries <= 0:
+            return None
+
+        with self._lock:
+            entry = self._entries.get((bucket, key))
+            cached = entry.urls.get(expires_in) if entry else None
+            if cached and cached[1] > self._clock():
+                self._entries.move_to_end((bucket, key))
+                self.hits += 1
+                return cached[0]
+            self.misses += 1
+            return None
+
+    def put_url(self, bucket: str, key: str, expires_in: int, url: str, signed_at: float) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entry(bucket, key).urls[expires_in] = (url, signed_at + expires_in * URL_REUSE_FRACTION)
+
+    def signed_url(self, bucket: str, key: str, expires_in: int, sign: Callable[[], str]) -> str:
+        url = self.get_url(bucket, key, expires_in)
+        if url is None:
+            #signed outside the lock, two threads racing on one key just both sign
+            signed_at = self._clock()
+            url = sign()
+            self.put_url(bucket, key, expires_in, url, signed_at)
+        return url
+
+    def known_to_exist(self, bucket: str, key: str) -> bool:
+        if self.max_entries <= 0 or self.exists_seconds <= 0:
+            return False
+
+        with self._lock:
+            entry = self._entries.get((bucket, key))
+            if entry and entry.exists_until > self._clock():
+                self._entries.move_to_end((bucket, key))
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+
+    def mark_exists(self, bucket: str, key: str, checked_at: float) -> None:
+        if self.max_entries <= 0 or self.exists_seconds <= 0:
+            return
+        with self._lock:
+            self._entry(bucket, key).exists_until = checked_at + self.exists_seconds
+
+    def exists(self, bucket: str, key: str, check: Callable[[], bool]) -> bool:
+        if self.known_to_exist(bucket, key):
+            return True
+        checked_at = self._clock()
+        if not check():
+            return False
+        self.mark_exists(bucket, key, checked_at)
+        return True
+
+    def now(self) -> float:
+        return self._clock()
+
+    def invalidate(self, bucket: str, key: str) -> None:
+        with self._lock:
+            self._entries.pop((bucket, key), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+storage_cache = StorageCache(settings.STORAGE_CACHE_MAX_ENTRIES, settings.STORAGE_EXISTS_CACHE_SECONDS)
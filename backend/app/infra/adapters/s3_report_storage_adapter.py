@@ -1,8 +1,9 @@
 import uuid
 
 import botocore
-from app.aws_client import get_s3_client
+from app.aws_client import get_s3_client, run_aws
 from app.config import settings
+from app.core.storage_cache import storage_cache
 from app.modules.reports.ports import StoragePort
 
 
@@ -12,10 +13,11 @@ class S3ReportStorageAdapter(StoragePort):
         self.s3 = get_s3_client()
         self.bucket = settings.REPORTS_BUCKET
 
-    def save(self, report_id: uuid.UUID, file_bytes: bytes) -> str:
+    async def save(self, report_id: uuid.UUID, file_bytes: bytes) -> str:
         file_name = f"report_{report_id}.pdf"
         
-        self.s3.put_object(
+        await run_aws(
+            self.s3.put_object,
             Bucket=self.bucket,
             Key=file_name,
             Body=file_bytes,
@@ -24,14 +26,31 @@ class S3ReportStorageAdapter(StoragePort):
 
         return file_name
 
-    def get_signed_url(self, key: str, expires_in: int = 300) -> str:
-        return self.s3.generate_presigned_url(
-            "get_object",
-            Params={"Bucket": self.bucket, "Key": key},
-            ExpiresIn=expires_in
-        )
+    async def get_signed_url(self, key: str, expires_in: int = 300) -> str:
+        #a cached url doesn't need a thread at all
+        url = storage_cache.get_url(self.bucket, key, expires_in)
+        if url is None:
+            signed_at = storage_cache.now()
+            url = await run_aws(
+                self.s3.generate_presigned_url,
+                "get_object",
+                Params={"Bucket": self.bucket, "Key": key},
+                ExpiresIn=expires_in
+            )
+            storage_cache.put_url(self.bucket, key, expires_in, url, signed_at)
+        return url
     
-    def exists(self, key: str) -> bool:
+    async def exists(self, key: str) -> bool:
+        if storage_cache.known_to_exist(self.bucket, key):
+            return True
+
+        checked_at = storage_cache.now()
+        if not await run_aws(self._head, key):
+            return False
+        storage_cache.mark_exists(self.bucket, key, checked_at)
+        return True
+
+    def _head(self, key: str) -> bool:
         try:
             self.s3.head_object(Bucket=self.bucket, Key=key)
             return True
@@ -40,9 +59,11 @@ class S3ReportStorageAdapter(StoragePort):
                 return False
             raise
 
-    def delete(self, key: str) -> bool:
+    async def delete(self, key: str) -> bool:
+        #dropped even if the delete fails, the next check asks s3 again
+        storage_cache.invalidate(self.bucket, key)
         try:
-            self.s3.delete_object(Bucket=self.bucket, Key=key)
+            await run_aws(self.s3.delete_object, Bucket=self.bucket, Key=key)
             return True
         except botocore.exceptions.ClientError:
-            return False
\ No newline at end of file
+            return False
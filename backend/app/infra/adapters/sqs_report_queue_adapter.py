@@ -1,6 +1,6 @@
 import json
 from app.config import settings
-from app.aws_client import get_sqs_client
+from app.aws_client import get_queue_url_async, get_sqs_client, run_aws
 from app.modules.reports.ports import QueuePort
 
 
@@ -8,8 +8,9 @@ class SQSReportQueueAdapter(QueuePort):
     
     def __init__(self):
         self.client = get_sqs_client()
-        self.queue_url = self.client.get_queue_url(QueueName=settings.REPORTS_QUEUE)["QueueUrl"]
 
-    def send(self, report_id: str) -> None:
+    async def send(self, report_id: str) -> None:
+        #resolved once per process, building the adapter per request costs no round trip
+        queue_url = await get_queue_url_async(self.client, settings.REPORTS_QUEUE)
         message = json.dumps({"report_id": report_id})
-        self.client.send_message(QueueUrl=self.queue_url, MessageBody=message)
\ No newline at end of file
+        await run_aws(self.client.send_message, QueueUrl=queue_url, MessageBody=message)
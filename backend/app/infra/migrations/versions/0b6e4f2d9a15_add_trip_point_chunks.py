@@ -0,0 +1,40 @@
+"""add trip_point_chunks
+
+Revision ID: 0b6e4f2d9a15
+Revises: d71b9e3a5c08
+Create Date: 2026-10-18 13:47:30.102558
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0b6e4f2d9a15'
+down_revision: Union[str, Sequence[str], None] = 'd71b9e3a5c08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('trip_point_chunks',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('trip_id', sa.UUID(), nullable=False),
+    sa.Column('sequence', sa.Integer(), nullable=False),
+    sa.Column('point_count', sa.Integer(), nullable=False),
+    sa.Column('geometry_encrypted', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['trip_id'], ['trips.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('trip_id', 'sequence', name='uq_trip_point_chunks_trip_sequence')
+    )
+    op.add_column('trips', sa.Column('recorded_meters', postgresql.DOUBLE_PRECISION(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('trips', 'recorded_meters')
+    op.drop_table('trip_point_chunks')
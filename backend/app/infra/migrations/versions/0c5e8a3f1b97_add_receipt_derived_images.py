@@ -0,0 +1,30 @@
+"""add receipt derived images
+
+Revision ID: 0c5e8a3f1b97
+Revises: f4b9d2e7a8c3
+Create Date: 2026-10-18 21:03:17.448920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c5e8a3f1b97'
+down_revision: Union[str, Sequence[str], None] = 'f4b9d2e7a8c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('expense_receipts', sa.Column('image_object_key', sa.String(length=512), nullable=True))
+    op.add_column('expense_receipts', sa.Column('thumbnail_object_key', sa.String(length=512), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('expense_receipts', 'thumbnail_object_key')
+    op.drop_column('expense_receipts', 'image_object_key')
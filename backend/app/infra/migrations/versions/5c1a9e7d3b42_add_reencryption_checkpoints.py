@@ -0,0 +1,36 @@
+"""add reencryption_checkpoints
+
+Revision ID: 5c1a9e7d3b42
+Revises: 0b6e4f2d9a15
+Create Date: 2026-10-18 16:05:12.418903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1a9e7d3b42'
+down_revision: Union[str, Sequence[str], None] = '0b6e4f2d9a15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('reencryption_checkpoints',
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('key_fingerprint', sa.String(length=32), nullable=False),
+    sa.Column('last_id', sa.UUID(), nullable=True),
+    sa.Column('rows_rewritten', sa.Integer(), nullable=False),
+    sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('reencryption_checkpoints')
@@ -0,0 +1,72 @@
+"""add trip_daily_rollups
+
+Revision ID: 5c1e7a9d2b40
+Revises: cf8d70cf7d30
+Create Date: 2026-10-18 10:12:41.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e7a9d2b40'
+down_revision: Union[str, Sequence[str], None] = 'cf8d70cf7d30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('trip_daily_rollups',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('rate_category_id', sa.UUID(), nullable=False),
+    sa.Column('vehicle_id', sa.UUID(), nullable=True),
+    sa.Column('trip_count', sa.Integer(), nullable=False),
+    sa.Column('total_miles', postgresql.DOUBLE_PRECISION(), nullable=False),
+    sa.Column('mileage_reimbursement_total', postgresql.DOUBLE_PRECISION(), nullable=False),
+    sa.Column('expense_reimbursement_total', postgresql.DOUBLE_PRECISION(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['rate_category_id'], ['rate_categories.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['vehicle_id'], ['vehicles.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    #coalesced so trips without a vehicle share one bucket, a unique constraint would treat the nulls as distinct.
+    #the app upserts against exactly these expressions, see TripRollupRepo._apply_delta
+    op.create_index(
+        'uq_trip_daily_rollups_bucket',
+        'trip_daily_rollups',
+        ['user_id', 'day', 'rate_category_id', sa.text("coalesce(vehicle_id, '00000000-0000-0000-0000-000000000000')")],
+        unique=True,
+    )
+
+    #seed from existing completed trips. same utc-day bucketing as the app code
+    op.execute("""
+        INSERT INTO trip_daily_rollups (
+            id, user_id, day, rate_category_id, vehicle_id, trip_count, total_miles,
+            mileage_reimbursement_total, expense_reimbursement_total
+        )
+        SELECT
+            gen_random_uuid(),
+            user_id,
+            (started_at AT TIME ZONE 'UTC')::date,
+            rate_category_id,
+            vehicle_id,
+            COUNT(*),
+            COALESCE(SUM(miles), 0),
+            COALESCE(SUM(mileage_reimbursement_total), 0),
+            COALESCE(SUM(expense_reimbursement_total), 0)
+        FROM trips
+        WHERE status = 'completed'
+        GROUP BY user_id, (started_at AT TIME ZONE 'UTC')::date, rate_category_id, vehicle_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('trip_daily_rollups')
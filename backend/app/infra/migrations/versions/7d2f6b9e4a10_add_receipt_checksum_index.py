@@ -0,0 +1,33 @@
+"""add receipt checksum index
+
+Revision ID: 7d2f6b9e4a10
+Revises: 0c5e8a3f1b97
+Create Date: 2026-10-18 21:47:55.902316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2f6b9e4a10'
+down_revision: Union[str, Sequence[str], None] = '0c5e8a3f1b97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    #duplicate uploads now point at the object of the first one, so keys stop being unique
+    op.drop_constraint('expense_receipts_object_key_key', 'expense_receipts', type_='unique')
+    op.create_index('ix_expense_receipts_object_key', 'expense_receipts', ['object_key'], unique=False)
+    op.create_index('ix_expense_receipts_user_checksum', 'expense_receipts', ['user_id', 'checksum_sha256'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_expense_receipts_user_checksum', table_name='expense_receipts')
+    op.drop_index('ix_expense_receipts_object_key', table_name='expense_receipts')
+    op.create_unique_constraint('expense_receipts_object_key_key', 'expense_receipts', ['object_key'])
@@ -0,0 +1,50 @@
+"""store trip geometry as binary
+
+Revision ID: 8e3d4b1f6a27
+Revises: 5c1e7a9d2b40
+Create Date: 2026-10-18 11:02:17.304915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e3d4b1f6a27'
+down_revision: Union[str, Sequence[str], None] = '5c1e7a9d2b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    #existing fernet text is kept byte for byte and still decrypts.
+    #run `python -m app.modules.trips.backfill_geometry` afterwards to compact old rows
+    op.alter_column(
+        'trips',
+        'geometry_encrypted',
+        existing_type=sa.Text(),
+        type_=sa.LargeBinary(),
+        existing_nullable=True,
+        postgresql_using="convert_to(geometry_encrypted, 'UTF8')",
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    #binary rows can't be represented as text, so they are dropped on downgrade: 0x01 raw fernet
+    #tokens and 0x02 aes-gcm envelopes. only legacy fernet text survives the conversion
+    op.execute(
+        "UPDATE trips SET geometry_encrypted = NULL "
+        "WHERE substring(geometry_encrypted from 1 for 1) IN ('\\x01'::bytea, '\\x02'::bytea)"
+    )
+    op.alter_column(
+        'trips',
+        'geometry_encrypted',
+        existing_type=sa.LargeBinary(),
+        type_=sa.Text(),
+        existing_nullable=True,
+        postgresql_using="convert_from(geometry_encrypted, 'UTF8')",
+    )
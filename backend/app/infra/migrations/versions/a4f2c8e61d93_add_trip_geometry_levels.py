@@ -0,0 +1,39 @@
+"""add trip_geometry_levels
+
+Revision ID: a4f2c8e61d93
+Revises: 8e3d4b1f6a27
+Create Date: 2026-10-18 12:21:09.418377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4f2c8e61d93'
+down_revision: Union[str, Sequence[str], None] = '8e3d4b1f6a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    #existing trips have no levels and keep serving the full route from trips.geometry_encrypted
+    op.create_table('trip_geometry_levels',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('trip_id', sa.UUID(), nullable=False),
+    sa.Column('level', sa.Integer(), nullable=False),
+    sa.Column('tolerance_meters', postgresql.DOUBLE_PRECISION(), nullable=False),
+    sa.Column('point_count', sa.Integer(), nullable=False),
+    sa.Column('geometry_encrypted', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['trip_id'], ['trips.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('trip_id', 'level', name='uq_trip_geometry_levels_trip_level')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('trip_geometry_levels')
@@ -0,0 +1,45 @@
+"""add address_search_tokens
+
+Revision ID: b83d0f4c6e21
+Revises: 5c1a9e7d3b42
+Create Date: 2026-10-18 17:22:40.551207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b83d0f4c6e21'
+down_revision: Union[str, Sequence[str], None] = '5c1a9e7d3b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('address_search_tokens',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('token', sa.LargeBinary(length=16), nullable=False),
+    sa.Column('field', sa.String(length=16), nullable=False),
+    sa.Column('trip_id', sa.UUID(), nullable=True),
+    sa.Column('common_place_id', sa.UUID(), nullable=True),
+    sa.ForeignKeyConstraint(['common_place_id'], ['common_places.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['trip_id'], ['trips.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_address_search_tokens_user_token', 'address_search_tokens', ['user_id', 'token'], unique=False)
+    op.create_index(op.f('ix_address_search_tokens_trip_id'), 'address_search_tokens', ['trip_id'], unique=False)
+    op.create_index(op.f('ix_address_search_tokens_common_place_id'), 'address_search_tokens', ['common_place_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_address_search_tokens_common_place_id'), table_name='address_search_tokens')
+    op.drop_index(op.f('ix_address_search_tokens_trip_id'), table_name='address_search_tokens')
+    op.drop_index('ix_address_search_tokens_user_token', table_name='address_search_tokens')
+    op.drop_table('address_search_tokens')
@@ -0,0 +1,31 @@
+"""add trip computed distance
+
+Revision ID: d71b9e3a5c08
+Revises: a4f2c8e61d93
+Create Date: 2026-10-18 13:04:52.771904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'd71b9e3a5c08'
+down_revision: Union[str, Sequence[str], None] = 'a4f2c8e61d93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    #run `python -m app.modules.trips.backfill_distance` afterwards to fill in historical trips
+    op.add_column('trips', sa.Column('computed_miles', postgresql.DOUBLE_PRECISION(), nullable=True))
+    op.add_column('trips', sa.Column('distance_flagged', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('trips', 'distance_flagged')
+    op.drop_column('trips', 'computed_miles')
@@ -0,0 +1,41 @@
+"""add trip filter indexes
+
+Revision ID: e2a7c4d19f86
+Revises: b83d0f4c6e21
+Create Date: 2026-10-18 18:40:03.712645
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a7c4d19f86'
+down_revision: Union[str, Sequence[str], None] = 'b83d0f4c6e21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    ('ix_trips_user_started', ['user_id', sa.text('started_at DESC'), sa.text('id DESC')]),
+    ('ix_trips_user_status_started', ['user_id', 'status', sa.text('started_at DESC'), sa.text('id DESC')]),
+    ('ix_trips_user_vehicle_started', ['user_id', 'vehicle_id', sa.text('started_at DESC'), sa.text('id DESC')]),
+    ('ix_trips_user_category_started', ['user_id', 'rate_category_id', sa.text('started_at DESC'), sa.text('id DESC')]),
+    ('ix_trips_user_purpose_prefix', ['user_id', sa.text('lower(purpose) text_pattern_ops')]),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    #trips is big, build the indexes without blocking writes. concurrently can't run in a transaction
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, 'trips', columns, unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='trips', postgresql_concurrently=True, if_exists=True)
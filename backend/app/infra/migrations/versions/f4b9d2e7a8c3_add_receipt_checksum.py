@@ -0,0 +1,28 @@
+"""add receipt checksum
+
+Revision ID: f4b9d2e7a8c3
+Revises: e2a7c4d19f86
+Create Date: 2026-10-18 20:12:41.305118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b9d2e7a8c3'
+down_revision: Union[str, Sequence[str], None] = 'e2a7c4d19f86'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('expense_receipts', sa.Column('checksum_sha256', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('expense_receipts', 'checksum_sha256')
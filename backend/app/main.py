@@ -1,8 +1,18 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.api.v1.router import router as api_v1_router
+from app.core.process_pool import shutdown_pools
 import os
 
-app = FastAPI(title="Vellora", version="1.0.0", docs_url=None if os.getenv("ENV") == "Production" else "/docs", redoc_url=None if os.getenv("ENV") == "Production" else "/redoc")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    #stop the render and receipt image worker processes with the server
+    shutdown_pools()
+
+
+app = FastAPI(title="Vellora", version="1.0.0", lifespan=lifespan, docs_url=None if os.getenv("ENV") == "Production" else "/docs", redoc_url=None if os.getenv("ENV") == "Production" else "/redoc")
 
 # @app.get("/")
 # def root():
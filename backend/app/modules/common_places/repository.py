@@ -1,9 +1,10 @@
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.modules.common_places.models import CommonPlace
+from app.modules.trips.models import AddressSearchToken
 
 
 class CommonPlaceRepo:
@@ -31,6 +32,14 @@ class CommonPlaceRepo:
         result = await self.db.execute(query)
         return result.scalar_one_or_none()
 
+    async def replace_address_tokens(self, common_place_id: UUID, user_id: UUID, tokens: list[bytes]) -> None:
+        #no commit, the tokens go out with the place write
+        await self.db.execute(delete(AddressSearchToken).where(AddressSearchToken.common_place_id == common_place_id))
+        self.db.add_all([
+            AddressSearchToken(user_id=user_id, token=token, field="place", common_place_id=common_place_id)
+            for token in tokens
+        ])
+
     async def update(self, common_place: CommonPlace) -> CommonPlace:
         
         await self.db.commit()
@@ -1,9 +1,10 @@
-from uuid import UUID
+from uuid import UUID, uuid4
 from sqlalchemy.exc import IntegrityError
 from app.modules.common_places.repository import CommonPlaceRepo
 from app.modules.common_places.schemas import CommonPlaceCreate, CommonPlaceUpdate
 from app.modules.common_places.models import CommonPlace
 from app.modules.common_places.exceptions import InvalidCommonPlaceDataError, CommonPlaceNotFoundError, DuplicateCommonPlaceError, CommonPlacePersistenceError, MaxCommonPlacesError
+from app.modules.trips.utils.blind_index import address_tokens
 from app.modules.trips.utils.crypto import encrypt_address
 
 
@@ -34,10 +35,12 @@ class CommonPlaceService:
             encrypted_address = encrypt_address(data.address.strip())
             
             place = CommonPlace(
+                id=uuid4(),
                 user_id=user_id,
                 name=cleaned_name,
                 address=encrypted_address
             )
+            await self.commonplace_repo.replace_address_tokens(place.id, user_id, address_tokens(user_id, data.address))
             return await self.commonplace_repo.create(place)
         except IntegrityError as e:
             raise DuplicateCommonPlaceError("A common place with this name already exists") from e
@@ -78,6 +81,8 @@ class CommonPlaceService:
             place.address = encrypt_address(data.address.strip())
         
         try:
+            if data.address is not None:
+                await self.commonplace_repo.replace_address_tokens(place.id, user_id, address_tokens(user_id, data.address))
             return await self.commonplace_repo.update(place)
         except IntegrityError as e:
             raise DuplicateCommonPlaceError("A common place with this name already exists") from e
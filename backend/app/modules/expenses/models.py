@@ -22,6 +22,10 @@ class Expense(Base):
 
 class ExpenseReceipt(Base):
     __tablename__ = "expense_receipts"
+    __table_args__ = (
+        #content lookup for dedup, a user's uploads are only ever matched against their own
+        sa.Index("ix_expense_receipts_user_checksum", "user_id", "checksum_sha256"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, index=True, default=uuid.uuid4)
     expense_id: Mapped[uuid.UUID | None] = mapped_column(
@@ -43,10 +47,15 @@ class ExpenseReceipt(Base):
         index=True,
     )
     bucket: Mapped[str] = mapped_column(sa.String(255), nullable=False)
-    object_key: Mapped[str] = mapped_column(sa.String(512), nullable=False, unique=True)
+    #not unique, duplicate uploads share the stored object of the first one
+    object_key: Mapped[str] = mapped_column(sa.String(512), nullable=False, index=True)
     file_name: Mapped[str] = mapped_column(sa.String(255), nullable=False)
     content_type: Mapped[str] = mapped_column(sa.String(100), nullable=False)
     size_bytes: Mapped[int] = mapped_column(sa.BigInteger, nullable=False)
+    checksum_sha256: Mapped[str | None] = mapped_column(sa.String(64), nullable=True)
+    #downsized, metadata free copies of photo receipts, null for pdfs or until they're built
+    image_object_key: Mapped[str | None] = mapped_column(sa.String(512), nullable=True)
+    thumbnail_object_key: Mapped[str | None] = mapped_column(sa.String(512), nullable=True)
     created_at: Mapped[sa.DateTime] = mapped_column(sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False)
 
     trip: Mapped["Trip"] = relationship("Trip", back_populates="receipts")
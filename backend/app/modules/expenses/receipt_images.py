@@ -0,0 +1,101 @@
+import io
+from dataclasses import dataclass
+from pathlib import PurePosixPath
+
+from PIL import Image, ImageOps
+
+from app.config import settings
+from app.core.process_pool import ProcessPool
+from app.core.storage import ReceiptStorage
+
+#longest edge of the copy served for viewing, plenty to read a receipt
+MAX_IMAGE_EDGE = 2000
+THUMBNAIL_EDGE = 320
+IMAGE_QUALITY = 82
+THUMBNAIL_QUALITY = 70
+DERIVED_CONTENT_TYPE = "image/jpeg"
+
+#only photos get derived copies, pdfs are served as uploaded
+IMAGE_CONTENT_TYPES = {"image/jpeg", "image/png"}
+
+
+@dataclass
+class DerivedImages:
+    image: bytes
+    thumbnail: bytes
+
+
+def _to_jpeg(image: Image.Image, quality: int, optimize: bool = False) -> bytes:
+    #saving without exif= or icc_profile= drops the metadata, gps location included
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=optimize)
+    return buffer.getvalue()
+
+
+def derive_images(data: bytes) -> DerivedImages:
+    """Build the viewing copy and the thumbnail of a receipt photo.
+
+    Both are metadata free JPEGs, turned upright from the EXIF orientation and scaled down
+    to fit MAX_IMAGE_EDGE and THUMBNAIL_EDGE.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        #lets the jpeg decoder scale down while decoding, a big win on phone photos. draft keeps
+        #both sides at least as big as asked, so ask for the size that fits, not a square
+        scale = min(1.0, MAX_IMAGE_EDGE / max(source.size))
+        source.draft("RGB", (round(source.width * scale), round(source.height * scale)))
+        image = ImageOps.exif_transpose(source)
+
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            #jpeg has no alpha, put transparent pngs on white like paper
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        image.thumbnail((MAX_IMAGE_EDGE, MAX_IMAGE_EDGE), Image.Resampling.LANCZOS)
+        viewing = _to_jpeg(image, IMAGE_QUALITY)
+
+        image.thumbnail((THUMBNAIL_EDGE, THUMBNAIL_EDGE), Image.Resampling.LANCZOS)
+        #huffman optimizing is cheap at thumbnail size and thumbnails are fetched the most
+        return DerivedImages(image=viewing, thumbnail=_to_jpeg(image, THUMBNAIL_QUALITY, optimize=True))
+
+
+def derived_keys(object_key: str) -> tuple[str, str]:
+    #next to the original under their own prefixes, so they can never pass for an uploaded receipt key
+    path = PurePosixPath(object_key)
+    name = f"{path.stem}.jpg"
+    return str(path.parent / "derived" / name), str(path.parent / "thumbnails" / name)
+
+
+_worker_storage: ReceiptStorage | None = None
+
+
+def _storage(bucket: str) -> ReceiptStorage:
+    #one s3 client per worker process, reused across jobs
+    global _worker_storage
+    if _worker_storage is None or _worker_storage.bucket != bucket:
+        _worker_storage = ReceiptStorage.from_settings()
+        _worker_storage.bucket = bucket
+    return _worker_storage
+
+
+def process_receipt(bucket: str, object_key: str) -> tuple[str, str]:
+    """Runs in a worker process: fetch the original, store both derived copies, return their keys.
+
+    Only keys cross the process boundary, the image bytes never go through the api process.
+    """
+    storage = _storage(bucket)
+    derived = derive_images(storage.download_bytes(object_key))
+    image_key, thumbnail_key = derived_keys(object_key)
+    storage.upload_bytes(key=image_key, content=derived.image, content_type=DERIVED_CONTENT_TYPE)
+    storage.upload_bytes(key=thumbnail_key, content=derived.thumbnail, content_type=DERIVED_CONTENT_TYPE)
+    return image_key, thumbnail_key
+
+
+_pool = ProcessPool(settings.RECEIPT_IMAGE_WORKERS)
+
+
+async def process_receipt_async(bucket: str, object_key: str) -> tuple[str, str]:
+    return await _pool.run(process_receipt, bucket, object_key)
@@ -33,6 +33,21 @@ class ExpenseReceiptRepo:
         result = await self.db.execute(query)
         return result.scalar_one_or_none()
 
+    async def get_by_object_key(self, object_key: str, trip_id: UUID, user_id: UUID | None = None) -> ExpenseReceipt | None:
+        query = select(ExpenseReceipt).where(ExpenseReceipt.object_key == object_key, ExpenseReceipt.trip_id == trip_id)
+        if user_id is not None:
+            query = query.where(ExpenseReceipt.user_id == user_id)
+        result = await self.db.execute(query.limit(1))
+        return result.scalar_one_or_none()
+
+    async def list_by_checksum(self, user_id: UUID, checksum_sha256: str) -> list[ExpenseReceipt]:
+        result = await self.db.execute(
+            select(ExpenseReceipt)
+            .where(ExpenseReceipt.user_id == user_id, ExpenseReceipt.checksum_sha256 == checksum_sha256)
+            .order_by(ExpenseReceipt.created_at)
+        )
+        return result.scalars().all()
+
     async def delete(self, receipt: ExpenseReceipt) -> None:
         await self.db.delete(receipt)
         await self.db.commit()
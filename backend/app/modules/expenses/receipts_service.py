@@ -1,3 +1,9 @@
+import asyncio
+import contextlib
+import datetime
+import hashlib
+import logging
+import re
 import secrets
 import uuid
 from pathlib import Path
@@ -6,16 +12,23 @@ from uuid import UUID
 from fastapi import UploadFile
 
 from app.modules.expenses.exceptions import (
+    ReceiptNotFoundError,
     ReceiptStorageConfigError,
     ReceiptUploadError,
     ReceiptValidationError,
 )
+from app.modules.expenses import receipt_images
 from app.modules.expenses.models import ExpenseReceipt
 from app.modules.expenses.receipts_repository import ExpenseReceiptRepo
-from app.modules.expenses.schemas import ExpenseReceiptDTO
+from app.modules.expenses.schemas import (
+    CompleteReceiptUploadDTO,
+    ExpenseReceiptDTO,
+    ReceiptUploadDTO,
+    ReceiptUploadRequestDTO,
+)
 from app.modules.trips.exceptions import TripNotFoundError
 from app.modules.trips.repository import TripRepo
-from app.core.storage import ReceiptStorage
+from app.core.storage import ReceiptStorage, head_sha256
 
 
 MAX_RECEIPT_BYTES = 10 * 1024 * 1024  # 10 MB
@@ -24,6 +37,17 @@ ALLOWED_CONTENT_TYPES: set[str] = {
     "image/png",
     "application/pdf",
 }
+#what each allowed type starts with, the body has to agree with the content type it was sent as
+CONTENT_SIGNATURES: dict[str, bytes] = {
+    "image/jpeg": b"\xff\xd8\xff",
+    "image/png": b"\x89PNG\r\n\x1a\n",
+    "application/pdf": b"%PDF-",
+}
+SNIFF_BYTES = max(len(signature) for signature in CONTENT_SIGNATURES.values())
+#read size for streaming uploads. bytes are only held until a full s3 part is ready
+UPLOAD_CHUNK_BYTES = 256 * 1024
+
+logger = logging.getLogger(__name__)
 
 
 class ExpenseReceiptsService:
@@ -43,21 +67,163 @@ class ExpenseReceiptsService:
             raise TripNotFoundError("Trip not found or not owned by user")
         return trip
 
-    def _validate_file(self, upload: UploadFile, content: bytes) -> None:
-        if not upload.filename:
+    def _validate_type(self, filename: str | None, content_type: str | None) -> None:
+        if not filename:
             raise ReceiptValidationError("File name is required")
-        if upload.content_type not in ALLOWED_CONTENT_TYPES:
+        if content_type not in ALLOWED_CONTENT_TYPES:
             raise ReceiptValidationError("Only JPEG, PNG, or PDF receipts are allowed")
-        if len(content) == 0:
-            raise ReceiptValidationError("Empty files are not allowed")
-        if len(content) > MAX_RECEIPT_BYTES:
+
+    def _validate_file(self, upload: UploadFile) -> None:
+        #everything that can be checked before reading the body
+        self._validate_type(upload.filename, upload.content_type)
+        if upload.size is not None and upload.size > MAX_RECEIPT_BYTES:
             raise ReceiptValidationError("File is too large (max 10 MB)")
 
+    def _check_signature(self, content_type: str | None, head: bytes) -> None:
+        if not head.startswith(CONTENT_SIGNATURES.get(content_type, b"\0")):
+            raise ReceiptValidationError("File contents don't match its type, only JPEG, PNG, or PDF receipts are allowed")
+
+    async def _hash_upload(self, upload: UploadFile) -> str:
+        """SHA-256 of the upload, read a chunk at a time with the size checks applied as it goes.
+
+        The leading bytes are matched against the claimed content type before any of the file is
+        hashed. Starlette has already spooled the body locally, so this costs no network and lets
+        a mismatch or a duplicate be caught before anything is sent to storage.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        head = b""
+        try:
+            while chunk := await upload.read(UPLOAD_CHUNK_BYTES):
+                if len(head) < SNIFF_BYTES:
+                    #the first chunk, unless chunks are smaller than the longest signature
+                    head += chunk[:SNIFF_BYTES - len(head)]
+                    if len(head) == SNIFF_BYTES:
+                        self._check_signature(upload.content_type, head)
+                size += len(chunk)
+                if size > MAX_RECEIPT_BYTES:
+                    raise ReceiptValidationError("File is too large (max 10 MB)")
+                digest.update(chunk)
+            await upload.seek(0)
+        except ReceiptValidationError:
+            raise
+        except Exception as exc:  # pragma: no cover - unexpected IO error
+            raise ReceiptUploadError("Failed to read uploaded file") from exc
+
+        if size == 0:
+            raise ReceiptValidationError("Empty files are not allowed")
+        if len(head) < SNIFF_BYTES:
+            self._check_signature(upload.content_type, head)
+        return digest.hexdigest()
+
+    async def _reuse_duplicate(self, user_id: UUID, trip_id: UUID, checksum: str, file_name: str) -> ExpenseReceipt | None:
+        """Find a receipt with the same content already uploaded by this user.
+
+        The same file on the same trip is the same receipt and is returned as is. On another
+        trip it gets a new row pointing at the stored objects, with no upload or processing.
+        """
+        matches = await self.receipt_repo.list_by_checksum(user_id, checksum)
+        if not matches:
+            return None
+
+        same_trip = next((receipt for receipt in matches if receipt.trip_id == trip_id), None)
+        if same_trip:
+            return same_trip
+
+        original = matches[0]
+        receipt = ExpenseReceipt(
+            id=uuid.uuid4(),
+            expense_id=None,
+            trip_id=trip_id,
+            user_id=user_id,
+            bucket=original.bucket,
+            object_key=original.object_key,
+            file_name=file_name,
+            content_type=original.content_type,
+            size_bytes=original.size_bytes,
+            checksum_sha256=checksum,
+            image_object_key=original.image_object_key,
+            thumbnail_object_key=original.thumbnail_object_key,
+        )
+        try:
+            return await self.receipt_repo.create(receipt)
+        except Exception as exc:  # pragma: no cover - db errors
+            raise ReceiptUploadError("Failed to persist receipt metadata") from exc
+
+    async def _stream_to_storage(self, upload: UploadFile, object_key: str):
+        """Copy the upload to storage a chunk at a time, enforcing the size limit as it goes.
+
+        Parts are sent from a worker thread, so the event loop never waits on S3.
+        """
+        writer = self.storage.start_upload(
+            key=object_key,
+            content_type=upload.content_type or "application/octet-stream",
+        )
+        pending = bytearray()
+        size = 0
+        try:
+            while chunk := await upload.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > MAX_RECEIPT_BYTES:
+                    raise ReceiptValidationError("File is too large (max 10 MB)")
+                pending += chunk
+                if len(pending) >= writer.part_size:
+                    await asyncio.to_thread(writer.upload_part, bytes(pending))
+                    pending.clear()
+
+            if size == 0:
+                raise ReceiptValidationError("Empty files are not allowed")
+            await asyncio.to_thread(writer.complete, bytes(pending))
+        except ReceiptValidationError:
+            await self._abort(writer)
+            raise
+        except Exception as exc:
+            await self._abort(writer)
+            raise ReceiptUploadError("Failed to upload receipt to storage") from exc
+        return writer
+
+    async def _abort(self, writer) -> None:
+        #best effort, the bucket's lifecycle rule sweeps up any multipart upload left behind
+        with contextlib.suppress(Exception):
+            await asyncio.to_thread(writer.abort)
+
     def _build_object_key(self, trip_id: UUID, filename: str) -> str:
         safe_name = Path(filename).name.replace(" ", "_")
         unique_prefix = secrets.token_hex(8)
         return f"trips/{trip_id}/receipts/{unique_prefix}_{safe_name}"
 
+    def _is_trip_object_key(self, trip_id: UUID, object_key: str) -> bool:
+        #only keys shaped like the ones _build_object_key hands out for this trip
+        return re.fullmatch(rf"trips/{trip_id}/receipts/[0-9a-f]{{16}}_[^/]+", object_key) is not None
+
+    async def _derive_images(self, object_key: str, content_type: str) -> tuple[str | None, str | None]:
+        """Build the viewing copy and thumbnail of a photo receipt on the image process pool.
+
+        A failure here doesn't fail the upload, the receipt is then served as uploaded.
+        """
+        if content_type not in receipt_images.IMAGE_CONTENT_TYPES:
+            return None, None
+        try:
+            return await receipt_images.process_receipt_async(self.storage.bucket, object_key)
+        except Exception:
+            logger.warning("Could not build derived images for receipt %s", object_key, exc_info=True)
+            return None, None
+
+    def _to_dto(self, receipt: ExpenseReceipt) -> ExpenseReceiptDTO:
+        return ExpenseReceiptDTO.model_validate(
+            {
+                "id": receipt.id,
+                "file_name": receipt.file_name,
+                "content_type": receipt.content_type,
+                "size_bytes": receipt.size_bytes,
+                "created_at": receipt.created_at,
+                "download_url": self.storage.generate_presigned_url(receipt.object_key),
+                #downsized copy without exif, what clients should show. the original stays downloadable
+                "image_url": self.storage.generate_presigned_url(receipt.image_object_key) if receipt.image_object_key else None,
+                "thumbnail_url": self.storage.generate_presigned_url(receipt.thumbnail_object_key) if receipt.thumbnail_object_key else None,
+            }
+        )
+
     async def upload_receipt(
         self,
         user_id: UUID,
@@ -67,26 +233,19 @@ class ExpenseReceiptsService:
     ) -> ExpenseReceiptDTO:
         await self._ensure_trip(user_id, trip_id)
 
-        try:
-            content = await upload.read()
-        except Exception as exc:  # pragma: no cover - unexpected IO error
-            raise ReceiptUploadError("Failed to read uploaded file") from exc
-
-        self._validate_file(upload, content)
+        self._validate_file(upload)
 
         if not self.storage.is_configured:
             raise ReceiptStorageConfigError("Receipt storage is not configured")
 
-        object_key = self._build_object_key(trip_id, upload.filename or "receipt")
+        checksum = await self._hash_upload(upload)
+        duplicate = await self._reuse_duplicate(user_id, trip_id, checksum, upload.filename or "receipt")
+        if duplicate:
+            return self._to_dto(duplicate)
 
-        try:
-            self.storage.upload_bytes(
-                key=object_key,
-                content=content,
-                content_type=upload.content_type or "application/octet-stream",
-            )
-        except Exception as exc:  # pragma: no cover - network/storage errors
-            raise ReceiptUploadError("Failed to upload receipt to storage") from exc
+        object_key = self._build_object_key(trip_id, upload.filename or "receipt")
+        written = await self._stream_to_storage(upload, object_key)
+        image_key, thumbnail_key = await self._derive_images(object_key, upload.content_type)
 
         receipt = ExpenseReceipt(
             id=uuid.uuid4(),
@@ -97,7 +256,10 @@ class ExpenseReceiptsService:
             object_key=object_key,
             file_name=upload.filename or "receipt",
             content_type=upload.content_type or "application/octet-stream",
-            size_bytes=len(content),
+            size_bytes=written.size,
+            checksum_sha256=checksum,
+            image_object_key=image_key,
+            thumbnail_object_key=thumbnail_key,
         )
 
         try:
@@ -105,18 +267,125 @@ class ExpenseReceiptsService:
         except Exception as exc:  # pragma: no cover - db errors
             raise ReceiptUploadError("Failed to persist receipt metadata") from exc
 
-        download_url = self.storage.generate_presigned_url(object_key)
-        return ExpenseReceiptDTO.model_validate(
-            {
-                "id": saved.id,
-                "file_name": saved.file_name,
-                "content_type": saved.content_type,
-                "size_bytes": saved.size_bytes,
-                "created_at": saved.created_at,
-                "download_url": download_url,
-            }
+        return self._to_dto(saved)
+
+    async def create_upload(
+        self,
+        user_id: UUID,
+        trip_id: UUID,
+        expense_id: UUID,
+        data: ReceiptUploadRequestDTO,
+    ) -> ReceiptUploadDTO:
+        """Hand out a presigned POST so the client sends the file straight to storage.
+
+        The policy pins the object key, content type, size limit and the file's SHA-256, so
+        storage verifies the checksum that complete_upload records. Nothing is recorded
+        until the client calls complete_upload. A file the user already stored isn't uploaded
+        again, the receipt it was recorded as comes back instead of a policy.
+        """
+        await self._ensure_trip(user_id, trip_id)
+        self._validate_type(data.file_name, data.content_type)
+
+        if not self.storage.is_configured:
+            raise ReceiptStorageConfigError("Receipt storage is not configured")
+
+        duplicate = await self._reuse_duplicate(user_id, trip_id, data.checksum_sha256, data.file_name)
+        if duplicate:
+            return ReceiptUploadDTO(object_key=duplicate.object_key, receipt=self._to_dto(duplicate))
+
+        object_key = self._build_object_key(trip_id, data.file_name)
+        post = self.storage.generate_presigned_post(
+            key=object_key,
+            content_type=data.content_type,
+            max_bytes=MAX_RECEIPT_BYTES,
+            checksum_sha256=data.checksum_sha256,
+        )
+        return ReceiptUploadDTO(
+            object_key=object_key,
+            upload_url=post["url"],
+            fields=post["fields"],
+            expires_at=datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=self.storage.presign_seconds),
+        )
+
+    async def complete_upload(
+        self,
+        user_id: UUID,
+        trip_id: UUID,
+        expense_id: UUID,
+        data: CompleteReceiptUploadDTO,
+    ) -> ExpenseReceiptDTO:
+        """Record a receipt the client uploaded with a presigned POST, once storage has it.
+
+        Safe to retry, completing the same object twice returns the receipt recorded the first time.
+        When a racing upload of the same file was recorded first, that receipt is reused and this
+        object is deleted, so a retry after that finds nothing to complete.
+        """
+        await self._ensure_trip(user_id, trip_id)
+        if not self._is_trip_object_key(trip_id, data.object_key):
+            raise ReceiptValidationError("Upload does not belong to this trip")
+        if not data.file_name.strip():
+            raise ReceiptValidationError("File name is required")
+
+        existing = await self.receipt_repo.get_by_object_key(data.object_key, trip_id, user_id)
+        if existing:
+            return self._to_dto(existing)
+
+        if not self.storage.is_configured:
+            raise ReceiptStorageConfigError("Receipt storage is not configured")
+
+        try:
+            head = await asyncio.to_thread(self.storage.head, data.object_key)
+        except Exception as exc:
+            raise ReceiptUploadError("Failed to check uploaded receipt") from exc
+        if head is None:
+            raise ReceiptNotFoundError("Uploaded receipt not found in storage")
+
+        #the policy already enforces these, checked again in case it was issued under older limits
+        size = head.get("ContentLength", 0)
+        content_type = head.get("ContentType")
+        if not 0 < size <= MAX_RECEIPT_BYTES or content_type not in ALLOWED_CONTENT_TYPES:
+            with contextlib.suppress(Exception):
+                await asyncio.to_thread(self.storage.delete, data.object_key)
+            raise ReceiptValidationError("Uploaded receipt must be a JPEG, PNG, or PDF of at most 10 MB")
+
+        checksum = head_sha256(head)
+        if checksum is None:
+            #uploaded under a policy issued before checksums were pinned, hash what storage has
+            try:
+                checksum = hashlib.sha256(await asyncio.to_thread(self.storage.download_bytes, data.object_key)).hexdigest()
+            except Exception as exc:
+                raise ReceiptUploadError("Failed to read uploaded receipt") from exc
+
+        duplicate = await self._reuse_duplicate(user_id, trip_id, checksum, data.file_name.strip())
+        if duplicate:
+            with contextlib.suppress(Exception):
+                await asyncio.to_thread(self.storage.delete, data.object_key)
+            return self._to_dto(duplicate)
+
+        image_key, thumbnail_key = await self._derive_images(data.object_key, content_type)
+
+        receipt = ExpenseReceipt(
+            id=uuid.uuid4(),
+            expense_id=None,
+            trip_id=trip_id,
+            user_id=user_id,
+            bucket=self.storage.bucket,
+            object_key=data.object_key,
+            file_name=data.file_name.strip(),
+            content_type=content_type,
+            size_bytes=size,
+            checksum_sha256=checksum,
+            image_object_key=image_key,
+            thumbnail_object_key=thumbnail_key,
         )
 
+        try:
+            saved = await self.receipt_repo.create(receipt)
+        except Exception as exc:  # pragma: no cover - db errors
+            raise ReceiptUploadError("Failed to persist receipt metadata") from exc
+
+        return self._to_dto(saved)
+
     async def list_receipts(
         self,
         user_id: UUID,
@@ -125,19 +394,4 @@ class ExpenseReceiptsService:
     ) -> list[ExpenseReceiptDTO]:
         await self._ensure_trip(user_id, trip_id)
         receipts = await self.receipt_repo.list_for_trip(trip_id, user_id)
-        if not receipts:
-            return []
-
-        def to_dto(rcpt: ExpenseReceipt):
-            return ExpenseReceiptDTO.model_validate(
-                {
-                    "id": rcpt.id,
-                    "file_name": rcpt.file_name,
-                    "content_type": rcpt.content_type,
-                    "size_bytes": rcpt.size_bytes,
-                    "created_at": rcpt.created_at,
-                    "download_url": self.storage.generate_presigned_url(rcpt.object_key),
-                }
-            )
-
-        return [to_dto(r) for r in receipts]
+        return [self._to_dto(receipt) for receipt in receipts]
@@ -15,16 +15,21 @@ class ExpenseRepo:
         
         return expense
     
-    async def get_expense(self, expense_id: UUID, user_id: UUID = None) -> Expense:
+    async def get_expense(self, expense_id: UUID, user_id: UUID = None, fresh: bool = False) -> Expense:
         query = select(Expense).where(Expense.id == expense_id)
         if user_id is not None:
             query = query.where(Expense.user_id == user_id)
+        if fresh:
+            #read again under the trip lock, an instance already in the session may hold a stale amount
+            query = query.execution_options(populate_existing=True)
         return await self.db.scalar(query)
     
-    async def get_expenses_by_trip_id(self, trip_id: UUID, user_id: UUID = None):
+    async def get_expenses_by_trip_id(self, trip_id: UUID, user_id: UUID = None, fresh: bool = False):
         query = select(Expense).where(Expense.trip_id == trip_id)
         if user_id is not None:
             query = query.where(Expense.user_id == user_id)
+        if fresh:
+            query = query.execution_options(populate_existing=True)
         result = await self.db.execute(query)
         return result.scalars().all()
 
@@ -44,6 +49,16 @@ class ExpenseRepo:
         result = await self.db.execute(query)
         return result.scalar_one_or_none()
 
+    async def apply_batch(self, created: list[Expense], deleted: list[Expense]) -> None:
+        #edited expenses are already tracked by the session, everything goes out in one commit
+        self.db.add_all(created)
+        for expense in deleted:
+            await self.db.delete(expense)
+        await self.db.commit()
+
+    async def rollback(self) -> None:
+        await self.db.rollback()
+
     async def delete_expense(self, expense: Expense) -> None:       
         await self.db.delete(expense)
         await self.db.commit()
@@ -7,21 +7,26 @@ from app.modules.expenses.repository import ExpenseRepo
 from app.modules.expenses.service import ExpensesService
 from app.container import get_db
 from app.modules.expenses.schemas import (
+    CompleteReceiptUploadDTO,
     CreateExpenseDTO,
     EditExpenseDTO,
+    ExpenseBatchDTO,
     ExpenseReceiptDTO,
     ExpenseResponseDTO,
+    ReceiptUploadDTO,
+    ReceiptUploadRequestDTO,
 )
 from app.core.error_handler import error_handler
 from app.core.dependencies import get_current_user, get_receipt_storage
 from app.modules.users.models import User
 from app.modules.trips.repository import TripRepo
+from app.modules.trips.rollups_repository import TripRollupRepo
 
 
 router = APIRouter(prefix="/trips/{trip_id}/expenses", tags=["Expenses"])
 
 def get_expenses_service(db: AsyncSession = Depends(get_db)):
-    return ExpensesService(ExpenseRepo(db), TripRepo(db))
+    return ExpensesService(ExpenseRepo(db), TripRepo(db), TripRollupRepo(db))
 
 
 def get_expense_receipts_service(
@@ -42,6 +47,17 @@ async def create_expense(
     expense = await svc.create_expense(current_user.id, trip_id, body)
     return expense
 
+@router.put(":batch", response_model=list[ExpenseResponseDTO])
+@error_handler
+async def batch_expenses(
+    trip_id: UUID,
+    body: ExpenseBatchDTO,
+    svc = Depends(get_expenses_service),
+    current_user: User = Depends(get_current_user)
+):
+    expenses = await svc.apply_expense_batch(current_user.id, trip_id, body)
+    return expenses
+
 @router.get("/", response_model=list[ExpenseResponseDTO])
 @error_handler
 async def get_expenses(
@@ -105,3 +121,27 @@ async def list_receipts(
     current_user: User = Depends(get_current_user),
 ):
     return await svc.list_receipts(current_user.id, trip_id, expense_id)
+
+
+@router.post("/{expense_id}/receipts/uploads", response_model=ReceiptUploadDTO, status_code=status.HTTP_201_CREATED)
+@error_handler
+async def create_receipt_upload(
+    trip_id: UUID,
+    expense_id: UUID,
+    body: ReceiptUploadRequestDTO,
+    svc=Depends(get_expense_receipts_service),
+    current_user: User = Depends(get_current_user),
+):
+    return await svc.create_upload(current_user.id, trip_id, expense_id, body)
+
+
+@router.post("/{expense_id}/receipts/uploads/complete", response_model=ExpenseReceiptDTO, status_code=status.HTTP_201_CREATED)
+@error_handler
+async def complete_receipt_upload(
+    trip_id: UUID,
+    expense_id: UUID,
+    body: CompleteReceiptUploadDTO,
+    svc=Depends(get_expense_receipts_service),
+    current_user: User = Depends(get_current_user),
+):
+    return await svc.complete_upload(current_user.id, trip_id, expense_id, body)
@@ -1,6 +1,9 @@
 import datetime
 from uuid import UUID
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+#upper bound on operations in one batch request
+MAX_BATCH_OPERATIONS = 100
 
 
 class CreateExpenseDTO(BaseModel):
@@ -13,18 +16,69 @@ class EditExpenseDTO(BaseModel):
     amount: float | None = None
 
 
+class BatchEditExpenseDTO(EditExpenseDTO):
+    id: UUID
+
+
+class ExpenseBatchDTO(BaseModel):
+    create: list[CreateExpenseDTO] = []
+    edit: list[BatchEditExpenseDTO] = []
+    delete: list[UUID] = []
+
+    @model_validator(mode='after')
+    def validate_operations(self):
+        if len(self.create) + len(self.edit) + len(self.delete) > MAX_BATCH_OPERATIONS:
+            raise ValueError(f"A batch can have at most {MAX_BATCH_OPERATIONS} operations")
+
+        touched = [edit.id for edit in self.edit] + self.delete
+        if len(touched) != len(set(touched)):
+            raise ValueError("Each expense can only be edited or deleted once per batch")
+        return self
+
+
 class ExpenseReceiptDTO(BaseModel):
     id: UUID
     file_name: str
     content_type: str
     size_bytes: int
     download_url: str | None = None
+    image_url: str | None = None
+    thumbnail_url: str | None = None
     created_at: datetime.datetime
 
     class Config:
         from_attributes = True
 
 
+class ReceiptUploadRequestDTO(BaseModel):
+    file_name: str
+    content_type: str
+    #pinned in the upload policy, storage rejects a file that doesn't hash to it
+    checksum_sha256: str = Field(
+        pattern=r"^[0-9a-fA-F]{64}$",
+        description="Hex SHA-256 of the file. The upload has to be sent with the checksum fields returned for it.",
+    )
+
+    @field_validator("checksum_sha256")
+    @classmethod
+    def lowercase_checksum(cls, value: str) -> str:
+        return value.lower()
+
+
+class ReceiptUploadDTO(BaseModel):
+    object_key: str
+    #no upload when the user already stored this file, receipt is then the one it was recorded as
+    upload_url: str | None = None
+    fields: dict[str, str] = {}
+    expires_at: datetime.datetime | None = None
+    receipt: ExpenseReceiptDTO | None = None
+
+
+class CompleteReceiptUploadDTO(BaseModel):
+    object_key: str
+    file_name: str
+
+
 class ExpenseResponseDTO(BaseModel):
     id: UUID
     trip_id: UUID
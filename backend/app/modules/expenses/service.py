@@ -1,6 +1,7 @@
+from dataclasses import replace
 from uuid import UUID
 from app.modules.expenses.repository import ExpenseRepo
-from app.modules.expenses.schemas import CreateExpenseDTO, EditExpenseDTO
+from app.modules.expenses.schemas import CreateExpenseDTO, EditExpenseDTO, ExpenseBatchDTO
 from app.modules.expenses.exceptions import (
     DuplicateExpenseError,
     ExpenseNotFoundError,
@@ -8,23 +9,33 @@ from app.modules.expenses.exceptions import (
     InvalidExpenseDataError,
 )
 from app.modules.trips.repository import TripRepo
+from app.modules.trips.rollups_repository import TripRollupRepo, rollup_contribution
 from app.modules.expenses.models import Expense
 from app.modules.trips.exceptions import TripNotFoundError
 
 
 class ExpensesService:
-    def __init__(self, expense_repo: ExpenseRepo, trip_repo: TripRepo):
+    def __init__(self, expense_repo: ExpenseRepo, trip_repo: TripRepo, rollup_repo: TripRollupRepo = None):
         self.expense_repo = expense_repo
         self.trip_repo = trip_repo
+        self.rollup_repo = rollup_repo
 
-    async def _update_trip_total(self, trip_id: UUID):
-        total = await self.expense_repo.sum_by_trip(trip_id)
-        trip = await self.trip_repo.get(trip_id)
+    async def _lock_trip(self, trip_id: UUID):
+        #taken before any expense is read for a write, see TripRepo.lock
+        if not await self.trip_repo.lock(trip_id):
+            await self.expense_repo.rollback()
+            raise TripNotFoundError("Trip not found")
+
+    async def _add_to_trip_total(self, trip_id: UUID, delta: float):
+        #the trip row is already locked by _lock_trip, this goes out in the same commit as the expense write
+        trip = await self.trip_repo.add_to_expense_total(trip_id, delta)
         if not trip:
             raise TripNotFoundError("Trip not found")
 
-        trip.expense_reimbursement_total = total
-        await self.trip_repo.save(trip)
+        if self.rollup_repo:
+            after = rollup_contribution(trip)
+            before = replace(after, expense_total=after.expense_total - delta) if after else None
+            await self.rollup_repo.apply(before, after)
 
     async def create_expense(self, user_id: UUID, trip_id: UUID, data: CreateExpenseDTO):
 
@@ -39,8 +50,10 @@ class ExpensesService:
             raise InvalidExpenseDataError("Amount must be positive")
         
         cleaned_type = data.type.strip().capitalize()
+        await self._lock_trip(trip_id)
         existing = await self.expense_repo.get_by_trip_and_type(trip_id, cleaned_type, user_id)
         if existing:
+            await self.expense_repo.rollback()
             raise DuplicateExpenseError("Expense type already exists for this trip")
 
         try:
@@ -51,10 +64,11 @@ class ExpensesService:
                 amount = data.amount
             )
 
+            await self._add_to_trip_total(trip_id, data.amount)
             saved_expense = await self.expense_repo.save(expense)
-            await self._update_trip_total(trip_id)
             return saved_expense
         except Exception as e:
+            await self.expense_repo.rollback()
             raise ExpensePersistenceError("Unexpected error occurred while saving expense") from e
 
     
@@ -77,26 +91,130 @@ class ExpensesService:
     async def edit_expense(self, user_id: UUID, expense_id: UUID, data: EditExpenseDTO):
         expense = await self.get_expense(user_id, expense_id)
 
-        if data.type is not None:
-            if not data.type.strip():
-                raise InvalidExpenseDataError("Type cannot be empty")
-            cleaned = data.type.strip().capitalize()
-            existing = await self.expense_repo.get_by_trip_and_type(expense.trip_id, cleaned, user_id)
-            if existing and existing.id != expense.id:
-                raise DuplicateExpenseError("Expense type already exists for this trip")
-            expense.type = cleaned
-
-        if data.amount is not None:
-            if data.amount <= 0:
-                raise InvalidExpenseDataError("Amount must be positive")
-            expense.amount = data.amount
-        
-        saved_expense = await self.expense_repo.save(expense)
-        await self._update_trip_total(expense.trip_id)
-        return saved_expense
+        if data.type is not None and not data.type.strip():
+            raise InvalidExpenseDataError("Type cannot be empty")
+        if data.amount is not None and data.amount <= 0:
+            raise InvalidExpenseDataError("Amount must be positive")
+
+        await self._lock_trip(expense.trip_id)
+        try:
+            #the amount read before the lock may already be outdated
+            expense = await self.expense_repo.get_expense(expense_id, user_id, fresh=True)
+            if not expense:
+                raise ExpenseNotFoundError("Expense not found or not owned by user")
+            previous_amount = expense.amount
+
+            if data.type is not None:
+                cleaned = data.type.strip().capitalize()
+                existing = await self.expense_repo.get_by_trip_and_type(expense.trip_id, cleaned, user_id)
+                if existing and existing.id != expense.id:
+                    raise DuplicateExpenseError("Expense type already exists for this trip")
+                expense.type = cleaned
+
+            if data.amount is not None:
+                expense.amount = data.amount
+
+            if expense.amount != previous_amount:
+                await self._add_to_trip_total(expense.trip_id, expense.amount - previous_amount)
+            saved_expense = await self.expense_repo.save(expense)
+            return saved_expense
+        except Exception:
+            await self.expense_repo.rollback()
+            raise
         
     async def delete_expense(self, user_id: UUID, expense_id: UUID):
         expense = await self.get_expense(user_id, expense_id)
-        trip_id = expense.trip_id
-        await self.expense_repo.delete_expense(expense)
-        await self._update_trip_total(trip_id)
+        await self._lock_trip(expense.trip_id)
+        try:
+            #a concurrent delete may have won the lock, then there's nothing left to take off the total
+            expense = await self.expense_repo.get_expense(expense_id, user_id, fresh=True)
+            if not expense:
+                raise ExpenseNotFoundError("Expense not found or not owned by user")
+            await self._add_to_trip_total(expense.trip_id, -expense.amount)
+            await self.expense_repo.delete_expense(expense)
+        except Exception:
+            await self.expense_repo.rollback()
+            raise
+
+    def _new_expenses(self, user_id: UUID, trip_id: UUID | None, items: list[CreateExpenseDTO]) -> list[Expense]:
+        created = []
+        for item in items:
+            if not item.type.strip():
+                raise InvalidExpenseDataError("Type is required")
+            if item.amount <= 0:
+                raise InvalidExpenseDataError("Amount must be positive")
+            created.append(Expense(user_id=user_id, trip_id=trip_id, type=item.type.strip().capitalize(), amount=item.amount))
+        return created
+
+    def _check_unique_types(self, types: list[str]) -> None:
+        lowered = [expense_type.lower() for expense_type in types]
+        if len(lowered) != len(set(lowered)):
+            raise DuplicateExpenseError("Expense type already exists for this trip")
+
+    def check_new_trip_batch(self, user_id: UUID, data: ExpenseBatchDTO) -> None:
+        """Run the checks apply_expense_batch would run on a trip without expenses, so a new
+        trip can be rejected along with a bad batch before either is written."""
+        if data.edit or data.delete:
+            raise ExpenseNotFoundError("Expense not found or not owned by user")
+        self._check_unique_types([expense.type for expense in self._new_expenses(user_id, None, data.create)])
+
+    async def apply_expense_batch(self, user_id: UUID, trip_id: UUID, data: ExpenseBatchDTO):
+        """Apply creates, edits and deletes for one trip in a single transaction.
+
+        The whole batch is checked against the trip's current expenses before anything is
+        written, and the trip total moves once by the net change. Returns the trip's expenses.
+        """
+        trip = await self.trip_repo.get(trip_id, user_id)
+        if not trip:
+            raise TripNotFoundError("Trip not found or not owned by user")
+
+        await self._lock_trip(trip_id)
+        try:
+            return await self._apply_locked_batch(user_id, trip_id, data)
+        except Exception:
+            await self.expense_repo.rollback()
+            raise
+
+    async def _apply_locked_batch(self, user_id: UUID, trip_id: UUID, data: ExpenseBatchDTO):
+        #amounts are read under the trip lock, so the net delta can't be based on a stale amount
+        expenses = {
+            expense.id: expense
+            for expense in await self.expense_repo.get_expenses_by_trip_id(trip_id, user_id, fresh=True)
+        }
+        for expense_id in [edit.id for edit in data.edit] + data.delete:
+            if expense_id not in expenses:
+                raise ExpenseNotFoundError("Expense not found or not owned by user")
+
+        deleted = [expenses.pop(expense_id) for expense_id in data.delete]
+
+        #work out the end state on the side, nothing is touched until the whole batch checks out
+        types = {expense_id: expense.type for expense_id, expense in expenses.items()}
+        amounts = {expense_id: expense.amount for expense_id, expense in expenses.items()}
+        for edit in data.edit:
+            if edit.type is not None:
+                if not edit.type.strip():
+                    raise InvalidExpenseDataError("Type cannot be empty")
+                types[edit.id] = edit.type.strip().capitalize()
+            if edit.amount is not None:
+                if edit.amount <= 0:
+                    raise InvalidExpenseDataError("Amount must be positive")
+                amounts[edit.id] = edit.amount
+
+        created = self._new_expenses(user_id, trip_id, data.create)
+        self._check_unique_types(list(types.values()) + [expense.type for expense in created])
+
+        delta = sum(expense.amount for expense in created) - sum(expense.amount for expense in deleted)
+        for edit in data.edit:
+            expense = expenses[edit.id]
+            delta += amounts[edit.id] - expense.amount
+            expense.type = types[edit.id]
+            expense.amount = amounts[edit.id]
+
+        try:
+            if delta:
+                await self._add_to_trip_total(trip_id, delta)
+            await self.expense_repo.apply_batch(created, deleted)
+        except Exception as e:
+            raise ExpensePersistenceError("Unexpected error occurred while saving expenses") from e
+
+        return await self.expense_repo.get_expenses_by_trip_id(trip_id, user_id)
@@ -5,14 +5,15 @@ from uuid import UUID
 
 import sqlalchemy as sa
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
 from app.modules.reports.models import Report
+from app.modules.rate_categories.models import RateCategory
 from app.modules.trips.models import Trip
 from app.modules.expenses.models import Expense
 
 
-@dataclass
+#slots, a long report holds one of these per trip and expense
+@dataclass(slots=True)
 class TripReportItem:
     date: date
     purpose: str
@@ -22,7 +23,7 @@ class TripReportItem:
     mileage_total: float
 
 
-@dataclass
+@dataclass(slots=True)
 class ExpenseReportItem:
     date: date
     type: str
@@ -48,74 +49,76 @@ class ReportData:
 
 class ReportDataBuilder:
 
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, chunk_size: int = 1000):
         self.session = session
+        self.chunk_size = chunk_size
 
     async def build(self, report: Report) -> ReportData:
-        #load trips in time range for the user
-        trip_result = await self.session.execute(
-            sa.select(Trip)
-            .options(
-                selectinload(Trip.rate_category),
-                selectinload(Trip.rate_customization),
-                selectinload(Trip.expenses),
-            )
-            .where(
-                Trip.user_id == report.user_id,
-                Trip.started_at >= report.start_date,
-                Trip.started_at <= report.end_date,
-            )
+        #totals are summed from the rows being itemized rather than read from trip_daily_rollups,
+        #so the printed total always matches the printed lines
+        #only the printed columns are selected and rows are streamed in chunks, no orm objects or
+        #relationships are loaded, so a year of trips costs its report items and nothing more
+        in_period = (
+            Trip.user_id == report.user_id,
+            Trip.started_at >= report.start_date,
+            Trip.started_at <= report.end_date,
         )
-        trips: list[Trip] = trip_result.scalars().all()
-
-        #load expenses linked to found trips
-        trip_ids = [t.id for t in trips]
 
-        expenses: list[Expense] = []
-        if trip_ids:
-            exp_result = await self.session.execute(
-                sa.select(Expense)
-                .options(selectinload(Expense.trip))
-                .where(Expense.trip_id.in_(trip_ids))
-            )
-            expenses = exp_result.scalars().all()
-
-        #convert trips into printable thingy
         trip_items: list[TripReportItem] = []
         total_miles = 0.0
         total_mileage_amount = 0.0
 
-        for t in trips:
-            miles = float(t.miles or 0)
-            mileage_total = float(t.mileage_reimbursement_total or 0)
+        trip_rows = await self.session.stream(
+            sa.select(
+                Trip.started_at,
+                Trip.purpose,
+                Trip.miles,
+                Trip.reimbursement_rate,
+                Trip.mileage_reimbursement_total,
+                RateCategory.name.label("category_name"),
+            )
+            .outerjoin(RateCategory, RateCategory.id == Trip.rate_category_id)
+            .where(*in_period)
+            .order_by(Trip.started_at)
+            .execution_options(yield_per=self.chunk_size)
+        )
+        async for row in trip_rows:
+            miles = float(row.miles or 0)
+            mileage_total = float(row.mileage_reimbursement_total or 0)
 
             total_miles += miles
             total_mileage_amount += mileage_total
 
             trip_items.append(
                 TripReportItem(
-                    date=t.started_at.date(),
-                    purpose=t.purpose or "Unspecified",
+                    date=row.started_at.date(),
+                    purpose=row.purpose or "Unspecified",
                     miles=miles,
-                    category_name=t.rate_category.name
-                    if t.rate_category else "Unknown",
-                    rate_used=t.reimbursement_rate,
+                    category_name=row.category_name or "Unknown",
+                    rate_used=row.reimbursement_rate,
                     mileage_total=mileage_total,
                 )
             )
 
-        #convert expenses into printable thingy
+        #expenses of the same trips, joined instead of collecting trip ids for an IN list
         expense_items: list[ExpenseReportItem] = []
         total_expense_amount = 0.0
 
-        for e in expenses:
-            amount = float(e.amount or 0)
+        expense_rows = await self.session.stream(
+            sa.select(Expense.created_at, Expense.type, Expense.amount)
+            .join(Trip, Trip.id == Expense.trip_id)
+            .where(*in_period)
+            .order_by(Expense.created_at)
+            .execution_options(yield_per=self.chunk_size)
+        )
+        async for row in expense_rows:
+            amount = float(row.amount or 0)
             total_expense_amount += amount
 
             expense_items.append(
                 ExpenseReportItem(
-                    date=e.created_at.date(),
-                    type=e.type,
+                    date=row.created_at.date(),
+                    type=row.type,
                     amount=amount,
                 )
             )
@@ -137,4 +140,4 @@ class ReportDataBuilder:
             total_mileage_amount=total_mileage_amount,
             total_expense_amount=total_expense_amount,
             grand_total=total_mileage_amount + total_expense_amount,
-        )
\ No newline at end of file
+        )
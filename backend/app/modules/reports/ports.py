@@ -20,24 +20,24 @@ class NotificationPort(ABC):
 class StoragePort(ABC):
     
     @abstractmethod
-    def save(self, report_id: UUID, file_bytes: bytes) -> str:
+    async def save(self, report_id: UUID, file_bytes: bytes) -> str:
         pass
     
     @abstractmethod
-    def get_signed_url(self, key: str, expires_in: int = 300) -> str:
+    async def get_signed_url(self, key: str, expires_in: int = 300) -> str:
         pass
     
     @abstractmethod
-    def exists(self, key: str) -> bool:
+    async def exists(self, key: str) -> bool:
         pass
     
     @abstractmethod
-    def delete(self, key: str) -> bool:
+    async def delete(self, key: str) -> bool:
         pass
 
 
 class QueuePort(ABC):
     
     @abstractmethod
-    def send(self, report_id: str) -> None:
+    async def send(self, report_id: str) -> None:
         pass
\ No newline at end of file
@@ -1,6 +1,10 @@
 from fpdf import FPDF
 from datetime import datetime
 
+from app.config import settings
+from app.core.process_pool import ProcessPool
+from app.modules.reports.data_builder import ReportData
+
 
 class ReportPDFRenderer:
 
@@ -102,3 +106,18 @@ class ReportPDFRenderer:
 
         output = pdf.output(dest="S")
         return output.encode("latin1") if isinstance(output, str) else output
+
+    async def render_async(self, data: ReportData) -> bytes:
+        """Render on the process pool, fpdf layout is pure python and would hold the event loop.
+
+        Only the ReportData goes to the worker process and only the pdf bytes come back.
+        """
+        return await _pool.run(render_report, data)
+
+
+def render_report(data: ReportData) -> bytes:
+    #top level so the process pool can pickle it
+    return ReportPDFRenderer().render(data)
+
+
+_pool = ProcessPool(settings.REPORT_RENDER_WORKERS)
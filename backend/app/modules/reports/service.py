@@ -1,6 +1,5 @@
 from datetime import date,datetime, timedelta, timezone
 from calendar import monthrange
-from collections import Counter
 from uuid import UUID
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -18,6 +17,7 @@ from app.modules.reports.exceptions import (
 )
 from app.modules.reports.ports import NotificationPort, StoragePort, QueuePort
 from app.modules.users.models import User
+from app.modules.trips.rollups_repository import TripRollupRepo
 from app.modules.audit_trail.service import AuditTrailService
 from app.modules.audit_trail.models import AuditAction
 import logging
@@ -27,7 +27,7 @@ class ReportsService:
     SYSTEM_MAX = 50
     MAX_RETRY_ATTEMPTS = 3
 
-    def __init__(self, session: AsyncSession, repo: ReportRepository, data_builder: ReportDataBuilder | None = None, renderer: ReportPDFRenderer | None = None, storage: StoragePort | None = None, queue: QueuePort | None = None, notification_service: NotificationPort | None = None, audit_service: AuditTrailService | None = None):
+    def __init__(self, session: AsyncSession, repo: ReportRepository, data_builder: ReportDataBuilder | None = None, renderer: ReportPDFRenderer | None = None, storage: StoragePort | None = None, queue: QueuePort | None = None, notification_service: NotificationPort | None = None, audit_service: AuditTrailService | None = None, rollup_repo: TripRollupRepo | None = None):
         self.session = session
         self.repo = repo
         self.data_builder = data_builder or ReportDataBuilder(session)
@@ -42,6 +42,7 @@ class ReportsService:
         self.queue = queue
         self.notification_service = notification_service
         self.audit_service = audit_service or AuditTrailService(session)
+        self.rollup_repo = rollup_repo or TripRollupRepo(session)
 
     async def generate_report(self, user_id: UUID, dto: GenerateReportDTO) -> Report:
         #rate limit stuff. disable when in local dev
@@ -65,7 +66,7 @@ class ReportsService:
                 details=f"Report requested for date range {dto.start_date} to {dto.end_date}"
             )
             
-            self.queue.send(str(created_report.id))
+            await self.queue.send(str(created_report.id))
             
             return created_report
         except Exception as e:
@@ -79,9 +80,9 @@ class ReportsService:
 
         data = await self.data_builder.build(report)
 
-        pdf_bytes = self.renderer.render(data)
+        pdf_bytes = await self.renderer.render_async(data)
 
-        key = self.storage.save(report.id, pdf_bytes)
+        key = await self.storage.save(report.id, pdf_bytes)
 
         report.file_name = key
         report.file_url = key
@@ -104,7 +105,7 @@ class ReportsService:
             try:
                 user_result = await self.session.get(User, report.user_id)
                 if user_result:
-                    download_url = self.storage.get_signed_url(report.file_name)
+                    download_url = await self.storage.get_signed_url(report.file_name)
                     await self.notification_service.notify_report_completed(
                         user=user_result,
                         report=report,
@@ -149,7 +150,7 @@ class ReportsService:
             await self.session.commit()
 
             #requeue
-            self.queue.send(str(report.id))
+            await self.queue.send(str(report.id))
 
             return report
         except Exception as e:
@@ -178,12 +179,12 @@ class ReportsService:
 
         #if file still exists in storage then try to sign it
         if report.file_name:
-            if self.storage.exists(report.file_name):
+            if await self.storage.exists(report.file_name):
                 now = datetime.now(timezone.utc)
                 report.expires_at = now + timedelta(days=90)
                 await self.session.commit()
                 
-                url = self.storage.get_signed_url(report.file_name)
+                url = await self.storage.get_signed_url(report.file_name)
                 return {
                     "status": "available",
                     "download_url": url
@@ -201,7 +202,7 @@ class ReportsService:
             await self.repo.update(self.session, report)
             await self.session.commit()
 
-            self.queue.send(str(report.id))
+            await self.queue.send(str(report.id))
 
             return {"status": "regenerating"}
         except Exception as e:
@@ -266,7 +267,7 @@ class ReportsService:
             raise ReportInvalidStateError("Report not generated yet")
 
         #check if file still exists in storage
-        if not self.storage.exists(report.file_name):
+        if not await self.storage.exists(report.file_name):
             report.status = ReportStatus.expired
             await self.session.commit()
             raise ReportExpiredError("Report no longer available and must be regenerated")
@@ -278,7 +279,7 @@ class ReportsService:
             details=f"Report download URL generated for file: {report.file_name}"
         )
 
-        return self.storage.get_signed_url(report.file_name)
+        return await self.storage.get_signed_url(report.file_name)
 
     async def list_user_reports(self, user_id: UUID) -> list[Report]:
         reports = await self.repo.list_for_user(self.session, user_id)
@@ -308,9 +309,9 @@ class ReportsService:
         if report.user_id != user_id:
             raise ReportPermissionError("Not allowed to delete this report")
         
-        if report.file_name and self.storage.exists(report.file_name):
+        if report.file_name and await self.storage.exists(report.file_name):
             try:
-                self.storage.delete(report.file_name)
+                await self.storage.delete(report.file_name)
             except Exception as e:
                 logger = logging.getLogger(__name__)
                 logger.warning(f"Failed to delete file {report.file_name} from storage: {str(e)}")
@@ -364,6 +365,11 @@ class ReportsService:
             await self.session.commit()
 
     async def get_analytics(self, user: User, month: str) -> AnalyticsResponse:
+        """Totals of the user's completed trips started in a month of the current year (UTC days).
+
+        Read from the daily rollups, so active and cancelled trips are not counted, and expenses
+        come in through each trip's expense_reimbursement_total, which tracks the sum of its expenses.
+        """
         year = date.today().year
         current_month = date.today().month
 
@@ -375,21 +381,18 @@ class ReportsService:
         start_date = date(year, month_num, 1)
         end_date = date(year, month_num, monthrange(year, month_num)[1])
 
+        #read the per-day rollups instead of rescanning every trip in the month
         try:
-            temp_report = Report(
-            user = user,
-            user_id=user.id,
-            start_date=start_date,
-            end_date=end_date
-        )
-            data = await self.data_builder.build(temp_report)
+            rows = await self.rollup_repo.get_category_totals(user.id, start_date, end_date)
         except Exception as e:
             raise InvalidDataAnalyticsError("Failed to gather data") from e
 
-        category_counts = Counter(trip.category_name for trip in data.trips)
+        category_counts = {row.category_name: int(row.trip_count) for row in rows if row.trip_count}
+        total_miles = sum(float(row.total_miles or 0) for row in rows)
+        grand_total = sum(float(row.mileage_reimbursement_total or 0) + float(row.expense_reimbursement_total or 0) for row in rows)
         
         return AnalyticsResponse(
-            category_counts=dict(category_counts),
-            total_miles=data.total_miles,
-            grand_total=data.grand_total
+            category_counts=category_counts,
+            total_miles=total_miles,
+            grand_total=grand_total
         )
\ No newline at end of file
@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+
+from sqlalchemy import delete, select
+
+from app.infra.db import AsyncSessionLocal
+from app.modules.trips.utils.blind_index import address_tokens
+from app.modules.trips.utils.crypto import decrypt_addresses
+
+from app.modules.auth.models import RefreshToken, OAuthAccount
+from app.modules.common_places.models import CommonPlace
+from app.modules.expenses.models import Expense
+from app.modules.rate_categories.models import RateCategory
+from app.modules.rate_customizations.models import RateCustomization
+from app.modules.reports.models import Report
+from app.modules.trips.models import AddressSearchToken, Trip
+from app.modules.users.models import User
+from app.modules.vehicles.models import Vehicle
+
+
+async def _rebuild(session, model, owner_column, fields: dict[str, str], chunk_size: int) -> int:
+    #fields maps the token field name to the encrypted address column
+    indexed = 0
+    last_id = None
+
+    while True:
+        query = (
+            select(model.id, model.user_id, *(getattr(model, column) for column in fields.values()))
+            .order_by(model.id)
+            .limit(chunk_size)
+        )
+        if last_id is not None:
+            query = query.where(model.id > last_id)
+
+        rows = (await session.execute(query)).all()
+        if not rows:
+            return indexed
+        last_id = rows[-1].id
+
+        encrypted = [row._mapping[column] for row in rows for column in fields.values()]
+        addresses = iter(await decrypt_addresses(encrypted))
+
+        await session.execute(delete(AddressSearchToken).where(owner_column.in_([row.id for row in rows])))
+        for row in rows:
+            for field in fields:
+                address = next(addresses)
+                session.add_all([
+                    AddressSearchToken(user_id=row.user_id, token=token, field=field, **{owner_column.key: row.id})
+                    for token in address_tokens(row.user_id, address)
+                ])
+        await session.commit()
+        indexed += len(rows)
+
+
+async def backfill(session, chunk_size: int = 500) -> dict[str, int]:
+    """(Re)build address search tokens for every trip and common place, one committed chunk at a time.
+
+    Needed once for rows written before the index existed, and again after BLIND_INDEX_KEY changes.
+    """
+    return {
+        "trips": await _rebuild(
+            session, Trip, AddressSearchToken.trip_id,
+            {"start": "start_address_encrypted", "end": "end_address_encrypted"}, chunk_size,
+        ),
+        "common_places": await _rebuild(
+            session, CommonPlace, AddressSearchToken.common_place_id, {"place": "address"}, chunk_size,
+        ),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Rebuild the address search index")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+
+    async with AsyncSessionLocal() as session:
+        counts = await backfill(session, args.chunk_size)
+    for table_name, count in counts.items():
+        print(f"Indexed {count} {table_name} rows")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+
+from sqlalchemy import bindparam, select, update
+
+from app.config import settings
+from app.infra.db import AsyncSessionLocal
+from app.modules.trips.rollups_repository import TripRollupRepo
+from app.modules.trips.utils.crypto import decrypt_geometry
+from app.modules.trips.utils.distance import distance_diverges, meters_to_miles, miles_to_meters, route_length_meters
+
+from app.modules.auth.models import RefreshToken, OAuthAccount
+from app.modules.common_places.models import CommonPlace
+from app.modules.expenses.models import Expense
+from app.modules.rate_categories.models import RateCategory
+from app.modules.rate_customizations.models import RateCustomization
+from app.modules.reports.models import Report
+from app.modules.trips.models import Trip, TripStatus
+from app.modules.users.models import User
+from app.modules.vehicles.models import Vehicle
+
+
+async def backfill(session, chunk_size: int = 500, apply_miles: bool = False) -> int:
+    """Recompute route distance for completed trips with geometry, one committed chunk at a time.
+
+    By default only computed_miles and distance_flagged are filled in. With apply_miles the
+    computed distance replaces miles and the mileage total, and rollups are rebuilt at the end.
+    """
+    updated = 0
+    last_id = None
+    trips = Trip.__table__
+
+    while True:
+        query = (
+            select(Trip.id, Trip.miles, Trip.reimbursement_rate, Trip.geometry_encrypted)
+            .where(Trip.status == TripStatus.completed, Trip.geometry_encrypted.is_not(None))
+            .order_by(Trip.id)
+            .limit(chunk_size)
+        )
+        if last_id is not None:
+            query = query.where(Trip.id > last_id)
+
+        rows = (await session.execute(query)).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        params = []
+        for row in rows:
+            computed_meters = route_length_meters(decrypt_geometry(row.geometry_encrypted)) if row.geometry_encrypted else None
+            if computed_meters is None:
+                continue
+
+            computed_miles = meters_to_miles(computed_meters)
+            miles = computed_miles if apply_miles else (row.miles or 0.0)
+            params.append({
+                "trip_id": row.id,
+                "computed_miles": computed_miles,
+                "distance_flagged": distance_diverges(
+                    miles_to_meters(miles),
+                    computed_meters,
+                    settings.TRIP_DISTANCE_TOLERANCE,
+                    settings.TRIP_DISTANCE_SLACK_METERS,
+                ),
+                "miles": miles,
+                "mileage_total": miles * (row.reimbursement_rate or 0.0),
+            })
+
+        if not params:
+            continue
+
+        values = {
+            "computed_miles": bindparam("computed_miles"),
+            "distance_flagged": bindparam("distance_flagged"),
+            "updated_at": trips.c.updated_at,
+        }
+        if apply_miles:
+            values["miles"] = bindparam("miles")
+            values["mileage_reimbursement_total"] = bindparam("mileage_total")
+
+        await session.execute(
+            update(trips).where(trips.c.id == bindparam("trip_id")).values(**values),
+            params,
+        )
+        await session.commit()
+        updated += len(params)
+
+    if apply_miles and updated:
+        #miles moved, so the stats rollups have to follow
+        await TripRollupRepo(session).rebuild()
+        await session.commit()
+
+    return updated
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Recompute trip distance from the recorded route")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--apply-miles", action="store_true", help="overwrite miles and mileage totals with the computed distance")
+    args = parser.parse_args()
+
+    async with AsyncSessionLocal() as session:
+        count = await backfill(session, args.chunk_size, args.apply_miles)
+    print(f"Recomputed distance for {count} trips")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+
+from sqlalchemy import bindparam, select, update
+
+from app.infra.db import AsyncSessionLocal
+from app.modules.trips.utils.crypto import decrypt_geometry, encrypt_geometry, is_legacy_geometry
+
+from app.modules.auth.models import RefreshToken, OAuthAccount
+from app.modules.common_places.models import CommonPlace
+from app.modules.expenses.models import Expense
+from app.modules.rate_categories.models import RateCategory
+from app.modules.rate_customizations.models import RateCustomization
+from app.modules.reports.models import Report
+from app.modules.trips.models import Trip
+from app.modules.users.models import User
+from app.modules.vehicles.models import Vehicle
+
+
+async def backfill(session, chunk_size: int = 500) -> int:
+    """Rewrite legacy fernet-text geometry rows into the binary format, one committed chunk at a time."""
+    converted = 0
+    last_id = None
+
+    while True:
+        query = (
+            select(Trip.id, Trip.geometry_encrypted)
+            .where(Trip.geometry_encrypted.is_not(None))
+            .order_by(Trip.id)
+            .limit(chunk_size)
+        )
+        if last_id is not None:
+            query = query.where(Trip.id > last_id)
+
+        rows = (await session.execute(query)).all()
+        if not rows:
+            return converted
+        last_id = rows[-1].id
+
+        params = [
+            {"trip_id": row.id, "geometry": encrypt_geometry(decrypt_geometry(row.geometry_encrypted))}
+            for row in rows
+            if row.geometry_encrypted and is_legacy_geometry(row.geometry_encrypted)
+        ]
+        if params:
+            #core executemany. updated_at is kept as is since the route itself didn't change
+            trips = Trip.__table__
+            await session.execute(
+                update(trips)
+                .where(trips.c.id == bindparam("trip_id"))
+                .values(geometry_encrypted=bindparam("geometry"), updated_at=trips.c.updated_at),
+                params,
+            )
+            await session.commit()
+            converted += len(params)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Convert legacy trip geometry rows to the binary format")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+
+    async with AsyncSessionLocal() as session:
+        count = await backfill(session, args.chunk_size)
+    print(f"Converted {count} trip geometries")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,5 +1,6 @@
 import enum
 import uuid
+from datetime import date
 import sqlalchemy as sa
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID, DOUBLE_PRECISION
@@ -13,6 +14,22 @@ class TripStatus(str, enum.Enum):
 
 class Trip(Base):
     __tablename__ = "trips"
+    #every trip list is per user and newest first, so each filter gets user_id first and ends on
+    #the (started_at, id) sort key. then the index serves both the filter and the ORDER BY.
+    #see TripRepo.user_trips_query
+    __table_args__ = (
+        sa.Index("ix_trips_user_started", "user_id", sa.text("started_at DESC"), sa.text("id DESC")),
+        sa.Index("ix_trips_user_status_started", "user_id", "status", sa.text("started_at DESC"), sa.text("id DESC")),
+        sa.Index("ix_trips_user_vehicle_started", "user_id", "vehicle_id", sa.text("started_at DESC"), sa.text("id DESC")),
+        sa.Index("ix_trips_user_category_started", "user_id", "rate_category_id", sa.text("started_at DESC"), sa.text("id DESC")),
+        #lower() so the purpose prefix filter is case insensitive, text_pattern_ops so LIKE 'x%' can use it
+        sa.Index(
+            "ix_trips_user_purpose_prefix",
+            "user_id",
+            sa.func.lower(sa.column("purpose")).label("purpose_lower"),
+            postgresql_ops={"purpose_lower": "text_pattern_ops"},
+        ),
+    )
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, index=True, default=uuid.uuid4)
     user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     status: Mapped[TripStatus] = mapped_column(sa.Enum(TripStatus, name="trip_status"), default=TripStatus.active, nullable=False)
@@ -22,7 +39,12 @@ class Trip(Base):
     vehicle_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), sa.ForeignKey("vehicles.id", ondelete="SET NULL"), nullable=True, index=True)
     reimbursement_rate: Mapped[float | None] = mapped_column(DOUBLE_PRECISION, nullable=True)
     miles: Mapped[float | None] = mapped_column(DOUBLE_PRECISION, nullable=True)
-    geometry_encrypted: Mapped[str | None] = mapped_column(sa.Text, nullable=True)
+    computed_miles: Mapped[float | None] = mapped_column(DOUBLE_PRECISION, nullable=True)
+    #running haversine length of the points streamed while the trip is active
+    recorded_meters: Mapped[float | None] = mapped_column(DOUBLE_PRECISION, nullable=True)
+    distance_flagged: Mapped[bool] = mapped_column(sa.Boolean, default=False, server_default=sa.false(), nullable=False)
+    #largest column by far. deferred so list and write paths never pull it, use undefer() where the route is needed
+    geometry_encrypted: Mapped[bytes | None] = mapped_column(sa.LargeBinary, nullable=True, deferred=True, deferred_raiseload=True)
     mileage_reimbursement_total: Mapped[float | None] = mapped_column(DOUBLE_PRECISION, nullable=True)
     expense_reimbursement_total: Mapped[float | None] = mapped_column(DOUBLE_PRECISION, nullable=True)
     started_at: Mapped[sa.DateTime] = mapped_column(sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False)
@@ -33,6 +55,18 @@ class Trip(Base):
         back_populates="trip",
         cascade="all, delete-orphan",
     )
+    geometry_levels: Mapped[list["TripGeometryLevel"]] = relationship(
+        "TripGeometryLevel",
+        back_populates="trip",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+    point_chunks: Mapped[list["TripPointChunk"]] = relationship(
+        "TripPointChunk",
+        back_populates="trip",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
     rate_customization_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), sa.ForeignKey("rate_customizations.id", ondelete="RESTRICT"), nullable=False)
     rate_customization: Mapped["RateCustomization"] = relationship("RateCustomization", back_populates="trips")
     rate_category_id : Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), sa.ForeignKey("rate_categories.id", ondelete="RESTRICT"), nullable=False)
@@ -43,6 +77,96 @@ class Trip(Base):
     vehicle: Mapped["Vehicle"] = relationship("Vehicle", back_populates="trips")
 
 
-    
+#stands in for a null vehicle_id in the rollup bucket key. a plain unique constraint treats nulls as
+#distinct, so trips without a vehicle would never conflict and could pile up as duplicate buckets
+ROLLUP_NO_VEHICLE = "'00000000-0000-0000-0000-000000000000'"
+
+
+class TripDailyRollup(Base):
+    __tablename__ = "trip_daily_rollups"
+    __table_args__ = (
+        sa.Index(
+            "uq_trip_daily_rollups_bucket",
+            "user_id",
+            "day",
+            "rate_category_id",
+            sa.func.coalesce(sa.column("vehicle_id"), sa.literal_column(ROLLUP_NO_VEHICLE)),
+            unique=True,
+        ),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    day: Mapped[date] = mapped_column(sa.Date, nullable=False)
+    rate_category_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), sa.ForeignKey("rate_categories.id", ondelete="CASCADE"), nullable=False)
+    vehicle_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), sa.ForeignKey("vehicles.id", ondelete="SET NULL"), nullable=True)
+    trip_count: Mapped[int] = mapped_column(sa.Integer, nullable=False, default=0)
+    total_miles: Mapped[float] = mapped_column(DOUBLE_PRECISION, nullable=False, default=0.0)
+    mileage_reimbursement_total: Mapped[float] = mapped_column(DOUBLE_PRECISION, nullable=False, default=0.0)
+    expense_reimbursement_total: Mapped[float] = mapped_column(DOUBLE_PRECISION, nullable=False, default=0.0)
+    updated_at: Mapped[sa.DateTime] = mapped_column(sa.DateTime(timezone=True), server_default=sa.func.now(), onupdate=sa.func.now(), nullable=False)
+
+
+class TripGeometryLevel(Base):
+    __tablename__ = "trip_geometry_levels"
+    __table_args__ = (
+        sa.UniqueConstraint("trip_id", "level", name="uq_trip_geometry_levels_trip_level"),
+    )
 
-     
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    trip_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), sa.ForeignKey("trips.id", ondelete="CASCADE"), nullable=False)
+    level: Mapped[int] = mapped_column(sa.Integer, nullable=False)
+    tolerance_meters: Mapped[float] = mapped_column(DOUBLE_PRECISION, nullable=False)
+    point_count: Mapped[int] = mapped_column(sa.Integer, nullable=False)
+    geometry_encrypted: Mapped[bytes] = mapped_column(sa.LargeBinary, nullable=False)
+
+    trip: Mapped["Trip"] = relationship("Trip", back_populates="geometry_levels")
+
+
+class TripPointChunk(Base):
+    __tablename__ = "trip_point_chunks"
+    __table_args__ = (
+        sa.UniqueConstraint("trip_id", "sequence", name="uq_trip_point_chunks_trip_sequence"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    trip_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), sa.ForeignKey("trips.id", ondelete="CASCADE"), nullable=False)
+    sequence: Mapped[int] = mapped_column(sa.Integer, nullable=False)
+    point_count: Mapped[int] = mapped_column(sa.Integer, nullable=False)
+    #same encrypted binary format as trips.geometry_encrypted, a LineString of just this batch
+    geometry_encrypted: Mapped[bytes] = mapped_column(sa.LargeBinary, nullable=False)
+    created_at: Mapped[sa.DateTime] = mapped_column(sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False)
+
+    trip: Mapped["Trip"] = relationship("Trip", back_populates="point_chunks")
+
+
+
+class AddressSearchToken(Base):
+    """Blind index entry for one encrypted address, see trips/utils/blind_index.py.
+
+    Each address writes its full-address token plus one token per word. Rows belong to
+    either a trip (field "start" or "end") or a common place (field "place").
+    """
+    __tablename__ = "address_search_tokens"
+    __table_args__ = (
+        sa.Index("ix_address_search_tokens_user_token", "user_id", "token"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    token: Mapped[bytes] = mapped_column(sa.LargeBinary(16), nullable=False)
+    field: Mapped[str] = mapped_column(sa.String(16), nullable=False)
+    trip_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), sa.ForeignKey("trips.id", ondelete="CASCADE"), nullable=True, index=True)
+    common_place_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), sa.ForeignKey("common_places.id", ondelete="CASCADE"), nullable=True, index=True)
+
+class ReencryptionCheckpoint(Base):
+    __tablename__ = "reencryption_checkpoints"
+
+    #one row per encrypted table, written in the same transaction as each re-encrypted chunk
+    table_name: Mapped[str] = mapped_column(sa.String(64), primary_key=True)
+    #the active key the run is rotating to, a checkpoint for another key is stale
+    key_fingerprint: Mapped[str] = mapped_column(sa.String(32), nullable=False)
+    last_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), nullable=True)
+    rows_rewritten: Mapped[int] = mapped_column(sa.Integer, nullable=False, default=0)
+    completed_at: Mapped[sa.DateTime | None] = mapped_column(sa.DateTime(timezone=True), nullable=True)
+    updated_at: Mapped[sa.DateTime] = mapped_column(sa.DateTime(timezone=True), server_default=sa.func.now(), onupdate=sa.func.now(), nullable=False)
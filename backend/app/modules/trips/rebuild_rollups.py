@@ -0,0 +1,36 @@
+import argparse
+import asyncio
+from uuid import UUID
+
+from app.infra.db import AsyncSessionLocal
+from app.modules.trips.rollups_repository import TripRollupRepo
+
+from app.modules.auth.models import RefreshToken, OAuthAccount
+from app.modules.common_places.models import CommonPlace
+from app.modules.expenses.models import Expense
+from app.modules.rate_categories.models import RateCategory
+from app.modules.rate_customizations.models import RateCustomization
+from app.modules.reports.models import Report
+from app.modules.trips.models import Trip
+from app.modules.users.models import User
+from app.modules.vehicles.models import Vehicle
+
+
+async def rebuild(user_id: UUID | None = None) -> int:
+    async with AsyncSessionLocal() as session:
+        count = await TripRollupRepo(session).rebuild(user_id)
+        await session.commit()
+        return count
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Rebuild trip_daily_rollups from the trips table")
+    parser.add_argument("--user-id", type=UUID, default=None, help="only rebuild rollups for this user")
+    args = parser.parse_args()
+
+    count = await rebuild(args.user_id)
+    print(f"Rebuilt {count} rollup rows")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
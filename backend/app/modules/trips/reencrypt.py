@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import datetime
+import time
+
+from sqlalchemy import and_, bindparam, select, update
+
+from app.infra.db import AsyncSessionLocal
+from app.modules.trips.utils import crypto
+
+from app.modules.auth.models import RefreshToken, OAuthAccount
+from app.modules.common_places.models import CommonPlace
+from app.modules.expenses.models import Expense
+from app.modules.rate_categories.models import RateCategory
+from app.modules.rate_customizations.models import RateCustomization
+from app.modules.reports.models import Report
+from app.modules.trips.models import ReencryptionCheckpoint, Trip, TripGeometryLevel, TripPointChunk
+from app.modules.users.models import User
+from app.modules.vehicles.models import Vehicle
+
+#every encrypted column, and how to bring a value over to the active key
+ROTATIONS = {
+    Trip.__table__: {
+        "start_address_encrypted": crypto.reencrypt_address,
+        "end_address_encrypted": crypto.reencrypt_address,
+        "geometry_encrypted": crypto.reencrypt_geometry,
+    },
+    TripGeometryLevel.__table__: {"geometry_encrypted": crypto.reencrypt_geometry},
+    TripPointChunk.__table__: {"geometry_encrypted": crypto.reencrypt_geometry},
+    CommonPlace.__table__: {"address": crypto.reencrypt_address},
+}
+
+
+async def _checkpoint(session, table_name: str) -> ReencryptionCheckpoint:
+    checkpoint = await session.get(ReencryptionCheckpoint, table_name)
+    if checkpoint is None:
+        checkpoint = ReencryptionCheckpoint(table_name=table_name, key_fingerprint=crypto.key_fingerprint, rows_rewritten=0)
+        session.add(checkpoint)
+    elif checkpoint.key_fingerprint != crypto.key_fingerprint:
+        #left over from a rotation to another key, start this table over
+        checkpoint.key_fingerprint = crypto.key_fingerprint
+        checkpoint.last_id = None
+        checkpoint.rows_rewritten = 0
+        checkpoint.completed_at = None
+    return checkpoint
+
+
+async def _rewrite(session, table, columns: tuple[str, ...], params: list[dict]) -> None:
+    #only touch the row if every value is still the one we read. a concurrent edit already wrote
+    #under the active key, so losing that race is fine
+    values = {column: bindparam(f"new_{column}") for column in columns}
+    if "updated_at" in table.c:
+        values["updated_at"] = table.c.updated_at
+
+    await session.execute(
+        update(table)
+        .where(and_(table.c.id == bindparam("row_id"), *(table.c[column] == bindparam(f"old_{column}") for column in columns)))
+        .values(**values)
+        .execution_options(synchronize_session=False),
+        params,
+    )
+
+
+async def reencrypt_table(session, table, chunk_size: int = 500, max_rows_per_second: float | None = None) -> int:
+    """Re-encrypt one table under the active key, one committed chunk at a time.
+
+    Rows are walked in id order from the table's checkpoint, which is saved in the same
+    transaction as each chunk, so a crashed run picks up after the last committed chunk.
+    Returns the number of rows rewritten by this call.
+    """
+    rotations = ROTATIONS[table]
+    checkpoint = await _checkpoint(session, table.name)
+    if checkpoint.completed_at is not None:
+        await session.commit()
+        return 0
+
+    rewritten = 0
+    while True:
+        chunk_started = time.monotonic()
+        query = select(table.c.id, *(table.c[column] for column in rotations)).order_by(table.c.id).limit(chunk_size)
+        if checkpoint.last_id is not None:
+            query = query.where(table.c.id > checkpoint.last_id)
+
+        rows = (await session.execute(query)).all()
+        if not rows:
+            checkpoint.completed_at = datetime.datetime.now(datetime.timezone.utc)
+            await session.commit()
+            return rewritten
+
+        #group by the set of changed columns so each group is one executemany
+        groups: dict[tuple[str, ...], list[dict]] = {}
+        for row in rows:
+            params = {"row_id": row.id}
+            for column, rotate in rotations.items():
+                new_value = rotate(row._mapping[column])
+                if new_value is not None:
+                    params[f"old_{column}"] = row._mapping[column]
+                    params[f"new_{column}"] = new_value
+            columns = tuple(column for column in rotations if f"new_{column}" in params)
+            if columns:
+                groups.setdefault(columns, []).append(params)
+
+        for columns, params in groups.items():
+            await _rewrite(session, table, columns, params)
+
+        changed = sum(len(params) for params in groups.values())
+        checkpoint.last_id = rows[-1].id
+        checkpoint.rows_rewritten += changed
+        await session.commit()
+        rewritten += changed
+
+        if max_rows_per_second:
+            #throttle on rows scanned, that's what costs the database io
+            delay = len(rows) / max_rows_per_second - (time.monotonic() - chunk_started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+
+async def reencrypt(session, chunk_size: int = 500, max_rows_per_second: float | None = None) -> dict[str, int]:
+    return {
+        table.name: await reencrypt_table(session, table, chunk_size, max_rows_per_second)
+        for table in ROTATIONS
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Re-encrypt stored addresses and geometry under the active key")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--max-rows-per-second", type=float, default=2000)
+    args = parser.parse_args()
+
+    async with AsyncSessionLocal() as session:
+        counts = await reencrypt(session, args.chunk_size, args.max_rows_per_second)
+    for table_name, count in counts.items():
+        print(f"Re-encrypted {count} {table_name} rows")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
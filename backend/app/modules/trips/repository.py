@@ -1,9 +1,21 @@
+from datetime import datetime, timezone
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
-from sqlalchemy import func, extract
-from app.modules.trips.models import Trip
+from sqlalchemy.orm import selectinload, undefer
+from sqlalchemy import delete, func, extract, update, and_, or_
+from app.modules.trips.models import AddressSearchToken, Trip, TripGeometryLevel, TripPointChunk
+from app.modules.trips.schemas import TripFilterDTO
+from app.modules.expenses.models import Expense, ExpenseReceipt
+
+
+def in_utc(column, dialect_name: str):
+    #postgres extracts fields of a timestamptz in the session time zone, month buckets are utc.
+    #sqlite keeps the utc wall time it was written with
+    if dialect_name == "postgresql":
+        return func.timezone('UTC', column)
+    return column
+
 
 class TripRepo:
     def __init__(self, db: AsyncSession):
@@ -26,7 +38,16 @@ class TripRepo:
         )
         return result.scalar_one()
     
-    async def get(self, trip_id: UUID, user_id: UUID = None):
+    async def add(self, trip: Trip) -> None:
+        #no commit, inserts a new trip ahead of the tokens and levels that reference it by id
+        self.db.add(trip)
+        await self.db.flush()
+
+    async def refresh_expenses(self, trip: Trip) -> None:
+        #expense writes don't go through the trip object, pick their effect up on an already loaded one
+        await self.db.refresh(trip, ["expenses", "expense_reimbursement_total"])
+
+    async def get(self, trip_id: UUID, user_id: UUID = None, with_geometry: bool = False):
         query = select(Trip).options(
             selectinload(Trip.expenses),
             selectinload(Trip.receipts),
@@ -37,12 +58,19 @@ class TripRepo:
         
         if user_id is not None:
             query = query.where(Trip.user_id == user_id)
+
+        if with_geometry:
+            query = query.options(undefer(Trip.geometry_encrypted))
             
         result = await self.db.execute(query)
         return result.scalar_one_or_none()
     
-    async def get_user_trips(self, user_id: UUID):
-        result = await self.db.execute(
+    async def get_user_trips(self, user_id: UUID, filters: TripFilterDTO | None = None):
+        result = await self.db.execute(self.user_trips_query(user_id, filters))
+        return result.scalars().all()
+
+    def user_trips_query(self, user_id: UUID, filters: TripFilterDTO | None = None):
+        query = (
             select(Trip)
             .options(
                 selectinload(Trip.expenses),
@@ -52,10 +80,287 @@ class TripRepo:
                 selectinload(Trip.vehicle),
             )
             .where(Trip.user_id == user_id)
-            .order_by(Trip.started_at.desc())
         )
-        return result.scalars().all()
+        if filters is not None:
+            query = query.where(*self._trip_filters(filters))
+        return query.order_by(Trip.started_at.desc(), Trip.id.desc())
+
+    def _trip_filters(self, filters: TripFilterDTO) -> list:
+        #each shape lines up with one of the (user_id, ...) indexes on Trip
+        conditions = []
+        if filters.status is not None:
+            conditions.append(Trip.status == filters.status)
+        if filters.vehicle_id is not None:
+            conditions.append(Trip.vehicle_id == filters.vehicle_id)
+        if filters.rate_category_id is not None:
+            conditions.append(Trip.rate_category_id == filters.rate_category_id)
+        if filters.started_after is not None:
+            conditions.append(Trip.started_at >= filters.started_after)
+        if filters.started_before is not None:
+            conditions.append(Trip.started_at < filters.started_before)
+        if filters.purpose_prefix:
+            conditions.append(func.lower(Trip.purpose).startswith(filters.purpose_prefix.lower(), autoescape=True))
+        return conditions
     
+    def _summary_query(self, user_id: UUID):
+        #column-only projection for list views. no geometry and no nested rows, just counts
+        expense_count = (
+            select(func.count(Expense.id))
+            .where(Expense.trip_id == Trip.id)
+            .correlate(Trip)
+            .scalar_subquery()
+        )
+        receipt_count = (
+            select(func.count(ExpenseReceipt.id))
+            .where(ExpenseReceipt.trip_id == Trip.id)
+            .correlate(Trip)
+            .scalar_subquery()
+        )
+
+        return (
+            select(
+                Trip.id,
+                Trip.status,
+                Trip.start_address_encrypted,
+                Trip.end_address_encrypted,
+                Trip.purpose,
+                Trip.vehicle_id,
+                Trip.miles,
+                Trip.reimbursement_rate,
+                Trip.mileage_reimbursement_total,
+                Trip.expense_reimbursement_total,
+                Trip.started_at,
+                Trip.ended_at,
+                Trip.updated_at,
+                Trip.rate_customization_id,
+                Trip.rate_category_id,
+                expense_count.label("expense_count"),
+                receipt_count.label("receipt_count"),
+            )
+            .where(Trip.user_id == user_id)
+        )
+
+    async def get_user_trip_summaries(self, user_id: UUID, limit: int, after: tuple[datetime, UUID] | None = None):
+        query = self._summary_query(user_id)
+
+        #keyset on (started_at, id) so deep pages cost the same as the first one
+        if after is not None:
+            after_started_at, after_id = after
+            query = query.where(
+                or_(
+                    Trip.started_at < after_started_at,
+                    and_(Trip.started_at == after_started_at, Trip.id < after_id),
+                )
+            )
+
+        result = await self.db.execute(
+            query.order_by(Trip.started_at.desc(), Trip.id.desc()).limit(limit)
+        )
+        return result.all()
+
+    async def replace_address_tokens(self, trip_id: UUID, user_id: UUID, field: str, tokens: list[bytes]) -> None:
+        #no commit, the tokens go out with the trip write
+        await self.db.execute(
+            delete(AddressSearchToken).where(AddressSearchToken.trip_id == trip_id, AddressSearchToken.field == field)
+        )
+        self.db.add_all([
+            AddressSearchToken(user_id=user_id, token=token, field=field, trip_id=trip_id)
+            for token in tokens
+        ])
+
+    async def get_common_place_tokens(self, common_place_id: UUID, user_id: UUID) -> list[bytes]:
+        result = await self.db.execute(
+            select(AddressSearchToken.token)
+            .where(AddressSearchToken.common_place_id == common_place_id, AddressSearchToken.user_id == user_id)
+        )
+        return list(result.scalars().all())
+
+    async def search_trip_summaries(self, user_id: UUID, tokens: list[bytes], limit: int):
+        #trips where one address, start or end, has every token. resolved on the (user_id, token)
+        #index, nothing is decrypted to find them
+        tokens = list(dict.fromkeys(tokens))
+        matches = (
+            select(AddressSearchToken.trip_id)
+            .where(
+                AddressSearchToken.user_id == user_id,
+                AddressSearchToken.token.in_(tokens),
+                AddressSearchToken.trip_id.is_not(None),
+            )
+            .group_by(AddressSearchToken.trip_id, AddressSearchToken.field)
+            .having(func.count(func.distinct(AddressSearchToken.token)) == len(tokens))
+        )
+
+        result = await self.db.execute(
+            self._summary_query(user_id)
+            .where(Trip.id.in_(matches))
+            .order_by(Trip.started_at.desc(), Trip.id.desc())
+            .limit(limit)
+        )
+        return result.all()
+
+    async def replace_geometry_levels(self, trip_id: UUID, levels: list[TripGeometryLevel]) -> None:
+        #no commit, the levels go out with the trip write
+        await self.db.execute(delete(TripGeometryLevel).where(TripGeometryLevel.trip_id == trip_id))
+        self.db.add_all(levels)
+
+    async def get_geometry_levels(self, trip_id: UUID, user_id: UUID):
+        #level metadata only, the encrypted geometry of the chosen level is fetched on its own
+        result = await self.db.execute(
+            select(TripGeometryLevel.level, TripGeometryLevel.tolerance_meters, TripGeometryLevel.point_count)
+            .join(Trip, Trip.id == TripGeometryLevel.trip_id)
+            .where(TripGeometryLevel.trip_id == trip_id, Trip.user_id == user_id)
+            .order_by(TripGeometryLevel.level)
+        )
+        return result.all()
+
+    async def get_preview_geometries(self, trip_ids: list[UUID]) -> dict[UUID, bytes]:
+        """Encrypted map preview of each trip: its coarsest stored level, or the route itself
+        when it has no levels (short routes and trips the backfill hasn't reached yet)."""
+        if not trip_ids:
+            return {}
+
+        coarsest = (
+            select(TripGeometryLevel.trip_id, func.max(TripGeometryLevel.level).label("level"))
+            .where(TripGeometryLevel.trip_id.in_(trip_ids))
+            .group_by(TripGeometryLevel.trip_id)
+            .subquery()
+        )
+        result = await self.db.execute(
+            select(Trip.id, func.coalesce(TripGeometryLevel.geometry_encrypted, Trip.geometry_encrypted))
+            .outerjoin(coarsest, coarsest.c.trip_id == Trip.id)
+            .outerjoin(TripGeometryLevel, and_(TripGeometryLevel.trip_id == Trip.id, TripGeometryLevel.level == coarsest.c.level))
+            .where(Trip.id.in_(trip_ids))
+        )
+        return {trip_id: geometry for trip_id, geometry in result.all() if geometry is not None}
+
+    async def get_geometry_level(self, trip_id: UUID, level: int) -> bytes | None:
+        return await self.db.scalar(
+            select(TripGeometryLevel.geometry_encrypted)
+            .where(TripGeometryLevel.trip_id == trip_id, TripGeometryLevel.level == level)
+        )
+
+    async def get_geometry_version(self, trip_id: UUID, user_id: UUID):
+        #enough to build the etag without touching any geometry bytes
+        result = await self.db.execute(
+            select(Trip.status, Trip.updated_at)
+            .where(Trip.id == trip_id, Trip.user_id == user_id)
+        )
+        return result.one_or_none()
+
+    async def get_geometry(self, trip_id: UUID, user_id: UUID):
+        #row is None when the trip doesn't exist, geometry_encrypted is None when it has no route
+        result = await self.db.execute(
+            select(Trip.geometry_encrypted)
+            .where(Trip.id == trip_id, Trip.user_id == user_id)
+        )
+        return result.one_or_none()
+
+    async def get_point_recording(self, trip_id: UUID, user_id: UUID):
+        #just what the append path needs, without loading the trip and its relationships
+        result = await self.db.execute(
+            select(Trip.status, Trip.recorded_meters)
+            .where(Trip.id == trip_id, Trip.user_id == user_id)
+        )
+        return result.one_or_none()
+
+    async def get_last_point_chunk(self, trip_id: UUID):
+        result = await self.db.execute(
+            select(TripPointChunk.sequence, TripPointChunk.geometry_encrypted)
+            .where(TripPointChunk.trip_id == trip_id)
+            .order_by(TripPointChunk.sequence.desc())
+            .limit(1)
+        )
+        return result.one_or_none()
+
+    async def add_point_chunk(self, chunk: TripPointChunk, meters: float) -> None:
+        self.db.add(chunk)
+        #running total is bumped in sql, in the same commit as the chunk
+        await self.db.execute(
+            update(Trip)
+            .where(Trip.id == chunk.trip_id)
+            .values(recorded_meters=func.coalesce(Trip.recorded_meters, 0.0) + meters)
+        )
+        await self.db.commit()
+
+    async def lock(self, trip_id: UUID, user_id: UUID = None) -> bool:
+        """Lock the trip row until the caller commits or rolls back. Returns False if there's no such trip.
+
+        Expense writes take this before reading the expenses they change, point appends, end and
+        cancel before reading the trip's status, chunks and recorded_meters. That way concurrent
+        writers to one trip see each other's changes and always lock in the same order.
+        """
+        #an update that changes nothing takes the same row lock as SELECT FOR UPDATE on postgres,
+        #and unlike it also takes the write lock on sqlite. updated_at is set so onupdate doesn't fire
+        query = update(Trip).where(Trip.id == trip_id).values(updated_at=Trip.updated_at).returning(Trip.id)
+        if user_id is not None:
+            query = query.where(Trip.user_id == user_id)
+        result = await self.db.execute(query)
+        return result.scalar_one_or_none() is not None
+
+    async def commit(self) -> None:
+        await self.db.commit()
+
+    async def rollback(self) -> None:
+        await self.db.rollback()
+
+    async def add_to_expense_total(self, trip_id: UUID, delta: float):
+        """Bump the trip's expense total by delta in sql and return the fields rollups need.
+
+        Does not commit, the change goes out with the expense write. Callers hold the
+        trip lock, so the delta comes from amounts no one else is changing.
+        """
+        result = await self.db.execute(
+            update(Trip)
+            .where(Trip.id == trip_id)
+            .values(expense_reimbursement_total=func.coalesce(Trip.expense_reimbursement_total, 0.0) + delta)
+            .returning(
+                Trip.user_id,
+                Trip.status,
+                Trip.started_at,
+                Trip.rate_category_id,
+                Trip.vehicle_id,
+                Trip.miles,
+                Trip.mileage_reimbursement_total,
+                Trip.expense_reimbursement_total,
+            )
+        )
+        return result.one_or_none()
+
+    async def get_point_progress(self, trip_id: UUID):
+        chunk_count = (
+            select(func.count(TripPointChunk.id))
+            .where(TripPointChunk.trip_id == Trip.id)
+            .correlate(Trip)
+            .scalar_subquery()
+        )
+        point_count = (
+            select(func.coalesce(func.sum(TripPointChunk.point_count), 0))
+            .where(TripPointChunk.trip_id == Trip.id)
+            .correlate(Trip)
+            .scalar_subquery()
+        )
+        result = await self.db.execute(
+            select(
+                func.coalesce(Trip.recorded_meters, 0.0).label("recorded_meters"),
+                chunk_count.label("chunk_count"),
+                point_count.label("point_count"),
+            )
+            .where(Trip.id == trip_id)
+        )
+        return result.one()
+
+    async def get_point_chunks(self, trip_id: UUID) -> list[bytes]:
+        result = await self.db.execute(
+            select(TripPointChunk.geometry_encrypted)
+            .where(TripPointChunk.trip_id == trip_id)
+            .order_by(TripPointChunk.sequence)
+        )
+        return result.scalars().all()
+
+    async def delete_point_chunks(self, trip_id: UUID) -> None:
+        #no commit, runs inside the end/cancel write
+        await self.db.execute(delete(TripPointChunk).where(TripPointChunk.trip_id == trip_id))
+
     async def get_active_trip(self, user_id: UUID):
         result = await self.db.execute(
             select(Trip)
@@ -71,25 +376,63 @@ class TripRepo:
         return result.scalar_one_or_none()
 
     async def get_monthly_stats(self, user_id: UUID, month: int, year: int):
+        #half-open range on started_at so the (user_id, started_at) lookup can use an index
+        period_start = datetime(year, month, 1, tzinfo=timezone.utc)
+        period_end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+
         result = await self.db.execute(
-            select(Trip)
+            select(
+                func.count(Trip.id),
+                func.coalesce(func.sum(Trip.miles), 0.0),
+                func.coalesce(func.sum(Trip.mileage_reimbursement_total), 0.0),
+                func.coalesce(func.sum(Trip.expense_reimbursement_total), 0.0),
+            )
             .where(
                 Trip.user_id == user_id,
                 Trip.status == "completed",
-                extract('year', Trip.started_at) == year,
-                extract('month', Trip.started_at) == month
+                Trip.started_at >= period_start,
+                Trip.started_at < period_end,
             )
         )
-        trips = result.scalars().all()
-        
-        total_drives = len(trips)
-        total_miles = sum(trip.miles or 0 for trip in trips)
-        total_mileage_reimbursement = sum(trip.mileage_reimbursement_total or 0 for trip in trips)
-        total_expense_reimbursement = sum(trip.expense_reimbursement_total or 0 for trip in trips)
-        
+        total_drives, total_miles, total_mileage_reimbursement, total_expense_reimbursement = result.one()
+
         return {
             'total_drives': total_drives,
-            'total_miles': total_miles,
-            'total_mileage_reimbursement': total_mileage_reimbursement,
-            'total_expense_reimbursement': total_expense_reimbursement
+            'total_miles': float(total_miles),
+            'total_mileage_reimbursement': float(total_mileage_reimbursement),
+            'total_expense_reimbursement': float(total_expense_reimbursement)
+        }
+
+    async def get_monthly_stats_range(self, user_id: UUID, period_start: datetime, period_end: datetime):
+        #one grouped aggregate for every month in [period_start, period_end)
+        started_at = in_utc(Trip.started_at, self.db.get_bind().dialect.name)
+        year_col = extract('year', started_at)
+        month_col = extract('month', started_at)
+
+        result = await self.db.execute(
+            select(
+                year_col.label("year"),
+                month_col.label("month"),
+                func.count(Trip.id).label("total_drives"),
+                func.coalesce(func.sum(Trip.miles), 0.0).label("total_miles"),
+                func.coalesce(func.sum(Trip.mileage_reimbursement_total), 0.0).label("total_mileage_reimbursement"),
+                func.coalesce(func.sum(Trip.expense_reimbursement_total), 0.0).label("total_expense_reimbursement"),
+            )
+            .where(
+                Trip.user_id == user_id,
+                Trip.status == "completed",
+                Trip.started_at >= period_start,
+                Trip.started_at < period_end,
+            )
+            .group_by(year_col, month_col)
+        )
+
+        return {
+            (int(row.year), int(row.month)): {
+                'total_drives': row.total_drives,
+                'total_miles': float(row.total_miles),
+                'total_mileage_reimbursement': float(row.total_mileage_reimbursement),
+                'total_expense_reimbursement': float(row.total_expense_reimbursement)
+            }
+            for row in result.all()
         }
@@ -0,0 +1,216 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from uuid import UUID
+
+from sqlalchemy import delete, extract, func, insert, literal_column, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.modules.rate_categories.models import RateCategory
+from app.modules.trips.models import ROLLUP_NO_VEHICLE, Trip, TripDailyRollup, TripStatus
+
+#the expressions of the uq_trip_daily_rollups_bucket index, an upsert has to name them exactly
+BUCKET_INDEX_ELEMENTS = (
+    TripDailyRollup.user_id,
+    TripDailyRollup.day,
+    TripDailyRollup.rate_category_id,
+    func.coalesce(TripDailyRollup.vehicle_id, literal_column(ROLLUP_NO_VEHICLE)),
+)
+
+#INSERT .. ON CONFLICT is dialect specific in sqlalchemy, tests run on sqlite
+UPSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+@dataclass(frozen=True)
+class RollupContribution:
+    user_id: UUID
+    day: date
+    rate_category_id: UUID
+    vehicle_id: UUID | None
+    miles: float
+    mileage_total: float
+    expense_total: float
+
+    @property
+    def bucket(self):
+        return (self.user_id, self.day, self.rate_category_id, self.vehicle_id)
+
+
+def rollup_day(started_at: datetime) -> date:
+    #rollup days are utc days. sqlite hands back naive datetimes that are already utc
+    if started_at.tzinfo is not None:
+        started_at = started_at.astimezone(timezone.utc)
+    return started_at.date()
+
+
+def rollup_contribution(trip: Trip) -> RollupContribution | None:
+    #only completed trips count towards stats, same as the old monthly stats query
+    if trip is None or trip.status != TripStatus.completed or trip.started_at is None:
+        return None
+
+    return RollupContribution(
+        user_id=trip.user_id,
+        day=rollup_day(trip.started_at),
+        rate_category_id=trip.rate_category_id,
+        vehicle_id=trip.vehicle_id,
+        miles=float(trip.miles or 0),
+        mileage_total=float(trip.mileage_reimbursement_total or 0),
+        expense_total=float(trip.expense_reimbursement_total or 0),
+    )
+
+
+class TripRollupRepo:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def apply(self, before: RollupContribution | None, after: RollupContribution | None) -> None:
+        """Move a trip's contribution from its old bucket to its new one.
+
+        Does not commit, so the change lands in the same transaction as the trip write.
+        """
+        if before == after:
+            return
+
+        deltas = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+        for contribution, sign in ((before, -1), (after, 1)):
+            if contribution is None:
+                continue
+            delta = deltas[contribution.bucket]
+            delta[0] += sign
+            delta[1] += sign * contribution.miles
+            delta[2] += sign * contribution.mileage_total
+            delta[3] += sign * contribution.expense_total
+
+        for bucket, (trip_count, miles, mileage_total, expense_total) in deltas.items():
+            if trip_count == 0 and miles == 0 and mileage_total == 0 and expense_total == 0:
+                continue
+            await self._apply_delta(bucket, trip_count, miles, mileage_total, expense_total)
+
+    async def _apply_delta(self, bucket, trip_count: int, miles: float, mileage_total: float, expense_total: float) -> None:
+        user_id, day, rate_category_id, vehicle_id = bucket
+
+        #one statement, so two writers creating the same bucket can't both insert it. the
+        #arithmetic is in sql so concurrent writers to an existing bucket don't overwrite each other
+        statement = UPSERTS[self.db.get_bind().dialect.name](TripDailyRollup).values(
+            user_id=user_id,
+            day=day,
+            rate_category_id=rate_category_id,
+            vehicle_id=vehicle_id,
+            trip_count=trip_count,
+            total_miles=miles,
+            mileage_reimbursement_total=mileage_total,
+            expense_reimbursement_total=expense_total,
+        )
+        await self.db.execute(statement.on_conflict_do_update(
+            index_elements=BUCKET_INDEX_ELEMENTS,
+            set_={
+                "trip_count": TripDailyRollup.trip_count + statement.excluded.trip_count,
+                "total_miles": TripDailyRollup.total_miles + statement.excluded.total_miles,
+                "mileage_reimbursement_total": TripDailyRollup.mileage_reimbursement_total + statement.excluded.mileage_reimbursement_total,
+                "expense_reimbursement_total": TripDailyRollup.expense_reimbursement_total + statement.excluded.expense_reimbursement_total,
+                "updated_at": func.now(),
+            },
+        ))
+
+    async def get_monthly_stats_range(self, user_id: UUID, start_day: date, end_day: date):
+        #end_day is exclusive
+        year_col = extract('year', TripDailyRollup.day)
+        month_col = extract('month', TripDailyRollup.day)
+
+        result = await self.db.execute(
+            select(
+                year_col.label("year"),
+                month_col.label("month"),
+                func.coalesce(func.sum(TripDailyRollup.trip_count), 0).label("total_drives"),
+                func.coalesce(func.sum(TripDailyRollup.total_miles), 0.0).label("total_miles"),
+                func.coalesce(func.sum(TripDailyRollup.mileage_reimbursement_total), 0.0).label("total_mileage_reimbursement"),
+                func.coalesce(func.sum(TripDailyRollup.expense_reimbursement_total), 0.0).label("total_expense_reimbursement"),
+            )
+            .where(
+                TripDailyRollup.user_id == user_id,
+                TripDailyRollup.day >= start_day,
+                TripDailyRollup.day < end_day,
+            )
+            .group_by(year_col, month_col)
+        )
+
+        return {
+            (int(row.year), int(row.month)): {
+                'total_drives': int(row.total_drives),
+                'total_miles': float(row.total_miles),
+                'total_mileage_reimbursement': float(row.total_mileage_reimbursement),
+                'total_expense_reimbursement': float(row.total_expense_reimbursement)
+            }
+            for row in result.all()
+        }
+
+    async def get_category_totals(self, user_id: UUID, start_day: date, end_day: date):
+        #end_day is inclusive, matching report date ranges
+        result = await self.db.execute(
+            select(
+                RateCategory.name.label("category_name"),
+                func.sum(TripDailyRollup.trip_count).label("trip_count"),
+                func.sum(TripDailyRollup.total_miles).label("total_miles"),
+                func.sum(TripDailyRollup.mileage_reimbursement_total).label("mileage_reimbursement_total"),
+                func.sum(TripDailyRollup.expense_reimbursement_total).label("expense_reimbursement_total"),
+            )
+            .join(RateCategory, RateCategory.id == TripDailyRollup.rate_category_id)
+            .where(
+                TripDailyRollup.user_id == user_id,
+                TripDailyRollup.day >= start_day,
+                TripDailyRollup.day <= end_day,
+            )
+            .group_by(RateCategory.name)
+        )
+        return result.all()
+
+    async def rebuild(self, user_id: UUID | None = None, chunk_size: int = 1000) -> int:
+        """Recompute rollups from the trips table. Caller commits."""
+        clear = delete(TripDailyRollup)
+        trips_query = (
+            select(
+                Trip.user_id,
+                Trip.started_at,
+                Trip.rate_category_id,
+                Trip.vehicle_id,
+                Trip.miles,
+                Trip.mileage_reimbursement_total,
+                Trip.expense_reimbursement_total,
+            )
+            .where(Trip.status == TripStatus.completed)
+            .execution_options(yield_per=chunk_size)
+        )
+        if user_id is not None:
+            clear = clear.where(TripDailyRollup.user_id == user_id)
+            trips_query = trips_query.where(Trip.user_id == user_id)
+
+        await self.db.execute(clear)
+
+        buckets = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+        result = await self.db.stream(trips_query)
+        async for row in result:
+            bucket = buckets[(row.user_id, rollup_day(row.started_at), row.rate_category_id, row.vehicle_id)]
+            bucket[0] += 1
+            bucket[1] += float(row.miles or 0)
+            bucket[2] += float(row.mileage_reimbursement_total or 0)
+            bucket[3] += float(row.expense_reimbursement_total or 0)
+
+        rows = [
+            {
+                "user_id": bucket_user_id,
+                "day": day,
+                "rate_category_id": rate_category_id,
+                "vehicle_id": vehicle_id,
+                "trip_count": trip_count,
+                "total_miles": miles,
+                "mileage_reimbursement_total": mileage_total,
+                "expense_reimbursement_total": expense_total,
+            }
+            for (bucket_user_id, day, rate_category_id, vehicle_id), (trip_count, miles, mileage_total, expense_total) in buckets.items()
+        ]
+
+        for start in range(0, len(rows), chunk_size):
+            await self.db.execute(insert(TripDailyRollup), rows[start:start + chunk_size])
+
+        return len(rows)
@@ -1,12 +1,14 @@
+from typing import Annotated
 from uuid import UUID
 from app.container import get_db
 from app.modules.trips.repository import TripRepo
-from app.modules.trips.schemas import CreateTripDTO, EditTripDTO, EndTripDTO, TripResponseDTO, ManualCreateTripDTO, MonthlyTripStatsResponseDTO
+from app.modules.trips.rollups_repository import TripRollupRepo
+from app.modules.trips.schemas import CreateTripDTO, EditTripDTO, EndTripDTO, TripResponseDTO, ManualCreateTripDTO, MonthlyTripStatsResponseDTO, TripSummaryDTO, TripSummaryPageDTO, TripGeometryDTO, AppendTripPointsDTO, TripPointsProgressDTO, TripFilterDTO
 from app.modules.trips.service import TripsService
 from app.core.error_handler  import error_handler
 from app.core.dependencies import get_current_user
 from app.modules.users.models import User
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Header, Query, Response, status
 from app.infra.db import AsyncSession
 from app.modules.rate_categories.repository import RateCategoryRepo
 from app.modules.rate_customizations.repository import RateCustomizationRepo
@@ -21,11 +23,12 @@ router = APIRouter(prefix="/trips", tags=["Trips"])
 
 def get_trips_service(db: AsyncSession = Depends(get_db)):
     trip_repo = TripRepo(db)
+    rollup_repo = TripRollupRepo(db)
     expense_repo = ExpenseRepo(db)
-    expense_service = ExpensesService(expense_repo, trip_repo)
+    expense_service = ExpensesService(expense_repo, trip_repo, rollup_repo)
     vehicle_repo = VehicleRepository(db)
     audit_service = AuditTrailService(AuditTrailRepo(db))
-    return TripsService(trip_repo, RateCategoryRepo(db), RateCustomizationRepo(db), vehicle_repo, expense_service, audit_service)
+    return TripsService(trip_repo, RateCategoryRepo(db), RateCustomizationRepo(db), vehicle_repo, expense_service, audit_service, rollup_repo)
 
 @router.post("/", response_model = TripResponseDTO)
 @error_handler
@@ -51,6 +54,12 @@ async def end_trip(trip_id: UUID, body: EndTripDTO, svc: TripsService = Depends(
     trip = await svc.end_trip(current_user.id, trip_id, body)
     return TripResponseDTO.model_validate(trip)
 
+@router.post("/{trip_id}/points", response_model=TripPointsProgressDTO)
+@error_handler
+async def append_trip_points(trip_id: UUID, body: AppendTripPointsDTO, svc: TripsService = Depends(get_trips_service), current_user: User = Depends(get_current_user)):
+    progress = await svc.append_trip_points(current_user.id, trip_id, body)
+    return TripPointsProgressDTO.model_validate(progress)
+
 @router.patch("/{trip_id}/cancel", response_model=TripResponseDTO)
 @error_handler
 async def cancel_trip(trip_id: UUID, svc: TripsService = Depends(get_trips_service), current_user: User = Depends(get_current_user)):
@@ -66,17 +75,60 @@ async def get_active_trip(svc: TripsService = Depends(get_trips_service), curren
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No active trip found")
     return TripResponseDTO.model_validate(trip)
 
+@router.get("/summary", response_model=TripSummaryPageDTO)
+@error_handler
+async def get_user_trip_summaries(limit: int = Query(50, ge=1, le=200), cursor: str | None = Query(None), svc: TripsService = Depends(get_trips_service), current_user: User = Depends(get_current_user)):
+    rows, next_cursor = await svc.get_trip_summaries(current_user.id, limit, cursor)
+    return TripSummaryPageDTO(
+        items=await TripSummaryDTO.model_validate_many(rows),
+        next_cursor=next_cursor,
+    )
+
+@router.get("/search", response_model=list[TripSummaryDTO])
+@error_handler
+async def search_trips(q: str | None = Query(None, min_length=1, max_length=512), exact: bool = Query(False), common_place_id: UUID | None = Query(None), limit: int = Query(50, ge=1, le=200), svc: TripsService = Depends(get_trips_service), current_user: User = Depends(get_current_user)):
+    rows = await svc.search_trips(current_user.id, query=q, exact=exact, common_place_id=common_place_id, limit=limit)
+    return await TripSummaryDTO.model_validate_many(rows)
+
+@router.get("/monthly-stats", response_model=list[MonthlyTripStatsResponseDTO])
+@error_handler
+async def get_monthly_trip_stats_range(start: str = Query(..., pattern=r"^\d{4}-\d{2}$"), end: str = Query(..., pattern=r"^\d{4}-\d{2}$"), svc: TripsService = Depends(get_trips_service), current_user: User = Depends(get_current_user)):
+    #start and end are inclusive YYYY-MM months
+    start_year, start_month = (int(part) for part in start.split("-"))
+    end_year, end_month = (int(part) for part in end.split("-"))
+    stats = await svc.get_monthly_stats_range(current_user.id, start_year, start_month, end_year, end_month)
+    return [MonthlyTripStatsResponseDTO(**month_stats) for month_stats in stats]
+
+@router.get("/{trip_id}/geometry", response_model=TripGeometryDTO)
+@error_handler
+async def get_trip_geometry(trip_id: UUID, response: Response, zoom: int | None = Query(None, ge=0, le=24), max_points: int | None = Query(None, ge=2), if_none_match: str | None = Header(None), svc: TripsService = Depends(get_trips_service), current_user: User = Depends(get_current_user)):
+    #no params returns the full route. zoom or max_points pick a simplified level instead
+    geometry = await svc.get_trip_geometry(current_user.id, trip_id, zoom, max_points, if_none_match)
+
+    #a completed route never changes, so clients can keep it. anything else must revalidate
+    headers = {
+        "ETag": geometry['etag'],
+        "Cache-Control": "private, max-age=86400" if geometry['completed'] else "private, no-cache",
+    }
+    if geometry['not_modified']:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
+    return TripGeometryDTO.model_validate(geometry)
+
 @router.get("/{trip_id}", response_model=TripResponseDTO)
 @error_handler
 async def get_trip(trip_id: UUID, svc: TripsService = Depends(get_trips_service), current_user: User = Depends(get_current_user)):
-    trip = await svc.get_trip_by_id(current_user.id, trip_id)
-    return TripResponseDTO.model_validate(trip)
+    #the detail view carries the full route, lists get a preview and write responses none
+    trip = await svc.get_trip_by_id(current_user.id, trip_id, with_geometry=True)
+    return TripResponseDTO.model_validate(trip, include_geometry=True)
 
 @router.get("/", response_model=list[TripResponseDTO])
 @error_handler
-async def get_user_trips(svc: TripsService = Depends(get_trips_service), current_user: User = Depends(get_current_user)):
-    trips = await svc.get_trips_by_userId(current_user.id)
-    return [TripResponseDTO.model_validate(trip) for trip in trips]
+async def get_user_trips(filters: Annotated[TripFilterDTO, Query()], svc: TripsService = Depends(get_trips_service), current_user: User = Depends(get_current_user)):
+    #each trip carries a simplified route for its card, the full one is on the detail view
+    trips = await svc.get_trips_by_userId(current_user.id, filters)
+    return await TripResponseDTO.model_validate_many(trips, await svc.get_preview_geometries(trips))
 
 @router.get("/monthly-stats/{month}/{year}", response_model=MonthlyTripStatsResponseDTO)
 @error_handler
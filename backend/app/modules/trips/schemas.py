@@ -1,11 +1,14 @@
 import datetime
-from typing import List
+from typing import List, Tuple
 from uuid import UUID
 from app.modules.trips.models import Trip, TripStatus
-from app.modules.trips.utils.crypto import decrypt_address, decrypt_geometry
+from app.modules.trips.utils.crypto import decrypt_address, decrypt_addresses, decrypt_geometries, decrypt_geometry
 from app.modules.trips.utils.distance import meters_to_miles
-from app.modules.expenses.schemas import CreateExpenseDTO
-from pydantic import BaseModel, Field, field_validator, ValidationError
+from app.modules.expenses.schemas import MAX_BATCH_OPERATIONS, CreateExpenseDTO
+from pydantic import BaseModel, Field, field_validator, model_validator, ValidationError
+
+#upper bound on one points batch, keeps each request body small
+MAX_POINTS_PER_BATCH = 5000
 
 class CreateTripDTO(BaseModel):
     start_address: str
@@ -27,7 +30,8 @@ class CreateTripDTO(BaseModel):
 
 class EndTripDTO(BaseModel):
     end_address: str
-    geometry: dict
+    #leave out when the route was streamed through POST /trips/{trip_id}/points
+    geometry: dict | None = None
     distance_meters: float
     
     @field_validator('distance_meters')
@@ -41,6 +45,59 @@ class EndTripDTO(BaseModel):
     def miles(self) -> float:
         return meters_to_miles(self.distance_meters)
 
+class TripFilterDTO(BaseModel):
+    #query parameters of GET /trips, all optional and combined with AND
+    status: TripStatus | None = None
+    vehicle_id: UUID | None = None
+    rate_category_id: UUID | None = None
+    started_after: datetime.datetime | None = None
+    started_before: datetime.datetime | None = None
+    purpose_prefix: str | None = Field(None, max_length=255)
+
+    @field_validator('purpose_prefix')
+    @classmethod
+    def validate_purpose_prefix(cls, v):
+        if v is None:
+            return v
+        v = v.strip()
+        return v or None
+
+    @model_validator(mode='after')
+    def validate_range(self):
+        if self.started_after and self.started_before and self.started_after >= self.started_before:
+            raise ValueError("started_after must be before started_before")
+        return self
+
+class AppendTripPointsDTO(BaseModel):
+    #client numbers its batches from 0 so a retried batch isn't stored twice
+    sequence: int = Field(..., ge=0)
+    coordinates: List[Tuple[float, float]] = Field(..., min_length=1, max_length=MAX_POINTS_PER_BATCH)
+
+    @field_validator('coordinates')
+    @classmethod
+    def validate_coordinates(cls, v):
+        for lng, lat in v:
+            if not (-180 <= lng <= 180 and -90 <= lat <= 90):
+                raise ValueError("Coordinates must be [lng, lat] within valid ranges")
+        return v
+
+class TripPointsProgressDTO(BaseModel):
+    trip_id: str
+    chunk_count: int
+    point_count: int
+    recorded_meters: float
+    recorded_miles: float
+
+    @classmethod
+    def model_validate(cls, data: dict):
+        return cls(
+            trip_id=str(data['trip_id']),
+            chunk_count=data['chunk_count'],
+            point_count=data['point_count'],
+            recorded_meters=data['recorded_meters'],
+            recorded_miles=meters_to_miles(data['recorded_meters']),
+        )
+
 class EditTripDTO(BaseModel):
     purpose: str | None = None
     vehicle_id: UUID | None = None
@@ -66,7 +123,8 @@ class ManualCreateTripDTO(BaseModel):
     ended_at: datetime.datetime
     rate_customization_id: UUID
     rate_category_id: UUID
-    expenses: List[CreateExpenseDTO] | None = None 
+    #saved as one expense batch after the trip, so checked here before anything is written
+    expenses: List[CreateExpenseDTO] | None = Field(default=None, max_length=MAX_BATCH_OPERATIONS)
 
 class TripExpenseReceiptDTO(BaseModel):
     id: str
@@ -103,6 +161,8 @@ class TripResponseDTO(BaseModel):
     vehicle_id: UUID | None = None
     vehicle: VehicleInfo | None = None
     miles: float | None = None
+    computed_miles: float | None = None
+    distance_flagged: bool = False
     reimbursement_rate: float | None = None
     mileage_reimbursement_total: float | None = None
     expense_reimbursement_total: float | None = None
@@ -116,7 +176,9 @@ class TripResponseDTO(BaseModel):
     receipts: List[TripExpenseReceiptDTO] = []
 
     @classmethod
-    def model_validate(cls, trip: Trip):
+    def model_validate(cls, trip: Trip, include_geometry: bool = False, geometry: dict | None = None):
+        #geometry is a deferred column, only read it when the caller loaded it on purpose.
+        #otherwise the caller can hand over an already decrypted route, like a list preview
 
         data = {
             #convert uuid to str
@@ -128,8 +190,10 @@ class TripResponseDTO(BaseModel):
             "vehicle_id": trip.vehicle_id,
             "vehicle": VehicleInfo.model_validate(trip.vehicle) if trip.vehicle else None,
             "miles": trip.miles,
+            "computed_miles": trip.computed_miles,
+            "distance_flagged": bool(trip.distance_flagged),
             "reimbursement_rate": trip.reimbursement_rate,
-            "geometry": decrypt_geometry(trip.geometry_encrypted) if trip.geometry_encrypted else None,
+            "geometry": decrypt_geometry(trip.geometry_encrypted) if include_geometry and trip.geometry_encrypted else geometry,
             "mileage_reimbursement_total": trip.mileage_reimbursement_total,
             "expense_reimbursement_total": trip.expense_reimbursement_total,
             "total_reimbursement": (trip.mileage_reimbursement_total or 0) + (trip.expense_reimbursement_total or 0),
@@ -172,9 +236,104 @@ class TripResponseDTO(BaseModel):
         # Create and return a new instance of TripResponseDTO
         return cls(**data)
 
+    @classmethod
+    async def model_validate_many(cls, trips: list[Trip], geometries: dict[UUID, bytes] | None = None) -> list["TripResponseDTO"]:
+        #decrypt the whole page's addresses in one batch off the event loop, then the
+        #per trip model_validate calls below are cache hits. geometries are encrypted
+        #previews by trip id, from TripsService.get_preview_geometries
+        await decrypt_addresses([
+            token
+            for trip in trips
+            for token in (trip.start_address_encrypted, trip.end_address_encrypted)
+        ])
+        geometries = geometries or {}
+        decrypted = dict(zip(geometries, await decrypt_geometries(list(geometries.values()))))
+        return [cls.model_validate(trip, geometry=decrypted.get(trip.id)) for trip in trips]
+
     class Config:
         from_attributes = True
 
+class TripSummaryDTO(BaseModel):
+    id: str
+    status: TripStatus
+    start_address: str
+    end_address: str | None = None
+    purpose: str | None = None
+    vehicle_id: UUID | None = None
+    miles: float | None = None
+    reimbursement_rate: float | None = None
+    mileage_reimbursement_total: float | None = None
+    expense_reimbursement_total: float | None = None
+    total_reimbursement: float | None = None
+    started_at: datetime.datetime
+    ended_at: datetime.datetime | None = None
+    updated_at: datetime.datetime
+    rate_customization_id: UUID
+    rate_category_id: UUID
+    expense_count: int = 0
+    receipt_count: int = 0
+
+    @classmethod
+    def model_validate(cls, row):
+        #row comes from TripRepo.get_user_trip_summaries, geometry is never loaded here
+        return cls(
+            id=str(row.id),
+            status=row.status,
+            start_address=decrypt_address(row.start_address_encrypted),
+            end_address=decrypt_address(row.end_address_encrypted) if row.end_address_encrypted else None,
+            purpose=row.purpose,
+            vehicle_id=row.vehicle_id,
+            miles=row.miles,
+            reimbursement_rate=row.reimbursement_rate,
+            mileage_reimbursement_total=row.mileage_reimbursement_total,
+            expense_reimbursement_total=row.expense_reimbursement_total,
+            total_reimbursement=(row.mileage_reimbursement_total or 0) + (row.expense_reimbursement_total or 0),
+            started_at=row.started_at,
+            ended_at=row.ended_at,
+            updated_at=row.updated_at,
+            rate_customization_id=row.rate_customization_id,
+            rate_category_id=row.rate_category_id,
+            expense_count=row.expense_count or 0,
+            receipt_count=row.receipt_count or 0,
+        )
+
+    @classmethod
+    async def model_validate_many(cls, rows) -> list["TripSummaryDTO"]:
+        #same batch warm up as TripResponseDTO.model_validate_many
+        await decrypt_addresses([
+            token
+            for row in rows
+            for token in (row.start_address_encrypted, row.end_address_encrypted)
+        ])
+        return [cls.model_validate(row) for row in rows]
+
+class TripSummaryPageDTO(BaseModel):
+    items: List[TripSummaryDTO]
+    next_cursor: str | None = None
+
+class TripGeometryDTO(BaseModel):
+    trip_id: str
+    level: int
+    tolerance_meters: float
+    point_count: int | None = None
+    geometry: dict | None = None
+
+    @classmethod
+    def model_validate(cls, data: dict):
+        #data comes from TripsService.get_trip_geometry. level 0 is the full route
+        geometry = decrypt_geometry(data['geometry_encrypted']) if data['geometry_encrypted'] else None
+        point_count = data['point_count']
+        if point_count is None and geometry and geometry.get("type") == "LineString":
+            point_count = len(geometry.get("coordinates", []))
+
+        return cls(
+            trip_id=str(data['trip_id']),
+            level=data['level'],
+            tolerance_meters=data['tolerance_meters'],
+            point_count=point_count,
+            geometry=geometry,
+        )
+
 class MonthlyTripStatsResponseDTO(BaseModel):
     month: int
     year: int
@@ -1,9 +1,17 @@
-from datetime import datetime, timezone
-from uuid import UUID
+from datetime import MAXYEAR, MINYEAR, date, datetime, timezone
+from uuid import UUID, uuid4
+from sqlalchemy.exc import IntegrityError
 from app.modules.trips.repository import TripRepo
-from app.modules.trips.schemas import CreateTripDTO, EditTripDTO, EndTripDTO, ManualCreateTripDTO
-from app.modules.trips.utils.crypto import encrypt_address, encrypt_geometry
-from app.modules.trips.models import Trip, TripStatus
+from app.modules.trips.rollups_repository import TripRollupRepo, rollup_contribution
+from app.modules.trips.schemas import AppendTripPointsDTO, CreateTripDTO, EditTripDTO, EndTripDTO, ManualCreateTripDTO, TripFilterDTO
+from app.modules.trips.utils.blind_index import address_tokens, full_address_token, word_tokens
+from app.modules.trips.utils.crypto import decrypt_geometry, encrypt_address, encrypt_geometry
+from app.modules.trips.utils.cursor import encode_cursor, decode_cursor
+from app.modules.trips.utils.etag import etag_matches, geometry_etag
+from app.modules.trips.utils.simplify import simplify_levels
+from app.modules.trips.utils.distance import distance_diverges, meters_to_miles, miles_to_meters, route_length_meters
+from app.config import settings
+from app.modules.trips.models import Trip, TripGeometryLevel, TripPointChunk, TripStatus
 from app.modules.trips.exceptions import InvalidTripDataError, TripNotFoundError, TripPersistenceError, TripAlreadyActiveError
 from app.modules.rate_categories.repository import RateCategoryRepo
 from app.modules.rate_customizations.repository import RateCustomizationRepo
@@ -11,20 +19,68 @@ from app.modules.rate_customizations.exceptions import RateCustomizationNotFound
 from app.modules.rate_categories.exceptions import InvalidRateCategoryDataError, RateCategoryNotFoundError
 from app.modules.expenses.models import Expense
 from app.modules.expenses.repository import ExpenseRepo
+from app.modules.expenses.schemas import ExpenseBatchDTO
 from app.modules.vehicles.repository import VehicleRepository
 from app.modules.vehicles.exceptions import VehicleNotFoundError
+from app.modules.common_places.exceptions import CommonPlaceNotFoundError
 from app.modules.audit_trail.service import AuditTrailService
 from app.modules.audit_trail.models import AuditAction
 
 
 class TripsService:
-    def __init__(self, repo: TripRepo, category_repo: RateCategoryRepo, customization_repo: RateCustomizationRepo, vehicle_repo: VehicleRepository = None, expense_service=None, audit_service: AuditTrailService = None):
+    MAX_STATS_MONTHS = 24
+    #meters per pixel at zoom 0 on 256px web mercator tiles, at the equator
+    ZOOM0_METERS_PER_PIXEL = 156_543.03
+    MAX_ZOOM = 24
+
+    def __init__(self, repo: TripRepo, category_repo: RateCategoryRepo, customization_repo: RateCustomizationRepo, vehicle_repo: VehicleRepository = None, expense_service=None, audit_service: AuditTrailService = None, rollup_repo: TripRollupRepo = None):
         self.repo = repo
         self.category_repo = category_repo
         self.customization_repo = customization_repo
         self.vehicle_repo = vehicle_repo
         self.expense_service = expense_service
         self.audit_service = audit_service
+        self.rollup_repo = rollup_repo
+
+    def _rollup_snapshot(self, trip: Trip):
+        if not self.rollup_repo:
+            return None
+        return rollup_contribution(trip)
+
+    async def _sync_rollup(self, before, trip: Trip):
+        #keeps trip_daily_rollups in step with the trip, inside the same commit as the trip write
+        if not self.rollup_repo:
+            return
+        await self.rollup_repo.apply(before, rollup_contribution(trip))
+
+    def _geometry_levels(self, trip_id: UUID, geometry: dict) -> list[TripGeometryLevel]:
+        #level 0 is the full route on the trip itself, stored levels start at 1 and get coarser
+        return [
+            TripGeometryLevel(
+                trip_id=trip_id,
+                level=level,
+                tolerance_meters=tolerance,
+                point_count=len(simplified["coordinates"]),
+                geometry_encrypted=encrypt_geometry(simplified),
+            )
+            for level, (tolerance, simplified) in enumerate(simplify_levels(geometry), start=1)
+        ]
+
+    def _check_distance(self, reported_meters: float, computed_meters: float | None):
+        #returns (computed_miles, flagged). the client's distance is still what gets reimbursed
+        if computed_meters is None:
+            return None, False
+
+        flagged = distance_diverges(
+            reported_meters,
+            computed_meters,
+            settings.TRIP_DISTANCE_TOLERANCE,
+            settings.TRIP_DISTANCE_SLACK_METERS,
+        )
+        if flagged and settings.TRIP_DISTANCE_REJECT:
+            raise InvalidTripDataError("Reported distance doesn't match the recorded route")
+
+        return meters_to_miles(computed_meters), flagged
 
     async def _validate_vehicle_ownership(self, user_id: UUID, vehicle_id: UUID):
         if not self.vehicle_repo:
@@ -90,7 +146,9 @@ class TripsService:
         try:
             encrypted_address = encrypt_address(data.start_address)
 
+            trip_id = uuid4()
             trip = Trip(
+                id=trip_id,
                 user_id=user_id,
                 start_address_encrypted = encrypted_address,
                 purpose = data.purpose,
@@ -99,7 +157,10 @@ class TripsService:
                 rate_customization_id=data.rate_customization_id,
                 rate_category_id=data.rate_category_id,
             )
-                    
+
+            #the tokens only carry the trip id, the trip row has to be in first
+            await self.repo.add(trip)
+            await self.repo.replace_address_tokens(trip_id, user_id, "start", address_tokens(user_id, data.start_address))
             saved_trip = await self.repo.save(trip)
             
             #log audit trail
@@ -115,6 +176,7 @@ class TripsService:
             return saved_trip
 
         except Exception as e:
+            await self.repo.rollback()
             raise TripPersistenceError(f"Unexpected error occurred while saving trip: {e}") from e
     
     async def manual_create_trip(self, user_id: UUID, data: ManualCreateTripDTO):
@@ -143,6 +205,13 @@ class TripsService:
         
         if data.vehicle_id:
             await self._validate_vehicle_ownership(user_id, data.vehicle_id)
+
+        computed_miles, distance_flagged = self._check_distance(miles_to_meters(data.miles), route_length_meters(data.geometry))
+
+        #checked before the trip is saved so a bad batch fails the request instead of leaving a trip without its expenses
+        expense_batch = ExpenseBatchDTO(create=data.expenses) if data.expenses and self.expense_service else None
+        if expense_batch:
+            self.expense_service.check_new_trip_batch(user_id, expense_batch)
         
         try:
             encrypted_start_address = encrypt_address(data.start_address)
@@ -152,7 +221,9 @@ class TripsService:
             reimbursement_rate = category.cost_per_mile
             mileage_total = data.miles * reimbursement_rate
 
+            trip_id = uuid4()
             trip = Trip(
+                id=trip_id,
                 user_id=user_id,
                 status=TripStatus.completed,
                 start_address_encrypted=encrypted_start_address,
@@ -160,6 +231,8 @@ class TripsService:
                 purpose=data.purpose,
                 vehicle_id=data.vehicle_id,
                 miles=data.miles,
+                computed_miles=computed_miles,
+                distance_flagged=distance_flagged,
                 geometry_encrypted=encrypted_geometry,
                 reimbursement_rate=reimbursement_rate,
                 mileage_reimbursement_total=mileage_total,
@@ -168,8 +241,16 @@ class TripsService:
                 ended_at=data.ended_at,
                 rate_customization_id=data.rate_customization_id,
                 rate_category_id=data.rate_category_id,
+                #through the relationship, so the levels are inserted after the trip they belong to
+                geometry_levels=self._geometry_levels(trip_id, data.geometry) if data.geometry else [],
             )
             
+            #the tokens only carry the trip id, the trip row has to be in first
+            await self.repo.add(trip)
+            await self.repo.replace_address_tokens(trip_id, user_id, "start", address_tokens(user_id, data.start_address))
+            await self.repo.replace_address_tokens(trip_id, user_id, "end", address_tokens(user_id, data.end_address))
+
+            await self._sync_rollup(None, trip)
             saved_trip = await self.repo.save(trip)
             
             #log audit trail
@@ -182,27 +263,47 @@ class TripsService:
                     details=f"Manual trip created: {saved_trip.miles} miles, ${saved_trip.mileage_reimbursement_total:.2f} reimbursement"
                 )
             
-            if data.expenses and self.expense_service:
-                for expense_data in data.expenses:
-                    await self.expense_service.create_expense(user_id, saved_trip.id, expense_data)
-                    
+            if expense_batch:
+                await self.expense_service.apply_expense_batch(user_id, saved_trip.id, expense_batch)
+                await self.repo.refresh_expenses(saved_trip)
+
             return saved_trip
 
         except Exception as e:
+            await self.repo.rollback()
             raise TripPersistenceError(f"Unexpected error occurred while saving manual trip: {e}") from e
     
-    async def get_trip_by_id(self, user_id: UUID, trip_id: UUID):
-        trip = await self.repo.get(trip_id, user_id)
+    async def get_trip_by_id(self, user_id: UUID, trip_id: UUID, with_geometry: bool = False):
+        trip = await self.repo.get(trip_id, user_id, with_geometry=with_geometry)
 
         if trip:
             return trip
         
         raise TripNotFoundError("Trip doesn't exist or not owned by user")
     
+    async def _lock_trip(self, user_id: UUID, trip_id: UUID):
+        #taken before reading the status, chunks or recorded_meters a write depends on, see TripRepo.lock
+        if not await self.repo.lock(trip_id, user_id):
+            await self.repo.rollback()
+            raise TripNotFoundError("Trip doesn't exist or not owned by user")
+
     async def end_trip(self, user_id: UUID, trip_id: UUID, data: EndTripDTO):
         if not data.end_address.strip():
             raise InvalidTripDataError("End address is required")
-        
+
+        miles = data.miles
+        if miles < 0:
+            raise InvalidTripDataError("Miles must be non-negative")
+
+        #a points batch committing mid-end would be deleted with the chunks without being in the route
+        await self._lock_trip(user_id, trip_id)
+        try:
+            return await self._end_locked_trip(user_id, trip_id, data)
+        except Exception:
+            await self.repo.rollback()
+            raise
+
+    async def _end_locked_trip(self, user_id: UUID, trip_id: UUID, data: EndTripDTO):
         #check if trip exists first
         trip = await self.get_trip_by_id(user_id, trip_id)
       
@@ -217,18 +318,42 @@ class TripsService:
         #     raise InvalidTripDataError("Start and end addresses cannot be the same")
 
         miles = data.miles
-        if miles < 0:
-            raise InvalidTripDataError("Miles must be non-negative")
+
+        #a streamed route is stitched from its chunks and its length is already known
+        chunks = await self.repo.get_point_chunks(trip.id)
+        if chunks:
+            if data.geometry:
+                raise InvalidTripDataError("Route was already streamed, geometry can't be sent when ending this trip")
+            geometry = {
+                "type": "LineString",
+                "coordinates": [point for chunk in chunks for point in decrypt_geometry(chunk)["coordinates"]],
+            }
+            computed_meters = trip.recorded_meters or 0.0
+        else:
+            if not data.geometry:
+                raise InvalidTripDataError("Geometry is required")
+            geometry = data.geometry
+            computed_meters = route_length_meters(geometry)
+
+        computed_miles, distance_flagged = self._check_distance(data.distance_meters, computed_meters)
                 
         try: 
+            before = self._rollup_snapshot(trip)
 
             trip.miles = miles
-            trip.geometry_encrypted = encrypt_geometry(data.geometry)
+            trip.computed_miles = computed_miles
+            trip.distance_flagged = distance_flagged
+            trip.geometry_encrypted = encrypt_geometry(geometry)
             trip.mileage_reimbursement_total = miles * (trip.reimbursement_rate or 0.0)
             trip.status = TripStatus.completed
             trip.end_address_encrypted = encrypt_address(data.end_address)
             trip.ended_at = datetime.now(timezone.utc)
 
+            await self.repo.replace_geometry_levels(trip.id, self._geometry_levels(trip.id, geometry))
+            await self.repo.replace_address_tokens(trip.id, user_id, "end", address_tokens(user_id, data.end_address))
+            if chunks:
+                await self.repo.delete_point_chunks(trip.id)
+            await self._sync_rollup(before, trip)
             saved_trip = await self.repo.save(trip)
             
             #log audit trail
@@ -244,15 +369,88 @@ class TripsService:
             return saved_trip
                
         except Exception as e:
-            await self.repo.db.rollback()
             raise TripPersistenceError(f"Unexpected error occurred while ending trip: {e}") from e
 
         
+    async def append_trip_points(self, user_id: UUID, trip_id: UUID, data: AppendTripPointsDTO):
+        #serialized with end and cancel, so a batch can't land on a trip that's being finalized
+        await self._lock_trip(user_id, trip_id)
+        try:
+            return await self._append_locked_points(user_id, trip_id, data)
+        except Exception:
+            await self.repo.rollback()
+            raise
+
+    async def _append_locked_points(self, user_id: UUID, trip_id: UUID, data: AppendTripPointsDTO):
+        recording = await self.repo.get_point_recording(trip_id, user_id)
+        if recording is None:
+            raise TripNotFoundError("Trip doesn't exist or not owned by user")
+
+        if recording.status != TripStatus.active:
+            raise InvalidTripDataError("Points can only be added to an active trip")
+
+        last_chunk = await self.repo.get_last_point_chunk(trip_id)
+        next_sequence = last_chunk.sequence + 1 if last_chunk else 0
+
+        #a batch we already have is a retry, answer with the current progress
+        if data.sequence < next_sequence:
+            #nothing to write, end the transaction so the lock is let go
+            await self.repo.commit()
+            return await self._point_progress(trip_id)
+
+        if data.sequence > next_sequence:
+            raise InvalidTripDataError(f"Expected points batch {next_sequence}, got {data.sequence}")
+
+        coordinates = [[lng, lat] for lng, lat in data.coordinates]
+
+        #only this batch is measured, joined to where the previous one left off
+        measured = coordinates
+        if last_chunk:
+            measured = decrypt_geometry(last_chunk.geometry_encrypted)["coordinates"][-1:] + coordinates
+        meters = route_length_meters({"type": "LineString", "coordinates": measured}) or 0.0
+
+        try:
+            await self.repo.add_point_chunk(
+                TripPointChunk(
+                    trip_id=trip_id,
+                    sequence=data.sequence,
+                    point_count=len(coordinates),
+                    geometry_encrypted=encrypt_geometry({"type": "LineString", "coordinates": coordinates}),
+                ),
+                meters,
+            )
+        except IntegrityError:
+            #same batch raced in from another request, it's stored either way
+            await self.repo.rollback()
+        except Exception as e:
+            raise TripPersistenceError(f"Unexpected error occurred while saving trip points: {e}") from e
+
+        return await self._point_progress(trip_id)
+
+    async def _point_progress(self, trip_id: UUID):
+        progress = await self.repo.get_point_progress(trip_id)
+        return {
+            'trip_id': trip_id,
+            'chunk_count': progress.chunk_count,
+            'point_count': progress.point_count,
+            'recorded_meters': progress.recorded_meters,
+        }
+
     async def edit_trip(self, user_id: UUID, trip_id: UUID, data: EditTripDTO):
-        #check if trip exists first
+        #an expense write landing between the rollup snapshot and the save would be subtracted stale
+        await self._lock_trip(user_id, trip_id)
+        try:
+            return await self._edit_locked_trip(user_id, trip_id, data)
+        except Exception:
+            await self.repo.rollback()
+            raise
+
+    async def _edit_locked_trip(self, user_id: UUID, trip_id: UUID, data: EditTripDTO):
+        #read under the lock, so the snapshot has the expense total the last write committed
         trip = await self.get_trip_by_id(user_id, trip_id)
         
         try:
+            before = self._rollup_snapshot(trip)
 
             if data.purpose is not None:
                 trip.purpose = data.purpose
@@ -291,44 +489,214 @@ class TripsService:
                 trip.rate_category_id = data.rate_category_id
                 trip.reimbursement_rate = category.cost_per_mile
 
+            await self._sync_rollup(before, trip)
             return await self.repo.save(trip)
         
         except Exception as e:
-            await self.repo.db.rollback()
             raise TripPersistenceError(f"Unexpected error occurred while editing trip: {e}") from e
 
     async def cancel_trip(self, user_id: UUID, trip_id: UUID):
+        await self._lock_trip(user_id, trip_id)
+        try:
+            return await self._cancel_locked_trip(user_id, trip_id)
+        except Exception:
+            await self.repo.rollback()
+            raise
 
+    async def _cancel_locked_trip(self, user_id: UUID, trip_id: UUID):
         trip = await self.get_trip_by_id(user_id, trip_id)
 
         if trip.status != TripStatus.active:
             raise InvalidTripDataError("Only active trips can be cancelled")
 
         try:
+            before = self._rollup_snapshot(trip)
             trip.status = TripStatus.cancelled
             trip.ended_at = datetime.now(timezone.utc)
+            #streamed points of a cancelled trip are never used
+            await self.repo.delete_point_chunks(trip.id)
+            await self._sync_rollup(before, trip)
             return await self.repo.save(trip)
 
         except Exception as e:
-            await self.repo.db.rollback()
             raise TripPersistenceError(f"Unexpected error occurred while cancelling trip {e}") from e
 
 
+    def _pick_geometry_level(self, levels, zoom: int | None, max_points: int | None):
+        #None means the full route
+        chosen = None
+        if zoom is not None:
+            #coarsest level whose error still stays under a pixel at this zoom
+            meters_per_pixel = self.ZOOM0_METERS_PER_PIXEL / 2 ** zoom
+            visible = [level for level in levels if level.tolerance_meters <= meters_per_pixel]
+            chosen = visible[-1] if visible else None
+
+        if max_points is not None and levels and (chosen is None or chosen.point_count > max_points):
+            fitting = [level for level in levels if level.point_count <= max_points]
+            chosen = fitting[0] if fitting else levels[-1]
+
+        return chosen
+
+    async def get_trip_geometry(self, user_id: UUID, trip_id: UUID, zoom: int | None = None, max_points: int | None = None, if_none_match: str | None = None):
+        if zoom is not None and not 0 <= zoom <= self.MAX_ZOOM:
+            raise InvalidTripDataError(f"Zoom must be between 0 and {self.MAX_ZOOM}")
+
+        if max_points is not None and max_points < 2:
+            raise InvalidTripDataError("max_points must be at least 2")
+
+        version = await self.repo.get_geometry_version(trip_id, user_id)
+        if version is None:
+            raise TripNotFoundError("Trip doesn't exist or not owned by user")
+
+        levels = await self.repo.get_geometry_levels(trip_id, user_id)
+        chosen = self._pick_geometry_level(levels, zoom, max_points)
+
+        result = {
+            'trip_id': trip_id,
+            'level': chosen.level if chosen else 0,
+            'tolerance_meters': chosen.tolerance_meters if chosen else 0.0,
+            'point_count': chosen.point_count if chosen else None,
+            'completed': version.status == TripStatus.completed,
+            'not_modified': False,
+            'geometry_encrypted': None,
+        }
+        result['etag'] = geometry_etag(trip_id, version.updated_at, result['level'])
+
+        #client already has this version, skip loading and decrypting the route
+        if etag_matches(if_none_match, result['etag']):
+            result['not_modified'] = True
+            return result
+
+        if chosen is not None:
+            result['geometry_encrypted'] = await self.repo.get_geometry_level(trip_id, chosen.level)
+        else:
+            row = await self.repo.get_geometry(trip_id, user_id)
+            result['geometry_encrypted'] = row.geometry_encrypted if row else None
+
+        return result
+
     async def get_active_trip(self, user_id: UUID):
         return await self.repo.get_active_trip(user_id)
 
-    async def get_trips_by_userId(self, user_id: UUID):
-        return await self.repo.get_user_trips(user_id)
+    async def get_trips_by_userId(self, user_id: UUID, filters: TripFilterDTO | None = None):
+        return await self.repo.get_user_trips(user_id, filters)
+
+    async def get_preview_geometries(self, trips: list[Trip]) -> dict[UUID, bytes]:
+        #list cards draw a small map, the coarsest level is plenty and keeps the page light
+        return await self.repo.get_preview_geometries([trip.id for trip in trips])
     
+    async def search_trips(self, user_id: UUID, query: str | None = None, exact: bool = False, common_place_id: UUID | None = None, limit: int = 50):
+        """Trips whose start or end address matches, found through the address blind index.
+
+        A query matches addresses containing all of its words, or the whole address when
+        exact is set. A common place matches trips to or from exactly its address.
+        """
+        if (query is None) == (common_place_id is None):
+            raise InvalidTripDataError("Search needs either a query or a common place")
+
+        if common_place_id is not None:
+            tokens = await self.repo.get_common_place_tokens(common_place_id, user_id)
+            if not tokens:
+                raise CommonPlaceNotFoundError("Common place not found or not owned by user")
+        elif exact:
+            full = full_address_token(user_id, query)
+            tokens = [full] if full else []
+        else:
+            tokens = word_tokens(user_id, query)
+
+        if not tokens:
+            raise InvalidTripDataError("Search query has no words to match")
+
+        return await self.repo.search_trip_summaries(user_id, tokens, limit)
+
+    async def get_trip_summaries(self, user_id: UUID, limit: int = 50, cursor: str | None = None):
+        if limit <= 0:
+            raise InvalidTripDataError("Limit must be greater than 0")
+
+        after = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except ValueError as e:
+                raise InvalidTripDataError("Invalid cursor") from e
+
+        #fetch one extra row to know if there is another page
+        rows = await self.repo.get_user_trip_summaries(user_id, limit + 1, after)
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(last.started_at, last.id)
+
+        return rows, next_cursor
+
+    def _empty_stats(self):
+        return {
+            'total_drives': 0,
+            'total_miles': 0.0,
+            'total_mileage_reimbursement': 0.0,
+            'total_expense_reimbursement': 0.0
+        }
+
+    @staticmethod
+    def _check_stats_year(*years: int) -> None:
+        #a month's period ends on the first of the next one, so december of MAXYEAR has no end
+        if not all(MINYEAR <= year < MAXYEAR for year in years):
+            raise InvalidTripDataError(f"Year must be between {MINYEAR} and {MAXYEAR - 1}")
+
     async def get_monthly_stats(self, user_id: UUID, month: int, year: int):
-        stats = await self.repo.get_monthly_stats(user_id, month, year)
+        if not 1 <= month <= 12:
+            raise InvalidTripDataError("Month must be between 1 and 12")
+        self._check_stats_year(year)
+
+        if self.rollup_repo:
+            by_month = await self.rollup_repo.get_monthly_stats_range(
+                user_id,
+                date(year, month, 1),
+                date(year + month // 12, month % 12 + 1, 1),
+            )
+            stats = by_month.get((year, month), self._empty_stats())
+        else:
+            stats = await self.repo.get_monthly_stats(user_id, month, year)
         
         stats['total_reimbursement'] = stats['total_mileage_reimbursement'] + stats['total_expense_reimbursement']
         stats['month'] = month
         stats['year'] = year
         
         return stats
-    
 
+    async def get_monthly_stats_range(self, user_id: UUID, start_year: int, start_month: int, end_year: int, end_month: int):
+        if not (1 <= start_month <= 12 and 1 <= end_month <= 12):
+            raise InvalidTripDataError("Month must be between 1 and 12")
+        self._check_stats_year(start_year, end_year)
+
+        start_index = start_year * 12 + (start_month - 1)
+        end_index = end_year * 12 + (end_month - 1)
+
+        if end_index < start_index:
+            raise InvalidTripDataError("End month cannot be before start month")
+
+        if end_index - start_index + 1 > self.MAX_STATS_MONTHS:
+            raise InvalidTripDataError(f"Cannot request more than {self.MAX_STATS_MONTHS} months at once")
+
+        period_start = datetime(start_year, start_month, 1, tzinfo=timezone.utc)
+        period_end = datetime((end_index + 1) // 12, (end_index + 1) % 12 + 1, 1, tzinfo=timezone.utc)
+
+        if self.rollup_repo:
+            by_month = await self.rollup_repo.get_monthly_stats_range(user_id, period_start.date(), period_end.date())
+        else:
+            by_month = await self.repo.get_monthly_stats_range(user_id, period_start, period_end)
+
+        #months without trips still show up as zeros so the dashboard gets a continuous series
+        results = []
+        for index in range(start_index, end_index + 1):
+            year, month = divmod(index, 12)
+            month += 1
+            stats = by_month.get((year, month), self._empty_stats())
+            stats['total_reimbursement'] = stats['total_mileage_reimbursement'] + stats['total_expense_reimbursement']
+            stats['month'] = month
+            stats['year'] = year
+            results.append(stats)
 
-    
\ No newline at end of file
+        return results
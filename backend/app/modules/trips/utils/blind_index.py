@@ -0,0 +1,66 @@
+import hashlib
+import hmac
+import re
+import unicodedata
+from uuid import UUID
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from app.config import settings
+
+#tokens are truncated hmacs. 16 bytes keeps collisions out of reach and the index small
+TOKEN_BYTES = 16
+
+#caps how many word tokens one address writes, real addresses are well under this
+MAX_WORDS = 32
+
+_FULL_ADDRESS = b"a"
+_WORD = b"w"
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def _index_key() -> bytes:
+    if settings.BLIND_INDEX_KEY:
+        return settings.BLIND_INDEX_KEY.encode()
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"vellora address blind index",
+    ).derive(settings.FERNET_KEY.encode())
+
+
+_key = _index_key()
+
+
+def normalize_address(address: str) -> str:
+    #"123 Main St., Apt #4B" and "123 main st apt 4b" should index the same
+    folded = unicodedata.normalize("NFKC", address).casefold()
+    return " ".join(_NON_WORD.sub(" ", folded).split())
+
+
+def address_words(address: str) -> list[str]:
+    return list(dict.fromkeys(normalize_address(address).split()))[:MAX_WORDS]
+
+
+def _token(user_id: UUID, kind: bytes, value: str) -> bytes:
+    #scoped per user, so the same address gives unrelated tokens for different users
+    message = user_id.bytes + kind + b"\x00" + value.encode()
+    return hmac.new(_key, message, hashlib.sha256).digest()[:TOKEN_BYTES]
+
+
+def full_address_token(user_id: UUID, address: str) -> bytes | None:
+    normalized = normalize_address(address)
+    return _token(user_id, _FULL_ADDRESS, normalized) if normalized else None
+
+
+def word_tokens(user_id: UUID, text: str) -> list[bytes]:
+    return [_token(user_id, _WORD, word) for word in address_words(text)]
+
+
+def address_tokens(user_id: UUID, address: str) -> list[bytes]:
+    """Every token stored for an address: the whole normalized address, then each word."""
+    full = full_address_token(user_id, address)
+    return ([full] if full else []) + word_tokens(user_id, address)
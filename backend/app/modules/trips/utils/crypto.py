@@ -1,29 +1,252 @@
+import asyncio
+import base64
+import copy
+import hashlib
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 from app.config import settings
-from cryptography.fernet import Fernet
+from app.modules.trips.utils.decrypt_cache import DecryptCache, ciphertext_digest
+from app.modules.trips.utils.geometry_codec import encode_geometry, decode_geometry
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, MultiFernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 
-f = Fernet((settings.FERNET_KEY).encode())
+#aes-gcm envelope: version byte, key id byte, 12 byte nonce, ciphertext + 16 byte tag.
+#the two header bytes are authenticated as associated data
+ENVELOPE_V2 = 0x02
+NONCE_BYTES = 12
+ENVELOPE_HEADER_BYTES = 2
+
+#key id 0 is derived from the fernet keys, so the envelope works without any extra config
+DERIVED_KEY_ID = 0
+
+
+def _derive_key(secret: str) -> bytes:
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"vellora field encryption v2",
+    ).derive(secret.encode())
+
+
+def _split_keys(value: str) -> list[str]:
+    return [key.strip() for key in value.split(",") if key.strip()]
+
+
+def _field_key_id(key_id: int) -> int:
+    if not 0 < key_id < 256:
+        raise ValueError("Field encryption key ids must be between 1 and 255")
+    return key_id
+
+
+def reload_keys() -> None:
+    """Build the keyring from settings.
+
+    The newest key of each kind encrypts, every configured key can decrypt. Several
+    keys can share an id (all the derived ones do), they're tried in order.
+    """
+    global f, active_key_id, key_fingerprint, _active_key, _keys
+
+    fernet_keys = [settings.FERNET_KEY] + _split_keys(settings.FERNET_OLD_KEYS)
+    #fernet is kept to read rows written before the aes-gcm envelope
+    fernet = MultiFernet([Fernet(key.encode()) for key in fernet_keys])
+
+    raw_keys = {DERIVED_KEY_ID: [_derive_key(key) for key in fernet_keys]}
+    for entry in _split_keys(settings.FIELD_ENCRYPTION_OLD_KEYS):
+        key_id, _, key = entry.partition(":")
+        raw_keys.setdefault(_field_key_id(int(key_id)), []).append(base64.urlsafe_b64decode(key))
+
+    active_id = DERIVED_KEY_ID
+    if settings.FIELD_ENCRYPTION_KEY:
+        active_id = _field_key_id(settings.FIELD_ENCRYPTION_KEY_ID)
+        raw_keys.setdefault(active_id, []).insert(0, base64.urlsafe_b64decode(settings.FIELD_ENCRYPTION_KEY))
+
+    #identifies the active key without revealing it, so progress of a rotation can be tied to it
+    key_fingerprint = hashlib.blake2b(bytes([active_id]) + raw_keys[active_id][0], digest_size=8).hexdigest()
+    active_key_id = active_id
+
+    f = fernet
+    _keys = {key_id: [AESGCM(key) for key in keys] for key_id, keys in raw_keys.items()}
+    _active_key = _keys[active_key_id][0]
+
+
+reload_keys()
+
+
+def seal(plaintext: bytes) -> bytes:
+    header = bytes([ENVELOPE_V2, active_key_id])
+    nonce = os.urandom(NONCE_BYTES)
+    return header + nonce + _active_key.encrypt(nonce, plaintext, header)
+
+
+def _open(envelope: bytes) -> tuple[bytes, AESGCM]:
+    header = envelope[:ENVELOPE_HEADER_BYTES]
+    if len(header) != ENVELOPE_HEADER_BYTES or header[0] != ENVELOPE_V2:
+        raise ValueError("Not an encryption envelope")
+
+    keys = _keys.get(header[1])
+    if not keys:
+        raise ValueError(f"Unknown field encryption key id: {header[1]}")
+
+    nonce_end = ENVELOPE_HEADER_BYTES + NONCE_BYTES
+    nonce, ciphertext = envelope[ENVELOPE_HEADER_BYTES:nonce_end], envelope[nonce_end:]
+    for key in keys[:-1]:
+        try:
+            return key.decrypt(nonce, ciphertext, header), key
+        except InvalidTag:
+            continue
+    return keys[-1].decrypt(nonce, ciphertext, header), keys[-1]
+
+
+def open_envelope(envelope: bytes) -> bytes:
+    return _open(envelope)[0]
+
+#plaintexts keyed by ciphertext digest. ciphertexts never change in place, so entries never go stale
+decrypt_cache = DecryptCache(settings.DECRYPT_CACHE_MAX_ENTRIES, settings.DECRYPT_CACHE_MAX_BYTES)
+
+#batches with fewer distinct tokens than this are decrypted inline, the pool hop isn't worth it
+BATCH_DECRYPT_MIN_SIZE = 32
+_decrypt_pool = ThreadPoolExecutor(max_workers=settings.DECRYPT_POOL_WORKERS, thread_name_prefix="decrypt")
+
+#rough python object overhead, only used to keep the cache near its byte budget
+ADDRESS_OVERHEAD_BYTES = 64
+GEOMETRY_POINT_BYTES = 112
+
+#leading byte of binary geometry rows. v1 is a raw fernet token, ENVELOPE_V2 is aes-gcm.
+#legacy rows are base64 fernet text and start with "g"
+GEOMETRY_FORMAT_V1 = 0x01
+
+#base64 fernet tokens start with this, their version byte is 0x80. envelopes start with "A"
+FERNET_TOKEN_PREFIX = "g"
 
 def encrypt_address(address: str) -> str:
     if not address:
         return ""
-    return f.encrypt(address.encode()).decode()
+    #address columns are text, so the envelope is stored base64 encoded
+    return base64.urlsafe_b64encode(seal(address.encode())).decode()
 
 def decrypt_address(token: str) -> str:
     if not token:
         return ""
-    return f.decrypt(token.encode()).decode()
 
-def encrypt_geometry(geometry: dict) -> str:
+    key = (b"a", ciphertext_digest(token))
+    address = decrypt_cache.get(key)
+    if address is None:
+        address = _decrypt_address(token)
+        decrypt_cache.put(key, address, len(address) + ADDRESS_OVERHEAD_BYTES)
+    return address
+
+def _decrypt_address(token: str) -> str:
+    if token.startswith(FERNET_TOKEN_PREFIX):
+        return f.decrypt(token.encode()).decode()
+    return open_envelope(base64.urlsafe_b64decode(token)).decode()
+
+def encrypt_geometry(geometry: dict) -> bytes:
     if not geometry:
-        return ""
-    #convert dict to string then encrypt it
-    geometry_json = json.dumps(geometry, separators=(',', ':'))
-    return f.encrypt(geometry_json.encode()).decode()
+        return b""
+    return seal(encode_geometry(geometry))
+
+def is_legacy_geometry(encrypted_geometry: bytes | str) -> bool:
+    return isinstance(encrypted_geometry, str) or encrypted_geometry[0] not in (GEOMETRY_FORMAT_V1, ENVELOPE_V2)
+
+def _geometry_size(geometry: dict, encrypted_geometry: bytes | str) -> int:
+    if geometry.get("type") == "LineString":
+        return len(geometry.get("coordinates", [])) * GEOMETRY_POINT_BYTES
+    return len(encrypted_geometry) * 4
 
-def decrypt_geometry(encrypted_geometry: str) -> dict:
+def decrypt_geometry(encrypted_geometry: bytes | str) -> dict:
     if not encrypted_geometry:
         return {}
-    #decrypt the str then revert back to dict
-    decrypted_json = f.decrypt(encrypted_geometry.encode()).decode()
-    return json.loads(decrypted_json)
\ No newline at end of file
+
+    if isinstance(encrypted_geometry, (bytearray, memoryview)):
+        encrypted_geometry = bytes(encrypted_geometry)
+
+    key = (b"g", ciphertext_digest(encrypted_geometry))
+    geometry = decrypt_cache.get(key)
+    if geometry is None:
+        geometry = _decrypt_geometry(encrypted_geometry)
+        decrypt_cache.put(key, geometry, _geometry_size(geometry, encrypted_geometry))
+    #the cached dict is shared, callers get their own copy to mutate
+    return copy.deepcopy(geometry)
+
+def _decrypt_geometry(encrypted_geometry: bytes | str) -> dict:
+    if is_legacy_geometry(encrypted_geometry):
+        #legacy rows are fernet text of the json geometry
+        if isinstance(encrypted_geometry, (bytes, bytearray, memoryview)):
+            encrypted_geometry = bytes(encrypted_geometry).decode()
+        decrypted_json = f.decrypt(encrypted_geometry.encode()).decode()
+        return json.loads(decrypted_json)
+
+    if encrypted_geometry[0] == ENVELOPE_V2:
+        return decode_geometry(open_envelope(encrypted_geometry))
+
+    token = base64.urlsafe_b64encode(bytes(encrypted_geometry[1:]))
+    return decode_geometry(f.decrypt(token))
+
+
+def reencrypt_address(token: str) -> str | None:
+    """Return the address encrypted under the active key, or None if it already is."""
+    if not token:
+        return None
+
+    if token.startswith(FERNET_TOKEN_PREFIX):
+        plaintext = f.decrypt(token.encode())
+    else:
+        plaintext, key = _open(base64.urlsafe_b64decode(token))
+        if key is _active_key:
+            return None
+    return base64.urlsafe_b64encode(seal(plaintext)).decode()
+
+def reencrypt_geometry(encrypted_geometry: bytes | str) -> bytes | None:
+    """Return the geometry encrypted under the active key, or None if it already is."""
+    if not encrypted_geometry:
+        return None
+
+    if is_legacy_geometry(encrypted_geometry):
+        return encrypt_geometry(_decrypt_geometry(encrypted_geometry))
+
+    encrypted_geometry = bytes(encrypted_geometry)
+    if encrypted_geometry[0] == GEOMETRY_FORMAT_V1:
+        #the payload inside is already the binary codec, no need to decode it
+        return seal(f.decrypt(base64.urlsafe_b64encode(encrypted_geometry[1:])))
+
+    payload, key = _open(encrypted_geometry)
+    return None if key is _active_key else seal(payload)
+
+
+async def _decrypt_many(tokens: list, decrypt_one) -> list:
+    #each distinct token is decrypted once. big batches go to the pool so the event loop isn't blocked
+    unique = list(dict.fromkeys(token for token in tokens if token))
+    if len(unique) < BATCH_DECRYPT_MIN_SIZE:
+        return [decrypt_one(token) for token in tokens]
+
+    chunk_size = -(-len(unique) // settings.DECRYPT_POOL_WORKERS)
+    chunks = [unique[start:start + chunk_size] for start in range(0, len(unique), chunk_size)]
+
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*(
+        loop.run_in_executor(_decrypt_pool, lambda chunk=chunk: [decrypt_one(token) for token in chunk])
+        for chunk in chunks
+    ))
+
+    plaintexts = {}
+    for chunk, values in zip(chunks, results):
+        plaintexts.update(zip(chunk, values))
+    return [plaintexts[token] if token else decrypt_one(token) for token in tokens]
+
+async def decrypt_addresses(tokens: list[str]) -> list[str]:
+    return await _decrypt_many(tokens, decrypt_address)
+
+async def decrypt_geometries(tokens: list[bytes | str]) -> list[dict]:
+    geometries = await _decrypt_many(tokens, decrypt_geometry)
+    #a token repeated in a pooled batch comes back as one dict, give each position its own
+    seen = set()
+    for index, geometry in enumerate(geometries):
+        if id(geometry) in seen:
+            geometries[index] = copy.deepcopy(geometry)
+        seen.add(id(geometry))
+    return geometries
@@ -0,0 +1,19 @@
+import base64
+from datetime import datetime
+from uuid import UUID
+
+
+def encode_cursor(started_at: datetime, trip_id: UUID) -> str:
+    #cursor is the (started_at, id) of the last trip on the page
+    raw = f"{started_at.isoformat()}|{trip_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        started_at, trip_id = raw.split("|", 1)
+        return datetime.fromisoformat(started_at), UUID(trip_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
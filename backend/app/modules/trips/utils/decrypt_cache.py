@@ -0,0 +1,68 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def ciphertext_digest(token: bytes | str) -> bytes:
+    #key on a digest so the cache never holds a second copy of big ciphertexts
+    if isinstance(token, str):
+        token = token.encode()
+    return hashlib.blake2b(token, digest_size=16).digest()
+
+
+class DecryptCache:
+    """LRU of decrypted values, capped by entry count and by an estimated byte size.
+
+    Thread safe, since batch decryption fills it from a thread pool. Cached values are
+    shared between callers and must be treated as read only.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size: int) -> None:
+        #values bigger than the whole budget would just flush everything else out
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+
+            self._entries[key] = (value, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
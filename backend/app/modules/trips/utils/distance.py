@@ -1,7 +1,13 @@
+from itertools import chain
+
+import numpy as np
 
 #1 mile = 1609.34 meters
 METERS_PER_MILE = 1609.34
 
+#mean earth radius (IUGG)
+EARTH_RADIUS_METERS = 6_371_008.8
+
 
 def meters_to_miles(meters: float) -> float:
     if meters < 0:
@@ -17,3 +23,42 @@ def miles_to_meters(miles: float) -> float:
     
     meters = miles * METERS_PER_MILE
     return round(meters, 2)
+
+
+def route_length_meters(geometry: dict | None) -> float | None:
+    """Haversine length of a GeoJSON LineString, every segment in one numpy pass.
+
+    Returns None when there's no plain LineString to measure.
+    """
+    if not geometry or geometry.get("type") != "LineString":
+        return None
+
+    coordinates = geometry.get("coordinates")
+    if not isinstance(coordinates, list) or len(coordinates) < 2:
+        return None
+
+    #flat fromiter is a lot cheaper than np.asarray on a list of lists. the size check
+    #catches 3d points or anything else that isn't plain [lng, lat] pairs
+    try:
+        flat = np.fromiter(chain.from_iterable(coordinates), dtype=float)
+    except (TypeError, ValueError):
+        return None
+    if flat.size != 2 * len(coordinates):
+        return None
+
+    radians = np.radians(flat.reshape(-1, 2))
+    lng, lat = radians[:, 0], radians[:, 1]
+    d_lng = np.diff(lng)
+    d_lat = np.diff(lat)
+
+    a = np.sin(d_lat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(d_lng / 2) ** 2
+    segments = 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    return float(segments.sum())
+
+
+def distance_diverges(reported_meters: float, computed_meters: float | None, tolerance: float, slack_meters: float) -> bool:
+    #slack covers short trips where a few bad gps fixes are a big share of the route
+    if computed_meters is None:
+        return False
+    allowed = max(slack_meters, tolerance * computed_meters)
+    return abs(reported_meters - computed_meters) > allowed
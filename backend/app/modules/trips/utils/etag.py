@@ -0,0 +1,23 @@
+import hashlib
+from datetime import datetime
+from uuid import UUID
+
+
+def geometry_etag(trip_id: UUID, updated_at: datetime, level: int) -> str:
+    #strong etag. every write to the trip bumps updated_at, and the level is part of the representation
+    raw = f"{trip_id}:{updated_at.isoformat()}:{level}"
+    return '"' + hashlib.sha256(raw.encode()).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        #If-None-Match uses weak comparison, so a W/ prefix still counts
+        if candidate.removeprefix("W/") == etag:
+            return True
+    return False
@@ -0,0 +1,80 @@
+import json
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+
+#1e-6 degrees is ~11cm, well below phone gps accuracy
+COORDINATE_SCALE = 1_000_000
+
+#first byte of the encoded payload says how the rest is laid out
+KIND_JSON = 0
+KIND_LINESTRING = 1
+
+
+def is_plain_linestring(geometry: dict) -> bool:
+    if set(geometry) != {"type", "coordinates"} or geometry["type"] != "LineString":
+        return False
+
+    coordinates = geometry["coordinates"]
+    if not isinstance(coordinates, list):
+        return False
+
+    for point in coordinates:
+        if not isinstance(point, (list, tuple)) or len(point) != 2:
+            return False
+        lng, lat = point
+        if isinstance(lng, bool) or isinstance(lat, bool) or not isinstance(lng, (int, float)) or not isinstance(lat, (int, float)):
+            return False
+        if not (-180 <= lng <= 180 and -90 <= lat <= 90):
+            return False
+    return True
+
+
+def encode_geometry(geometry: dict) -> bytes:
+    """Pack GeoJSON into a compact binary payload.
+
+    Plain 2D LineStrings are quantized to COORDINATE_SCALE, delta encoded as int32 and
+    zlib compressed. Anything else falls back to compressed JSON so nothing is lost.
+    """
+    if not is_plain_linestring(geometry):
+        raw = json.dumps(geometry, separators=(',', ':')).encode()
+        return bytes([KIND_JSON]) + zlib.compress(raw)
+
+    deltas = array("i")
+    prev_lng = prev_lat = 0
+    for lng, lat in geometry["coordinates"]:
+        q_lng = round(lng * COORDINATE_SCALE)
+        q_lat = round(lat * COORDINATE_SCALE)
+        deltas.append(q_lng - prev_lng)
+        deltas.append(q_lat - prev_lat)
+        prev_lng, prev_lat = q_lng, q_lat
+
+    if sys.byteorder != "little":
+        deltas.byteswap()
+    return bytes([KIND_LINESTRING]) + zlib.compress(deltas.tobytes())
+
+
+def decode_geometry(payload: bytes) -> dict:
+    kind, body = payload[0], zlib.decompress(payload[1:])
+
+    if kind == KIND_JSON:
+        return json.loads(body)
+
+    if kind != KIND_LINESTRING:
+        raise ValueError(f"Unknown geometry payload kind: {kind}")
+
+    deltas = array("i")
+    deltas.frombytes(body)
+    if sys.byteorder != "little":
+        deltas.byteswap()
+
+    lngs = accumulate(deltas[0::2])
+    lats = accumulate(deltas[1::2])
+    return {
+        "type": "LineString",
+        "coordinates": [
+            [lng / COORDINATE_SCALE, lat / COORDINATE_SCALE]
+            for lng, lat in zip(lngs, lats)
+        ],
+    }
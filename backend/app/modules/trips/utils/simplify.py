@@ -0,0 +1,92 @@
+import numpy as np
+
+from app.modules.trips.utils.geometry_codec import is_plain_linestring
+
+#meters per degree of latitude, plenty accurate for picking simplification tolerances
+METERS_PER_DEGREE = 111_320.0
+
+#max deviation from the real route for each stored level, most detailed first
+LEVEL_TOLERANCES_METERS = (5.0, 20.0, 80.0, 320.0)
+
+
+def _project(coordinates: np.ndarray) -> np.ndarray:
+    #local equirectangular projection so a tolerance means the same distance at any latitude
+    mean_lat = np.radians(coordinates[:, 1].mean())
+    return np.column_stack((
+        coordinates[:, 0] * METERS_PER_DEGREE * np.cos(mean_lat),
+        coordinates[:, 1] * METERS_PER_DEGREE,
+    ))
+
+
+def douglas_peucker_mask(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Return a boolean mask of the points Douglas-Peucker keeps for this tolerance.
+
+    Uses an explicit stack instead of recursion, and computes the distances for every
+    point in a span in one numpy pass.
+    """
+    count = len(points)
+    keep = np.zeros(count, dtype=bool)
+    if count == 0:
+        return keep
+
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        a, b = points[start], points[end]
+        span = points[start + 1:end] - a
+        ab = b - a
+        length_sq = float(ab @ ab)
+
+        #distance to the segment, not the infinite line, so gps loops back to the start aren't dropped
+        if length_sq == 0.0:
+            offsets = span
+        else:
+            t = np.clip((span @ ab) / length_sq, 0.0, 1.0)
+            offsets = span - t[:, None] * ab
+        distances = np.hypot(offsets[:, 0], offsets[:, 1])
+
+        index = int(distances.argmax())
+        if distances[index] > tolerance:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    return keep
+
+
+def simplify_levels(geometry: dict) -> list[tuple[float, dict]]:
+    """Build the simplified levels stored for a trip route.
+
+    Returns (tolerance_meters, geometry) pairs, most detailed first. Only plain LineStrings
+    are simplified, and a level is skipped if it doesn't drop points compared to the one
+    before it, so short routes end up with few or no levels.
+    """
+    if not geometry or not is_plain_linestring(geometry):
+        return []
+
+    coordinates = geometry["coordinates"]
+    if len(coordinates) < 3:
+        return []
+
+    points = _project(np.asarray(coordinates, dtype=float))
+
+    levels = []
+    previous_count = len(coordinates)
+    for tolerance in LEVEL_TOLERANCES_METERS:
+        keep = douglas_peucker_mask(points, tolerance)
+        kept_count = int(keep.sum())
+        if kept_count >= previous_count:
+            continue
+
+        levels.append((tolerance, {
+            "type": "LineString",
+            "coordinates": [coordinates[i] for i in np.flatnonzero(keep)],
+        }))
+        previous_count = kept_count
+
+    return levels
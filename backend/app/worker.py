@@ -1,8 +1,9 @@
 import asyncio
 import json
 
-from app.aws_client import get_sqs_client
+from app.aws_client import get_queue_url, get_sqs_client, run_aws
 from app.config import settings
+from app.core.process_pool import shutdown_pools
 from app.infra.db import AsyncSessionLocal
 
 from app.modules.reports.repository import ReportRepository
@@ -22,13 +23,20 @@ from app.modules.users.models import User
 from app.modules.vehicles.models import Vehicle
 
 VISIBILITY_TIMEOUT = 60 
+#a message still being worked on is hidden for another VISIBILITY_TIMEOUT this often
+VISIBILITY_HEARTBEAT_SECONDS = VISIBILITY_TIMEOUT / 3
 MAX_RECEIVE_COUNT = 3 
+#sqs caps both receive and delete batches at 10
+SQS_BATCH_SIZE = 10
 
 class ReportWorker:
 
-    def __init__(self):
+    def __init__(self, concurrency: int | None = None):
         self.sqs = get_sqs_client()
-        self.queue_url = self.sqs.get_queue_url(QueueName=settings.REPORTS_QUEUE)["QueueUrl"]
+        self.queue_url = get_queue_url(self.sqs, settings.REPORTS_QUEUE)
+        self.concurrency = concurrency or settings.REPORT_WORKER_CONCURRENCY
+        #receipt handles of finished messages, deleted in batches before each poll
+        self._finished: list[str] = []
 
     async def start(self):
         
@@ -38,55 +46,120 @@ class ReportWorker:
         #start background clean task
         cleanup_task = asyncio.create_task(self.periodic_cleanup())
         
-        print("Worker is running and listening for messages...\n")
+        print(f"Worker is running and listening for messages ({self.concurrency} at a time)...\n")
 
+        jobs: set[asyncio.Task] = set()
         try:
             while True:
-                response = self.sqs.receive_message(
-                    QueueUrl=self.queue_url,
-                    MaxNumberOfMessages=1,
-                    WaitTimeSeconds=5,
-                    VisibilityTimeout=VISIBILITY_TIMEOUT,
-                    AttributeNames=['All'],
-                    MessageAttributeNames=['All'] 
-                )
+                #only as many messages as there are free slots. a received message that sat waiting for a
+                #slot would run down its visibility timeout and be handed to another worker meanwhile
+                room = self.concurrency - len(jobs)
+                if room <= 0:
+                    await asyncio.wait(jobs, return_when=asyncio.FIRST_COMPLETED)
+                    continue
 
-                messages = response.get("Messages", [])
+                await self.delete_finished()
+                messages = await self.receive(min(room, SQS_BATCH_SIZE))
 
                 if not messages:
                     await asyncio.sleep(1)
                     continue
 
                 for message in messages:
-                    body = json.loads(message["Body"])
-                    receipt = message["ReceiptHandle"]
-                    retry_count = int(message.get("Attributes", {}).get("ApproximateReceiveCount", "1"))
-
-                    print(f"Received message: {body} (Attempt {retry_count})")
-                    
-                    if retry_count >= MAX_RECEIVE_COUNT:
-                        print(f"Max retries reached for {body['report_id']}. Marking as failed.")
-                        async with AsyncSessionLocal() as session:
-                            success = await self.mark_failed(session, body["report_id"])
-                            if success:
-                                self.sqs.delete_message(QueueUrl=self.queue_url, ReceiptHandle=receipt)
-                                print(f"Marked {body['report_id']} as failed and deleted message")
-                        continue
-
-                    success = await self.process_report(body["report_id"], receipt)
-
-                    if success:
-                        print(f"Successfully processed and deleted message: {body}\n")
-                    else:
-                        print(f"Worker failed for {body}. Will retry.\n")
-        except KeyboardInterrupt:
+                    job = asyncio.create_task(self.run_job(message))
+                    jobs.add(job)
+                    job.add_done_callback(jobs.discard)
+        except (KeyboardInterrupt, asyncio.CancelledError):
             print("\nShutting down worker...")
-            cleanup_task.cancel()
             raise
         except Exception as e:
             print(f"Unexpected error in worker main loop: {e}")
-            cleanup_task.cancel()
             raise
+        finally:
+            cleanup_task.cancel()
+            #let running reports finish, every received message is already running
+            if jobs:
+                await asyncio.wait(jobs)
+            await self.delete_finished()
+
+    async def receive(self, max_messages: int) -> list[dict]:
+        #long poll on a thread so reports keep rendering meanwhile
+        response = await run_aws(
+            self.sqs.receive_message,
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=max_messages,
+            WaitTimeSeconds=5,
+            VisibilityTimeout=VISIBILITY_TIMEOUT,
+            AttributeNames=['All'],
+            MessageAttributeNames=['All'] 
+        )
+        return response.get("Messages", [])
+
+    async def run_job(self, message: dict) -> None:
+        heartbeat = asyncio.create_task(self.keep_invisible(message["ReceiptHandle"]))
+        try:
+            await self.handle_message(message)
+        except Exception as e:
+            #the message isn't deleted, sqs hands it out again
+            print(f"Unexpected error handling message {message.get('MessageId')}: {e}")
+        finally:
+            heartbeat.cancel()
+
+    async def keep_invisible(self, receipt_handle: str) -> None:
+        #a long render must not outlive the visibility timeout, or another worker renders it again
+        while True:
+            await asyncio.sleep(VISIBILITY_HEARTBEAT_SECONDS)
+            try:
+                await run_aws(
+                    self.sqs.change_message_visibility,
+                    QueueUrl=self.queue_url,
+                    ReceiptHandle=receipt_handle,
+                    VisibilityTimeout=VISIBILITY_TIMEOUT,
+                )
+            except Exception as e:
+                print(f"Failed to extend visibility of a message: {e}")
+
+    async def handle_message(self, message: dict) -> None:
+        body = json.loads(message["Body"])
+        receipt = message["ReceiptHandle"]
+        retry_count = int(message.get("Attributes", {}).get("ApproximateReceiveCount", "1"))
+
+        print(f"Received message: {body} (Attempt {retry_count})")
+        
+        if retry_count >= MAX_RECEIVE_COUNT:
+            print(f"Max retries reached for {body['report_id']}. Marking as failed.")
+            async with AsyncSessionLocal() as session:
+                success = await self.mark_failed(session, body["report_id"])
+                if success:
+                    self.finish(receipt)
+                    print(f"Marked {body['report_id']} as failed")
+            return
+
+        success = await self.process_report(body["report_id"], receipt)
+
+        if success:
+            print(f"Successfully processed message: {body}\n")
+        else:
+            print(f"Worker failed for {body}. Will retry.\n")
+
+    def finish(self, receipt_handle: str) -> None:
+        self._finished.append(receipt_handle)
+
+    async def delete_finished(self) -> None:
+        while self._finished:
+            batch, self._finished = self._finished[:SQS_BATCH_SIZE], self._finished[SQS_BATCH_SIZE:]
+            try:
+                response = await run_aws(
+                    self.sqs.delete_message_batch,
+                    QueueUrl=self.queue_url,
+                    Entries=[{"Id": str(index), "ReceiptHandle": handle} for index, handle in enumerate(batch)],
+                )
+            except Exception as e:
+                #redelivered reports are skipped once they're completed, so a lost delete only costs a lookup
+                print(f"Failed to delete {len(batch)} messages: {e}")
+                continue
+            for failure in response.get("Failed", []):
+                print(f"Failed to delete message: {failure.get('Code')} {failure.get('Message')}")
 
     async def periodic_cleanup(self):
         #clean every 10 mins
@@ -167,7 +240,7 @@ class ReportWorker:
             print(f"Error during startup cleanup: {e}")
 
     async def process_report(self, report_id: str, receipt_handle: str) -> bool:
-        """Process a report and only delete SQS message if successful."""
+        """Process a report and only queue its SQS message for deletion if successful."""
         
         repo = ReportRepository()
 
@@ -178,13 +251,13 @@ class ReportWorker:
                 if not report:
                     print(f"Report {report_id} not found. Skipping.")
                     #delete message since report doesn't exist
-                    self.sqs.delete_message(QueueUrl=self.queue_url, ReceiptHandle=receipt_handle)
+                    self.finish(receipt_handle)
                     return True
 
                 if report.status == ReportStatus.completed:
                     print(f"{report_id} already completed - skipping.")
                     #delete message since work is already done
-                    self.sqs.delete_message(QueueUrl=self.queue_url, ReceiptHandle=receipt_handle)
+                    self.finish(receipt_handle)
                     return True
 
                 from app.modules.audit_trail.service import AuditTrailService
@@ -210,7 +283,7 @@ class ReportWorker:
                 await service.generate_now(report_id)
                 print(f"Report done: {report.file_name}")
                 
-                self.sqs.delete_message(QueueUrl=self.queue_url, ReceiptHandle=receipt_handle)
+                self.finish(receipt_handle)
                 return True
 
         except Exception as e:
@@ -218,8 +291,8 @@ class ReportWorker:
                 async with AsyncSessionLocal() as session:
                     success = await self.mark_failed(session, report_id)
                     if success:
-                        self.sqs.delete_message(QueueUrl=self.queue_url, ReceiptHandle=receipt_handle)
-                        print(f"Marked {report_id} as failed and deleted message")
+                        self.finish(receipt_handle)
+                        print(f"Marked {report_id} as failed")
                         return True
             except Exception as commit_error:
                 print(f"Error marking report {report_id} as failed: {commit_error}")
@@ -230,7 +303,10 @@ class ReportWorker:
 
 async def main():
     worker = ReportWorker()
-    await worker.start()
+    try:
+        await worker.start()
+    finally:
+        shutdown_pools()
 
 
 if __name__ == "__main__":
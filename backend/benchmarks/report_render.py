@@ -0,0 +1,98 @@
+"""Throughput of rendering report pdfs on a process pool of 1, 2, 4 and 8 processes.
+
+    python -m benchmarks.report_render --trips 2000 --reports 16
+"""
+import argparse
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timezone
+
+from app.modules.reports.data_builder import ExpenseReportItem, ReportData, TripReportItem
+from app.modules.reports.renderer_fpdf import render_report
+
+PROCESS_COUNTS = (1, 2, 4, 8)
+
+
+def _report_data(trips: int) -> ReportData:
+    return ReportData(
+        employee_name="Benchmark User",
+        employee_email="benchmark@example.com",
+        period_start=date(2025, 1, 1),
+        period_end=date(2025, 12, 31),
+        generated_at=datetime.now(timezone.utc),
+        trips=[
+            TripReportItem(
+                date=date(2025, 1 + i % 12, 1 + i % 28),
+                purpose=f"Client visit {i}",
+                miles=12.5,
+                category_name="Business",
+                rate_used=0.7,
+                mileage_total=8.75,
+            )
+            for i in range(trips)
+        ],
+        expenses=[ExpenseReportItem(date=date(2025, 1 + i % 12, 1), type="Parking", amount=12.0) for i in range(trips // 10)],
+        total_miles=12.5 * trips,
+        total_mileage_amount=8.75 * trips,
+        total_expense_amount=12.0 * (trips // 10),
+        grand_total=8.75 * trips + 12.0 * (trips // 10),
+    )
+
+
+async def _render_all(pool: ProcessPoolExecutor, data: ReportData, reports: int) -> tuple[float, float]:
+    #a 1ms ticker shows how long the loop was blocked while reports rendered
+    max_lag = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal max_lag
+        while running:
+            expected = time.perf_counter() + 0.001
+            await asyncio.sleep(0.001)
+            max_lag = max(max_lag, time.perf_counter() - expected)
+
+    task = asyncio.create_task(ticker())
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    await asyncio.gather(*(loop.run_in_executor(pool, render_report, data) for _ in range(reports)))
+    total = time.perf_counter() - start
+    running = False
+    await task
+    return total, max_lag
+
+
+async def main_async(trips: int, reports: int):
+    data = _report_data(trips)
+
+    start = time.perf_counter()
+    render_report(data)
+    inline = time.perf_counter() - start
+
+    print(f"{reports} reports of {trips} trips each, {multiprocessing.cpu_count()} cpus")
+    print(f"  inline, one report     {inline * 1000:8.1f} ms, blocks the loop for all of it")
+    for processes in PROCESS_COUNTS:
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+            #start every process and import the renderer before timing
+            await asyncio.gather(*(
+                asyncio.get_running_loop().run_in_executor(pool, render_report, _report_data(1))
+                for _ in range(processes)
+            ))
+            total, lag = await _render_all(pool, data, reports)
+        print(
+            f"  {processes} processes            {reports / total:8.2f} reports/s   "
+            f"total {total * 1000:8.1f} ms   max loop stall {lag * 1000:6.2f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark report pdf rendering on a process pool")
+    parser.add_argument("--trips", type=int, default=2000)
+    parser.add_argument("--reports", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.trips, args.reports))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Per-trip cost of measuring a recorded route.
+
+    python -m benchmarks.route_distance --points 50000 --trips 20
+"""
+import argparse
+import math
+import random
+import time
+
+from app.modules.trips.utils.distance import EARTH_RADIUS_METERS, route_length_meters
+from app.modules.trips.utils.geometry_codec import decode_geometry, encode_geometry
+
+
+def _route(points: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    lng, lat = -122.4194, 37.7749
+    coordinates = []
+    for _ in range(points):
+        lng += rng.uniform(-0.00002, 0.00006)
+        lat += rng.uniform(-0.00002, 0.00006)
+        coordinates.append([lng, lat])
+    return {"type": "LineString", "coordinates": coordinates}
+
+
+def _python_length(geometry: dict) -> float:
+    #reference loop, what this would cost without numpy
+    total = 0.0
+    coordinates = geometry["coordinates"]
+    for (lng1, lat1), (lng2, lat2) in zip(coordinates, coordinates[1:]):
+        phi1, phi2 = math.radians(lat1), math.radians(lat2)
+        a = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+        total += 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+    return total
+
+
+def _time_per_trip(fn, routes) -> float:
+    start = time.perf_counter()
+    for route in routes:
+        fn(route)
+    return (time.perf_counter() - start) / len(routes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark route distance computation")
+    parser.add_argument("--points", type=int, default=50_000)
+    parser.add_argument("--trips", type=int, default=20)
+    args = parser.parse_args()
+
+    routes = [_route(args.points, seed) for seed in range(args.trips)]
+    payloads = [encode_geometry(route) for route in routes]
+
+    numpy_cost = _time_per_trip(route_length_meters, routes)
+    python_cost = _time_per_trip(_python_length, routes)
+    #what the backfill pays per trip, decoding the stored route included
+    backfill_cost = _time_per_trip(lambda payload: route_length_meters(decode_geometry(payload)), payloads)
+
+    assert math.isclose(route_length_meters(routes[0]), _python_length(routes[0]), rel_tol=1e-9)
+
+    print(f"{args.trips} trips x {args.points} points")
+    print(f"  numpy haversine:   {numpy_cost * 1000:8.2f} ms/trip")
+    print(f"  python loop:       {python_cost * 1000:8.2f} ms/trip")
+    print(f"  decode + numpy:    {backfill_cost * 1000:8.2f} ms/trip")
+
+
+if __name__ == "__main__":
+    main()
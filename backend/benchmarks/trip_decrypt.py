@@ -0,0 +1,96 @@
+"""Event loop stall and total time of building a trip summary page.
+
+    python -m benchmarks.trip_decrypt --trips 500
+"""
+import argparse
+import asyncio
+import datetime
+import time
+from types import SimpleNamespace
+from uuid import uuid4
+
+from app.modules.trips.schemas import TripSummaryDTO
+from app.modules.trips.utils.crypto import decrypt_cache, encrypt_address
+
+
+def _rows(count: int) -> list:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return [
+        SimpleNamespace(
+            id=uuid4(),
+            status="completed",
+            start_address_encrypted=encrypt_address(f"{i} Market St, San Francisco, CA"),
+            end_address_encrypted=encrypt_address(f"{i} Mission St, San Francisco, CA"),
+            purpose="client visit",
+            vehicle_id=None,
+            miles=12.5,
+            reimbursement_rate=0.7,
+            mileage_reimbursement_total=8.75,
+            expense_reimbursement_total=0.0,
+            started_at=now,
+            ended_at=now,
+            updated_at=now,
+            rate_customization_id=uuid4(),
+            rate_category_id=uuid4(),
+            expense_count=0,
+            receipt_count=0,
+        )
+        for i in range(count)
+    ]
+
+
+async def _measure(build) -> tuple[float, float]:
+    #a 1ms ticker shows how long the loop was blocked while the page was built
+    max_lag = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal max_lag
+        while running:
+            expected = time.perf_counter() + 0.001
+            await asyncio.sleep(0.001)
+            max_lag = max(max_lag, time.perf_counter() - expected)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await build()
+    total = time.perf_counter() - start
+    running = False
+    await task
+    return total, max_lag
+
+
+async def main_async(trips: int):
+    rows = _rows(trips)
+
+    async def inline():
+        return [TripSummaryDTO.model_validate(row) for row in rows]
+
+    async def batched():
+        return await TripSummaryDTO.model_validate_many(rows)
+
+    decrypt_cache.clear()
+    inline_cold = await _measure(inline)
+    decrypt_cache.clear()
+    batched_cold = await _measure(batched)
+    batched_warm = await _measure(batched)
+
+    print(f"{trips} trips, 2 addresses each")
+    for name, (total, lag) in (
+        ("inline, cold cache", inline_cold),
+        ("batched, cold cache", batched_cold),
+        ("batched, warm cache", batched_warm),
+    ):
+        print(f"  {name:22} total {total * 1000:8.2f} ms   max loop stall {lag * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark trip address decryption")
+    parser.add_argument("--trips", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.trips))
+
+
+if __name__ == "__main__":
+    main()
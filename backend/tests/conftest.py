@@ -89,6 +89,9 @@ def sample_expense_id():
 @pytest.fixture(autouse=True)
 def mock_aws_clients():
     """Mock AWS clients for all tests"""
+    from app import aws_client
+    #shared clients and resolved queue urls live for the whole process, start every test without them
+    aws_client.reset_clients()
     with patch('app.aws_client.get_s3_client') as mock_s3, \
          patch('app.aws_client.get_sqs_client') as mock_sqs:
         
@@ -108,6 +111,34 @@ def mock_aws_clients():
         yield {'s3': s3_client, 'sqs': sqs_client}
 
 
+@pytest.fixture(autouse=True)
+def clear_storage_cache():
+    """Signed urls and existence checks are cached per process, don't let them leak between tests."""
+    from app.core.storage_cache import storage_cache
+    storage_cache.clear()
+    yield
+    storage_cache.clear()
+
+
+@pytest.fixture
+def rotated_keys():
+    """Lets a test change the configured keys, the original keyring is restored afterwards."""
+    from app.config import settings
+    from app.modules.trips.utils import crypto
+
+    saved = (settings.FERNET_KEY, settings.FERNET_OLD_KEYS, settings.FIELD_ENCRYPTION_KEY, settings.FIELD_ENCRYPTION_KEY_ID, settings.FIELD_ENCRYPTION_OLD_KEYS)
+
+    def rotate(**overrides):
+        for name, value in overrides.items():
+            setattr(settings, name, value)
+        crypto.reload_keys()
+
+    yield rotate
+
+    (settings.FERNET_KEY, settings.FERNET_OLD_KEYS, settings.FIELD_ENCRYPTION_KEY, settings.FIELD_ENCRYPTION_KEY_ID, settings.FIELD_ENCRYPTION_OLD_KEYS) = saved
+    crypto.reload_keys()
+
+
 # Event Loop
 @pytest_asyncio.fixture(scope="session")
 def event_loop():
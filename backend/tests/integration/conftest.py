@@ -1,17 +1,35 @@
 
 import pytest
 import pytest_asyncio
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from app.core.base import Base
 
 
+def enforce_foreign_keys(engine):
+    """SQLite ignores foreign keys unless every connection turns them on, postgres always checks them."""
+    @event.listens_for(engine.sync_engine, "connect")
+    def _foreign_keys_on(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+@pytest.fixture
+def foreign_keys():
+    """Overridden to False by tests whose rows reference users that live in another database."""
+    return True
+
+
 @pytest_asyncio.fixture
-async def test_engine():
+async def test_engine(foreign_keys):
     """Create an in-memory SQLite database engine for testing."""
     engine = create_async_engine(
         "sqlite+aiosqlite:///:memory:",
         echo=False,
     )
+    if foreign_keys:
+        enforce_foreign_keys(engine)
     
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
@@ -33,3 +51,19 @@ async def test_db_session(test_engine):
     async with async_session() as session:
         yield session
         await session.rollback()
+
+
+@pytest_asyncio.fixture
+async def file_sessions(tmp_path):
+    """Sessions on a file database, so every session gets its own connection and concurrent writers really interleave."""
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'concurrent.db'}",
+        connect_args={"timeout": 30},
+    )
+    enforce_foreign_keys(engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    await engine.dispose()
@@ -0,0 +1,132 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from sqlalchemy import func, select
+
+from app.modules.common_places.models import CommonPlace
+from app.modules.common_places.repository import CommonPlaceRepo
+from app.modules.rate_categories.models import RateCategory
+from app.modules.rate_customizations.models import RateCustomization
+from app.modules.trips.backfill_address_index import backfill
+from app.modules.trips.models import AddressSearchToken, Trip, TripStatus
+from app.modules.trips.repository import TripRepo
+from app.modules.trips.service import TripsService
+from app.modules.trips.utils.blind_index import address_tokens
+from app.modules.trips.utils.crypto import encrypt_address
+from app.modules.rate_categories.repository import RateCategoryRepo
+from app.modules.rate_customizations.repository import RateCustomizationRepo
+from app.modules.users.models import User, UserRole
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+class TestAddressSearchIntegration:
+
+    async def _user(self, session):
+        user = User(
+            id=uuid4(),
+            email=f"search-{uuid4()}@example.com",
+            full_name="Search User",
+            password_hash="hashed_password",
+            role=UserRole.EMPLOYEE
+        )
+        session.add(user)
+        await session.commit()
+
+        customization = RateCustomization(id=uuid4(), name="Search", year=2025, user_id=user.id)
+        session.add(customization)
+        await session.commit()
+
+        category = RateCategory(id=uuid4(), name="Business", cost_per_mile=0.5, rate_customization_id=customization.id)
+        session.add(category)
+        await session.commit()
+        return user, customization, category
+
+    async def _trip(self, repo, user, customization, category, start, end, hours_ago=0):
+        trip = Trip(
+            id=uuid4(),
+            status=TripStatus.completed,
+            start_address_encrypted=encrypt_address(start),
+            end_address_encrypted=encrypt_address(end),
+            started_at=datetime.now(timezone.utc) - timedelta(hours=hours_ago),
+            rate_customization_id=customization.id,
+            rate_category_id=category.id,
+            user_id=user.id
+        )
+        await repo.add(trip)
+        await repo.replace_address_tokens(trip.id, user.id, "start", address_tokens(user.id, start))
+        await repo.replace_address_tokens(trip.id, user.id, "end", address_tokens(user.id, end))
+        return await repo.save(trip)
+
+    def _service(self, session):
+        return TripsService(TripRepo(session), RateCategoryRepo(session), RateCustomizationRepo(session))
+
+    async def test_search_finds_trips_to_or_from_an_address(self, test_db_session):
+        user, customization, category = await self._user(test_db_session)
+        repo = TripRepo(test_db_session)
+        outbound = await self._trip(repo, user, customization, category, "1 Home Rd", "500 Client Plaza, Suite 200", hours_ago=2)
+        inbound = await self._trip(repo, user, customization, category, "500 client plaza suite 200", "1 Home Rd", hours_ago=1)
+        await self._trip(repo, user, customization, category, "1 Home Rd", "9 Other Ave")
+
+        service = self._service(test_db_session)
+
+        rows = await service.search_trips(user.id, query="Client Plaza")
+        assert [row.id for row in rows] == [inbound.id, outbound.id]
+
+        rows = await service.search_trips(user.id, query="500 Client Plaza Suite 200", exact=True)
+        assert {row.id for row in rows} == {inbound.id, outbound.id}
+
+        #words split across the start and end address don't count as a match
+        assert await service.search_trips(user.id, query="home plaza") == []
+        assert await service.search_trips(user.id, query="500 Client Plaza", exact=True) == []
+
+    async def test_search_is_scoped_to_the_user(self, test_db_session):
+        user, customization, category = await self._user(test_db_session)
+        other, other_customization, other_category = await self._user(test_db_session)
+        repo = TripRepo(test_db_session)
+        await self._trip(repo, other, other_customization, other_category, "1 Home Rd", "500 Client Plaza")
+
+        assert await self._service(test_db_session).search_trips(user.id, query="client plaza") == []
+
+    async def test_search_by_common_place(self, test_db_session):
+        user, customization, category = await self._user(test_db_session)
+        repo = TripRepo(test_db_session)
+        visit = await self._trip(repo, user, customization, category, "1 Home Rd", "500 Client Plaza")
+        await self._trip(repo, user, customization, category, "1 Home Rd", "500 Client Plaza Annex")
+
+        place_repo = CommonPlaceRepo(test_db_session)
+        place = CommonPlace(id=uuid4(), user_id=user.id, name="Client", address=encrypt_address("500 Client Plaza"))
+        await place_repo.replace_address_tokens(place.id, user.id, address_tokens(user.id, "500 Client Plaza"))
+        await place_repo.create(place)
+
+        rows = await self._service(test_db_session).search_trips(user.id, common_place_id=place.id)
+
+        assert [row.id for row in rows] == [visit.id]
+
+    async def test_backfill_indexes_existing_rows(self, test_db_session):
+        user, customization, category = await self._user(test_db_session)
+        trip = Trip(
+            id=uuid4(),
+            status=TripStatus.completed,
+            start_address_encrypted=encrypt_address("1 Home Rd"),
+            end_address_encrypted=encrypt_address("77 Legacy Ln"),
+            rate_customization_id=customization.id,
+            rate_category_id=category.id,
+            user_id=user.id
+        )
+        test_db_session.add(trip)
+        test_db_session.add(CommonPlace(id=uuid4(), user_id=user.id, name="Gym", address=encrypt_address("3 Gym St")))
+        await test_db_session.commit()
+
+        counts = await backfill(test_db_session, chunk_size=1)
+        assert counts["trips"] >= 1 and counts["common_places"] >= 1
+
+        rows = await self._service(test_db_session).search_trips(user.id, query="legacy ln")
+        assert [row.id for row in rows] == [trip.id]
+
+        #running it again replaces the tokens instead of piling up duplicates
+        before = await test_db_session.scalar(select(func.count()).select_from(AddressSearchToken).where(AddressSearchToken.trip_id == trip.id))
+        await backfill(test_db_session, chunk_size=1)
+        after = await test_db_session.scalar(select(func.count()).select_from(AddressSearchToken).where(AddressSearchToken.trip_id == trip.id))
+        assert before == after == len(address_tokens(user.id, "1 Home Rd")) + len(address_tokens(user.id, "77 Legacy Ln"))
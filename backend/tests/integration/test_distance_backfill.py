@@ -0,0 +1,73 @@
+import pytest
+from uuid import uuid4
+
+from app.modules.rate_categories.models import RateCategory
+from app.modules.rate_customizations.models import RateCustomization
+from app.modules.trips.backfill_distance import backfill
+from app.modules.trips.models import Trip, TripStatus
+from app.modules.trips.utils.crypto import encrypt_geometry
+from app.modules.users.models import User, UserRole
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+class TestDistanceBackfillIntegration:
+
+    @pytest.fixture
+    async def trips(self, test_db_session):
+        user = User(
+            id=uuid4(),
+            email="distance@example.com",
+            full_name="Distance User",
+            password_hash="hashed_password",
+            role=UserRole.EMPLOYEE
+        )
+        test_db_session.add(user)
+        await test_db_session.commit()
+
+        customization = RateCustomization(id=uuid4(), name="Distance", year=2025, user_id=user.id)
+        test_db_session.add(customization)
+        await test_db_session.commit()
+
+        category = RateCategory(id=uuid4(), name="Business", cost_per_mile=0.5, rate_customization_id=customization.id)
+        test_db_session.add(category)
+        await test_db_session.commit()
+
+        #~1.42km, about 0.88 miles
+        geometry = {"type":"LineString","coordinates":[[-122.4194,37.7749],[-122.4094,37.7849]]}
+        trips = [
+            Trip(
+                id=uuid4(),
+                status=TripStatus.completed,
+                start_address_encrypted="start",
+                geometry_encrypted=encrypt_geometry(geometry),
+                miles=miles,
+                reimbursement_rate=0.5,
+                mileage_reimbursement_total=miles * 0.5,
+                rate_customization_id=customization.id,
+                rate_category_id=category.id,
+                user_id=user.id
+            )
+            for miles in (0.9, 0.85, 40.0)
+        ]
+        test_db_session.add_all(trips)
+        await test_db_session.commit()
+        return trips
+
+    async def test_backfill_flags_without_touching_miles(self, test_db_session, trips):
+        assert await backfill(test_db_session, chunk_size=2) == 3
+
+        for trip in trips:
+            await test_db_session.refresh(trip)
+        assert [trip.computed_miles for trip in trips] == [0.88, 0.88, 0.88]
+        assert [trip.distance_flagged for trip in trips] == [False, False, True]
+        assert [trip.miles for trip in trips] == [0.9, 0.85, 40.0]
+
+    async def test_backfill_apply_miles(self, test_db_session, trips):
+        assert await backfill(test_db_session, chunk_size=2, apply_miles=True) == 3
+
+        for trip in trips:
+            await test_db_session.refresh(trip)
+            assert trip.miles == 0.88
+            assert trip.mileage_reimbursement_total == pytest.approx(0.44)
+            assert trip.distance_flagged is False
@@ -0,0 +1,272 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from datetime import date, datetime, timezone
+from uuid import uuid4
+from sqlalchemy import func, select
+
+from app.modules.expenses.exceptions import ExpenseNotFoundError
+from app.modules.expenses.models import Expense
+from app.modules.expenses.repository import ExpenseRepo
+from app.modules.expenses.schemas import BatchEditExpenseDTO, CreateExpenseDTO, EditExpenseDTO, ExpenseBatchDTO
+from app.modules.expenses.service import ExpensesService
+from app.modules.rate_categories.repository import RateCategoryRepo
+from app.modules.rate_customizations.repository import RateCustomizationRepo
+from app.modules.rate_categories.models import RateCategory
+from app.modules.rate_customizations.models import RateCustomization
+from app.modules.trips.models import Trip, TripDailyRollup, TripStatus
+from app.modules.trips.repository import TripRepo
+from app.modules.trips.rollups_repository import RollupContribution, TripRollupRepo
+from app.modules.trips.schemas import EditTripDTO
+from app.modules.trips.service import TripsService
+from app.modules.users.models import User, UserRole
+from app.modules.vehicles.models import Vehicle
+from app.modules.vehicles.repository import VehicleRepository
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+class TestConcurrentExpenseTotals:
+
+    @pytest_asyncio.fixture
+    async def trip(self, file_sessions):
+        async with file_sessions() as session:
+            user = User(
+                id=uuid4(),
+                email="totals@example.com",
+                full_name="Totals User",
+                password_hash="hashed_password",
+                role=UserRole.EMPLOYEE
+            )
+            customization = RateCustomization(id=uuid4(), name="Totals", year=2025, user_id=user.id)
+            category = RateCategory(id=uuid4(), name="Business", cost_per_mile=0.5, rate_customization_id=customization.id)
+            trip = Trip(
+                id=uuid4(),
+                user_id=user.id,
+                status=TripStatus.completed,
+                start_address_encrypted="",
+                miles=10.0,
+                mileage_reimbursement_total=5.0,
+                expense_reimbursement_total=0.0,
+                started_at=datetime(2025, 3, 10, 15, 0, tzinfo=timezone.utc),
+                ended_at=datetime(2025, 3, 10, 16, 0, tzinfo=timezone.utc),
+                rate_customization_id=customization.id,
+                rate_category_id=category.id,
+            )
+            session.add_all([user, customization, category, trip])
+            await session.commit()
+
+            rollup_repo = TripRollupRepo(session)
+            await rollup_repo.rebuild(user.id)
+            await session.commit()
+            return trip
+
+    async def _run(self, file_sessions, action):
+        async with file_sessions() as session:
+            service = ExpensesService(ExpenseRepo(session), TripRepo(session), TripRollupRepo(session))
+            return await action(service)
+
+    async def test_total_converges_under_concurrent_writes(self, file_sessions, trip):
+        seeded = []
+        for index in range(10):
+            seeded.append(await self._run(
+                file_sessions,
+                lambda service, index=index: service.create_expense(
+                    trip.user_id, trip.id, CreateExpenseDTO(type=f"Seed {index}", amount=10.0)
+                ),
+            ))
+
+        actions = [
+            lambda service, index=index: service.create_expense(
+                trip.user_id, trip.id, CreateExpenseDTO(type=f"New {index}", amount=1.25 * (index + 1))
+            )
+            for index in range(20)
+        ]
+        actions += [
+            lambda service, expense=expense: service.edit_expense(
+                trip.user_id, expense.id, EditExpenseDTO(amount=3.5)
+            )
+            for expense in seeded[:5]
+        ]
+        actions += [
+            lambda service, expense=expense: service.delete_expense(trip.user_id, expense.id)
+            for expense in seeded[5:]
+        ]
+
+        await asyncio.gather(*(self._run(file_sessions, action) for action in actions))
+
+        async with file_sessions() as session:
+            expected = await session.scalar(select(func.sum(Expense.amount)).where(Expense.trip_id == trip.id))
+            total = await session.scalar(select(Trip.expense_reimbursement_total).where(Trip.id == trip.id))
+            rollup_total = await session.scalar(
+                select(func.sum(TripDailyRollup.expense_reimbursement_total)).where(TripDailyRollup.user_id == trip.user_id)
+            )
+
+        assert expected == pytest.approx(sum(1.25 * (index + 1) for index in range(20)) + 5 * 3.5)
+        assert total == pytest.approx(expected)
+        assert rollup_total == pytest.approx(expected)
+
+    async def test_total_converges_when_writers_share_an_expense(self, file_sessions, trip):
+        edited = await self._run(
+            file_sessions,
+            lambda service: service.create_expense(trip.user_id, trip.id, CreateExpenseDTO(type="Parking", amount=10.0)),
+        )
+        deleted = await self._run(
+            file_sessions,
+            lambda service: service.create_expense(trip.user_id, trip.id, CreateExpenseDTO(type="Tolls", amount=7.0)),
+        )
+        raced = await self._run(
+            file_sessions,
+            lambda service: service.create_expense(trip.user_id, trip.id, CreateExpenseDTO(type="Meals", amount=5.0)),
+        )
+
+        #every writer reads its expense before any of them commits, so an unlocked read gives them all the old amount
+        actions = [
+            lambda service, amount=amount: service.edit_expense(trip.user_id, edited.id, EditExpenseDTO(amount=amount))
+            for amount in (11.0, 12.0, 13.0, 14.0)
+        ]
+        actions += [lambda service: service.delete_expense(trip.user_id, deleted.id) for _ in range(3)]
+        actions += [
+            lambda service: service.edit_expense(trip.user_id, raced.id, EditExpenseDTO(amount=6.0)),
+            lambda service: service.delete_expense(trip.user_id, raced.id),
+        ]
+
+        results = await asyncio.gather(*(self._run(file_sessions, action) for action in actions), return_exceptions=True)
+        assert not [result for result in results if isinstance(result, Exception) and not isinstance(result, ExpenseNotFoundError)]
+
+        async with file_sessions() as session:
+            expected = await session.scalar(select(func.sum(Expense.amount)).where(Expense.trip_id == trip.id))
+            remaining = await session.scalar(select(func.count(Expense.id)).where(Expense.trip_id == trip.id))
+            total = await session.scalar(select(Trip.expense_reimbursement_total).where(Trip.id == trip.id))
+            rollup_total = await session.scalar(
+                select(func.sum(TripDailyRollup.expense_reimbursement_total)).where(TripDailyRollup.user_id == trip.user_id)
+            )
+
+        assert remaining in (1, 2)
+        assert total == pytest.approx(expected)
+        assert rollup_total == pytest.approx(expected)
+
+    async def test_new_rollup_bucket_under_concurrent_writers(self, file_sessions, trip):
+        #every writer finds the bucket missing, a select-then-insert has all of them insert it
+        async def add_trip(vehicle_id):
+            async with file_sessions() as session:
+                await TripRollupRepo(session).apply(None, RollupContribution(
+                    user_id=trip.user_id,
+                    day=date(2025, 4, 1),
+                    rate_category_id=trip.rate_category_id,
+                    vehicle_id=vehicle_id,
+                    miles=10.0,
+                    mileage_total=5.0,
+                    expense_total=0.0,
+                ))
+                await session.commit()
+
+        vehicle_id = uuid4()
+        async with file_sessions() as session:
+            session.add(Vehicle(id=vehicle_id, name="Civic", license_plate="ROLL1", model="Honda Civic", user_id=trip.user_id))
+            await session.commit()
+
+        await asyncio.gather(*(add_trip(vehicle) for vehicle in [None] * 4 + [vehicle_id] * 4))
+
+        async with file_sessions() as session:
+            result = await session.execute(
+                select(TripDailyRollup.vehicle_id, TripDailyRollup.trip_count, TripDailyRollup.total_miles)
+                .where(TripDailyRollup.day == date(2025, 4, 1))
+            )
+            buckets = sorted(result.all(), key=lambda row: row.vehicle_id is not None)
+        assert [tuple(row) for row in buckets] == [(None, 4, 40.0), (vehicle_id, 4, 40.0)]
+
+    async def test_batch_applies_in_one_go(self, file_sessions, trip):
+        parking = await self._run(
+            file_sessions,
+            lambda service: service.create_expense(trip.user_id, trip.id, CreateExpenseDTO(type="Parking", amount=10.0)),
+        )
+        tolls = await self._run(
+            file_sessions,
+            lambda service: service.create_expense(trip.user_id, trip.id, CreateExpenseDTO(type="Tolls", amount=4.0)),
+        )
+
+        expenses = await self._run(file_sessions, lambda service: service.apply_expense_batch(
+            trip.user_id,
+            trip.id,
+            ExpenseBatchDTO(
+                create=[CreateExpenseDTO(type="Meals", amount=12.5), CreateExpenseDTO(type="tolls", amount=6.0)],
+                edit=[BatchEditExpenseDTO(id=parking.id, type="Garage", amount=8.0)],
+                delete=[tolls.id],
+            ),
+        ))
+
+        assert sorted((expense.type, expense.amount) for expense in expenses) == [("Garage", 8.0), ("Meals", 12.5), ("Tolls", 6.0)]
+        assert all(expense.created_at is not None for expense in expenses)
+
+        async with file_sessions() as session:
+            total = await session.scalar(select(Trip.expense_reimbursement_total).where(Trip.id == trip.id))
+            rollup_total = await session.scalar(
+                select(func.sum(TripDailyRollup.expense_reimbursement_total)).where(TripDailyRollup.user_id == trip.user_id)
+            )
+        assert total == pytest.approx(26.5)
+        assert rollup_total == pytest.approx(26.5)
+
+    async def test_total_converges_when_batches_race_single_writes(self, file_sessions, trip):
+        parking = await self._run(
+            file_sessions,
+            lambda service: service.create_expense(trip.user_id, trip.id, CreateExpenseDTO(type="Parking", amount=10.0)),
+        )
+
+        actions = [
+            lambda service, amount=amount: service.apply_expense_batch(
+                trip.user_id, trip.id, ExpenseBatchDTO(edit=[BatchEditExpenseDTO(id=parking.id, amount=amount)])
+            )
+            for amount in (11.0, 12.0, 13.0)
+        ]
+        actions += [
+            lambda service, amount=amount: service.edit_expense(trip.user_id, parking.id, EditExpenseDTO(amount=amount))
+            for amount in (14.0, 15.0, 16.0)
+        ]
+
+        results = await asyncio.gather(*(self._run(file_sessions, action) for action in actions), return_exceptions=True)
+        assert not [result for result in results if isinstance(result, Exception)]
+
+        async with file_sessions() as session:
+            expected = await session.scalar(select(func.sum(Expense.amount)).where(Expense.trip_id == trip.id))
+            total = await session.scalar(select(Trip.expense_reimbursement_total).where(Trip.id == trip.id))
+        assert total == pytest.approx(expected)
+
+    async def test_edit_moving_a_trip_keeps_racing_expenses_in_its_bucket(self, file_sessions, trip):
+        vehicle_id = uuid4()
+        async with file_sessions() as session:
+            session.add(Vehicle(id=vehicle_id, name="Civic", license_plate="EDIT1", model="Honda Civic", user_id=trip.user_id))
+            await session.commit()
+
+        racing = []
+        run = self._run
+
+        class RacedVehicleRepository(VehicleRepository):
+            async def get_by_id(self, vehicle_id, user_id):
+                #an expense comes in while the edit is between its rollup snapshot and its save
+                racing.append(asyncio.create_task(run(file_sessions, lambda service: service.create_expense(
+                    trip.user_id, trip.id, CreateExpenseDTO(type="Parking", amount=5.0)
+                ))))
+                await asyncio.sleep(0.2)
+                return await super().get_by_id(vehicle_id, user_id)
+
+        async with file_sessions() as session:
+            service = TripsService(
+                TripRepo(session),
+                RateCategoryRepo(session),
+                RateCustomizationRepo(session),
+                vehicle_repo=RacedVehicleRepository(session),
+                rollup_repo=TripRollupRepo(session),
+            )
+            await service.edit_trip(trip.user_id, trip.id, EditTripDTO(vehicle_id=vehicle_id))
+        await racing[0]
+
+        async with file_sessions() as session:
+            result = await session.execute(
+                select(TripDailyRollup.vehicle_id, TripDailyRollup.trip_count, TripDailyRollup.expense_reimbursement_total)
+                .where(TripDailyRollup.user_id == trip.user_id)
+                .order_by(TripDailyRollup.trip_count)
+            )
+            rows = [tuple(row) for row in result.all()]
+        #the trip and its expense both moved to the vehicle's bucket, nothing is left behind
+        assert rows == [(None, 0, pytest.approx(0.0)), (vehicle_id, 1, pytest.approx(5.0))]
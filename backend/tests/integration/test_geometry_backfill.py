@@ -0,0 +1,63 @@
+import json
+import pytest
+from uuid import uuid4
+
+from app.modules.rate_categories.models import RateCategory
+from app.modules.rate_customizations.models import RateCustomization
+from app.modules.trips.backfill_geometry import backfill
+from app.modules.trips.models import Trip, TripStatus
+from app.modules.trips.utils.crypto import f, decrypt_geometry, is_legacy_geometry
+from app.modules.users.models import User, UserRole
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+class TestGeometryBackfillIntegration:
+
+    async def test_backfill_converts_legacy_rows(self, test_db_session):
+        user = User(
+            id=uuid4(),
+            email="backfill@example.com",
+            full_name="Backfill User",
+            password_hash="hashed_password",
+            role=UserRole.EMPLOYEE
+        )
+        test_db_session.add(user)
+        await test_db_session.commit()
+
+        customization = RateCustomization(id=uuid4(), name="Backfill", year=2025, user_id=user.id)
+        test_db_session.add(customization)
+        await test_db_session.commit()
+
+        category = RateCategory(id=uuid4(), name="Business", cost_per_mile=0.5, rate_customization_id=customization.id)
+        test_db_session.add(category)
+        await test_db_session.commit()
+
+        geometry = {"type":"LineString","coordinates":[[-122.4194,37.7749],[-122.4094,37.7849]]}
+        trips = [
+            Trip(
+                id=uuid4(),
+                status=TripStatus.completed,
+                start_address_encrypted="start",
+                #legacy text token, as left behind by the Text -> LargeBinary migration
+                geometry_encrypted=f.encrypt(json.dumps(geometry).encode()),
+                rate_customization_id=customization.id,
+                rate_category_id=category.id,
+                user_id=user.id
+            )
+            for _ in range(3)
+        ]
+        test_db_session.add_all(trips)
+        await test_db_session.commit()
+        updated_at = {trip.id: trip.updated_at for trip in trips}
+
+        converted = await backfill(test_db_session, chunk_size=2)
+        assert converted == 3
+
+        for trip in trips:
+            await test_db_session.refresh(trip, ["geometry_encrypted", "updated_at"])
+            assert not is_legacy_geometry(trip.geometry_encrypted)
+            assert decrypt_geometry(trip.geometry_encrypted) == geometry
+            assert trip.updated_at == updated_at[trip.id]
+
+        assert await backfill(test_db_session, chunk_size=2) == 0
@@ -0,0 +1,142 @@
+import base64
+import pytest
+from unittest.mock import patch
+from uuid import uuid4
+
+from app.config import settings
+from app.modules.common_places.models import CommonPlace
+from app.modules.rate_categories.models import RateCategory
+from app.modules.rate_customizations.models import RateCustomization
+from app.modules.trips import reencrypt as reencrypt_module
+from app.modules.trips.models import ReencryptionCheckpoint, Trip, TripGeometryLevel, TripStatus
+from app.modules.trips.reencrypt import reencrypt, reencrypt_table
+from app.modules.trips.utils import crypto
+from app.modules.trips.utils.crypto import encrypt_address, encrypt_geometry
+from app.modules.users.models import User, UserRole
+from cryptography.fernet import Fernet
+
+GEOMETRY = {"type":"LineString","coordinates":[[-122.4194,37.7749],[-122.4094,37.7849],[-122.3994,37.7949]]}
+
+
+def _is_active_key(envelope: bytes) -> bool:
+    return crypto.reencrypt_geometry(envelope) is None
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+class TestReencryptionIntegration:
+
+    async def _seed(self, session, trip_count: int = 5):
+        user = User(
+            id=uuid4(),
+            email=f"rotate-{uuid4()}@example.com",
+            full_name="Rotate User",
+            password_hash="hashed_password",
+            role=UserRole.EMPLOYEE
+        )
+        session.add(user)
+        await session.commit()
+
+        customization = RateCustomization(id=uuid4(), name="Rotate", year=2025, user_id=user.id)
+        session.add(customization)
+        await session.commit()
+
+        category = RateCategory(id=uuid4(), name="Business", cost_per_mile=0.5, rate_customization_id=customization.id)
+        session.add(category)
+        await session.commit()
+
+        trips = [
+            Trip(
+                id=uuid4(),
+                status=TripStatus.completed,
+                start_address_encrypted=encrypt_address(f"{i} Start St"),
+                end_address_encrypted=encrypt_address(f"{i} End St") if i % 2 else None,
+                geometry_encrypted=encrypt_geometry(GEOMETRY),
+                rate_customization_id=customization.id,
+                rate_category_id=category.id,
+                user_id=user.id
+            )
+            for i in range(trip_count)
+        ]
+        session.add_all(trips)
+        await session.commit()
+
+        session.add(TripGeometryLevel(trip_id=trips[0].id, level=1, tolerance_meters=5.0, point_count=3, geometry_encrypted=encrypt_geometry(GEOMETRY)))
+        session.add(CommonPlace(id=uuid4(), user_id=user.id, name="Office", address=encrypt_address("1 Office Way")))
+        await session.commit()
+        return trips
+
+    def _rotate(self, rotated_keys):
+        rotated_keys(FERNET_KEY=Fernet.generate_key().decode(), FERNET_OLD_KEYS=settings.FERNET_KEY)
+
+    async def test_reencrypts_every_table_under_the_new_key(self, test_db_session, rotated_keys):
+        trips = await self._seed(test_db_session)
+        updated_at = {trip.id: trip.updated_at for trip in trips}
+        self._rotate(rotated_keys)
+
+        counts = await reencrypt(test_db_session, chunk_size=2)
+
+        assert counts["trips"] == len(trips)
+        assert counts["trip_geometry_levels"] == 1
+        assert counts["common_places"] == 1
+
+        #the old key can go now
+        rotated_keys(FERNET_OLD_KEYS="")
+        for i, trip in enumerate(trips):
+            await test_db_session.refresh(trip, ["start_address_encrypted", "end_address_encrypted", "geometry_encrypted", "updated_at"])
+            assert crypto._decrypt_address(trip.start_address_encrypted) == f"{i} Start St"
+            assert _is_active_key(trip.geometry_encrypted)
+            assert trip.updated_at == updated_at[trip.id]
+
+        assert await reencrypt(test_db_session, chunk_size=2) == {name: 0 for name in counts}
+
+    async def test_resumes_from_checkpoint_after_a_crash(self, test_db_session, rotated_keys):
+        trips = await self._seed(test_db_session, trip_count=6)
+        self._rotate(rotated_keys)
+
+        calls = 0
+        def flaky(token):
+            nonlocal calls
+            calls += 1
+            if calls == 5:
+                raise RuntimeError("worker died")
+            return crypto.reencrypt_address(token)
+
+        rotations = dict(reencrypt_module.ROTATIONS[Trip.__table__], start_address_encrypted=flaky)
+        with patch.dict(reencrypt_module.ROTATIONS, {Trip.__table__: rotations}):
+            with pytest.raises(RuntimeError):
+                await reencrypt_table(test_db_session, Trip.__table__, chunk_size=2)
+        await test_db_session.rollback()
+
+        checkpoint = await test_db_session.get(ReencryptionCheckpoint, "trips")
+        await test_db_session.refresh(checkpoint)
+        assert checkpoint.rows_rewritten >= 2
+        assert checkpoint.completed_at is None
+        done = checkpoint.rows_rewritten
+
+        #the rest is picked up after the last committed chunk
+        assert await reencrypt_table(test_db_session, Trip.__table__, chunk_size=2) <= len(trips) - done
+        rotated_keys(FERNET_OLD_KEYS="")
+        for trip in trips:
+            await test_db_session.refresh(trip, ["geometry_encrypted"])
+            assert _is_active_key(trip.geometry_encrypted)
+
+    async def test_new_key_restarts_a_finished_table(self, test_db_session, rotated_keys):
+        await self._seed(test_db_session, trip_count=2)
+        await reencrypt_table(test_db_session, Trip.__table__)
+
+        rotated_keys(FIELD_ENCRYPTION_KEY=base64.urlsafe_b64encode(bytes(range(32))).decode(), FIELD_ENCRYPTION_KEY_ID=9)
+
+        assert await reencrypt_table(test_db_session, Trip.__table__) >= 2
+        checkpoint = await test_db_session.get(ReencryptionCheckpoint, "trips")
+        assert checkpoint.key_fingerprint == crypto.key_fingerprint
+
+    async def test_throttles_to_the_row_rate(self, test_db_session, rotated_keys):
+        await self._seed(test_db_session, trip_count=4)
+        self._rotate(rotated_keys)
+
+        with patch.object(reencrypt_module.asyncio, "sleep") as sleep:
+            await reencrypt_table(test_db_session, Trip.__table__, chunk_size=2, max_rows_per_second=10)
+
+        assert sleep.await_count >= 1
+        assert all(0 < call.args[0] <= 0.2 for call in sleep.await_args_list)
@@ -0,0 +1,93 @@
+import pytest
+from datetime import date, datetime, timezone
+from uuid import uuid4
+
+from app.modules.expenses.models import Expense
+from app.modules.rate_categories.models import RateCategory
+from app.modules.rate_customizations.models import RateCustomization
+from app.modules.reports.data_builder import ReportDataBuilder
+from app.modules.reports.models import Report, ReportStatus
+from app.modules.reports.repository import ReportRepository
+from app.modules.trips.models import Trip, TripStatus
+from app.modules.users.models import User, UserRole
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+class TestReportDataBuilder:
+
+    def _trip(self, user, customization, category, started_at, miles, purpose=None):
+        return Trip(
+            id=uuid4(),
+            user_id=user.id,
+            status=TripStatus.completed,
+            start_address_encrypted="",
+            purpose=purpose,
+            miles=miles,
+            reimbursement_rate=0.5,
+            mileage_reimbursement_total=miles * 0.5,
+            started_at=started_at,
+            ended_at=started_at,
+            rate_customization_id=customization.id,
+            rate_category_id=category.id,
+        )
+
+    @pytest.fixture
+    async def report(self, test_db_session):
+        user = User(id=uuid4(), email="builder@example.com", full_name="Builder User", password_hash="hashed_password", role=UserRole.EMPLOYEE)
+        other = User(id=uuid4(), email="other@example.com", full_name="Other User", password_hash="hashed_password", role=UserRole.EMPLOYEE)
+        customization = RateCustomization(id=uuid4(), name="Builder", year=2025, user_id=user.id)
+        category = RateCategory(id=uuid4(), name="Business", cost_per_mile=0.5, rate_customization_id=customization.id)
+        test_db_session.add_all([user, other, customization, category])
+        await test_db_session.commit()
+
+        march = [
+            self._trip(user, customization, category, datetime(2025, 3, day, 15, 0, tzinfo=timezone.utc), miles=float(day), purpose=f"Visit {day}")
+            for day in (20, 5, 12)
+        ]
+        march.append(self._trip(user, customization, category, datetime(2025, 3, 25, 15, 0, tzinfo=timezone.utc), miles=4.0))
+        april = self._trip(user, customization, category, datetime(2025, 4, 2, 15, 0, tzinfo=timezone.utc), miles=100.0)
+        not_mine = self._trip(other, customization, category, datetime(2025, 3, 6, 15, 0, tzinfo=timezone.utc), miles=100.0)
+        test_db_session.add_all([*march, april, not_mine])
+        await test_db_session.commit()
+
+        test_db_session.add_all([
+            Expense(id=uuid4(), user_id=user.id, trip_id=march[0].id, type="Parking", amount=12.0, created_at=datetime(2025, 3, 20, 16, 0, tzinfo=timezone.utc)),
+            Expense(id=uuid4(), user_id=user.id, trip_id=march[1].id, type="Tolls", amount=3.5, created_at=datetime(2025, 3, 5, 16, 0, tzinfo=timezone.utc)),
+            Expense(id=uuid4(), user_id=user.id, trip_id=april.id, type="Meals", amount=40.0, created_at=datetime(2025, 4, 2, 16, 0, tzinfo=timezone.utc)),
+            Expense(id=uuid4(), user_id=other.id, trip_id=not_mine.id, type="Meals", amount=40.0, created_at=datetime(2025, 3, 6, 16, 0, tzinfo=timezone.utc)),
+        ])
+        report = Report(id=uuid4(), user_id=user.id, start_date=date(2025, 3, 1), end_date=date(2025, 3, 31), status=ReportStatus.processing)
+        test_db_session.add(report)
+        await test_db_session.commit()
+
+        test_db_session.expunge_all()
+        return await ReportRepository().get_by_id(test_db_session, report.id)
+
+    async def test_builds_items_and_totals_from_projections(self, test_db_session, report):
+        #a tiny chunk size so the rows really arrive over several fetches
+        data = await ReportDataBuilder(test_db_session, chunk_size=2).build(report)
+
+        assert [(item.date, item.purpose, item.miles, item.category_name) for item in data.trips] == [
+            (date(2025, 3, 5), "Visit 5", 5.0, "Business"),
+            (date(2025, 3, 12), "Visit 12", 12.0, "Business"),
+            (date(2025, 3, 20), "Visit 20", 20.0, "Business"),
+            (date(2025, 3, 25), "Unspecified", 4.0, "Business"),
+        ]
+        assert [(item.date, item.type, item.amount) for item in data.expenses] == [
+            (date(2025, 3, 5), "Tolls", 3.5),
+            (date(2025, 3, 20), "Parking", 12.0),
+        ]
+        assert data.total_miles == pytest.approx(41.0)
+        assert data.total_mileage_amount == pytest.approx(20.5)
+        assert data.total_expense_amount == pytest.approx(15.5)
+        assert data.grand_total == pytest.approx(36.0)
+        assert data.employee_name == "Builder User"
+
+    async def test_loads_no_trip_or_expense_objects(self, test_db_session, report):
+        await ReportDataBuilder(test_db_session).build(report)
+
+        loaded = {type(instance) for instance in test_db_session.identity_map.values()}
+        assert Trip not in loaded
+        assert Expense not in loaded
+        assert RateCategory not in loaded
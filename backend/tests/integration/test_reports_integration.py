@@ -43,6 +43,12 @@ def mock_aws_services():
         }
 
 
+@pytest.fixture
+def foreign_keys():
+    #users are registered through the api's database, the rows written here point at them
+    return False
+
+
 @pytest.mark.integration 
 @pytest.mark.asyncio
 class TestReportsIntegration:
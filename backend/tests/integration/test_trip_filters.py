@@ -0,0 +1,135 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from sqlalchemy import text
+
+from app.modules.rate_categories.models import RateCategory
+from app.modules.rate_customizations.models import RateCustomization
+from app.modules.trips.models import Trip, TripStatus
+from app.modules.trips.repository import TripRepo
+from app.modules.trips.schemas import TripFilterDTO
+from app.modules.users.models import User, UserRole
+from app.modules.vehicles.models import Vehicle
+
+NOW = datetime(2025, 6, 15, 12, 0, tzinfo=timezone.utc)
+
+
+async def _query_plan(session, query) -> str:
+    #sqlite's plan doesn't depend on the bound values, so inline them to run EXPLAIN
+    sql = query.compile(dialect=session.bind.dialect, compile_kwargs={"literal_binds": True})
+    rows = (await session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+class TestTripFiltersIntegration:
+
+    @pytest.fixture
+    async def seeded(self, test_db_session):
+        user = User(
+            id=uuid4(),
+            email=f"filters-{uuid4()}@example.com",
+            full_name="Filter User",
+            password_hash="hashed_password",
+            role=UserRole.EMPLOYEE
+        )
+        test_db_session.add(user)
+        await test_db_session.commit()
+
+        customization = RateCustomization(id=uuid4(), name="Filters", year=2025, user_id=user.id)
+        test_db_session.add(customization)
+        await test_db_session.commit()
+
+        business = RateCategory(id=uuid4(), name="Business", cost_per_mile=0.7, rate_customization_id=customization.id)
+        medical = RateCategory(id=uuid4(), name="Medical", cost_per_mile=0.2, rate_customization_id=customization.id)
+        vehicle = Vehicle(id=uuid4(), user_id=user.id, name="Car", license_plate="ABC123", model="Civic", year=2020)
+        test_db_session.add_all([business, medical, vehicle])
+        await test_db_session.commit()
+
+        def trip(days_ago, status=TripStatus.completed, vehicle_id=None, category=business, purpose=None):
+            return Trip(
+                id=uuid4(),
+                user_id=user.id,
+                status=status,
+                start_address_encrypted="start",
+                purpose=purpose,
+                vehicle_id=vehicle_id,
+                started_at=NOW - timedelta(days=days_ago),
+                rate_customization_id=customization.id,
+                rate_category_id=category.id,
+            )
+
+        trips = {
+            "active": trip(0, status=TripStatus.active, vehicle_id=vehicle.id),
+            "visit": trip(1, purpose="Client visit: Acme"),
+            "medical": trip(5, category=medical, purpose="client lunch"),
+            "cancelled": trip(10, status=TripStatus.cancelled, vehicle_id=vehicle.id, purpose="Conference 100%"),
+            "old": trip(40, vehicle_id=vehicle.id),
+        }
+        test_db_session.add_all(trips.values())
+        await test_db_session.commit()
+        return user, vehicle, business, medical, trips
+
+    async def _ids(self, session, user, **filters):
+        trips = await TripRepo(session).get_user_trips(user.id, TripFilterDTO(**filters))
+        return [trip.id for trip in trips]
+
+    async def test_filters(self, test_db_session, seeded):
+        user, vehicle, business, medical, trips = seeded
+
+        assert await self._ids(test_db_session, user) == [trip.id for trip in trips.values()]
+        assert await self._ids(test_db_session, user, status=TripStatus.cancelled) == [trips["cancelled"].id]
+        assert await self._ids(test_db_session, user, vehicle_id=vehicle.id) == [trips["active"].id, trips["cancelled"].id, trips["old"].id]
+        assert await self._ids(test_db_session, user, rate_category_id=medical.id) == [trips["medical"].id]
+        assert await self._ids(
+            test_db_session, user, started_after=NOW - timedelta(days=10), started_before=NOW - timedelta(days=1)
+        ) == [trips["medical"].id, trips["cancelled"].id]
+        assert await self._ids(test_db_session, user, vehicle_id=vehicle.id, status=TripStatus.completed) == [trips["old"].id]
+
+    async def test_purpose_prefix_is_case_insensitive_and_literal(self, test_db_session, seeded):
+        user, _, _, _, trips = seeded
+
+        assert await self._ids(test_db_session, user, purpose_prefix="CLIENT") == [trips["visit"].id, trips["medical"].id]
+        assert await self._ids(test_db_session, user, purpose_prefix="client v") == [trips["visit"].id]
+        #LIKE wildcards in the prefix are matched literally
+        assert await self._ids(test_db_session, user, purpose_prefix="Conference 100%") == [trips["cancelled"].id]
+        assert await self._ids(test_db_session, user, purpose_prefix="%") == []
+
+    async def test_filters_are_scoped_to_user(self, test_db_session, seeded):
+        _, vehicle, _, _, _ = seeded
+
+        other = User(id=uuid4(), email=f"other-{uuid4()}@example.com", full_name="Other", password_hash="x", role=UserRole.EMPLOYEE)
+        test_db_session.add(other)
+        await test_db_session.commit()
+
+        assert await self._ids(test_db_session, other, vehicle_id=vehicle.id) == []
+
+    @pytest.mark.parametrize("filters, index", [
+        ({}, "ix_trips_user_started"),
+        ({"started_after": NOW - timedelta(days=30), "started_before": NOW}, "ix_trips_user_started"),
+        ({"status": TripStatus.completed}, "ix_trips_user_status_started"),
+        ({"status": TripStatus.completed, "started_after": NOW - timedelta(days=30)}, "ix_trips_user_status_started"),
+        ({"vehicle_id": uuid4()}, "ix_trips_user_vehicle_started"),
+        ({"vehicle_id": uuid4(), "started_after": NOW - timedelta(days=30)}, "ix_trips_user_vehicle_started"),
+        ({"rate_category_id": uuid4()}, "ix_trips_user_category_started"),
+        ({"rate_category_id": uuid4(), "started_before": NOW}, "ix_trips_user_category_started"),
+    ])
+    async def test_each_filter_shape_uses_its_index(self, test_db_session, filters, index):
+        query = TripRepo(test_db_session).user_trips_query(uuid4(), TripFilterDTO(**filters))
+
+        plan = await _query_plan(test_db_session, query)
+
+        assert f"USING INDEX {index}" in plan, plan
+        assert "SCAN trips" not in plan, plan
+
+    async def test_purpose_prefix_uses_an_index(self, test_db_session):
+        query = TripRepo(test_db_session).user_trips_query(uuid4(), TripFilterDTO(purpose_prefix="client"))
+
+        plan = await _query_plan(test_db_session, query)
+
+        #sqlite can't range scan LIKE on the expression, it still narrows by user_id through an index.
+        #postgres uses the lower(purpose) text_pattern_ops column for the prefix as well
+        assert "SEARCH trips USING INDEX" in plan, plan
+        assert "SCAN trips" not in plan, plan
@@ -0,0 +1,79 @@
+import math
+import pytest
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from app.modules.rate_categories.models import RateCategory
+from app.modules.rate_categories.repository import RateCategoryRepo
+from app.modules.rate_customizations.models import RateCustomization
+from app.modules.rate_customizations.repository import RateCustomizationRepo
+from app.modules.trips.exceptions import TripNotFoundError
+from app.modules.trips.repository import TripRepo
+from app.modules.trips.schemas import ManualCreateTripDTO, TripGeometryDTO
+from app.modules.trips.service import TripsService
+from app.modules.users.models import User, UserRole
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+class TestTripGeometryLevelsIntegration:
+
+    @pytest.fixture
+    async def category(self, test_db_session):
+        user = User(
+            id=uuid4(),
+            email="levels@example.com",
+            full_name="Levels User",
+            password_hash="hashed_password",
+            role=UserRole.EMPLOYEE
+        )
+        test_db_session.add(user)
+        await test_db_session.commit()
+
+        customization = RateCustomization(id=uuid4(), name="Levels", year=2025, user_id=user.id)
+        test_db_session.add(customization)
+        await test_db_session.commit()
+
+        category = RateCategory(id=uuid4(), name="Business", cost_per_mile=0.5, rate_customization_id=customization.id)
+        test_db_session.add(category)
+        await test_db_session.commit()
+        return category, user
+
+    @pytest.fixture
+    def service(self, test_db_session):
+        return TripsService(TripRepo(test_db_session), RateCategoryRepo(test_db_session), RateCustomizationRepo(test_db_session))
+
+    async def test_manual_trip_serves_simplified_levels(self, test_db_session, category, service):
+        category, user = category
+        geometry = {
+            "type": "LineString",
+            "coordinates": [
+                [-122.4194 + i * 0.00004 + 0.00008 * math.sin(i / 3), 37.7749 + i * 0.00003 + 0.003 * math.sin(i / 800)]
+                for i in range(10_000)
+            ],
+        }
+        started_at = datetime(2025, 3, 10, 15, 0, tzinfo=timezone.utc)
+        trip = await service.manual_create_trip(user.id, ManualCreateTripDTO(
+            start_address="1 Main St",
+            end_address="2 Main St",
+            miles=30.0,
+            geometry=geometry,
+            started_at=started_at,
+            ended_at=started_at + timedelta(hours=1),
+            rate_customization_id=category.rate_customization_id,
+            rate_category_id=category.id,
+        ))
+
+        thumbnail = TripGeometryDTO.model_validate(await service.get_trip_geometry(user.id, trip.id, max_points=100))
+        assert thumbnail.level > 0
+        assert thumbnail.point_count <= 100
+        assert len(thumbnail.geometry["coordinates"]) == thumbnail.point_count
+        assert thumbnail.geometry["coordinates"][0] == pytest.approx(geometry["coordinates"][0])
+
+        full = TripGeometryDTO.model_validate(await service.get_trip_geometry(user.id, trip.id))
+        assert full.level == 0
+        assert full.point_count == 10_000
+
+        #someone else's trip looks like it doesn't exist
+        with pytest.raises(TripNotFoundError):
+            await service.get_trip_geometry(uuid4(), trip.id, max_points=100)
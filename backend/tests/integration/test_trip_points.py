@@ -0,0 +1,134 @@
+import asyncio
+import pytest
+from uuid import uuid4
+from sqlalchemy import func, select
+
+from app.modules.rate_categories.models import RateCategory
+from app.modules.rate_categories.repository import RateCategoryRepo
+from app.modules.rate_customizations.models import RateCustomization
+from app.modules.rate_customizations.repository import RateCustomizationRepo
+from app.modules.trips.models import TripPointChunk
+from app.modules.trips.exceptions import InvalidTripDataError
+from app.modules.trips.repository import TripRepo
+from app.modules.trips.schemas import AppendTripPointsDTO, CreateTripDTO, EndTripDTO, TripGeometryDTO, TripResponseDTO
+from app.modules.trips.service import TripsService
+from app.modules.trips.utils.distance import route_length_meters
+from app.modules.users.models import User, UserRole
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+class TestTripPointsIntegration:
+
+    @pytest.fixture
+    async def category(self, test_db_session):
+        user = User(
+            id=uuid4(),
+            email="points@example.com",
+            full_name="Points User",
+            password_hash="hashed_password",
+            role=UserRole.EMPLOYEE
+        )
+        test_db_session.add(user)
+        await test_db_session.commit()
+
+        customization = RateCustomization(id=uuid4(), name="Points", year=2025, user_id=user.id)
+        test_db_session.add(customization)
+        await test_db_session.commit()
+
+        category = RateCategory(id=uuid4(), name="Business", cost_per_mile=0.5, rate_customization_id=customization.id)
+        test_db_session.add(category)
+        await test_db_session.commit()
+        return category, user
+
+    @pytest.fixture
+    def service(self, test_db_session):
+        return TripsService(TripRepo(test_db_session), RateCategoryRepo(test_db_session), RateCustomizationRepo(test_db_session))
+
+    async def test_streamed_points_finalize_on_end(self, test_db_session, category, service):
+        category, user = category
+        trip = await service.start_trip(user.id, CreateTripDTO(
+            start_address="1 Main St",
+            rate_customization_id=category.rate_customization_id,
+            rate_category_id=category.id,
+        ))
+
+        route = [[-122.4194 + i * 0.001, 37.7749 + i * 0.0005] for i in range(30)]
+        batches = [route[0:10], route[10:20], route[20:30]]
+        for sequence, batch in enumerate(batches):
+            progress = await service.append_trip_points(user.id, trip.id, AppendTripPointsDTO(sequence=sequence, coordinates=batch))
+
+        #phone didn't see the last response and sends the batch again
+        progress = await service.append_trip_points(user.id, trip.id, AppendTripPointsDTO(sequence=2, coordinates=batches[2]))
+        full_length = route_length_meters({"type": "LineString", "coordinates": route})
+        assert progress['chunk_count'] == 3
+        assert progress['point_count'] == 30
+        assert progress['recorded_meters'] == pytest.approx(full_length)
+
+        ended = await service.end_trip(user.id, trip.id, EndTripDTO(end_address="2 Main St", distance_meters=full_length))
+
+        response = TripResponseDTO.model_validate(ended)
+        stored = TripGeometryDTO.model_validate(await service.get_trip_geometry(user.id, trip.id)).geometry["coordinates"]
+        assert len(stored) == len(route)
+        assert all(point == pytest.approx(expected) for point, expected in zip(stored, route))
+        assert response.distance_flagged is False
+        assert response.computed_miles == pytest.approx(full_length / 1609.34, abs=0.01)
+
+        remaining = await test_db_session.scalar(
+            select(func.count(TripPointChunk.id)).where(TripPointChunk.trip_id == trip.id)
+        )
+        assert remaining == 0
+
+    async def test_points_racing_end_are_kept_or_rejected(self, file_sessions):
+        async with file_sessions() as session:
+            user = User(
+                id=uuid4(),
+                email="racing@example.com",
+                full_name="Racing User",
+                password_hash="hashed_password",
+                role=UserRole.EMPLOYEE
+            )
+            customization = RateCustomization(id=uuid4(), name="Racing", year=2025, user_id=user.id)
+            category = RateCategory(id=uuid4(), name="Business", cost_per_mile=0.5, rate_customization_id=customization.id)
+            session.add_all([user, customization, category])
+            await session.commit()
+
+        async def run(action, repo_class=TripRepo):
+            async with file_sessions() as session:
+                return await action(TripsService(repo_class(session), RateCategoryRepo(session), RateCustomizationRepo(session)))
+
+        route = [[-122.4194 + i * 0.001, 37.7749 + i * 0.0005] for i in range(30)]
+        trip = await run(lambda service: service.start_trip(user.id, CreateTripDTO(
+            start_address="1 Main St",
+            rate_customization_id=category.rate_customization_id,
+            rate_category_id=category.id,
+        )))
+        for sequence in range(2):
+            await run(lambda service, sequence=sequence: service.append_trip_points(
+                user.id, trip.id, AppendTripPointsDTO(sequence=sequence, coordinates=route[sequence * 10:sequence * 10 + 10])
+            ))
+
+        racing = []
+
+        class RacedTripRepo(TripRepo):
+            async def get_point_chunks(self, trip_id):
+                #the last batch comes in right after the end request read the chunks
+                chunks = await super().get_point_chunks(trip_id)
+                racing.append(asyncio.create_task(run(lambda service: service.append_trip_points(
+                    user.id, trip.id, AppendTripPointsDTO(sequence=2, coordinates=route[20:30])
+                ))))
+                await asyncio.sleep(0.2)
+                return chunks
+
+        await run(lambda service: service.end_trip(user.id, trip.id, EndTripDTO(end_address="2 Main St", distance_meters=5000.0)), RacedTripRepo)
+
+        #the batch waits for the end and is turned away, instead of being deleted with the chunks after
+        #the route was stitched without it
+        with pytest.raises(InvalidTripDataError):
+            await racing[0]
+
+        stored = TripGeometryDTO.model_validate(await run(lambda service: service.get_trip_geometry(user.id, trip.id))).geometry["coordinates"]
+        async with file_sessions() as session:
+            remaining = await session.scalar(select(func.count(TripPointChunk.id)).where(TripPointChunk.trip_id == trip.id))
+        assert len(stored) == 20
+        assert remaining == 0
@@ -1,10 +1,13 @@
 
 import pytest
+from datetime import datetime, timedelta, timezone
 from uuid import uuid4
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.exc import InvalidRequestError
 from app.modules.expenses.models import Expense
 from app.modules.rate_categories.models import RateCategory
 from app.modules.rate_customizations.models import RateCustomization
-from app.modules.trips.models import Trip, TripStatus
+from app.modules.trips.models import Trip, TripGeometryLevel, TripStatus
 from app.modules.trips.repository import TripRepo
 from app.modules.users.models import User, UserRole
 from app.modules.vehicles.models import Vehicle
@@ -67,7 +70,7 @@ class TestTripRepoIntegration:
             start_address_encrypted="encrypted_start_address",
             purpose="Business meeting",
             vehicle_id=vehicle.id,
-            geometry_encrypted="gAAAAABhZ6_encrypted_geometry_data_here",
+            geometry_encrypted=b"gAAAAABhZ6_encrypted_geometry_data_here",
             rate_customization_id=customization.id,
             rate_category_id=category.id,
             reimbursement_rate=0.67,
@@ -141,7 +144,7 @@ class TestTripRepoIntegration:
             purpose="Client visit",
             vehicle_id=vehicle.id,
             miles=50.5,
-            geometry_encrypted="gAAAAABhZ7_client_visit_geometry_encrypted",
+            geometry_encrypted=b"gAAAAABhZ7_client_visit_geometry_encrypted",
             reimbursement_rate=0.67,
             mileage_reimbursement_total=33.84,
             rate_customization_id=customization.id,
@@ -213,7 +216,7 @@ class TestTripRepoIntegration:
             status=TripStatus.active,
             start_address_encrypted="encrypted_start",
             vehicle_id=vehicle.id,
-            geometry_encrypted="gAAAAABhZ8_travel_geometry_encrypted",
+            geometry_encrypted=b"gAAAAABhZ8_travel_geometry_encrypted",
             rate_customization_id=customization.id,
             rate_category_id=category.id,
             reimbursement_rate=0.67,
@@ -278,7 +281,7 @@ class TestTripRepoIntegration:
             status=TripStatus.active,
             start_address_encrypted="encrypted_start",
             vehicle_id=vehicle.id,
-            geometry_encrypted="gAAAAABhZ9_mileage_geometry_encrypted",
+            geometry_encrypted=b"gAAAAABhZ9_mileage_geometry_encrypted",
             rate_customization_id=customization.id,
             rate_category_id=category.id,
             reimbursement_rate=0.67,
@@ -390,3 +393,198 @@ class TestTripRepoIntegration:
         assert other_trips[0].id == other_trip.id
         assert other_trips[0].purpose == "Other business meeting"
         assert other_trips[0].user_id == other_user.id
+
+    async def test_trip_summaries_keyset_pagination(self, test_db_session, test_user):
+        customization = RateCustomization(
+            id=uuid4(),
+            name="Paging Customization",
+            year=2024,
+            user_id=test_user.id
+        )
+        test_db_session.add(customization)
+        await test_db_session.commit()
+
+        category = RateCategory(
+            id=uuid4(),
+            name="Paging Category",
+            cost_per_mile=0.67,
+            rate_customization_id=customization.id
+        )
+        test_db_session.add(category)
+        await test_db_session.commit()
+
+        base = datetime(2024, 5, 1, 9, 0, tzinfo=timezone.utc)
+        trips = []
+        for i in range(5):
+            trips.append(Trip(
+                id=uuid4(),
+                status=TripStatus.completed,
+                start_address_encrypted=f"start_{i}",
+                purpose=f"Trip {i}",
+                miles=10.0 + i,
+                geometry_encrypted=b"large_geometry_blob",
+                rate_customization_id=customization.id,
+                rate_category_id=category.id,
+                reimbursement_rate=0.67,
+                #two trips share a start time so the id tiebreak is exercised
+                started_at=base + timedelta(hours=min(i, 3)),
+                user_id=test_user.id
+            ))
+        test_db_session.add_all(trips)
+        await test_db_session.commit()
+
+        test_db_session.add(Expense(
+            id=uuid4(),
+            user_id=test_user.id,
+            trip_id=trips[4].id,
+            type="Parking",
+            amount=5.0
+        ))
+        await test_db_session.commit()
+
+        repo = TripRepo(test_db_session)
+
+        first_page = await repo.get_user_trip_summaries(test_user.id, 2)
+        assert len(first_page) == 2
+        assert "geometry_encrypted" not in first_page[0]._fields
+
+        last = first_page[-1]
+        second_page = await repo.get_user_trip_summaries(test_user.id, 10, (last.started_at, last.id))
+        assert len(second_page) == 3
+
+        seen = [row.id for row in first_page] + [row.id for row in second_page]
+        assert len(set(seen)) == 5
+        assert seen[-1] == trips[0].id
+
+        by_id = {row.id: row for row in first_page + second_page}
+        assert by_id[trips[4].id].expense_count == 1
+        assert by_id[trips[0].id].expense_count == 0
+        assert by_id[trips[0].id].receipt_count == 0
+
+    async def test_monthly_stats_aggregates_in_sql(self, test_db_session, test_user):
+        customization = RateCustomization(
+            id=uuid4(),
+            name="Stats Customization",
+            year=2025,
+            user_id=test_user.id
+        )
+        test_db_session.add(customization)
+        await test_db_session.commit()
+
+        category = RateCategory(
+            id=uuid4(),
+            name="Stats Category",
+            cost_per_mile=0.5,
+            rate_customization_id=customization.id
+        )
+        test_db_session.add(category)
+        await test_db_session.commit()
+
+        def make_trip(started_at, miles, status=TripStatus.completed):
+            return Trip(
+                id=uuid4(),
+                status=status,
+                start_address_encrypted="start",
+                miles=miles,
+                mileage_reimbursement_total=miles * 0.5,
+                expense_reimbursement_total=1.0,
+                rate_customization_id=customization.id,
+                rate_category_id=category.id,
+                reimbursement_rate=0.5,
+                started_at=started_at,
+                user_id=test_user.id
+            )
+
+        test_db_session.add_all([
+            make_trip(datetime(2025, 1, 31, 23, 0, tzinfo=timezone.utc), 10.0),
+            make_trip(datetime(2025, 2, 1, 0, 0, tzinfo=timezone.utc), 20.0),
+            make_trip(datetime(2025, 2, 14, 12, 0, tzinfo=timezone.utc), 30.0),
+            make_trip(datetime(2025, 2, 15, 12, 0, tzinfo=timezone.utc), 99.0, TripStatus.cancelled),
+            make_trip(datetime(2025, 3, 1, 0, 0, tzinfo=timezone.utc), 40.0),
+        ])
+        await test_db_session.commit()
+
+        repo = TripRepo(test_db_session)
+
+        february = await repo.get_monthly_stats(test_user.id, 2, 2025)
+        assert february['total_drives'] == 2
+        assert february['total_miles'] == 50.0
+        assert february['total_mileage_reimbursement'] == 25.0
+        assert february['total_expense_reimbursement'] == 2.0
+
+        december = await repo.get_monthly_stats(test_user.id, 12, 2025)
+        assert december['total_drives'] == 0
+        assert december['total_miles'] == 0.0
+
+        by_month = await repo.get_monthly_stats_range(
+            test_user.id,
+            datetime(2025, 1, 1, tzinfo=timezone.utc),
+            datetime(2025, 3, 1, tzinfo=timezone.utc),
+        )
+        assert set(by_month) == {(2025, 1), (2025, 2)}
+        assert by_month[(2025, 1)]['total_miles'] == 10.0
+        assert by_month[(2025, 2)]['total_drives'] == 2
+
+    async def test_geometry_is_only_loaded_on_request(self, test_db_session, test_user):
+        customization = RateCustomization(id=uuid4(), name="Deferred", year=2025, user_id=test_user.id)
+        test_db_session.add(customization)
+        await test_db_session.commit()
+
+        category = RateCategory(id=uuid4(), name="Business", cost_per_mile=0.5, rate_customization_id=customization.id)
+        test_db_session.add(category)
+        await test_db_session.commit()
+
+        trip = Trip(
+            id=uuid4(),
+            status=TripStatus.completed,
+            start_address_encrypted="encrypted_start",
+            geometry_encrypted=b"\x01route",
+            rate_customization_id=customization.id,
+            rate_category_id=category.id,
+            user_id=test_user.id
+        )
+        test_db_session.add(trip)
+        await test_db_session.commit()
+        test_db_session.expunge_all()
+
+        repo = TripRepo(test_db_session)
+
+        listed = await repo.get_user_trips(test_user.id)
+        assert "geometry_encrypted" not in sa_inspect(listed[0]).dict
+        with pytest.raises(InvalidRequestError):
+            listed[0].geometry_encrypted
+
+        detailed = await repo.get(trip.id, test_user.id, with_geometry=True)
+        assert detailed.geometry_encrypted == b"\x01route"
+
+    async def test_preview_geometries_use_coarsest_level(self, test_db_session, test_user):
+        customization = RateCustomization(id=uuid4(), name="Previews", year=2025, user_id=test_user.id)
+        test_db_session.add(customization)
+        await test_db_session.commit()
+
+        category = RateCategory(id=uuid4(), name="Business", cost_per_mile=0.5, rate_customization_id=customization.id)
+        test_db_session.add(category)
+        await test_db_session.commit()
+
+        def make_trip(geometry_encrypted):
+            return Trip(
+                id=uuid4(),
+                status=TripStatus.completed,
+                start_address_encrypted="encrypted_start",
+                geometry_encrypted=geometry_encrypted,
+                rate_customization_id=customization.id,
+                rate_category_id=category.id,
+                user_id=test_user.id
+            )
+
+        simplified, short, no_route = make_trip(b"\x01full"), make_trip(b"\x01short"), make_trip(None)
+        test_db_session.add_all([simplified, short, no_route])
+        test_db_session.add_all([
+            TripGeometryLevel(trip_id=simplified.id, level=level, tolerance_meters=tolerance, point_count=count, geometry_encrypted=geometry)
+            for level, tolerance, count, geometry in ((1, 5.0, 400, b"\x01fine"), (2, 20.0, 80, b"\x01coarse"))
+        ])
+        await test_db_session.commit()
+
+        previews = await TripRepo(test_db_session).get_preview_geometries([simplified.id, short.id, no_route.id])
+
+        assert previews == {simplified.id: b"\x01coarse", short.id: b"\x01short"}
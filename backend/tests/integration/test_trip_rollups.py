@@ -0,0 +1,221 @@
+import pytest
+from unittest.mock import MagicMock
+from datetime import date, datetime, timedelta, timezone
+from uuid import uuid4
+from sqlalchemy import func, select
+
+from app.modules.expenses.exceptions import DuplicateExpenseError
+from app.modules.expenses.repository import ExpenseRepo
+from app.modules.expenses.schemas import CreateExpenseDTO, EditExpenseDTO
+from app.modules.expenses.service import ExpensesService
+from app.modules.rate_categories.models import RateCategory
+from app.modules.rate_categories.repository import RateCategoryRepo
+from app.modules.rate_customizations.models import RateCustomization
+from app.modules.rate_customizations.repository import RateCustomizationRepo
+from app.modules.reports.repository import ReportRepository
+from app.modules.reports.service import ReportsService
+from app.modules.trips.models import Trip, TripDailyRollup, TripStatus
+from app.modules.trips.repository import TripRepo
+from app.modules.trips.rollups_repository import RollupContribution, TripRollupRepo
+from app.modules.trips.schemas import CreateTripDTO, EditTripDTO, EndTripDTO, ManualCreateTripDTO
+from app.modules.trips.service import TripsService
+from app.modules.users.models import User, UserRole
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+class TestTripRollupsIntegration:
+
+    @pytest.fixture
+    async def test_user(self, test_db_session):
+        user = User(
+            id=uuid4(),
+            email="rollups@example.com",
+            full_name="Rollup User",
+            password_hash="hashed_password",
+            role=UserRole.EMPLOYEE
+        )
+        test_db_session.add(user)
+        await test_db_session.commit()
+        return user
+
+    @pytest.fixture
+    async def category(self, test_db_session, test_user):
+        customization = RateCustomization(
+            id=uuid4(),
+            name="Rollup Customization",
+            year=2025,
+            user_id=test_user.id
+        )
+        test_db_session.add(customization)
+        await test_db_session.commit()
+
+        category = RateCategory(
+            id=uuid4(),
+            name="Business",
+            cost_per_mile=0.5,
+            rate_customization_id=customization.id
+        )
+        test_db_session.add(category)
+        await test_db_session.commit()
+        return category
+
+    @pytest.fixture
+    def rollup_repo(self, test_db_session):
+        return TripRollupRepo(test_db_session)
+
+    @pytest.fixture
+    def expense_service(self, test_db_session, rollup_repo):
+        return ExpensesService(ExpenseRepo(test_db_session), TripRepo(test_db_session), rollup_repo)
+
+    @pytest.fixture
+    def service(self, test_db_session, rollup_repo, expense_service):
+        return TripsService(
+            TripRepo(test_db_session),
+            RateCategoryRepo(test_db_session),
+            RateCustomizationRepo(test_db_session),
+            expense_service=expense_service,
+            rollup_repo=rollup_repo,
+        )
+
+    async def _rollup_rows(self, test_db_session, user_id):
+        result = await test_db_session.execute(
+            select(TripDailyRollup).where(TripDailyRollup.user_id == user_id)
+        )
+        return result.scalars().all()
+
+    async def test_trips_without_vehicle_share_one_bucket(self, test_db_session, test_user, category, rollup_repo):
+        for miles in (10.0, 5.0, 2.5):
+            await rollup_repo.apply(None, RollupContribution(
+                user_id=test_user.id,
+                day=date(2025, 3, 10),
+                rate_category_id=category.id,
+                vehicle_id=None,
+                miles=miles,
+                mileage_total=miles / 2,
+                expense_total=1.0,
+            ))
+        await test_db_session.commit()
+
+        rows = await self._rollup_rows(test_db_session, test_user.id)
+        assert [(row.vehicle_id, row.trip_count, row.total_miles, row.mileage_reimbursement_total, row.expense_reimbursement_total) for row in rows] == [
+            (None, 3, 17.5, 8.75, 3.0)
+        ]
+
+    async def test_manual_trip_with_invalid_expenses_is_not_saved(self, test_db_session, test_user, category, service):
+        started_at = datetime(2025, 3, 10, 15, 0, tzinfo=timezone.utc)
+        with pytest.raises(DuplicateExpenseError):
+            await service.manual_create_trip(test_user.id, ManualCreateTripDTO(
+                start_address="1 Main St",
+                end_address="2 Main St",
+                miles=10.0,
+                started_at=started_at,
+                ended_at=started_at + timedelta(hours=1),
+                rate_customization_id=category.rate_customization_id,
+                rate_category_id=category.id,
+                expenses=[CreateExpenseDTO(type="Parking", amount=4.0), CreateExpenseDTO(type="parking ", amount=2.0)],
+            ))
+
+        assert await test_db_session.scalar(select(func.count(Trip.id)).where(Trip.user_id == test_user.id)) == 0
+        assert await self._rollup_rows(test_db_session, test_user.id) == []
+
+    async def test_rollups_follow_trip_and_expense_writes(self, test_db_session, test_user, category, service, expense_service, rollup_repo):
+        started_at = datetime(2025, 3, 10, 15, 0, tzinfo=timezone.utc)
+        manual = await service.manual_create_trip(test_user.id, ManualCreateTripDTO(
+            start_address="1 Main St",
+            end_address="2 Main St",
+            miles=10.0,
+            started_at=started_at,
+            ended_at=started_at + timedelta(hours=1),
+            rate_customization_id=category.rate_customization_id,
+            rate_category_id=category.id,
+            expenses=[CreateExpenseDTO(type="Parking", amount=4.0)],
+        ))
+        assert [(expense.type, expense.amount) for expense in manual.expenses] == [("Parking", 4.0)]
+        assert manual.expense_reimbursement_total == 4.0
+
+        active = await service.start_trip(test_user.id, CreateTripDTO(
+            start_address="3 Main St",
+            rate_customization_id=category.rate_customization_id,
+            rate_category_id=category.id,
+        ))
+        now = datetime.now(timezone.utc)
+        #active trips don't count yet
+        stats = await service.get_monthly_stats(test_user.id, now.month, now.year)
+        assert stats['total_drives'] == 0
+
+        await service.end_trip(test_user.id, active.id, EndTripDTO(
+            end_address="4 Main St",
+            geometry={"type": "LineString", "coordinates": [[0, 0], [1, 1]]},
+            distance_meters=1609.34 * 20,
+        ))
+        stats = await service.get_monthly_stats(test_user.id, now.month, now.year)
+        assert stats['total_drives'] == 1
+        assert stats['total_miles'] == 20.0
+
+        await service.edit_trip(test_user.id, manual.id, EditTripDTO(miles=12.0))
+
+        expenses = await expense_service.get_expenses_for_trip(test_user.id, manual.id)
+        await expense_service.edit_expense(test_user.id, expenses[0].id, EditExpenseDTO(amount=6.0))
+
+        incremental = {
+            (row.day, row.rate_category_id): (row.trip_count, row.total_miles, row.mileage_reimbursement_total, row.expense_reimbursement_total)
+            for row in await self._rollup_rows(test_db_session, test_user.id)
+            if row.trip_count
+        }
+        assert incremental[(date(2025, 3, 10), category.id)] == (1, 12.0, 6.0, 6.0)
+
+        assert sum(counts[0] for counts in incremental.values()) == 2
+
+        #rebuilding from scratch lands on the same numbers
+        await rollup_repo.rebuild(test_user.id)
+        await test_db_session.commit()
+        rebuilt = {
+            (row.day, row.rate_category_id): (row.trip_count, row.total_miles, row.mileage_reimbursement_total, row.expense_reimbursement_total)
+            for row in await self._rollup_rows(test_db_session, test_user.id)
+        }
+        assert rebuilt == incremental
+
+        analytics = await rollup_repo.get_category_totals(test_user.id, date(2025, 3, 1), date(2025, 3, 31))
+        assert len(analytics) == 1
+        assert analytics[0].category_name == "Business"
+        assert analytics[0].trip_count == 1
+
+    async def test_analytics_count_completed_trips_of_the_whole_month(self, test_db_session, test_user, category, service):
+        year = date.today().year
+        for started_at, miles, expenses in (
+            (datetime(year, 1, 10, 15, 0, tzinfo=timezone.utc), 10.0, [CreateExpenseDTO(type="Parking", amount=4.0)]),
+            #late on the last day still belongs to the month
+            (datetime(year, 1, 31, 23, 30, tzinfo=timezone.utc), 5.0, None),
+        ):
+            await service.manual_create_trip(test_user.id, ManualCreateTripDTO(
+                start_address="1 Main St",
+                end_address="2 Main St",
+                miles=miles,
+                started_at=started_at,
+                ended_at=started_at + timedelta(minutes=20),
+                rate_customization_id=category.rate_customization_id,
+                rate_category_id=category.id,
+                expenses=expenses,
+            ))
+        #trips that were never completed are not reimbursed and don't count
+        for status in (TripStatus.active, TripStatus.cancelled):
+            test_db_session.add(Trip(
+                id=uuid4(),
+                user_id=test_user.id,
+                status=status,
+                start_address_encrypted="",
+                miles=99.0,
+                mileage_reimbursement_total=49.5,
+                started_at=datetime(year, 1, 12, 9, 0, tzinfo=timezone.utc),
+                rate_customization_id=category.rate_customization_id,
+                rate_category_id=category.id,
+            ))
+        await test_db_session.commit()
+
+        reports = ReportsService(test_db_session, ReportRepository(), storage=MagicMock(), queue=MagicMock())
+        analytics = await reports.get_analytics(test_user, "January")
+
+        assert analytics.category_counts == {"Business": 2}
+        assert analytics.total_miles == 15.0
+        assert analytics.grand_total == 7.5 + 4.0
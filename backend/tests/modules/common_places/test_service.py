@@ -7,6 +7,7 @@ from app.modules.common_places.service import CommonPlaceService
 from app.modules.common_places.repository import CommonPlaceRepo
 from app.modules.common_places.schemas import CommonPlaceCreate, CommonPlaceUpdate
 from app.modules.common_places.models import CommonPlace
+from app.modules.trips.utils.blind_index import address_tokens
 from app.modules.common_places.exceptions import (
     CommonPlaceNotFoundError,
     DuplicateCommonPlaceError,
@@ -43,6 +44,8 @@ class TestCommonPlaceServiceCreate:
 
         assert result == mock_place
         repo.create.assert_called_once()
+        place = repo.create.call_args.args[0]
+        repo.replace_address_tokens.assert_called_once_with(place.id, user_id, address_tokens(user_id, "123 Main St"))
 
     @pytest.mark.asyncio
     async def test_create_common_place_max_limit(self, service, repo, user_id):
@@ -162,6 +165,7 @@ class TestCommonPlaceServiceUpdate:
         assert mock_place.name == "New Name"
         assert mock_place.address == "new_encrypted_address"
         repo.update.assert_called_once()
+        repo.replace_address_tokens.assert_called_once_with(mock_place.id, user_id, address_tokens(user_id, "New Address"))
 
     @pytest.mark.asyncio
     async def test_update_common_place_duplicate_name(self, service, repo, mock_place):
@@ -0,0 +1,99 @@
+import io
+
+from PIL import Image
+
+from app.modules.expenses import receipt_images
+from app.modules.expenses.receipt_images import MAX_IMAGE_EDGE, THUMBNAIL_EDGE, derive_images, derived_keys, process_receipt
+
+#exif orientation tag, 6 means the camera was turned 90 degrees clockwise
+ORIENTATION = 0x0112
+GPS_INFO = 0x8825
+
+
+def _photo(size=(4000, 3000), orientation: int | None = None) -> bytes:
+    image = Image.new("RGB", size, (200, 190, 180))
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"
+    exif[GPS_INFO] = {1: "N", 2: (37.0, 46.0, 29.0)}
+    if orientation is not None:
+        exif[ORIENTATION] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", exif=exif, quality=95)
+    return buffer.getvalue()
+
+
+def _open(data: bytes) -> Image.Image:
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+class TestDeriveImages:
+
+    def test_downsizes_and_strips_metadata(self):
+        original = _photo()
+
+        derived = derive_images(original)
+
+        image = _open(derived.image)
+        assert image.format == "JPEG"
+        assert max(image.size) <= MAX_IMAGE_EDGE
+        assert not image.getexif()
+        assert "exif" not in image.info
+        assert len(derived.image) < len(original)
+
+        thumbnail = _open(derived.thumbnail)
+        assert max(thumbnail.size) == THUMBNAIL_EDGE
+        assert not thumbnail.getexif()
+
+    def test_applies_exif_orientation(self):
+        derived = derive_images(_photo(size=(1200, 800), orientation=6))
+
+        width, height = _open(derived.image).size
+        assert height > width
+
+    def test_transparent_png_goes_on_white(self):
+        image = Image.new("RGBA", (100, 100), (0, 0, 0, 0))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+
+        derived = derive_images(buffer.getvalue())
+
+        pixel = _open(derived.image).getpixel((50, 50))
+        assert all(channel > 245 for channel in pixel)
+
+    def test_small_images_are_not_upscaled(self):
+        derived = derive_images(_photo(size=(200, 100)))
+
+        assert _open(derived.image).size == (200, 100)
+        assert _open(derived.thumbnail).size == (200, 100)
+
+
+class TestProcessReceipt:
+
+    def test_derived_keys_sit_next_to_the_original(self):
+        image_key, thumbnail_key = derived_keys("trips/1/receipts/abc_receipt.png")
+
+        assert image_key == "trips/1/receipts/derived/abc_receipt.jpg"
+        assert thumbnail_key == "trips/1/receipts/thumbnails/abc_receipt.jpg"
+
+    def test_process_receipt_stores_both_copies(self, monkeypatch):
+        class FakeStorage:
+            bucket = "receipts"
+
+            def __init__(self):
+                self.objects = {"trips/1/receipts/abc_receipt.jpg": _photo()}
+
+            def download_bytes(self, key):
+                return self.objects[key]
+
+            def upload_bytes(self, *, key, content, content_type):
+                self.objects[key] = content
+
+        storage = FakeStorage()
+        monkeypatch.setattr(receipt_images, "_storage", lambda bucket: storage)
+
+        image_key, thumbnail_key = process_receipt("receipts", "trips/1/receipts/abc_receipt.jpg")
+
+        assert max(_open(storage.objects[image_key]).size) == MAX_IMAGE_EDGE
+        assert max(_open(storage.objects[thumbnail_key]).size) == THUMBNAIL_EDGE
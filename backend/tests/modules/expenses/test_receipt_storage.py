@@ -0,0 +1,211 @@
+import base64
+import hashlib
+import json
+from unittest.mock import MagicMock
+
+import boto3
+from botocore.stub import Stubber
+
+from app.core.storage import ReceiptStorage, ReceiptUpload, head_sha256
+from app.core.storage_cache import StorageCache
+
+
+def _b64_sha256(data: bytes) -> str:
+    return base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+
+class TestReceiptUpload:
+
+    def _upload(self):
+        client = MagicMock()
+        client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+        client.upload_part.side_effect = lambda **kwargs: {"ETag": f"etag-{kwargs['PartNumber']}"}
+        storage = ReceiptStorage(bucket="receipts", region="us-east-1", _client=client)
+        return client, storage.start_upload(key="trips/1/receipts/a.pdf", content_type="application/pdf")
+
+    def test_small_object_is_a_single_put(self):
+        client, upload = self._upload()
+
+        upload.complete(b"receipt")
+
+        client.create_multipart_upload.assert_not_called()
+        kwargs = client.put_object.call_args.kwargs
+        assert kwargs["Body"] == b"receipt"
+        assert kwargs["ChecksumSHA256"] == _b64_sha256(b"receipt")
+        assert kwargs["ServerSideEncryption"] == "AES256"
+        assert upload.size == 7
+        assert upload.checksum == hashlib.sha256(b"receipt").hexdigest()
+
+    def test_big_object_goes_up_in_parts(self):
+        client, upload = self._upload()
+        first, rest, tail = b"a" * 10, b"b" * 10, b"c" * 3
+
+        upload.upload_part(first)
+        upload.upload_part(rest)
+        upload.complete(tail)
+
+        client.put_object.assert_not_called()
+        assert client.create_multipart_upload.call_args.kwargs["ChecksumAlgorithm"] == "SHA256"
+        assert [call.kwargs["PartNumber"] for call in client.upload_part.call_args_list] == [1, 2, 3]
+        parts = client.complete_multipart_upload.call_args.kwargs["MultipartUpload"]["Parts"]
+        assert parts == [
+            {"PartNumber": 1, "ETag": "etag-1", "ChecksumSHA256": _b64_sha256(first)},
+            {"PartNumber": 2, "ETag": "etag-2", "ChecksumSHA256": _b64_sha256(rest)},
+            {"PartNumber": 3, "ETag": "etag-3", "ChecksumSHA256": _b64_sha256(tail)},
+        ]
+        assert upload.size == 23
+        assert upload.checksum == hashlib.sha256(first + rest + tail).hexdigest()
+
+    def test_abort_only_cleans_up_started_multipart_uploads(self):
+        client, upload = self._upload()
+
+        upload.abort()
+        client.abort_multipart_upload.assert_not_called()
+
+        upload.upload_part(b"a" * 10)
+        upload.abort()
+        client.abort_multipart_upload.assert_called_once_with(
+            Bucket="receipts", Key="trips/1/receipts/a.pdf", UploadId="upload-1"
+        )
+
+    def test_upload_defaults_to_the_s3_minimum_part_size(self):
+        _, upload = self._upload()
+
+        assert isinstance(upload, ReceiptUpload)
+        assert upload.part_size == 5 * 1024 * 1024
+
+
+class TestReceiptStorageDirectUploads:
+
+    def _storage(self):
+        client = boto3.client(
+            "s3",
+            region_name="us-east-1",
+            aws_access_key_id="test",
+            aws_secret_access_key="test",
+            endpoint_url="http://localhost:4566",
+        )
+        return ReceiptStorage(bucket="receipts", region="us-east-1", _client=client)
+
+    def test_presigned_post_pins_key_type_and_size(self):
+        storage = self._storage()
+
+        checksum = hashlib.sha256(b"pdf").hexdigest()
+        post = storage.generate_presigned_post(
+            key="trips/1/receipts/a.pdf", content_type="application/pdf", max_bytes=1024, checksum_sha256=checksum
+        )
+
+        assert post["fields"]["key"] == "trips/1/receipts/a.pdf"
+        assert post["fields"]["Content-Type"] == "application/pdf"
+        policy = json.loads(base64.b64decode(post["fields"]["policy"]))
+        assert ["content-length-range", 1, 1024] in policy["conditions"]
+        assert {"Content-Type": "application/pdf"} in policy["conditions"]
+        assert {"key": "trips/1/receipts/a.pdf"} in policy["conditions"]
+        assert {"x-amz-checksum-algorithm": "SHA256"} in policy["conditions"]
+        assert {"x-amz-checksum-sha256": base64.b64encode(hashlib.sha256(b"pdf").digest()).decode()} in policy["conditions"]
+
+    def test_head_returns_none_for_missing_object(self):
+        storage = self._storage()
+
+        with Stubber(storage._client) as stub:
+            stub.add_client_error("head_object", service_error_code="404", http_status_code=404)
+            stub.add_response(
+                "head_object",
+                {"ContentLength": 42, "ContentType": "image/png"},
+                {"Bucket": "receipts", "Key": "present.png", "ChecksumMode": "ENABLED"},
+            )
+
+            assert storage.head("missing.png") is None
+            assert storage.head("present.png")["ContentLength"] == 42
+
+    def test_head_sha256_reads_whole_object_checksum(self):
+        digest = hashlib.sha256(b"receipt").digest()
+
+        assert head_sha256({"ChecksumSHA256": base64.b64encode(digest).decode()}) == digest.hex()
+        assert head_sha256({"ChecksumSHA256": f"{base64.b64encode(digest).decode()}-3", "ChecksumType": "COMPOSITE"}) is None
+        assert head_sha256({"ContentLength": 7}) is None
+
+
+class TestStorageCache:
+
+    def _cache(self, **kwargs):
+        now = [1000.0]
+        cache = StorageCache(max_entries=kwargs.get("max_entries", 10), exists_seconds=60, clock=lambda: now[0])
+        return cache, now
+
+    def test_signed_url_is_reused_until_close_to_expiry(self):
+        cache, now = self._cache()
+        sign = MagicMock(side_effect=["url-1", "url-2"])
+
+        assert cache.signed_url("receipts", "a.pdf", 900, sign) == "url-1"
+        now[0] += 600
+        assert cache.signed_url("receipts", "a.pdf", 900, sign) == "url-1"
+        now[0] += 100
+        assert cache.signed_url("receipts", "a.pdf", 900, sign) == "url-2"
+        assert sign.call_count == 2
+
+    def test_signed_urls_are_kept_per_lifetime(self):
+        cache, _ = self._cache()
+
+        assert cache.signed_url("reports", "r.pdf", 300, lambda: "short") == "short"
+        assert cache.signed_url("reports", "r.pdf", 900, lambda: "long") == "long"
+        assert cache.signed_url("reports", "r.pdf", 300, lambda: "other") == "short"
+
+    def test_only_existing_objects_are_cached(self):
+        cache, now = self._cache()
+        check = MagicMock(side_effect=[False, True, True])
+
+        assert cache.exists("reports", "r.pdf", check) is False
+        assert cache.exists("reports", "r.pdf", check) is True
+        assert cache.exists("reports", "r.pdf", check) is True
+        assert check.call_count == 2
+
+        now[0] += 61
+        assert cache.exists("reports", "r.pdf", check) is True
+        assert check.call_count == 3
+
+    def test_invalidate_drops_urls_and_existence(self):
+        cache, _ = self._cache()
+        cache.signed_url("reports", "r.pdf", 300, lambda: "url-1")
+        cache.exists("reports", "r.pdf", lambda: True)
+
+        cache.invalidate("reports", "r.pdf")
+
+        assert cache.signed_url("reports", "r.pdf", 300, lambda: "url-2") == "url-2"
+        assert cache.exists("reports", "r.pdf", lambda: False) is False
+
+    def test_evicts_least_recently_used_object(self):
+        cache, _ = self._cache(max_entries=2)
+        cache.signed_url("receipts", "a", 900, lambda: "a-1")
+        cache.signed_url("receipts", "b", 900, lambda: "b-1")
+        cache.signed_url("receipts", "a", 900, lambda: "unused")
+        cache.signed_url("receipts", "c", 900, lambda: "c-1")
+
+        assert len(cache) == 2
+        assert cache.signed_url("receipts", "a", 900, lambda: "a-2") == "a-1"
+        assert cache.signed_url("receipts", "b", 900, lambda: "b-2") == "b-2"
+
+
+class TestReceiptStorageUrlCache:
+
+    def test_list_views_sign_each_key_once(self):
+        client = MagicMock()
+        client.generate_presigned_url.side_effect = lambda *args, **kwargs: f"signed-{kwargs['Params']['Key']}"
+        first = ReceiptStorage(bucket="receipts", region="us-east-1", _client=client)
+        #storage is built per request, the cache is shared between instances
+        second = ReceiptStorage(bucket="receipts", region="us-east-1", _client=client)
+
+        assert first.generate_presigned_url("a.png") == "signed-a.png"
+        assert second.generate_presigned_url("a.png") == "signed-a.png"
+        assert second.generate_presigned_url("b.png") == "signed-b.png"
+        assert client.generate_presigned_url.call_count == 2
+
+    def test_delete_invalidates_signed_url(self):
+        client = MagicMock()
+        client.generate_presigned_url.side_effect = ["url-1", "url-2"]
+        storage = ReceiptStorage(bucket="receipts", region="us-east-1", _client=client)
+
+        storage.generate_presigned_url("a.png")
+        storage.delete("a.png")
+
+        assert storage.generate_presigned_url("a.png") == "url-2"
@@ -1,34 +1,114 @@
+import base64
+import hashlib
 import io
 import uuid
 from datetime import datetime, timezone
 
 import pytest
 from fastapi import UploadFile
+from pydantic import ValidationError
 
 from app.modules.expenses.exceptions import (
+    ReceiptNotFoundError,
     ReceiptStorageConfigError,
     ReceiptUploadError,
     ReceiptValidationError,
 )
 from app.modules.expenses.models import ExpenseReceipt
+from app.modules.expenses import receipt_images, receipts_service
 from app.modules.expenses.receipts_service import ExpenseReceiptsService
+from app.modules.expenses.schemas import CompleteReceiptUploadDTO, ReceiptUploadRequestDTO
 from app.modules.trips.exceptions import TripNotFoundError
 
+PDF_SHA256 = hashlib.sha256(b"pdf bytes").hexdigest()
+#smallest prefixes that pass the content sniffing in upload_receipt
+PNG = b"\x89PNG\r\n\x1a\n"
+JPEG = b"\xff\xd8\xff"
+
+
+class DummyUpload:
+    def __init__(self, storage, key: str, content_type: str, part_size: int):
+        self.storage = storage
+        self.key = key
+        self.content_type = content_type
+        self.part_size = part_size
+        self.parts = []
+        self.aborted = False
+        self._sha256 = hashlib.sha256()
+
+    @property
+    def size(self) -> int:
+        return sum(len(part) for part in self.parts)
+
+    @property
+    def checksum(self) -> str:
+        return self._sha256.hexdigest()
+
+    def upload_part(self, data: bytes) -> None:
+        self.parts.append(data)
+        self._sha256.update(data)
+
+    def complete(self, data: bytes = b"") -> None:
+        if data:
+            self.upload_part(data)
+        self.storage.uploaded.append((self.key, b"".join(self.parts), self.content_type))
+
+    def abort(self) -> None:
+        self.aborted = True
+
 
 class DummyStorage:
-    def __init__(self, bucket: str = "test-bucket"):
+    def __init__(self, bucket: str = "test-bucket", part_size: int = 5 * 1024 * 1024):
         self.bucket = bucket
         self.uploaded = []
+        self.uploads = []
+        self.part_size = part_size
         self._presigned = "https://example.com/download"
         self.is_configured = bool(bucket)
+        self.presign_seconds = 900
+        self.objects = {}
+        self.contents = {}
+        self.deleted = []
+
+    def generate_presigned_post(
+        self, *, key: str, content_type: str, max_bytes: int, checksum_sha256: str, expires_in: int | None = None
+    ) -> dict:
+        return {
+            "url": "https://example.com/upload",
+            "fields": {"key": key, "Content-Type": content_type, "x-amz-checksum-sha256": checksum_sha256},
+        }
+
+    def head(self, key: str) -> dict | None:
+        return self.objects.get(key)
+
+    def download_bytes(self, key: str) -> bytes:
+        return self.contents[key]
 
-    def upload_bytes(self, *, key: str, content: bytes, content_type: str) -> None:
-        self.uploaded.append((key, content, content_type))
+    def delete(self, key: str) -> None:
+        self.deleted.append(key)
+
+    def start_upload(self, *, key: str, content_type: str) -> DummyUpload:
+        upload = DummyUpload(self, key, content_type, self.part_size)
+        self.uploads.append(upload)
+        return upload
 
     def generate_presigned_url(self, key: str, expires_in: int | None = None) -> str:
         return f"{self._presigned}/{key}"
 
 
+@pytest.fixture(autouse=True)
+def processed_images(monkeypatch):
+    #stands in for the image process pool, records what it was asked to process
+    processed = []
+
+    async def _process(bucket, object_key):
+        processed.append(object_key)
+        return receipt_images.derived_keys(object_key)
+
+    monkeypatch.setattr(receipt_images, "process_receipt_async", _process)
+    return processed
+
+
 def make_upload(filename: str, content_type: str, data: bytes) -> UploadFile:
     upload = UploadFile(filename=filename, file=io.BytesIO(data))
     
@@ -68,27 +148,32 @@ async def test_upload_receipt_happy_path(monkeypatch):
     async def _list_for_expense(self, eid, uid=None):
         return [created_receipt]
 
+    async def _list_by_checksum(self, uid, checksum):
+        return []
+
     receipts_repo = type(
         "RRepo",
         (),
         {
             "create": _create,
             "list_for_trip": _list_for_expense,
+            "list_by_checksum": _list_by_checksum,
         },
     )()
 
     storage = DummyStorage()
     svc = ExpenseReceiptsService(trip_repo, receipts_repo, storage)
 
-    upload = make_upload("receipt.png", "image/png", b"data")
+    upload = make_upload("receipt.png", "image/png", PNG + b"data")
 
     dto = await svc.upload_receipt(user_id, trip_id, expense_id, upload)
 
     assert dto.file_name == "receipt.png"
     assert dto.content_type == "image/png"
-    assert dto.size_bytes == 4
+    assert dto.size_bytes == len(PNG) + 4
     assert dto.download_url.endswith("receipt.png")
     assert storage.uploaded  # upload called
+    assert storage.uploads[0].checksum == hashlib.sha256(PNG + b"data").hexdigest()
 
 
 @pytest.mark.asyncio
@@ -134,7 +219,7 @@ async def test_upload_receipt_missing_trip():
     storage = DummyStorage()
     svc = ExpenseReceiptsService(trip_repo, receipts_repo, storage)
 
-    upload = make_upload("receipt.png", "image/png", b"data")
+    upload = make_upload("receipt.png", "image/png", PNG + b"data")
     with pytest.raises(TripNotFoundError):
         await svc.upload_receipt(user_id, trip_id, expense_id, upload)
 
@@ -155,7 +240,7 @@ async def test_upload_receipt_storage_not_configured():
     storage = DummyStorage(bucket="")  # not configured
     svc = ExpenseReceiptsService(trip_repo, receipts_repo, storage)
 
-    upload = make_upload("receipt.png", "image/png", b"data")
+    upload = make_upload("receipt.png", "image/png", PNG + b"data")
     with pytest.raises(ReceiptStorageConfigError):
         await svc.upload_receipt(user_id, trip_id, expense_id, upload)
 
@@ -192,3 +277,409 @@ async def test_list_receipts_returns_presigned_urls():
     dtos = await svc.list_receipts(user_id, trip_id, expense_id)
     assert len(dtos) == 1
     assert dtos[0].download_url.endswith("key/receipt.png")
+
+
+def make_service(storage, saved=None):
+    #receipts by id, several can share an object key once duplicates are reused
+    saved = {} if saved is None else saved
+
+    async def _get_trip(self, tid, uid):
+        return object()
+
+    async def _create(self, r):
+        if getattr(r, "created_at", None) is None:
+            r.created_at = datetime.now(timezone.utc)
+        saved[r.id] = r
+        return r
+
+    async def _get_by_object_key(self, key, tid, uid=None):
+        return next((r for r in saved.values() if r.object_key == key and r.trip_id == tid), None)
+
+    async def _list_by_checksum(self, uid, checksum):
+        return [r for r in saved.values() if r.user_id == uid and r.checksum_sha256 == checksum]
+
+    trip_repo = type("TRepo", (), {"get": _get_trip})()
+    receipts_repo = type(
+        "RRepo",
+        (),
+        {"create": _create, "get_by_object_key": _get_by_object_key, "list_by_checksum": _list_by_checksum},
+    )()
+    return ExpenseReceiptsService(trip_repo, receipts_repo, storage)
+
+
+@pytest.mark.asyncio
+async def test_upload_receipt_streams_in_parts(monkeypatch):
+    monkeypatch.setattr(receipts_service, "UPLOAD_CHUNK_BYTES", 4)
+    storage = DummyStorage(part_size=10)
+    svc = make_service(storage)
+    data = b"%PDF-" + bytes(range(20))
+    reads = []
+
+    upload = make_upload("receipt.pdf", "application/pdf", data)
+    original_read = upload.read
+
+    async def _read(size=-1):
+        reads.append(size)
+        return await original_read(size)
+
+    upload.read = _read
+
+    dto = await svc.upload_receipt(uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), upload)
+
+    #never asked for the whole body at once, and parts went up as soon as they were full
+    assert set(reads) == {4}
+    assert [len(part) for part in storage.uploads[0].parts] == [12, 12, 1]
+    assert storage.uploaded[0][1] == data
+    assert dto.size_bytes == 25
+
+
+@pytest.mark.asyncio
+async def test_upload_receipt_stops_reading_past_the_limit(monkeypatch):
+    monkeypatch.setattr(receipts_service, "UPLOAD_CHUNK_BYTES", 4)
+    monkeypatch.setattr(receipts_service, "MAX_RECEIPT_BYTES", 10)
+    storage = DummyStorage(part_size=4)
+    svc = make_service(storage)
+
+    upload = make_upload("receipt.png", "image/png", PNG + b"x" * 92)
+    with pytest.raises(ReceiptValidationError):
+        await svc.upload_receipt(uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), upload)
+
+    #caught while hashing, before anything went to storage
+    assert storage.uploads == []
+    #stopped at the first chunk over the limit instead of reading the rest of the body
+    assert upload.file.tell() == 12
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("filename, content_type, data", [
+    ("receipt.png", "image/png", JPEG + b"data"),
+    ("receipt.pdf", "application/pdf", b"MZ\x90\x00 not a pdf"),
+    ("receipt.jpg", "image/jpeg", b"%PDF-1.4"),
+    #shorter than any signature
+    ("receipt.png", "image/png", b"\x89P"),
+])
+async def test_upload_receipt_rejects_contents_of_another_type(filename, content_type, data):
+    storage = DummyStorage()
+    saved = {}
+    svc = make_service(storage, saved)
+
+    with pytest.raises(ReceiptValidationError):
+        await svc.upload_receipt(uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), make_upload(filename, content_type, data))
+
+    assert storage.uploads == []
+    assert saved == {}
+
+
+@pytest.mark.asyncio
+async def test_upload_receipt_sniffs_the_first_chunk(monkeypatch):
+    monkeypatch.setattr(receipts_service, "UPLOAD_CHUNK_BYTES", 16)
+    storage = DummyStorage()
+    svc = make_service(storage)
+    upload = make_upload("receipt.png", "image/png", b"GIF89a" + b"x" * 100)
+
+    with pytest.raises(ReceiptValidationError):
+        await svc.upload_receipt(uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), upload)
+
+    #rejected on the first chunk, the rest of the body was never read
+    assert upload.file.tell() == 16
+
+
+@pytest.mark.asyncio
+async def test_upload_receipt_rejects_empty_file():
+    storage = DummyStorage()
+    svc = make_service(storage)
+
+    upload = make_upload("receipt.png", "image/png", b"")
+    with pytest.raises(ReceiptValidationError):
+        await svc.upload_receipt(uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), upload)
+
+    assert storage.uploads == []
+
+
+@pytest.mark.asyncio
+async def test_upload_receipt_storage_failure_aborts():
+    class FailingStorage(DummyStorage):
+        def start_upload(self, *, key, content_type):
+            upload = super().start_upload(key=key, content_type=content_type)
+
+            def _fail(data=b""):
+                raise RuntimeError("s3 down")
+
+            upload.complete = _fail
+            return upload
+
+    storage = FailingStorage()
+    svc = make_service(storage)
+
+    upload = make_upload("receipt.png", "image/png", PNG + b"data")
+    with pytest.raises(ReceiptUploadError):
+        await svc.upload_receipt(uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), upload)
+
+    assert storage.uploads[0].aborted
+
+
+@pytest.mark.asyncio
+async def test_create_upload_issues_presigned_post_for_trip_key():
+    storage = DummyStorage()
+    svc = make_service(storage)
+    trip_id = uuid.uuid4()
+
+    dto = await svc.create_upload(uuid.uuid4(), trip_id, uuid.uuid4(), ReceiptUploadRequestDTO(file_name="gas receipt.pdf", content_type="application/pdf", checksum_sha256=PDF_SHA256))
+
+    assert dto.object_key.startswith(f"trips/{trip_id}/receipts/")
+    assert dto.object_key.endswith("_gas_receipt.pdf")
+    assert dto.upload_url == "https://example.com/upload"
+    assert dto.fields["key"] == dto.object_key
+    assert dto.expires_at > datetime.now(timezone.utc)
+
+
+@pytest.mark.asyncio
+async def test_create_upload_rejects_invalid_type():
+    svc = make_service(DummyStorage())
+
+    with pytest.raises(ReceiptValidationError):
+        await svc.create_upload(uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), ReceiptUploadRequestDTO(file_name="a.exe", content_type="application/octet-stream", checksum_sha256=PDF_SHA256))
+
+
+@pytest.mark.asyncio
+async def test_complete_upload_records_receipt_once():
+    storage = DummyStorage()
+    saved = {}
+    svc = make_service(storage, saved)
+    user_id, trip_id = uuid.uuid4(), uuid.uuid4()
+    checksum = hashlib.sha256(b"png bytes").hexdigest()
+    upload = await svc.create_upload(
+        user_id, trip_id, uuid.uuid4(), ReceiptUploadRequestDTO(file_name="receipt.png", content_type="image/png", checksum_sha256=checksum)
+    )
+    storage.objects[upload.object_key] = {
+        "ContentLength": 2048,
+        "ContentType": "image/png",
+        "ChecksumSHA256": base64.b64encode(hashlib.sha256(b"png bytes").digest()).decode(),
+        "ChecksumType": "FULL_OBJECT",
+    }
+
+    body = CompleteReceiptUploadDTO(object_key=upload.object_key, file_name="receipt.png")
+    first = await svc.complete_upload(user_id, trip_id, uuid.uuid4(), body)
+    again = await svc.complete_upload(user_id, trip_id, uuid.uuid4(), body)
+
+    assert upload.fields["x-amz-checksum-sha256"] == checksum
+    assert first.size_bytes == 2048
+    assert first.content_type == "image/png"
+    assert first.download_url.endswith(upload.object_key)
+    assert again.id == first.id
+    assert len(saved) == 1
+    assert next(iter(saved.values())).checksum_sha256 == checksum
+
+
+def _stored_object(data: bytes, content_type: str = "image/png") -> dict:
+    return {
+        "ContentLength": len(data),
+        "ContentType": content_type,
+        "ChecksumSHA256": base64.b64encode(hashlib.sha256(data).digest()).decode(),
+        "ChecksumType": "FULL_OBJECT",
+    }
+
+
+@pytest.mark.asyncio
+async def test_create_upload_returns_receipt_already_stored(processed_images):
+    storage = DummyStorage()
+    saved = {}
+    svc = make_service(storage, saved)
+    user_id, trip_id, other_trip_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    stored = await svc.upload_receipt(user_id, trip_id, uuid.uuid4(), make_upload("receipt.png", "image/png", PNG + b"png bytes"))
+    request = ReceiptUploadRequestDTO(file_name="again.png", content_type="image/png", checksum_sha256=hashlib.sha256(PNG + b"png bytes").hexdigest())
+
+    same_trip = await svc.create_upload(user_id, trip_id, uuid.uuid4(), request)
+    other_trip = await svc.create_upload(user_id, other_trip_id, uuid.uuid4(), request)
+
+    #nothing to upload, the stored file is reused
+    assert same_trip.upload_url is None and other_trip.upload_url is None
+    assert same_trip.receipt.id == stored.id
+    assert other_trip.receipt.id != stored.id
+    assert other_trip.object_key == same_trip.object_key
+    assert len(storage.uploaded) == 1
+    assert len(processed_images) == 1
+    assert {receipt.trip_id for receipt in saved.values()} == {trip_id, other_trip_id}
+
+
+@pytest.mark.asyncio
+async def test_complete_upload_reuses_receipt_of_a_racing_upload(processed_images):
+    storage = DummyStorage()
+    saved = {}
+    svc = make_service(storage, saved)
+    user_id, trip_id = uuid.uuid4(), uuid.uuid4()
+    request = ReceiptUploadRequestDTO(file_name="receipt.png", content_type="image/png", checksum_sha256=hashlib.sha256(b"png bytes").hexdigest())
+    #both policies are issued before either upload is completed
+    first = await svc.create_upload(user_id, trip_id, uuid.uuid4(), request)
+    second = await svc.create_upload(user_id, trip_id, uuid.uuid4(), request)
+    storage.objects[first.object_key] = storage.objects[second.object_key] = _stored_object(b"png bytes")
+
+    recorded = await svc.complete_upload(user_id, trip_id, uuid.uuid4(), CompleteReceiptUploadDTO(object_key=first.object_key, file_name="receipt.png"))
+    reused = await svc.complete_upload(user_id, trip_id, uuid.uuid4(), CompleteReceiptUploadDTO(object_key=second.object_key, file_name="receipt.png"))
+
+    assert reused.id == recorded.id
+    assert len(saved) == 1
+    assert storage.deleted == [second.object_key]
+    assert processed_images == [first.object_key]
+
+
+@pytest.mark.asyncio
+async def test_complete_upload_hashes_object_stored_without_checksum():
+    storage = DummyStorage()
+    saved = {}
+    svc = make_service(storage, saved)
+    trip_id = uuid.uuid4()
+    key = f"trips/{trip_id}/receipts/0123456789abcdef_receipt.png"
+    storage.objects[key] = {"ContentLength": 9, "ContentType": "image/png"}
+    storage.contents[key] = b"png bytes"
+
+    await svc.complete_upload(uuid.uuid4(), trip_id, uuid.uuid4(), CompleteReceiptUploadDTO(object_key=key, file_name="receipt.png"))
+
+    assert next(iter(saved.values())).checksum_sha256 == hashlib.sha256(b"png bytes").hexdigest()
+
+
+def test_upload_request_requires_hex_sha256():
+    with pytest.raises(ValidationError):
+        ReceiptUploadRequestDTO(file_name="receipt.png", content_type="image/png")
+    with pytest.raises(ValidationError):
+        ReceiptUploadRequestDTO(file_name="receipt.png", content_type="image/png", checksum_sha256="not-a-hash")
+
+    dto = ReceiptUploadRequestDTO(file_name="receipt.png", content_type="image/png", checksum_sha256=PDF_SHA256.upper())
+    assert dto.checksum_sha256 == PDF_SHA256
+
+
+@pytest.mark.asyncio
+async def test_complete_upload_rejects_key_of_another_trip():
+    storage = DummyStorage()
+    svc = make_service(storage)
+    other_key = f"trips/{uuid.uuid4()}/receipts/0123456789abcdef_receipt.png"
+    storage.objects[other_key] = {"ContentLength": 10, "ContentType": "image/png"}
+
+    with pytest.raises(ReceiptValidationError):
+        await svc.complete_upload(uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), CompleteReceiptUploadDTO(object_key=other_key, file_name="receipt.png"))
+
+
+@pytest.mark.asyncio
+async def test_complete_upload_missing_object():
+    svc = make_service(DummyStorage())
+    trip_id = uuid.uuid4()
+    key = f"trips/{trip_id}/receipts/0123456789abcdef_receipt.png"
+
+    with pytest.raises(ReceiptNotFoundError):
+        await svc.complete_upload(uuid.uuid4(), trip_id, uuid.uuid4(), CompleteReceiptUploadDTO(object_key=key, file_name="receipt.png"))
+
+
+@pytest.mark.asyncio
+async def test_complete_upload_deletes_object_that_breaks_the_limits():
+    storage = DummyStorage()
+    saved = {}
+    svc = make_service(storage, saved)
+    trip_id = uuid.uuid4()
+    key = f"trips/{trip_id}/receipts/0123456789abcdef_receipt.png"
+    storage.objects[key] = {"ContentLength": 11 * 1024 * 1024, "ContentType": "image/png"}
+
+    with pytest.raises(ReceiptValidationError):
+        await svc.complete_upload(uuid.uuid4(), trip_id, uuid.uuid4(), CompleteReceiptUploadDTO(object_key=key, file_name="receipt.png"))
+
+    assert storage.deleted == [key]
+    assert saved == {}
+
+
+@pytest.mark.asyncio
+async def test_upload_receipt_records_derived_images(processed_images):
+    storage = DummyStorage()
+    saved = {}
+    svc = make_service(storage, saved)
+
+    dto = await svc.upload_receipt(uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), make_upload("receipt.png", "image/png", PNG + b"data"))
+
+    receipt = next(iter(saved.values()))
+    assert processed_images == [receipt.object_key]
+    assert receipt.image_object_key.endswith("/derived/" + receipt.object_key.rsplit("/", 1)[1].replace(".png", ".jpg"))
+    assert dto.download_url.endswith(receipt.object_key)
+    assert dto.image_url.endswith(receipt.image_object_key)
+    assert dto.thumbnail_url.endswith(receipt.thumbnail_object_key)
+
+
+@pytest.mark.asyncio
+async def test_upload_receipt_pdf_has_no_derived_images(processed_images):
+    storage = DummyStorage()
+    svc = make_service(storage)
+
+    dto = await svc.upload_receipt(uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), make_upload("receipt.pdf", "application/pdf", b"%PDF-1.4"))
+
+    assert processed_images == []
+    assert dto.image_url is None
+    assert dto.thumbnail_url is None
+    assert dto.download_url.endswith("receipt.pdf")
+
+
+@pytest.mark.asyncio
+async def test_upload_receipt_keeps_original_when_processing_fails(monkeypatch):
+    async def _fail(bucket, object_key):
+        raise OSError("cannot identify image file")
+
+    monkeypatch.setattr(receipt_images, "process_receipt_async", _fail)
+    storage = DummyStorage()
+    saved = {}
+    svc = make_service(storage, saved)
+
+    dto = await svc.upload_receipt(uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), make_upload("receipt.jpg", "image/jpeg", JPEG + b"data"))
+
+    receipt = next(iter(saved.values()))
+    assert receipt.image_object_key is None
+    assert dto.image_url is None
+    assert dto.thumbnail_url is None
+    assert dto.download_url.endswith(receipt.object_key)
+
+
+@pytest.mark.asyncio
+async def test_upload_receipt_same_file_on_same_trip_returns_existing(processed_images):
+    storage = DummyStorage()
+    saved = {}
+    svc = make_service(storage, saved)
+    user_id, trip_id = uuid.uuid4(), uuid.uuid4()
+
+    first = await svc.upload_receipt(user_id, trip_id, uuid.uuid4(), make_upload("receipt.png", "image/png", PNG + b"same bytes"))
+    again = await svc.upload_receipt(user_id, trip_id, uuid.uuid4(), make_upload("IMG_0001.png", "image/png", PNG + b"same bytes"))
+
+    assert again.id == first.id
+    assert len(saved) == 1
+    assert len(storage.uploads) == 1
+    assert len(processed_images) == 1
+
+
+@pytest.mark.asyncio
+async def test_upload_receipt_same_file_on_other_trip_reuses_stored_objects(processed_images):
+    storage = DummyStorage()
+    saved = {}
+    svc = make_service(storage, saved)
+    user_id = uuid.uuid4()
+
+    first = await svc.upload_receipt(user_id, uuid.uuid4(), uuid.uuid4(), make_upload("receipt.png", "image/png", PNG + b"same bytes"))
+    other_trip = uuid.uuid4()
+    again = await svc.upload_receipt(user_id, other_trip, uuid.uuid4(), make_upload("copy.png", "image/png", PNG + b"same bytes"))
+
+    original, copy = saved[first.id], saved[again.id]
+    assert copy.trip_id == other_trip
+    assert copy.file_name == "copy.png"
+    assert copy.object_key == original.object_key
+    assert copy.thumbnail_object_key == original.thumbnail_object_key
+    assert copy.checksum_sha256 == hashlib.sha256(PNG + b"same bytes").hexdigest()
+    #no second put and no second trip through the image pool
+    assert len(storage.uploads) == 1
+    assert len(processed_images) == 1
+
+
+@pytest.mark.asyncio
+async def test_upload_receipt_does_not_reuse_other_users_files():
+    storage = DummyStorage()
+    saved = {}
+    svc = make_service(storage, saved)
+    trip_id = uuid.uuid4()
+
+    await svc.upload_receipt(uuid.uuid4(), trip_id, uuid.uuid4(), make_upload("receipt.png", "image/png", PNG + b"same bytes"))
+    await svc.upload_receipt(uuid.uuid4(), trip_id, uuid.uuid4(), make_upload("receipt.png", "image/png", PNG + b"same bytes"))
+
+    assert len(storage.uploads) == 2
+    assert len({receipt.object_key for receipt in saved.values()}) == 2
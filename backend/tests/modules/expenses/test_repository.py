@@ -193,6 +193,25 @@ class TestExpenseRepoDeleteExpense:
         assert result is None
 
 
+class TestExpenseRepoApplyBatch:
+
+    @pytest.fixture
+    def repo(self, mock_db_session):
+        return ExpenseRepo(mock_db_session)
+
+    @pytest.mark.asyncio
+    async def test_apply_batch_commits_once(self, repo, mock_db_session):
+        created = [MagicMock(spec=Expense), MagicMock(spec=Expense)]
+        deleted = [MagicMock(spec=Expense)]
+        mock_db_session.add_all = MagicMock()
+
+        await repo.apply_batch(created, deleted)
+
+        mock_db_session.add_all.assert_called_once_with(created)
+        mock_db_session.delete.assert_called_once_with(deleted[0])
+        mock_db_session.commit.assert_called_once()
+
+
 class TestExpenseRepoSumByTrip:
 
     @pytest.fixture
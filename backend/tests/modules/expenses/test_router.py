@@ -5,7 +5,7 @@ from fastapi import status, HTTPException
 
 from app.modules.expenses.router import router, get_expenses_service
 from app.modules.expenses.service import ExpensesService
-from app.modules.expenses.schemas import CreateExpenseDTO, EditExpenseDTO, ExpenseResponseDTO
+from app.modules.expenses.schemas import CreateExpenseDTO, EditExpenseDTO, ExpenseBatchDTO, ExpenseResponseDTO
 from app.modules.expenses.models import Expense
 from app.modules.expenses.exceptions import (
     ExpenseNotFoundError,
@@ -415,6 +415,48 @@ class TestDeleteExpenseEndpoint:
         assert exc_info.value.status_code == 404
 
 
+class TestBatchExpensesEndpoint:
+    """PUT /trips/{trip_id}/expenses:batch endpoint"""
+
+    @pytest.fixture
+    def mock_user(self):
+        user = MagicMock(spec=User)
+        user.id = uuid4()
+        user.role = UserRole.EMPLOYEE
+        return user
+
+    @pytest.fixture
+    def mock_service(self):
+        return AsyncMock(spec=ExpensesService)
+
+    @pytest.mark.asyncio
+    async def test_batch_expenses_success(self, mock_service, mock_user):
+
+        trip_id = uuid4()
+        body = ExpenseBatchDTO(create=[CreateExpenseDTO(type="Parking", amount=5.0)], delete=[uuid4()])
+        mock_expenses = [MagicMock(spec=Expense)]
+        mock_service.apply_expense_batch.return_value = mock_expenses
+
+        from app.modules.expenses.router import batch_expenses
+
+        result = await batch_expenses(trip_id=trip_id, body=body, svc=mock_service, current_user=mock_user)
+
+        assert result == mock_expenses
+        mock_service.apply_expense_batch.assert_called_once_with(mock_user.id, trip_id, body)
+
+    @pytest.mark.asyncio
+    async def test_batch_expenses_duplicate(self, mock_service, mock_user):
+
+        mock_service.apply_expense_batch.side_effect = DuplicateExpenseError("Expense type already exists for this trip")
+
+        from app.modules.expenses.router import batch_expenses
+
+        with pytest.raises(HTTPException) as exc_info:
+            await batch_expenses(trip_id=uuid4(), body=ExpenseBatchDTO(), svc=mock_service, current_user=mock_user)
+
+        assert exc_info.value.status_code == 409
+
+
 class TestGetExpensesServiceDependency:
 
     def test_get_expenses_service_returns_service(self):
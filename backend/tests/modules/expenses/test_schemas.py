@@ -3,7 +3,7 @@ from uuid import uuid4
 from datetime import datetime, timezone
 from pydantic import ValidationError
 
-from app.modules.expenses.schemas import CreateExpenseDTO, EditExpenseDTO, ExpenseResponseDTO
+from app.modules.expenses.schemas import MAX_BATCH_OPERATIONS, CreateExpenseDTO, EditExpenseDTO, ExpenseBatchDTO, ExpenseResponseDTO
 
 
 class TestCreateExpenseDTO:
@@ -100,3 +100,39 @@ class TestExpenseResponseDTO:
                 amount=15.50,
                 created_at=datetime.now(timezone.utc)
             )
+
+
+class TestExpenseBatchDTO:
+
+    def test_expense_batch_dto_defaults_empty(self):
+        dto = ExpenseBatchDTO()
+
+        assert dto.create == []
+        assert dto.edit == []
+        assert dto.delete == []
+
+    def test_expense_batch_dto_valid(self):
+        expense_id = uuid4()
+
+        dto = ExpenseBatchDTO(
+            create=[{"type": "Parking", "amount": 5.0}],
+            edit=[{"id": str(expense_id), "amount": 7.5}],
+            delete=[str(uuid4())],
+        )
+
+        assert dto.edit[0].id == expense_id
+        assert dto.edit[0].type is None
+
+    def test_expense_batch_dto_edit_requires_id(self):
+        with pytest.raises(ValidationError):
+            ExpenseBatchDTO(edit=[{"amount": 7.5}])
+
+    def test_expense_batch_dto_rejects_touching_an_expense_twice(self):
+        expense_id = uuid4()
+
+        with pytest.raises(ValidationError):
+            ExpenseBatchDTO(edit=[{"id": expense_id, "amount": 7.5}], delete=[expense_id])
+
+    def test_expense_batch_dto_rejects_too_many_operations(self):
+        with pytest.raises(ValidationError):
+            ExpenseBatchDTO(create=[{"type": f"Type {i}", "amount": 1.0} for i in range(MAX_BATCH_OPERATIONS + 1)])
@@ -5,12 +5,14 @@ from uuid import uuid4
 from app.modules.expenses.service import ExpensesService
 from app.modules.expenses.repository import ExpenseRepo
 from app.modules.trips.repository import TripRepo
-from app.modules.expenses.schemas import CreateExpenseDTO, EditExpenseDTO
+from app.modules.expenses.schemas import BatchEditExpenseDTO, CreateExpenseDTO, EditExpenseDTO, ExpenseBatchDTO
 from app.modules.expenses.models import Expense
 from app.modules.trips.models import Trip
 from app.modules.expenses.exceptions import (
     ExpenseNotFoundError,
-    DuplicateExpenseError
+    DuplicateExpenseError,
+    ExpensePersistenceError,
+    InvalidExpenseDataError,
 )
 from app.modules.trips.exceptions import TripNotFoundError
 
@@ -58,7 +60,6 @@ class TestExpensesServiceCreateExpense:
         trip_repo.get.return_value = mock_trip
         expense_repo.get_by_trip_and_type.return_value = None
         expense_repo.save.return_value = mock_expense
-        expense_repo.sum_by_trip.return_value = 15.50
 
         with patch('app.modules.expenses.service.Expense') as MockExpense:
             MockExpense.return_value = mock_expense
@@ -66,6 +67,22 @@ class TestExpensesServiceCreateExpense:
 
         assert result == mock_expense
         expense_repo.save.assert_called()
+        trip_repo.add_to_expense_total.assert_called_once_with(trip_id, 15.50)
+
+    @pytest.mark.asyncio
+    async def test_create_expense_save_failure_rolls_back_total(
+        self, service, expense_repo, trip_repo, mock_trip, user_id
+    ):
+        trip_id = uuid4()
+        dto = CreateExpenseDTO(type="Parking", amount=15.50)
+        trip_repo.get.return_value = mock_trip
+        expense_repo.get_by_trip_and_type.return_value = None
+        expense_repo.save.side_effect = Exception("db down")
+
+        with pytest.raises(ExpensePersistenceError):
+            await service.create_expense(user_id, trip_id, dto)
+
+        expense_repo.rollback.assert_called_once()
 
     @pytest.mark.asyncio
     async def test_create_expense_trip_not_found(self, service, trip_repo, user_id):
@@ -88,6 +105,24 @@ class TestExpensesServiceCreateExpense:
         with pytest.raises(DuplicateExpenseError):
             await service.create_expense(user_id, trip_id, dto)
 
+        #the trip lock taken for the check is released
+        expense_repo.rollback.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_create_expense_locks_trip_before_reading_expenses(
+        self, service, expense_repo, trip_repo, mock_trip, mock_expense, user_id
+    ):
+        trip_id = uuid4()
+        calls = []
+        trip_repo.get.return_value = mock_trip
+        trip_repo.lock.side_effect = lambda *args: calls.append("lock") or True
+        expense_repo.get_by_trip_and_type.side_effect = lambda *args: calls.append("read")
+        expense_repo.save.return_value = mock_expense
+
+        await service.create_expense(user_id, trip_id, CreateExpenseDTO(type="Parking", amount=15.50))
+
+        assert calls == ["lock", "read"]
+
 
 class TestExpensesServiceGetExpensesForTrip:
 
@@ -218,12 +253,26 @@ class TestExpensesServiceEditExpense:
         trip_repo.get.return_value = mock_trip
         expense_repo.get_by_trip_and_type.return_value = None
         expense_repo.save.return_value = mock_expense
-        expense_repo.sum_by_trip.return_value = 25.00
 
         result = await service.edit_expense(user_id, expense_id, dto)
 
         assert result == mock_expense
         expense_repo.save.assert_called()
+        trip_repo.add_to_expense_total.assert_called_once_with(mock_expense.trip_id, 9.50)
+
+    @pytest.mark.asyncio
+    async def test_edit_expense_delta_uses_amount_read_under_lock(
+        self, service, expense_repo, trip_repo, user_id
+    ):
+        stale = Expense(id=uuid4(), trip_id=uuid4(), type="Parking", amount=15.50)
+        current = Expense(id=stale.id, trip_id=stale.trip_id, type="Parking", amount=20.00)
+        expense_repo.get_expense.side_effect = lambda expense_id, uid, fresh=False: current if fresh else stale
+        expense_repo.save.side_effect = lambda expense: expense
+
+        await service.edit_expense(user_id, stale.id, EditExpenseDTO(amount=25.00))
+
+        trip_repo.lock.assert_called_once_with(stale.trip_id)
+        trip_repo.add_to_expense_total.assert_called_once_with(stale.trip_id, 5.00)
 
     @pytest.mark.asyncio
     async def test_edit_expense_not_found(self, service, expense_repo, user_id):
@@ -249,8 +298,11 @@ class TestExpensesServiceEditExpense:
         with pytest.raises(DuplicateExpenseError):
             await service.edit_expense(user_id, expense_id, dto)
 
+        expense_repo.rollback.assert_called_once()
+        expense_repo.save.assert_not_called()
+
     @pytest.mark.asyncio
-    async def test_edit_expense_no_changes(self, service, expense_repo, mock_expense, user_id):
+    async def test_edit_expense_no_changes(self, service, expense_repo, trip_repo, mock_expense, user_id):
         expense_id = uuid4()
         dto = EditExpenseDTO()
         expense_repo.get_expense.return_value = mock_expense
@@ -260,6 +312,7 @@ class TestExpensesServiceEditExpense:
 
         assert result == mock_expense
         expense_repo.save.assert_called()
+        trip_repo.add_to_expense_total.assert_not_called()
 
 
 class TestExpensesServiceDeleteExpense:
@@ -281,6 +334,7 @@ class TestExpensesServiceDeleteExpense:
         expense = MagicMock(spec=Expense)
         expense.id = uuid4()
         expense.trip_id = uuid4()
+        expense.amount = 15.00
         return expense
 
     @pytest.fixture
@@ -301,11 +355,21 @@ class TestExpensesServiceDeleteExpense:
         expense_id = uuid4()
         expense_repo.get_expense.return_value = mock_expense
         trip_repo.get.return_value = mock_trip
-        expense_repo.sum_by_trip.return_value = 35.00
 
         await service.delete_expense(user_id, expense_id)
 
         expense_repo.delete_expense.assert_called_once_with(mock_expense)
+        trip_repo.add_to_expense_total.assert_called_once_with(mock_expense.trip_id, -15.00)
+
+    @pytest.mark.asyncio
+    async def test_delete_expense_trip_gone(self, service, expense_repo, trip_repo, mock_expense, user_id):
+        expense_repo.get_expense.return_value = mock_expense
+        trip_repo.add_to_expense_total.return_value = None
+
+        with pytest.raises(TripNotFoundError):
+            await service.delete_expense(user_id, uuid4())
+
+        expense_repo.delete_expense.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_delete_expense_not_found(self, service, expense_repo, user_id):
@@ -314,3 +378,190 @@ class TestExpensesServiceDeleteExpense:
 
         with pytest.raises(ExpenseNotFoundError):
             await service.delete_expense(user_id, expense_id)
+
+    @pytest.mark.asyncio
+    async def test_delete_expense_already_deleted_under_lock(
+        self, service, expense_repo, trip_repo, mock_expense, user_id
+    ):
+        #a concurrent delete committed between the first read and the lock
+        expense_repo.get_expense.side_effect = lambda expense_id, uid, fresh=False: None if fresh else mock_expense
+
+        with pytest.raises(ExpenseNotFoundError):
+            await service.delete_expense(user_id, uuid4())
+
+        trip_repo.add_to_expense_total.assert_not_called()
+        expense_repo.delete_expense.assert_not_called()
+        expense_repo.rollback.assert_called_once()
+
+
+class TestExpensesServiceApplyExpenseBatch:
+
+    @pytest.fixture
+    def user_id(self):
+        return uuid4()
+
+    @pytest.fixture
+    def trip_id(self):
+        return uuid4()
+
+    @pytest.fixture
+    def expense_repo(self):
+        return AsyncMock(spec=ExpenseRepo)
+
+    @pytest.fixture
+    def trip_repo(self):
+        return AsyncMock(spec=TripRepo)
+
+    @pytest.fixture
+    def service(self, expense_repo, trip_repo):
+        return ExpensesService(expense_repo, trip_repo)
+
+    def _expense(self, trip_id, expense_type, amount):
+        expense = MagicMock(spec=Expense)
+        expense.id = uuid4()
+        expense.trip_id = trip_id
+        expense.type = expense_type
+        expense.amount = amount
+        return expense
+
+    @pytest.fixture
+    def parking(self, trip_id):
+        return self._expense(trip_id, "Parking", 10.0)
+
+    @pytest.fixture
+    def tolls(self, trip_id):
+        return self._expense(trip_id, "Tolls", 4.0)
+
+    @pytest.fixture(autouse=True)
+    def existing(self, expense_repo, trip_repo, parking, tolls):
+        trip_repo.get.return_value = MagicMock(spec=Trip)
+        expense_repo.get_expenses_by_trip_id.return_value = [parking, tolls]
+
+    @pytest.mark.asyncio
+    async def test_apply_expense_batch_success(
+        self, service, expense_repo, trip_repo, parking, tolls, user_id, trip_id
+    ):
+        dto = ExpenseBatchDTO(
+            create=[CreateExpenseDTO(type=" meals ", amount=12.5)],
+            edit=[BatchEditExpenseDTO(id=parking.id, amount=8.0)],
+            delete=[tolls.id],
+        )
+
+        result = await service.apply_expense_batch(user_id, trip_id, dto)
+
+        created, deleted = expense_repo.apply_batch.call_args.args
+        assert [(expense.type, expense.amount, expense.trip_id) for expense in created] == [("Meals", 12.5, trip_id)]
+        assert deleted == [tolls]
+        assert parking.amount == 8.0
+        #one total update for the net change of the whole batch
+        trip_repo.add_to_expense_total.assert_called_once_with(trip_id, 12.5 - 4.0 - 2.0)
+        expense_repo.get_by_trip_and_type.assert_not_called()
+        assert result == expense_repo.get_expenses_by_trip_id.return_value
+
+    @pytest.mark.asyncio
+    async def test_apply_expense_batch_trip_not_found(self, service, trip_repo, user_id, trip_id):
+        trip_repo.get.return_value = None
+
+        with pytest.raises(TripNotFoundError):
+            await service.apply_expense_batch(user_id, trip_id, ExpenseBatchDTO())
+
+    @pytest.mark.asyncio
+    async def test_apply_expense_batch_unknown_expense(self, service, expense_repo, user_id, trip_id):
+        dto = ExpenseBatchDTO(delete=[uuid4()])
+
+        with pytest.raises(ExpenseNotFoundError):
+            await service.apply_expense_batch(user_id, trip_id, dto)
+
+        expense_repo.apply_batch.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_apply_expense_batch_duplicate_type_leaves_expenses_alone(
+        self, service, expense_repo, parking, user_id, trip_id
+    ):
+        dto = ExpenseBatchDTO(
+            edit=[BatchEditExpenseDTO(id=parking.id, amount=20.0)],
+            create=[CreateExpenseDTO(type="tolls", amount=3.0)],
+        )
+
+        with pytest.raises(DuplicateExpenseError):
+            await service.apply_expense_batch(user_id, trip_id, dto)
+
+        assert parking.amount == 10.0
+        expense_repo.apply_batch.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_apply_expense_batch_frees_type_of_deleted_expense(
+        self, service, expense_repo, tolls, user_id, trip_id
+    ):
+        dto = ExpenseBatchDTO(delete=[tolls.id], create=[CreateExpenseDTO(type="Tolls", amount=6.0)])
+
+        await service.apply_expense_batch(user_id, trip_id, dto)
+
+        expense_repo.apply_batch.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_apply_expense_batch_invalid_amount(self, service, expense_repo, user_id, trip_id):
+        dto = ExpenseBatchDTO(create=[CreateExpenseDTO(type="Meals", amount=0)])
+
+        with pytest.raises(InvalidExpenseDataError):
+            await service.apply_expense_batch(user_id, trip_id, dto)
+
+        expense_repo.apply_batch.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_apply_expense_batch_save_failure_rolls_back(
+        self, service, expense_repo, user_id, trip_id
+    ):
+        expense_repo.apply_batch.side_effect = Exception("db down")
+
+        with pytest.raises(ExpensePersistenceError):
+            await service.apply_expense_batch(user_id, trip_id, ExpenseBatchDTO(create=[CreateExpenseDTO(type="Meals", amount=2.0)]))
+
+        expense_repo.rollback.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_apply_expense_batch_locks_trip_before_loading_expenses(
+        self, service, expense_repo, trip_repo, parking, user_id, trip_id
+    ):
+        calls = []
+        trip_repo.lock.side_effect = lambda *args, **kwargs: calls.append("lock") or True
+        expense_repo.get_expenses_by_trip_id.side_effect = lambda *args, **kwargs: calls.append(kwargs.get("fresh")) or [parking]
+
+        await service.apply_expense_batch(user_id, trip_id, ExpenseBatchDTO(edit=[BatchEditExpenseDTO(id=parking.id, amount=3.0)]))
+
+        #the amounts the delta is built from are read under the lock
+        assert calls[:2] == ["lock", True]
+        trip_repo.add_to_expense_total.assert_called_once_with(trip_id, 3.0 - 10.0)
+
+    @pytest.mark.asyncio
+    async def test_apply_expense_batch_rejected_batch_releases_lock(self, service, expense_repo, user_id, trip_id):
+        with pytest.raises(ExpenseNotFoundError):
+            await service.apply_expense_batch(user_id, trip_id, ExpenseBatchDTO(delete=[uuid4()]))
+
+        expense_repo.rollback.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_apply_expense_batch_trip_deleted_before_lock(self, service, expense_repo, trip_repo, user_id, trip_id):
+        trip_repo.lock.return_value = False
+
+        with pytest.raises(TripNotFoundError):
+            await service.apply_expense_batch(user_id, trip_id, ExpenseBatchDTO(create=[CreateExpenseDTO(type="Meals", amount=2.0)]))
+
+        expense_repo.get_expenses_by_trip_id.assert_not_called()
+        expense_repo.apply_batch.assert_not_called()
+
+    def test_check_new_trip_batch_rejects_what_the_batch_would(self, service, expense_repo, trip_repo, user_id):
+        with pytest.raises(DuplicateExpenseError):
+            service.check_new_trip_batch(user_id, ExpenseBatchDTO(create=[
+                CreateExpenseDTO(type="Parking", amount=1.0),
+                CreateExpenseDTO(type="parking", amount=2.0),
+            ]))
+        with pytest.raises(InvalidExpenseDataError):
+            service.check_new_trip_batch(user_id, ExpenseBatchDTO(create=[CreateExpenseDTO(type="  ", amount=1.0)]))
+        with pytest.raises(ExpenseNotFoundError):
+            service.check_new_trip_batch(user_id, ExpenseBatchDTO(delete=[uuid4()]))
+
+        service.check_new_trip_batch(user_id, ExpenseBatchDTO(create=[CreateExpenseDTO(type="Parking", amount=1.0)]))
+        #nothing is read or written
+        assert not expense_repo.mock_calls
+        assert not trip_repo.mock_calls
@@ -0,0 +1,104 @@
+import os
+import pickle
+import signal
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timezone
+
+import pytest
+
+from app.core.process_pool import ProcessPool
+from app.modules.reports import renderer_fpdf
+from app.modules.reports.data_builder import ExpenseReportItem, ReportData, TripReportItem
+from app.modules.reports.renderer_fpdf import ReportPDFRenderer, render_report
+
+
+def _report_data(trips: int = 3) -> ReportData:
+    return ReportData(
+        employee_name="Test User",
+        employee_email="test@example.com",
+        period_start=date(2025, 3, 1),
+        period_end=date(2025, 3, 31),
+        generated_at=datetime(2025, 4, 1, 9, 30, tzinfo=timezone.utc),
+        trips=[
+            TripReportItem(
+                date=date(2025, 3, 1 + index % 28),
+                purpose=f"Client visit {index}",
+                miles=12.5,
+                category_name="Business",
+                rate_used=0.7,
+                mileage_total=8.75,
+            )
+            for index in range(trips)
+        ],
+        expenses=[ExpenseReportItem(date=date(2025, 3, 2), type="Parking", amount=12.0)],
+        total_miles=12.5 * trips,
+        total_mileage_amount=8.75 * trips,
+        total_expense_amount=12.0,
+        grand_total=8.75 * trips + 12.0,
+    )
+
+
+def _die():
+    #top level so the pool can pickle it, takes the worker process down like the oom killer would
+    os._exit(1)
+
+
+class TestReportPDFRenderer:
+
+    def test_report_data_survives_the_process_boundary(self):
+        data = _report_data()
+
+        assert pickle.loads(pickle.dumps(data)) == data
+
+    def test_render_report_matches_inline_render(self):
+        data = _report_data()
+
+        pdf = render_report(data)
+
+        assert pdf.startswith(b"%PDF")
+        assert len(pdf) == len(ReportPDFRenderer().render(data))
+
+    async def test_render_async_renders_in_a_worker_process(self):
+        pdf = await ReportPDFRenderer().render_async(_report_data(trips=50))
+
+        assert pdf.startswith(b"%PDF")
+
+    async def test_render_async_survives_a_dead_worker(self):
+        renderer = ReportPDFRenderer()
+        await renderer.render_async(_report_data())
+
+        for process in list(renderer_fpdf._pool._get_executor()._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+            process.join()
+
+        pdf = await renderer.render_async(_report_data())
+
+        assert pdf.startswith(b"%PDF")
+
+
+class TestProcessPool:
+
+    async def test_broken_pool_is_rebuilt(self):
+        pool = ProcessPool(max_workers=1)
+        try:
+            #dies on the first try and on the retry, the error gets through
+            with pytest.raises(BrokenProcessPool):
+                await pool.run(_die)
+
+            #the next call gets a working pool instead of the broken one
+            assert (await pool.run(render_report, _report_data())).startswith(b"%PDF")
+        finally:
+            pool.shutdown()
+
+    async def test_shutdown_stops_workers_and_pool_restarts(self):
+        pool = ProcessPool(max_workers=1)
+        try:
+            await pool.run(render_report, _report_data())
+            processes = list(pool._get_executor()._processes.values())
+
+            pool.shutdown()
+
+            assert all(not process.is_alive() for process in processes)
+            assert (await pool.run(render_report, _report_data())).startswith(b"%PDF")
+        finally:
+            pool.shutdown()
@@ -7,6 +7,7 @@ from app.modules.reports.service import ReportsService
 from app.modules.reports.repository import ReportRepository
 from app.modules.reports.schemas import GenerateReportDTO, AnalyticsResponse
 from app.modules.reports.models import Report, ReportStatus
+from app.modules.reports.ports import QueuePort, StoragePort
 from app.modules.reports.exceptions import (
     ReportNotFoundError, ReportPermissionError, ReportRateLimitError,
     ReportSystemLimitError, ReportMaxRetriesError, ReportInvalidStateError,
@@ -33,13 +34,13 @@ class TestReportsService:
     @pytest.fixture
     def mock_renderer(self):
         renderer = MagicMock()
-        renderer.render.return_value = b"pdf_content"
+        renderer.render_async = AsyncMock(return_value=b"pdf_content")
         return renderer
 
     @pytest.fixture
     def mock_storage(self):
         # Mock the storage methods directly instead of using real S3ReportStorage
-        storage = MagicMock()
+        storage = AsyncMock(spec=StoragePort)
         storage.exists.return_value = True
         storage.get_signed_url.return_value = "http://example.com/report.pdf"
         storage.save.return_value = "report_file.pdf"
@@ -48,16 +49,21 @@ class TestReportsService:
     @pytest.fixture
     def mock_queue(self):
         # Mock the queue methods directly instead of using real ReportQueue
-        queue = MagicMock()
+        queue = AsyncMock(spec=QueuePort)
         queue.send.return_value = None
         return queue
 
+    @pytest.fixture
+    def mock_rollup_repo(self):
+        return AsyncMock()
+
     @pytest.fixture
     def service(self, mock_session, mock_repo, mock_data_builder, 
-                mock_renderer, mock_storage, mock_queue):
+                mock_renderer, mock_storage, mock_queue, mock_rollup_repo):
         return ReportsService(
             mock_session, mock_repo, mock_data_builder,
-            mock_renderer, mock_storage, mock_queue
+            mock_renderer, mock_storage, mock_queue,
+            rollup_repo=mock_rollup_repo
         )
 
     @pytest.fixture
@@ -271,7 +277,7 @@ class TestGetDownloadUrl(TestReportsService):
         sample_report.status = ReportStatus.completed
         sample_report.expires_at = datetime.now(timezone.utc) + timedelta(days=30)
         mock_repo.get_by_id.return_value = sample_report
-        mock_storage.exists = MagicMock(return_value=False)
+        mock_storage.exists.return_value = False
 
         with pytest.raises(ReportExpiredError):
             await service.get_download_url(report_id, user_id)
@@ -339,7 +345,7 @@ class TestGenerateNow(TestReportsService):
     ):
         mock_repo.get_by_id.return_value = sample_report
         mock_data_builder.build.return_value = {"test": "data"}
-        mock_renderer.render.return_value = b"pdf_content"
+        mock_renderer.render_async.return_value = b"pdf_content"
         mock_storage.save.return_value = "report_file.pdf"
 
         result = await service.generate_now(report_id)
@@ -352,7 +358,7 @@ class TestGenerateNow(TestReportsService):
         assert sample_report.expires_at is not None
         
         mock_data_builder.build.assert_called_once_with(sample_report)
-        mock_renderer.render.assert_called_once_with({"test": "data"})
+        mock_renderer.render_async.assert_awaited_once_with({"test": "data"})
         mock_storage.save.assert_called_once_with(report_id, b"pdf_content")
         mock_session.commit.assert_called_once()
 
@@ -373,31 +379,32 @@ class TestGetAnalytics(TestReportsService):
         user.id = uuid4()
         return user
 
-    @pytest.fixture
-    def mock_trip_data(self):
-        """Mock trip data with category information"""
-        data = MagicMock()
-        trip1 = MagicMock()
-        trip1.category_name = "Business"
-        trip2 = MagicMock()
-        trip2.category_name = "Business"
-        trip3 = MagicMock()
-        trip3.category_name = "Personal"
-        data.trips = [trip1, trip2, trip3]
-        data.total_miles = 150.5
-        data.grand_total = 95.25
-        return data
+    def _row(self, category_name, trip_count, miles, mileage_total, expense_total):
+        row = MagicMock()
+        row.category_name = category_name
+        row.trip_count = trip_count
+        row.total_miles = miles
+        row.mileage_reimbursement_total = mileage_total
+        row.expense_reimbursement_total = expense_total
+        return row
 
     @pytest.mark.asyncio
     async def test_get_analytics_success(
-        self, service, mock_user, mock_data_builder, mock_trip_data
+        self, service, mock_user, mock_data_builder, mock_rollup_repo
     ):
-        mock_data_builder.build.return_value = mock_trip_data
+        mock_rollup_repo.get_category_totals.return_value = [
+            self._row("Business", 2, 100.5, 60.0, 10.25),
+            self._row("Personal", 1, 50.0, 25.0, 0.0),
+        ]
 
-        with patch('app.modules.reports.service.Report'):
-            result = await service.get_analytics(mock_user, "January")
+        result = await service.get_analytics(mock_user, "January")
 
-        mock_data_builder.build.assert_called_once()
+        mock_rollup_repo.get_category_totals.assert_called_once()
+        args = mock_rollup_repo.get_category_totals.call_args.args
+        assert args[0] == mock_user.id
+        assert args[1].month == 1 and args[1].day == 1
+        assert args[2].month == 1 and args[2].day == 31
+        mock_data_builder.build.assert_not_called()
         assert result.total_miles == 150.5
         assert result.grand_total == 95.25
         assert result.category_counts == {"Business": 2, "Personal": 1}
@@ -410,30 +417,24 @@ class TestGetAnalytics(TestReportsService):
         assert "Invalid Month" in str(exc_info.value)
 
     @pytest.mark.asyncio
-    async def test_get_analytics_data_builder_failure(
-        self, service, mock_user, mock_data_builder
+    async def test_get_analytics_rollup_failure(
+        self, service, mock_user, mock_rollup_repo
     ):
-        mock_data_builder.build.side_effect = Exception("Database error")
+        mock_rollup_repo.get_category_totals.side_effect = Exception("Database error")
 
-        with patch('app.modules.reports.service.Report'):
-            with pytest.raises(InvalidDataAnalyticsError) as exc_info:
-                await service.get_analytics(mock_user, "January")
+        with pytest.raises(InvalidDataAnalyticsError) as exc_info:
+            await service.get_analytics(mock_user, "January")
         
         assert "Failed to gather data" in str(exc_info.value)
 
     @pytest.mark.asyncio
     async def test_get_analytics_empty_trips(
-        self, service, mock_user, mock_data_builder
+        self, service, mock_user, mock_rollup_repo
     ):
-        empty_data = MagicMock()
-        empty_data.trips = []
-        empty_data.total_miles = 0.0
-        empty_data.grand_total = 0.0
-        mock_data_builder.build.return_value = empty_data
+        mock_rollup_repo.get_category_totals.return_value = []
 
-        with patch('app.modules.reports.service.Report'):
-            result = await service.get_analytics(mock_user, "February")
+        result = await service.get_analytics(mock_user, "February")
 
         assert result.total_miles == 0.0
         assert result.grand_total == 0.0
-        assert result.category_counts == {}
\ No newline at end of file
+        assert result.category_counts == {}
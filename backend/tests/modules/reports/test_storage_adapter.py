@@ -0,0 +1,178 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+from botocore.exceptions import ClientError
+
+from app import aws_client
+#imported directly, like the adapters do, since the root conftest patches them on the module
+from app.aws_client import get_s3_client, get_sqs_client
+from app.config import settings
+from app.core.storage import ReceiptStorage
+from app.infra.adapters.s3_report_storage_adapter import S3ReportStorageAdapter
+from app.infra.adapters.sqs_report_queue_adapter import SQSReportQueueAdapter
+
+BOTO_CALL_SECONDS = 0.2
+
+
+async def _max_loop_stall(call) -> float:
+    """Run call while a ticker measures the longest time the event loop went without running it."""
+    stall = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal stall
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            stall = max(stall, now - last)
+            last = now
+
+    ticking = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    try:
+        await call()
+    finally:
+        done = True
+        await ticking
+    return stall
+
+
+def _slow(result=None):
+    def call(*args, **kwargs):
+        time.sleep(BOTO_CALL_SECONDS)
+        return result
+    return call
+
+
+class TestS3ReportStorageAdapter:
+
+    @pytest.fixture
+    def s3(self):
+        client = MagicMock()
+        client.generate_presigned_url.side_effect = ["url-1", "url-2"]
+        with patch("app.infra.adapters.s3_report_storage_adapter.get_s3_client", return_value=client):
+            yield client
+
+    async def test_signed_url_is_reused_across_requests(self, s3):
+        assert await S3ReportStorageAdapter().get_signed_url("report_1.pdf") == "url-1"
+        assert await S3ReportStorageAdapter().get_signed_url("report_1.pdf") == "url-1"
+        s3.generate_presigned_url.assert_called_once()
+
+    async def test_existing_report_is_only_checked_once(self, s3):
+        storage = S3ReportStorageAdapter()
+
+        assert await storage.exists("report_1.pdf") is True
+        assert await storage.exists("report_1.pdf") is True
+        s3.head_object.assert_called_once()
+
+    async def test_missing_report_is_checked_every_time(self, s3):
+        s3.head_object.side_effect = ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        storage = S3ReportStorageAdapter()
+
+        assert await storage.exists("report_1.pdf") is False
+        assert await storage.exists("report_1.pdf") is False
+        assert s3.head_object.call_count == 2
+
+    async def test_delete_invalidates_cached_entries(self, s3):
+        storage = S3ReportStorageAdapter()
+        await storage.get_signed_url("report_1.pdf")
+        await storage.exists("report_1.pdf")
+
+        assert await storage.delete("report_1.pdf") is True
+        s3.head_object.side_effect = ClientError({"Error": {"Code": "404"}}, "HeadObject")
+
+        assert await storage.exists("report_1.pdf") is False
+        assert await storage.get_signed_url("report_1.pdf") == "url-2"
+
+    async def test_slow_s3_calls_do_not_stall_the_event_loop(self, s3):
+        s3.put_object.side_effect = _slow({"ETag": "etag"})
+        s3.head_object.side_effect = _slow({})
+        s3.generate_presigned_url.side_effect = _slow("url")
+        storage = S3ReportStorageAdapter()
+
+        async def calls():
+            assert await storage.save("1", b"%PDF") == "report_1.pdf"
+            assert await storage.exists("report_1.pdf") is True
+            assert await storage.get_signed_url("report_1.pdf") == "url"
+
+        stall = await _max_loop_stall(calls)
+
+        #three blocking calls of 0.2s each would stall the loop for as long if run inline
+        assert stall < BOTO_CALL_SECONDS / 2
+
+
+class TestSQSReportQueueAdapter:
+
+    @pytest.fixture
+    def sqs(self):
+        client = MagicMock()
+        client.get_queue_url.return_value = {"QueueUrl": "test-queue-url"}
+        with patch("app.infra.adapters.sqs_report_queue_adapter.get_sqs_client", return_value=client):
+            yield client
+
+    async def test_building_the_adapter_makes_no_calls(self, sqs):
+        SQSReportQueueAdapter()
+
+        sqs.get_queue_url.assert_not_called()
+
+    async def test_send_looks_up_the_queue_once_per_process(self, sqs):
+        #the api builds a new adapter for every request
+        await SQSReportQueueAdapter().send("report-1")
+        await SQSReportQueueAdapter().send("report-2")
+
+        sqs.get_queue_url.assert_called_once()
+        assert [call.kwargs["MessageBody"] for call in sqs.send_message.call_args_list] == [
+            '{"report_id": "report-1"}',
+            '{"report_id": "report-2"}',
+        ]
+        assert sqs.send_message.call_args.kwargs["QueueUrl"] == "test-queue-url"
+
+    async def test_slow_send_does_not_stall_the_event_loop(self, sqs):
+        sqs.get_queue_url.side_effect = _slow({"QueueUrl": "test-queue-url"})
+        sqs.send_message.side_effect = _slow({"MessageId": "1"})
+        queue = SQSReportQueueAdapter()
+
+        stall = await _max_loop_stall(lambda: queue.send("report-1"))
+
+        assert stall < BOTO_CALL_SECONDS / 2
+
+
+class TestAwsClientRegistry:
+
+    def test_clients_are_built_once_per_process(self):
+        with patch("app.aws_client.boto3.client", side_effect=lambda service, **kwargs: MagicMock(service=service)) as build:
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                clients = list(pool.map(lambda _: get_sqs_client(), range(32)))
+            s3 = get_s3_client()
+
+        assert all(client is clients[0] for client in clients)
+        assert s3 is get_s3_client()
+        assert build.call_count == 2
+        config = build.call_args.kwargs["config"]
+        assert config.max_pool_connections == settings.AWS_MAX_POOL_CONNECTIONS
+
+    def test_receipt_storage_shares_one_client(self, monkeypatch):
+        monkeypatch.setattr(settings, "AWS_S3_BUCKET", "receipts")
+        with patch("app.aws_client.boto3.client", side_effect=lambda service, **kwargs: MagicMock()) as build:
+            first = ReceiptStorage.from_settings()
+            second = ReceiptStorage.from_settings()
+
+        assert first._client is second._client
+        build.assert_called_once()
+        assert build.call_args.kwargs["config"].s3 == {"addressing_style": "virtual"}
+
+    def test_queue_url_is_resolved_once(self):
+        client = MagicMock()
+        client.get_queue_url.return_value = {"QueueUrl": "test-queue-url"}
+
+        assert aws_client.get_queue_url(client, "reports") == "test-queue-url"
+        assert aws_client.get_queue_url(client, "reports") == "test-queue-url"
+        client.get_queue_url.assert_called_once_with(QueueName="reports")
+
+        aws_client.reset_clients()
+        aws_client.get_queue_url(client, "reports")
+        assert client.get_queue_url.call_count == 2
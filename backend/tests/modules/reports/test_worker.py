@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from uuid import uuid4
@@ -5,6 +6,7 @@ import json
 
 from app.worker import ReportWorker
 from app.modules.reports.models import Report, ReportStatus
+from tests.modules.reports.test_storage_adapter import BOTO_CALL_SECONDS, _max_loop_stall, _slow
 
 
 class TestReportWorker:
@@ -161,4 +163,143 @@ class TestReportWorker:
             
             assert result is False
             # Should not commit if report not found
-            mock_session.commit.assert_not_called()
\ No newline at end of file
+            mock_session.commit.assert_not_called()
+
+class TestConcurrentReportWorker:
+
+    @pytest.fixture
+    def sqs(self):
+        sqs = MagicMock()
+        sqs.get_queue_url.return_value = {"QueueUrl": "test-queue-url"}
+        sqs.delete_message_batch.return_value = {"Successful": [], "Failed": []}
+        return sqs
+
+    @pytest.fixture
+    def worker(self, sqs):
+        with patch('app.worker.get_sqs_client', return_value=sqs):
+            worker = ReportWorker(concurrency=2)
+        worker.cleanup_stuck_reports_on_startup = AsyncMock()
+        worker.periodic_cleanup = AsyncMock()
+        return worker
+
+    def _messages(self, count):
+        return [
+            {
+                "MessageId": f"message-{index}",
+                "Body": json.dumps({"report_id": f"report-{index}"}),
+                "ReceiptHandle": f"handle-{index}",
+                "Attributes": {"ApproximateReceiveCount": "1"},
+            }
+            for index in range(count)
+        ]
+
+    async def test_renders_concurrently_and_receives_only_for_free_slots(self, worker, sqs):
+        queue = self._messages(7)
+        rendering = set()
+        peak = 0
+        polls = []
+
+        def receive_message(**kwargs):
+            polls.append((kwargs["MaxNumberOfMessages"], len(rendering)))
+            if not queue:
+                raise RuntimeError("queue drained")
+            batch = queue[:kwargs["MaxNumberOfMessages"]]
+            del queue[:len(batch)]
+            return {"Messages": batch}
+
+        async def process_report(report_id, receipt_handle):
+            nonlocal peak
+            rendering.add(report_id)
+            peak = max(peak, len(rendering))
+            #uneven render times, so one slot frees up while the other report is still rendering
+            await asyncio.sleep(0.01 * (1 + int(report_id.split("-")[1]) % 3))
+            rendering.discard(report_id)
+            worker.finish(receipt_handle)
+            return True
+
+        sqs.receive_message.side_effect = receive_message
+        worker.process_report = process_report
+
+        with pytest.raises(RuntimeError):
+            await worker.start()
+
+        assert peak == 2
+        #nothing is received to wait for a slot, later polls happen while the other report renders
+        assert polls[0] == (2, 0)
+        assert all(requested + rendering_then <= 2 for requested, rendering_then in polls)
+        assert any(rendering_then > 0 for _, rendering_then in polls[1:])
+        deleted = [
+            entry["ReceiptHandle"]
+            for call in sqs.delete_message_batch.call_args_list
+            for entry in call.kwargs["Entries"]
+        ]
+        assert sorted(deleted) == sorted(f"handle-{index}" for index in range(7))
+        sqs.delete_message.assert_not_called()
+
+    async def test_visibility_is_extended_while_a_report_renders(self, worker, sqs):
+        message = self._messages(1)[0]
+
+        async def handle_message(message):
+            #renders until the message was extended twice
+            while sqs.change_message_visibility.call_count < 2:
+                await asyncio.sleep(0.01)
+
+        worker.handle_message = handle_message
+
+        with patch('app.worker.VISIBILITY_HEARTBEAT_SECONDS', 0.01):
+            await asyncio.wait_for(worker.run_job(message), timeout=5)
+            extended = sqs.change_message_visibility.call_count
+            await asyncio.sleep(0.03)
+
+        assert extended >= 2
+        #the heartbeat stops with the job
+        assert sqs.change_message_visibility.call_count == extended
+        assert sqs.change_message_visibility.call_args.kwargs == {
+            "QueueUrl": "test-queue-url",
+            "ReceiptHandle": "handle-0",
+            "VisibilityTimeout": 60,
+        }
+
+    async def test_failed_reports_are_not_deleted(self, worker, sqs):
+        messages = self._messages(2)
+        sqs.receive_message.side_effect = [{"Messages": messages}, RuntimeError("stop")]
+
+        async def process_report(report_id, receipt_handle):
+            if report_id == "report-0":
+                worker.finish(receipt_handle)
+                return True
+            return False
+
+        worker.process_report = process_report
+
+        with pytest.raises(RuntimeError):
+            await worker.start()
+
+        entries = sqs.delete_message_batch.call_args.kwargs["Entries"]
+        assert [entry["ReceiptHandle"] for entry in entries] == ["handle-0"]
+
+    async def test_long_poll_does_not_stall_the_event_loop(self, worker, sqs):
+        sqs.receive_message.side_effect = _slow({"Messages": []})
+        sqs.delete_message_batch.side_effect = _slow({"Successful": [], "Failed": []})
+        worker.finish("handle-0")
+
+        async def poll():
+            await worker.delete_finished()
+            assert await worker.receive(10) == []
+
+        assert await _max_loop_stall(poll) < BOTO_CALL_SECONDS / 2
+
+    async def test_deletes_are_sent_ten_at_a_time(self, worker, sqs):
+        sqs.delete_message_batch.side_effect = [
+            {"Successful": [], "Failed": [{"Id": "3", "Code": "ReceiptHandleIsInvalid", "Message": "expired"}]},
+            Exception("throttled"),
+            {"Successful": [], "Failed": []},
+        ]
+        for index in range(23):
+            worker.finish(f"handle-{index}")
+
+        await worker.delete_finished()
+
+        sizes = [len(call.kwargs["Entries"]) for call in sqs.delete_message_batch.call_args_list]
+        assert sizes == [10, 10, 3]
+        assert worker._finished == []
@@ -0,0 +1,56 @@
+from uuid import uuid4
+
+from app.modules.trips.utils.blind_index import (
+    MAX_WORDS,
+    TOKEN_BYTES,
+    address_tokens,
+    address_words,
+    full_address_token,
+    normalize_address,
+    word_tokens,
+)
+
+
+class TestNormalizeAddress:
+
+    def test_case_punctuation_and_spacing_are_ignored(self):
+        assert normalize_address("123 Main St., Apt #4B") == normalize_address("  123 main st apt 4b ")
+        assert normalize_address("123 Main St., Apt #4B") == "123 main st apt 4b"
+
+    def test_unicode_is_folded(self):
+        assert normalize_address("STRASSE São Paulo") == normalize_address("strasse são paulo")
+        assert normalize_address("ＡＢＣ") == "abc"
+
+    def test_words_are_unique_and_capped(self):
+        assert address_words("1 Main St Main St") == ["1", "main", "st"]
+        assert len(address_words(" ".join(str(i) for i in range(100)))) == MAX_WORDS
+
+
+class TestTokens:
+
+    def test_tokens_are_deterministic_per_user(self):
+        user_id = uuid4()
+
+        assert full_address_token(user_id, "1 Main St") == full_address_token(user_id, "1 main st.")
+        assert len(full_address_token(user_id, "1 Main St")) == TOKEN_BYTES
+
+    def test_tokens_differ_between_users(self):
+        assert full_address_token(uuid4(), "1 Main St") != full_address_token(uuid4(), "1 Main St")
+
+    def test_full_address_and_word_tokens_differ(self):
+        user_id = uuid4()
+
+        #a one word address must not match every address containing that word
+        assert full_address_token(user_id, "Office") not in word_tokens(user_id, "Office")
+
+    def test_address_tokens_has_full_token_then_words(self):
+        user_id = uuid4()
+
+        tokens = address_tokens(user_id, "500 Client Plaza")
+
+        assert tokens[0] == full_address_token(user_id, "500 Client Plaza")
+        assert tokens[1:] == word_tokens(user_id, "500 Client Plaza")
+
+    def test_empty_address_has_no_tokens(self):
+        assert address_tokens(uuid4(), " ,. ") == []
+        assert full_address_token(uuid4(), "") is None
@@ -1,5 +1,31 @@
+import base64
+import os
 import pytest
-from app.modules.trips.utils.crypto import encrypt_address, decrypt_address, encrypt_geometry, decrypt_geometry
+import json
+from unittest.mock import patch
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet
+from app.config import settings
+from app.modules.trips.utils import crypto
+from app.modules.trips.utils.crypto import (
+    BATCH_DECRYPT_MIN_SIZE,
+    ENVELOPE_V2,
+    GEOMETRY_FORMAT_V1,
+    _decrypt_pool,
+    active_key_id,
+    decrypt_addresses,
+    decrypt_cache,
+    decrypt_geometries,
+    f,
+    encrypt_address,
+    decrypt_address,
+    encrypt_geometry,
+    decrypt_geometry,
+    is_legacy_geometry,
+    open_envelope,
+    seal,
+)
+from app.modules.trips.utils.geometry_codec import encode_geometry
 
 
 class TestEncryptAddress:
@@ -159,13 +185,13 @@ class TestEncryptGeometry:
         encrypted = encrypt_geometry(geometry)
         
         assert encrypted != geometry
-        assert isinstance(encrypted, str)
+        assert isinstance(encrypted, bytes)
         assert len(encrypted) > 0
 
     def test_encrypt_geometry_with_empty_dict(self):
         result = encrypt_geometry({})
         
-        assert result == ""
+        assert result == b""
 
     def test_encrypt_geometry_with_complex_geojson(self):
         geometry = {"type":"Polygon","coordinates":[[[-122.4,37.8],[-122.4,37.7],[-122.3,37.7],[-122.3,37.8],[-122.4,37.8]]]}
@@ -173,7 +199,7 @@ class TestEncryptGeometry:
         encrypted = encrypt_geometry(geometry)
         
         assert encrypted != geometry
-        assert isinstance(encrypted, str)
+        assert isinstance(encrypted, bytes)
         assert len(encrypted) > 0
 
     def test_encrypt_geometry_is_non_deterministic(self):
@@ -223,7 +249,7 @@ class TestDecryptGeometry:
         original = {"type":"Point","coordinates":[-122.4194,37.7749]}
         encrypted = encrypt_geometry(original)
         
-        corrupted = encrypted[:-5] + "XXXXX"
+        corrupted = encrypted[:-5] + b"XXXXX"
         
         with pytest.raises(Exception):
             decrypt_geometry(corrupted)
@@ -262,4 +288,233 @@ class TestGeometryRoundTripEncryption:
         encrypted = encrypt_geometry(large_geometry)
         decrypted = decrypt_geometry(encrypted)
         
-        assert decrypted == large_geometry
+        #linestrings are quantized to 1e-6 degrees
+        assert decrypted["type"] == "LineString"
+        assert len(decrypted["coordinates"]) == len(coordinates)
+        for actual, expected in zip(decrypted["coordinates"], coordinates):
+            assert actual == pytest.approx(expected, abs=1e-6)
+
+    def test_geometry_binary_format_is_smaller_than_legacy(self):
+        coordinates = [[-122.4194 + i*0.0001, 37.7749 + i*0.00005] for i in range(5000)]
+        geometry = {"type":"LineString","coordinates":coordinates}
+
+        legacy = f.encrypt(json.dumps(geometry, separators=(',', ':')).encode())
+
+        assert len(encrypt_geometry(geometry)) * 5 < len(legacy)
+
+
+class TestLegacyGeometryFormat:
+
+    def test_decrypt_geometry_reads_legacy_text_token(self):
+        geometry = {"type":"LineString","coordinates":[[-122.4194,37.7749],[-122.4094,37.7849]]}
+        legacy = f.encrypt(json.dumps(geometry).encode()).decode()
+
+        assert is_legacy_geometry(legacy)
+        assert decrypt_geometry(legacy) == geometry
+
+    def test_decrypt_geometry_reads_legacy_bytes_from_converted_column(self):
+        geometry = {"type":"Point","coordinates":[-122.4194,37.7749]}
+        legacy = f.encrypt(json.dumps(geometry).encode())
+
+        assert is_legacy_geometry(legacy)
+        assert decrypt_geometry(legacy) == geometry
+
+    def test_new_rows_are_not_legacy(self):
+        encrypted = encrypt_geometry({"type":"Point","coordinates":[-122.4194,37.7749]})
+
+        assert not is_legacy_geometry(encrypted)
+
+
+class TestEnvelopeFormat:
+
+    def test_envelope_header(self):
+        envelope = seal(b"payload")
+
+        assert envelope[0] == ENVELOPE_V2
+        assert envelope[1] == active_key_id
+        assert len(envelope) == 2 + 12 + len(b"payload") + 16
+        assert open_envelope(envelope) == b"payload"
+
+    def test_new_geometry_rows_use_envelope(self):
+        encrypted = encrypt_geometry({"type":"Point","coordinates":[-122.4194,37.7749]})
+
+        assert encrypted[0] == ENVELOPE_V2
+
+    def test_address_envelope_is_smaller_than_fernet(self):
+        address = "123 Main St, Springfield, IL 62701"
+
+        assert len(encrypt_address(address)) < len(f.encrypt(address.encode()).decode())
+
+    def test_fernet_address_still_decrypts(self):
+        token = f.encrypt("77 Old Format Rd".encode()).decode()
+
+        assert decrypt_address(token) == "77 Old Format Rd"
+
+    def test_v1_geometry_still_decrypts(self):
+        geometry = {"type":"LineString","coordinates":[[-122.4194,37.7749],[-122.4094,37.7849]]}
+        token = f.encrypt(encode_geometry(geometry))
+        v1 = bytes([GEOMETRY_FORMAT_V1]) + base64.urlsafe_b64decode(token)
+
+        assert not is_legacy_geometry(v1)
+        assert decrypt_geometry(v1)["coordinates"][1] == pytest.approx([-122.4094, 37.7849])
+
+    def test_tampered_header_is_rejected(self):
+        envelope = bytearray(seal(b"payload"))
+        envelope[1] = (envelope[1] + 1) % 256
+
+        with pytest.raises(Exception):
+            open_envelope(bytes(envelope))
+
+    def test_unknown_key_id_is_rejected(self):
+        envelope = bytearray(seal(b"payload"))
+        envelope[1] = 200
+
+        with pytest.raises(ValueError, match="Unknown field encryption key id"):
+            open_envelope(bytes(envelope))
+
+
+class TestDecryptCaching:
+
+    def test_repeat_address_decrypt_is_cached(self):
+        encrypted = encrypt_address("42 Cache Ln")
+
+        assert decrypt_address(encrypted) == "42 Cache Ln"
+        with patch('app.modules.trips.utils.crypto._decrypt_address', side_effect=AssertionError("should be cached")):
+            assert decrypt_address(encrypted) == "42 Cache Ln"
+
+    def test_repeat_geometry_decrypt_is_cached(self):
+        geometry = {"type":"LineString","coordinates":[[-122.4194,37.7749],[-122.4094,37.7849]]}
+        encrypted = encrypt_geometry(geometry)
+
+        assert decrypt_geometry(encrypted)["type"] == "LineString"
+        with patch('app.modules.trips.utils.crypto._decrypt_geometry', side_effect=AssertionError("should be cached")):
+            assert decrypt_geometry(encrypted)["coordinates"][0] == pytest.approx([-122.4194, 37.7749])
+
+    def test_mutating_a_decrypted_geometry_leaves_the_cache_alone(self):
+        geometry = {"type":"LineString","coordinates":[[-122.4194,37.7749],[-122.4094,37.7849]]}
+        encrypted = encrypt_geometry(geometry)
+
+        first = decrypt_geometry(encrypted)
+        first["coordinates"][0][0] = 0.0
+        first["coordinates"].append([1.0, 1.0])
+        first["type"] = "Point"
+
+        second = decrypt_geometry(encrypted)
+        assert second["type"] == "LineString"
+        assert len(second["coordinates"]) == 2
+        assert second["coordinates"][0] == pytest.approx([-122.4194, 37.7749])
+
+
+class TestBatchDecrypt:
+
+    @pytest.mark.asyncio
+    async def test_small_batch_keeps_order(self):
+        tokens = [encrypt_address(f"{i} Batch St") for i in range(3)]
+
+        result = await decrypt_addresses(tokens + [None, tokens[0]])
+
+        assert result == ["0 Batch St", "1 Batch St", "2 Batch St", "", "0 Batch St"]
+
+    @pytest.mark.asyncio
+    async def test_large_batch_uses_pool(self):
+        decrypt_cache.clear()
+        tokens = [encrypt_address(f"{i} Pool Ave") for i in range(BATCH_DECRYPT_MIN_SIZE * 2)]
+
+        with patch('app.modules.trips.utils.crypto._decrypt_pool', wraps=_decrypt_pool) as pool:
+            result = await decrypt_addresses(tokens)
+            assert pool.submit.called
+
+        assert result == [f"{i} Pool Ave" for i in range(BATCH_DECRYPT_MIN_SIZE * 2)]
+
+    @pytest.mark.asyncio
+    async def test_geometry_batch(self):
+        geometry = {"type":"LineString","coordinates":[[-122.4194,37.7749],[-122.4094,37.7849]]}
+
+        result = await decrypt_geometries([encrypt_geometry(geometry), None])
+
+        assert result[0]["coordinates"][1] == pytest.approx([-122.4094, 37.7849])
+        assert result[1] == {}
+
+    @pytest.mark.asyncio
+    async def test_large_geometry_batch_repeats_are_separate_dicts(self):
+        decrypt_cache.clear()
+        tokens = [
+            encrypt_geometry({"type":"LineString","coordinates":[[float(i), 1.0],[float(i), 2.0]]})
+            for i in range(BATCH_DECRYPT_MIN_SIZE)
+        ]
+
+        result = await decrypt_geometries(tokens + [tokens[0]])
+
+        result[0]["coordinates"].clear()
+        assert result[-1]["coordinates"] == [[0.0, 1.0], [0.0, 2.0]]
+        assert decrypt_geometry(tokens[0])["coordinates"] == [[0.0, 1.0], [0.0, 2.0]]
+
+
+class TestKeyRotation:
+
+    def test_fernet_rotation_keeps_old_rows_readable(self, rotated_keys):
+        old_key = settings.FERNET_KEY
+        legacy = crypto.f.encrypt(b"12 Rotated Rd").decode()
+        sealed = encrypt_address("12 Rotated Rd")
+
+        rotated_keys(FERNET_KEY=Fernet.generate_key().decode(), FERNET_OLD_KEYS=old_key)
+
+        assert crypto._decrypt_address(legacy) == "12 Rotated Rd"
+        assert crypto._decrypt_address(sealed) == "12 Rotated Rd"
+
+    def test_field_key_rotation_keeps_old_rows_readable(self, rotated_keys):
+        sealed = crypto.seal(b"payload")
+
+        rotated_keys(FIELD_ENCRYPTION_KEY=base64.urlsafe_b64encode(os.urandom(32)).decode(), FIELD_ENCRYPTION_KEY_ID=7)
+
+        assert crypto.seal(b"payload")[1] == 7
+        assert open_envelope(sealed) == b"payload"
+
+    def test_retired_key_no_longer_decrypts(self, rotated_keys):
+        sealed = crypto.seal(b"payload")
+
+        rotated_keys(FERNET_KEY=Fernet.generate_key().decode(), FERNET_OLD_KEYS="")
+
+        with pytest.raises(InvalidTag):
+            open_envelope(sealed)
+
+    def test_reencrypt_moves_values_to_active_key(self, rotated_keys):
+        old_key = settings.FERNET_KEY
+        address = encrypt_address("5 Moving Ave")
+        legacy_address = crypto.f.encrypt(b"5 Moving Ave").decode()
+        geometry = {"type":"LineString","coordinates":[[-122.4194,37.7749],[-122.4094,37.7849]]}
+        encrypted_geometry = encrypt_geometry(geometry)
+        legacy_geometry = crypto.f.encrypt(json.dumps(geometry).encode()).decode()
+
+        rotated_keys(FERNET_KEY=Fernet.generate_key().decode(), FERNET_OLD_KEYS=old_key)
+        new_address = crypto.reencrypt_address(address)
+        new_geometry = crypto.reencrypt_geometry(encrypted_geometry)
+        rotated_keys(FERNET_OLD_KEYS="")
+
+        assert crypto._decrypt_address(new_address) == "5 Moving Ave"
+        assert crypto._decrypt_geometry(new_geometry)["coordinates"][0] == pytest.approx([-122.4194, 37.7749])
+        assert crypto.reencrypt_address(new_address) is None
+        assert crypto.reencrypt_geometry(new_geometry) is None
+        assert crypto.reencrypt_address("") is None
+
+    def test_reencrypt_upgrades_fernet_formats(self):
+        geometry = {"type":"LineString","coordinates":[[-122.4194,37.7749],[-122.4094,37.7849]]}
+        v1 = bytes([GEOMETRY_FORMAT_V1]) + base64.urlsafe_b64decode(f.encrypt(encode_geometry(geometry)))
+
+        new_address = crypto.reencrypt_address(f.encrypt(b"9 Upgrade St").decode())
+        new_geometry = crypto.reencrypt_geometry(v1)
+
+        assert base64.urlsafe_b64decode(new_address)[0] == ENVELOPE_V2
+        assert new_geometry[0] == ENVELOPE_V2
+        assert crypto._decrypt_geometry(new_geometry)["coordinates"][1] == pytest.approx([-122.4094, 37.7849])
+
+    def test_fingerprint_follows_active_key(self, rotated_keys):
+        before = crypto.key_fingerprint
+
+        rotated_keys(FIELD_ENCRYPTION_KEY=base64.urlsafe_b64encode(os.urandom(32)).decode(), FIELD_ENCRYPTION_KEY_ID=3)
+
+        assert crypto.key_fingerprint != before
+
+    def test_bad_key_id_is_rejected(self, rotated_keys):
+        with pytest.raises(ValueError):
+            rotated_keys(FIELD_ENCRYPTION_OLD_KEYS=f"0:{base64.urlsafe_b64encode(os.urandom(32)).decode()}")
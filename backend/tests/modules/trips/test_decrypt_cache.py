@@ -0,0 +1,59 @@
+from app.modules.trips.utils.decrypt_cache import DecryptCache, ciphertext_digest
+
+
+class TestDecryptCache:
+
+    def test_get_after_put(self):
+        cache = DecryptCache(max_entries=10, max_bytes=1000)
+
+        cache.put("a", "value", 10)
+
+        assert cache.get("a") == "value"
+        assert cache.get("b") is None
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_evicts_least_recently_used_entry(self):
+        cache = DecryptCache(max_entries=2, max_bytes=1000)
+        cache.put("a", 1, 10)
+        cache.put("b", 2, 10)
+
+        cache.get("a")
+        cache.put("c", 3, 10)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    def test_evicts_to_stay_under_byte_budget(self):
+        cache = DecryptCache(max_entries=100, max_bytes=100)
+        cache.put("a", 1, 60)
+        cache.put("b", 2, 60)
+
+        assert cache.get("a") is None
+        assert cache.get("b") == 2
+        assert cache.size_bytes == 60
+
+    def test_value_bigger_than_budget_is_not_cached(self):
+        cache = DecryptCache(max_entries=100, max_bytes=100)
+        cache.put("a", 1, 60)
+
+        cache.put("huge", 2, 500)
+
+        assert cache.get("huge") is None
+        assert cache.get("a") == 1
+
+    def test_replacing_entry_keeps_size_accurate(self):
+        cache = DecryptCache(max_entries=10, max_bytes=1000)
+        cache.put("a", 1, 100)
+        cache.put("a", 2, 30)
+
+        assert cache.get("a") == 2
+        assert cache.size_bytes == 30
+        assert len(cache) == 1
+
+
+class TestCiphertextDigest:
+
+    def test_str_and_bytes_agree(self):
+        assert ciphertext_digest("token") == ciphertext_digest(b"token")
+        assert ciphertext_digest("token") != ciphertext_digest("other")
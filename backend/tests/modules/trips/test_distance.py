@@ -1,5 +1,5 @@
 import pytest
-from app.modules.trips.utils.distance import meters_to_miles, miles_to_meters, METERS_PER_MILE
+from app.modules.trips.utils.distance import meters_to_miles, miles_to_meters, METERS_PER_MILE, distance_diverges, route_length_meters
 
 
 class TestMetersToMiles:
@@ -110,3 +110,50 @@ class TestRoundTripConversion:
         result_miles = meters_to_miles(meters)
         
         assert abs(result_miles - original_miles) < 0.01
+
+
+
+class TestRouteLengthMeters:
+
+    def test_one_degree_of_latitude(self):
+        geometry = {"type":"LineString","coordinates":[[0.0, 0.0],[0.0, 1.0]]}
+
+        result = route_length_meters(geometry)
+
+        assert result == pytest.approx(111_195, rel=1e-3)
+
+    def test_sums_every_segment(self):
+        geometry = {"type":"LineString","coordinates":[[-122.4194,37.7749],[-122.4094,37.7849],[-122.4194,37.7749]]}
+        one_way = route_length_meters({"type":"LineString","coordinates":geometry["coordinates"][:2]})
+
+        result = route_length_meters(geometry)
+
+        assert result == pytest.approx(2 * one_way)
+
+    def test_single_point_has_no_length(self):
+        assert route_length_meters({"type":"LineString","coordinates":[[-122.4194,37.7749]]}) is None
+
+    def test_non_linestring_has_no_length(self):
+        assert route_length_meters({"type":"Point","coordinates":[-122.4194,37.7749]}) is None
+        assert route_length_meters({}) is None
+        assert route_length_meters(None) is None
+
+    def test_3d_points_are_not_measured(self):
+        geometry = {"type":"LineString","coordinates":[[-122.4194,37.7749,10.0],[-122.4094,37.7849,12.0]]}
+
+        assert route_length_meters(geometry) is None
+
+
+class TestDistanceDiverges:
+
+    def test_within_tolerance(self):
+        assert distance_diverges(10_500.0, 10_000.0, 0.25, 500.0) is False
+
+    def test_beyond_tolerance(self):
+        assert distance_diverges(20_000.0, 10_000.0, 0.25, 500.0) is True
+
+    def test_slack_covers_short_trips(self):
+        assert distance_diverges(700.0, 300.0, 0.25, 500.0) is False
+
+    def test_no_route_is_never_flagged(self):
+        assert distance_diverges(20_000.0, None, 0.25, 500.0) is False
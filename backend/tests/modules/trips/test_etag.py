@@ -0,0 +1,41 @@
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from app.modules.trips.utils.etag import etag_matches, geometry_etag
+
+
+class TestGeometryEtag:
+
+    def test_strong_and_stable(self):
+        trip_id = uuid4()
+        updated_at = datetime(2025, 3, 10, 15, 0, tzinfo=timezone.utc)
+
+        etag = geometry_etag(trip_id, updated_at, 0)
+
+        assert etag.startswith('"') and etag.endswith('"')
+        assert etag == geometry_etag(trip_id, updated_at, 0)
+
+    def test_changes_with_updated_at_and_level(self):
+        trip_id = uuid4()
+        updated_at = datetime(2025, 3, 10, 15, 0, tzinfo=timezone.utc)
+
+        etag = geometry_etag(trip_id, updated_at, 0)
+
+        assert etag != geometry_etag(trip_id, updated_at, 1)
+        assert etag != geometry_etag(trip_id, datetime(2025, 3, 10, 15, 1, tzinfo=timezone.utc), 0)
+
+
+class TestEtagMatches:
+
+    def test_exact_match(self):
+        assert etag_matches('"abc"', '"abc"') is True
+
+    def test_list_and_weak_prefix(self):
+        assert etag_matches('"xyz", W/"abc"', '"abc"') is True
+
+    def test_wildcard(self):
+        assert etag_matches('*', '"abc"') is True
+
+    def test_no_match(self):
+        assert etag_matches('"xyz"', '"abc"') is False
+        assert etag_matches(None, '"abc"') is False
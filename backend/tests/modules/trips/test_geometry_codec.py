@@ -0,0 +1,51 @@
+import pytest
+
+from app.modules.trips.utils.geometry_codec import KIND_JSON, KIND_LINESTRING, decode_geometry, encode_geometry
+
+
+class TestEncodeGeometry:
+
+    def test_linestring_uses_binary_kind(self):
+        geometry = {"type":"LineString","coordinates":[[-122.4194,37.7749],[-122.4094,37.7849]]}
+
+        assert encode_geometry(geometry)[0] == KIND_LINESTRING
+
+    def test_non_linestring_falls_back_to_json(self):
+        geometry = {"type":"Polygon","coordinates":[[[-122.4,37.8],[-122.4,37.7],[-122.3,37.7],[-122.4,37.8]]]}
+
+        assert encode_geometry(geometry)[0] == KIND_JSON
+        assert decode_geometry(encode_geometry(geometry)) == geometry
+
+    def test_linestring_with_altitude_falls_back_to_json(self):
+        geometry = {"type":"LineString","coordinates":[[-122.4194,37.7749,12.0],[-122.4094,37.7849,13.5]]}
+
+        assert encode_geometry(geometry)[0] == KIND_JSON
+        assert decode_geometry(encode_geometry(geometry)) == geometry
+
+    def test_linestring_with_extra_keys_falls_back_to_json(self):
+        geometry = {"type":"LineString","coordinates":[[-122.4194,37.7749]],"bbox":[-122.5,37.7,-122.4,37.8]}
+
+        assert decode_geometry(encode_geometry(geometry)) == geometry
+
+
+class TestDecodeGeometry:
+
+    def test_round_trip_is_quantized(self):
+        coordinates = [[-122.41941234, 37.77491234], [-122.40941234, 37.78491234], [179.999999, -89.999999]]
+
+        decoded = decode_geometry(encode_geometry({"type":"LineString","coordinates":coordinates}))
+
+        assert decoded["type"] == "LineString"
+        for actual, expected in zip(decoded["coordinates"], coordinates):
+            assert actual == pytest.approx(expected, abs=1e-6)
+
+    def test_empty_linestring(self):
+        geometry = {"type":"LineString","coordinates":[]}
+
+        assert decode_geometry(encode_geometry(geometry)) == geometry
+
+    def test_unknown_kind_raises(self):
+        payload = bytes([9]) + encode_geometry({"type":"LineString","coordinates":[]})[1:]
+
+        with pytest.raises(ValueError):
+            decode_geometry(payload)
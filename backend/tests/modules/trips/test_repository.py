@@ -1,9 +1,11 @@
 import pytest
 from unittest.mock import AsyncMock, MagicMock
 from uuid import uuid4
+from sqlalchemy import extract
+from sqlalchemy.dialects import postgresql, sqlite
 
-from app.modules.trips.repository import TripRepo
-from app.modules.trips.models import TripStatus
+from app.modules.trips.repository import TripRepo, in_utc
+from app.modules.trips.models import Trip, TripStatus
 
 
 class TestTripRepoDesignDiscussion:
@@ -14,3 +16,15 @@ class TestTripRepoDesignDiscussion:
 
  #Cant test this due to tight coupling so will instead test it using integration testing
 
+
+class TestInUtc:
+
+    def test_postgres_extracts_months_in_utc(self):
+        column = extract('month', in_utc(Trip.started_at, "postgresql"))
+
+        sql = str(column.compile(dialect=postgresql.dialect()))
+        assert "timezone(%(timezone_1)s, trips.started_at)" in sql
+        assert column.compile(dialect=postgresql.dialect()).params["timezone_1"] == "UTC"
+
+    def test_sqlite_keeps_the_column(self):
+        assert in_utc(Trip.started_at, "sqlite") is Trip.started_at
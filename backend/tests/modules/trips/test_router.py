@@ -2,11 +2,11 @@ import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from uuid import uuid4
 from datetime import datetime, timezone, timedelta
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
 
 from app.modules.trips.router import get_trips_service
 from app.modules.trips.service import TripsService
-from app.modules.trips.schemas import CreateTripDTO, EditTripDTO, EndTripDTO, ManualCreateTripDTO
+from app.modules.trips.schemas import CreateTripDTO, EditTripDTO, EndTripDTO, ManualCreateTripDTO, TripFilterDTO
 from app.modules.trips.models import Trip, TripStatus
 from app.modules.trips.exceptions import (
     InvalidTripDataError,
@@ -256,8 +256,8 @@ class TestGetTripEndpoint:
             mock_validate.return_value = MagicMock()
             result = await get_trip(trip_id, mock_service, current_user=mock_user)
 
-        mock_service.get_trip_by_id.assert_called_once_with(mock_user.id, trip_id)
-        mock_validate.assert_called_once_with(mock_trip)
+        mock_service.get_trip_by_id.assert_called_once_with(mock_user.id, trip_id, with_geometry=True)
+        mock_validate.assert_called_once_with(mock_trip, include_geometry=True)
 
     @pytest.mark.asyncio
     async def test_get_trip_not_found(self, mock_service, mock_user):
@@ -461,6 +461,214 @@ class TestCancelTripEndpoint:
         assert exc_info.value.status_code == 400
 
 
+class TestGetTripSummariesEndpoint:
+
+    @pytest.fixture
+    def mock_service(self):
+        return AsyncMock(spec=TripsService)
+
+    @pytest.fixture
+    def mock_user(self):
+        user = MagicMock(spec=User)
+        user.id = uuid4()
+        user.email = "test@example.com"
+        user.role = UserRole.EMPLOYEE
+        return user
+
+    @pytest.mark.asyncio
+    async def test_get_trip_summaries_success(self, mock_service, mock_user):
+        from app.modules.trips.router import get_user_trip_summaries
+
+        row = MagicMock()
+        mock_service.get_trip_summaries.return_value = ([row], "next-cursor")
+
+        with patch('app.modules.trips.router.TripSummaryDTO.model_validate_many', new_callable=AsyncMock) as mock_validate:
+            mock_validate.return_value = [MagicMock()]
+            with patch('app.modules.trips.router.TripSummaryPageDTO') as mock_page:
+                await get_user_trip_summaries(20, None, mock_service, current_user=mock_user)
+
+        mock_service.get_trip_summaries.assert_called_once_with(mock_user.id, 20, None)
+        mock_validate.assert_called_once_with([row])
+        assert mock_page.call_args.kwargs["next_cursor"] == "next-cursor"
+
+    @pytest.mark.asyncio
+    async def test_get_trip_summaries_invalid_cursor(self, mock_service, mock_user):
+        from app.modules.trips.router import get_user_trip_summaries
+
+        mock_service.get_trip_summaries.side_effect = InvalidTripDataError("Invalid cursor")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_user_trip_summaries(20, "bad", mock_service, current_user=mock_user)
+
+        assert exc_info.value.status_code == 400
+
+
+    @pytest.mark.asyncio
+    async def test_get_user_trips_passes_filters(self, mock_service, mock_user):
+        from app.modules.trips.router import get_user_trips
+
+        filters = TripFilterDTO(status="completed", purpose_prefix="client")
+        trips = [MagicMock()]
+        mock_service.get_trips_by_userId.return_value = trips
+        mock_service.get_preview_geometries.return_value = {trips[0].id: b"encrypted"}
+
+        with patch('app.modules.trips.router.TripResponseDTO.model_validate_many', new_callable=AsyncMock) as mock_validate:
+            mock_validate.return_value = []
+            result = await get_user_trips(filters, mock_service, current_user=mock_user)
+
+        assert result == []
+        mock_service.get_trips_by_userId.assert_called_once_with(mock_user.id, filters)
+        #the history cards draw the preview, so the list can't go out without it
+        mock_service.get_preview_geometries.assert_called_once_with(trips)
+        mock_validate.assert_called_once_with(trips, {trips[0].id: b"encrypted"})
+
+    @pytest.mark.asyncio
+    async def test_search_trips(self, mock_service, mock_user):
+        from app.modules.trips.router import search_trips
+
+        row = MagicMock()
+        mock_service.search_trips.return_value = [row]
+
+        with patch('app.modules.trips.router.TripSummaryDTO.model_validate_many', new_callable=AsyncMock) as mock_validate:
+            mock_validate.return_value = ["summary"]
+            result = await search_trips(q="client plaza", exact=False, common_place_id=None, limit=20, svc=mock_service, current_user=mock_user)
+
+        assert result == ["summary"]
+        mock_service.search_trips.assert_called_once_with(mock_user.id, query="client plaza", exact=False, common_place_id=None, limit=20)
+        mock_validate.assert_called_once_with([row])
+
+    @pytest.mark.asyncio
+    async def test_search_trips_without_query(self, mock_service, mock_user):
+        from app.modules.trips.router import search_trips
+
+        mock_service.search_trips.side_effect = InvalidTripDataError("Search needs either a query or a common place")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await search_trips(q=None, exact=False, common_place_id=None, limit=20, svc=mock_service, current_user=mock_user)
+
+        assert exc_info.value.status_code == 400
+
+
+class TestGetTripGeometryEndpoint:
+
+    @pytest.fixture
+    def mock_service(self):
+        return AsyncMock(spec=TripsService)
+
+    @pytest.fixture
+    def mock_user(self):
+        user = MagicMock(spec=User)
+        user.id = uuid4()
+        user.email = "test@example.com"
+        user.role = UserRole.EMPLOYEE
+        return user
+
+    @pytest.mark.asyncio
+    async def test_get_trip_geometry_success(self, mock_service, mock_user):
+        from app.modules.trips.router import get_trip_geometry
+
+        trip_id = uuid4()
+        mock_service.get_trip_geometry.return_value = {
+            'trip_id': trip_id,
+            'level': 2,
+            'tolerance_meters': 20.0,
+            'point_count': 90,
+            'completed': True,
+            'not_modified': False,
+            'etag': '"abc"',
+            'geometry_encrypted': b"encrypted",
+        }
+        response = Response()
+
+        with patch('app.modules.trips.schemas.decrypt_geometry', return_value={"type":"LineString","coordinates":[[0, 0], [1, 1]]}):
+            result = await get_trip_geometry(trip_id, response, zoom=None, max_points=100, if_none_match=None, svc=mock_service, current_user=mock_user)
+
+        mock_service.get_trip_geometry.assert_called_once_with(mock_user.id, trip_id, None, 100, None)
+        assert result.level == 2
+        assert result.point_count == 90
+        assert result.trip_id == str(trip_id)
+        assert response.headers["ETag"] == '"abc"'
+        assert "max-age" in response.headers["Cache-Control"]
+
+    @pytest.mark.asyncio
+    async def test_get_trip_geometry_not_modified(self, mock_service, mock_user):
+        from app.modules.trips.router import get_trip_geometry
+
+        mock_service.get_trip_geometry.return_value = {
+            'trip_id': uuid4(),
+            'level': 0,
+            'tolerance_meters': 0.0,
+            'point_count': None,
+            'completed': True,
+            'not_modified': True,
+            'etag': '"abc"',
+            'geometry_encrypted': None,
+        }
+
+        result = await get_trip_geometry(uuid4(), Response(), zoom=None, max_points=None, if_none_match='"abc"', svc=mock_service, current_user=mock_user)
+
+        assert result.status_code == 304
+        assert result.headers["ETag"] == '"abc"'
+
+    @pytest.mark.asyncio
+    async def test_get_trip_geometry_not_found(self, mock_service, mock_user):
+        from app.modules.trips.router import get_trip_geometry
+
+        mock_service.get_trip_geometry.side_effect = TripNotFoundError("Trip not found")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_trip_geometry(uuid4(), Response(), zoom=None, max_points=None, if_none_match=None, svc=mock_service, current_user=mock_user)
+
+        assert exc_info.value.status_code == 404
+
+
+class TestAppendTripPointsEndpoint:
+
+    @pytest.fixture
+    def mock_service(self):
+        return AsyncMock(spec=TripsService)
+
+    @pytest.fixture
+    def mock_user(self):
+        user = MagicMock(spec=User)
+        user.id = uuid4()
+        user.email = "test@example.com"
+        user.role = UserRole.EMPLOYEE
+        return user
+
+    @pytest.mark.asyncio
+    async def test_append_trip_points_success(self, mock_service, mock_user):
+        from app.modules.trips.router import append_trip_points
+        from app.modules.trips.schemas import AppendTripPointsDTO
+
+        trip_id = uuid4()
+        body = AppendTripPointsDTO(sequence=0, coordinates=[[-122.4194,37.7749],[-122.4094,37.7849]])
+        mock_service.append_trip_points.return_value = {
+            'trip_id': trip_id,
+            'chunk_count': 1,
+            'point_count': 2,
+            'recorded_meters': 1609.34,
+        }
+
+        result = await append_trip_points(trip_id, body, mock_service, current_user=mock_user)
+
+        mock_service.append_trip_points.assert_called_once_with(mock_user.id, trip_id, body)
+        assert result.point_count == 2
+        assert result.recorded_miles == 1.0
+
+    @pytest.mark.asyncio
+    async def test_append_trip_points_inactive_trip(self, mock_service, mock_user):
+        from app.modules.trips.router import append_trip_points
+        from app.modules.trips.schemas import AppendTripPointsDTO
+
+        mock_service.append_trip_points.side_effect = InvalidTripDataError("Points can only be added to an active trip")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await append_trip_points(uuid4(), AppendTripPointsDTO(sequence=0, coordinates=[[0.0, 0.0]]), mock_service, current_user=mock_user)
+
+        assert exc_info.value.status_code == 400
+
+
 class TestGetTripsServiceDependency:
 
     def test_get_service_returns_service(self):
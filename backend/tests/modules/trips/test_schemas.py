@@ -7,11 +7,15 @@ from app.modules.trips.schemas import (
     CreateTripDTO,
     EditTripDTO,
     EndTripDTO,
+    AppendTripPointsDTO,
+    MAX_POINTS_PER_BATCH,
     ManualCreateTripDTO,
     TripResponseDTO,
+    TripFilterDTO,
     ExpenseResponseDTO
 )
 from app.modules.trips.models import TripStatus
+from app.modules.expenses.schemas import MAX_BATCH_OPERATIONS
 
 
 class TestCreateTripDTO:
@@ -81,6 +85,51 @@ class TestEndTripDTO:
         assert "Distance must be non-negative" in str(exc_info.value)
 
 
+class TestAppendTripPointsDTO:
+
+    def test_append_points_valid(self):
+        dto = AppendTripPointsDTO(sequence=0, coordinates=[[-122.4194,37.7749],[-122.4094,37.7849]])
+
+        assert dto.coordinates == [(-122.4194,37.7749),(-122.4094,37.7849)]
+
+    def test_append_points_out_of_range(self):
+        with pytest.raises(ValidationError):
+            AppendTripPointsDTO(sequence=0, coordinates=[[37.7749,-122.4194]])
+
+    def test_append_points_batch_too_large(self):
+        with pytest.raises(ValidationError):
+            AppendTripPointsDTO(sequence=0, coordinates=[[0.0, 0.0]] * (MAX_POINTS_PER_BATCH + 1))
+
+    def test_append_points_empty_or_negative_sequence(self):
+        with pytest.raises(ValidationError):
+            AppendTripPointsDTO(sequence=0, coordinates=[])
+
+        with pytest.raises(ValidationError):
+            AppendTripPointsDTO(sequence=-1, coordinates=[[0.0, 0.0]])
+
+
+class TestTripFilterDTO:
+
+    def test_filters_are_optional(self):
+        dto = TripFilterDTO()
+
+        assert dto.status is None and dto.purpose_prefix is None
+
+    def test_blank_purpose_prefix_is_ignored(self):
+        assert TripFilterDTO(purpose_prefix="   ").purpose_prefix is None
+        assert TripFilterDTO(purpose_prefix=" Client ").purpose_prefix == "Client"
+
+    def test_started_range_must_be_ordered(self):
+        now = datetime.now(timezone.utc)
+
+        with pytest.raises(ValidationError):
+            TripFilterDTO(started_after=now, started_before=now - timedelta(days=1))
+
+    def test_status_must_be_known(self):
+        with pytest.raises(ValidationError):
+            TripFilterDTO(status="parked")
+
+
 class TestEditTripDTO:
 
     def test_edit_trip_dto_all_fields(self):
@@ -201,6 +250,21 @@ class TestManualCreateTripDTO:
         assert dto.expenses[1].type == "Toll"
         assert dto.expenses[1].amount == 5.75
 
+    def test_manual_create_trip_dto_too_many_expenses(self):
+        started_time = datetime.now(timezone.utc)
+
+        with pytest.raises(ValidationError):
+            ManualCreateTripDTO(
+                start_address="123 Main St",
+                end_address="456 Oak Ave",
+                miles=10.5,
+                started_at=started_time,
+                ended_at=started_time + timedelta(hours=1),
+                rate_customization_id=uuid4(),
+                rate_category_id=uuid4(),
+                expenses=[{"type": f"Expense {i}", "amount": 1.0} for i in range(MAX_BATCH_OPERATIONS + 1)]
+            )
+
     def test_manual_create_trip_dto_missing_required_fields(self):
         with pytest.raises(ValidationError):
             ManualCreateTripDTO(
@@ -294,6 +358,38 @@ class TestTripResponseDTO:
         assert dto.start_address == "123 Main St"
         assert dto.total_reimbursement == 0
 
+    @pytest.mark.asyncio
+    async def test_trip_response_dto_many_attaches_previews(self):
+        from unittest.mock import MagicMock
+        from app.modules.trips.models import Trip
+        from app.modules.trips.utils.crypto import encrypt_address, encrypt_geometry
+
+        def make_trip():
+            trip = MagicMock(spec=Trip)
+            trip.id = uuid4()
+            trip.status = TripStatus.completed
+            trip.start_address_encrypted = encrypt_address("123 Main St")
+            trip.end_address_encrypted = None
+            trip.vehicle = None
+            trip.distance_flagged = False
+            trip.mileage_reimbursement_total = None
+            trip.expense_reimbursement_total = None
+            trip.started_at = trip.updated_at = datetime.now(timezone.utc)
+            trip.rate_customization_id = uuid4()
+            trip.rate_category_id = uuid4()
+            trip.purpose = trip.vehicle_id = trip.miles = trip.computed_miles = trip.reimbursement_rate = trip.ended_at = None
+            trip.expenses = []
+            trip.receipts = []
+            return trip
+
+        with_route, without_route = make_trip(), make_trip()
+        preview = {"type": "LineString", "coordinates": [[-122.4194, 37.7749], [-122.4094, 37.7849]]}
+
+        dtos = await TripResponseDTO.model_validate_many([with_route, without_route], {with_route.id: encrypt_geometry(preview)})
+
+        assert dtos[0].geometry == preview
+        assert dtos[1].geometry is None
+
     def test_trip_response_dto_with_expenses(self):
         from unittest.mock import MagicMock, patch
         from app.modules.trips.models import Trip
@@ -7,10 +7,11 @@ from app.modules.trips.service import TripsService
 from app.modules.trips.repository import TripRepo
 from app.modules.rate_categories.repository import RateCategoryRepo
 from app.modules.rate_customizations.repository import RateCustomizationRepo
+from app.modules.expenses.exceptions import DuplicateExpenseError
 from app.modules.expenses.repository import ExpenseRepo
 from app.modules.vehicles.repository import VehicleRepository
 from app.modules.expenses.service import ExpensesService
-from app.modules.trips.schemas import CreateTripDTO, EditTripDTO, EndTripDTO, ManualCreateTripDTO
+from app.modules.trips.schemas import AppendTripPointsDTO, CreateTripDTO, EditTripDTO, EndTripDTO, ManualCreateTripDTO
 from app.modules.trips.models import Trip, TripStatus
 from app.modules.rate_categories.models import RateCategory
 from app.modules.rate_customizations.models import RateCustomization
@@ -23,6 +24,8 @@ from app.modules.trips.exceptions import (
 from app.modules.rate_customizations.exceptions import RateCustomizationNotFoundError
 from app.modules.rate_categories.exceptions import InvalidRateCategoryDataError, RateCategoryNotFoundError
 from app.modules.vehicles.exceptions import VehicleNotFoundError
+from app.modules.common_places.exceptions import CommonPlaceNotFoundError
+from app.modules.trips.utils.blind_index import full_address_token, word_tokens
 
 
 class TestTripsServiceStartTrip:
@@ -112,6 +115,9 @@ class TestTripsServiceStartTrip:
         assert result == mock_trip
         mock_encrypt.assert_called_once_with("123 Main St")
         trip_repo.save.assert_called_once()
+        #the trip row goes in before the tokens that reference it
+        writes = [name for name, _, _ in trip_repo.mock_calls if name in ("add", "replace_address_tokens", "save")]
+        assert writes == ["add", "replace_address_tokens", "save"]
         customization_repo.get.assert_called_once_with(mock_customization.id, user_id)
         category_repo.get.assert_called_once_with(mock_category.id)
         vehicle_repo.get_by_id.assert_called_once_with(mock_vehicle.id, user_id)
@@ -309,6 +315,36 @@ class TestTripsServiceManualCreateTrip:
         mock_encrypt_geom.assert_called_once()
         trip_repo.save.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_manual_create_trip_attaches_geometry_levels_to_the_trip(
+        self, service, trip_repo, category_repo, customization_repo, mock_customization, mock_category, user_id
+    ):
+        started_time = datetime.now(timezone.utc)
+        mock_category.rate_customization_id = mock_customization.id
+        coordinates = [[-122.4194 + i * 0.0001, 37.7749 + (0.0001 if i % 2 else 0.0)] for i in range(50)]
+        dto = ManualCreateTripDTO(
+            start_address="123 Main St",
+            end_address="456 Oak Ave",
+            miles=25.5,
+            geometry={"type": "LineString", "coordinates": coordinates},
+            started_at=started_time,
+            ended_at=started_time + timedelta(hours=2),
+            rate_customization_id=mock_customization.id,
+            rate_category_id=mock_category.id
+        )
+        customization_repo.get.return_value = mock_customization
+        category_repo.get.return_value = mock_category
+        trip_repo.save.side_effect = lambda trip: trip
+
+        trip = await service.manual_create_trip(user_id, dto)
+
+        #the relationship orders the level inserts after the trip, a bare trip_id wouldn't
+        trip_repo.replace_geometry_levels.assert_not_called()
+        assert trip_repo.add.call_args.args[0] is trip
+        assert [level.level for level in trip.geometry_levels] == list(range(1, len(trip.geometry_levels) + 1))
+        assert trip.geometry_levels
+        assert all(level.trip_id == trip.id for level in trip.geometry_levels)
+
     @pytest.mark.asyncio
     async def test_manual_create_trip_empty_start_address(self, service, user_id):
         started_time = datetime.now(timezone.utc)
@@ -522,7 +558,8 @@ class TestTripsServiceManualCreateTrip:
         vehicle_repo.get_by_id = AsyncMock(return_value=mock_vehicle)
         trip_repo.save.return_value = mock_trip
 
-        service.expense_service.create_expense = AsyncMock()
+        service.expense_service.apply_expense_batch = AsyncMock()
+        service.expense_service.check_new_trip_batch = MagicMock()
 
         with patch('app.modules.trips.service.encrypt_address', return_value="encrypted"):
             with patch('app.modules.trips.service.encrypt_geometry', return_value="encrypted_geom"):
@@ -530,7 +567,37 @@ class TestTripsServiceManualCreateTrip:
                     result = await service.manual_create_trip(user_id, dto)
 
         assert result == mock_trip
-        assert service.expense_service.create_expense.call_count == 2  
+        service.expense_service.apply_expense_batch.assert_called_once()
+        batch = service.expense_service.apply_expense_batch.call_args.args[2]
+        assert [(expense.type, expense.amount) for expense in batch.create] == [("Parking", 15.50), ("Toll", 5.75)]
+        service.expense_service.check_new_trip_batch.assert_called_once_with(user_id, batch)
+        trip_repo.refresh_expenses.assert_called_once_with(mock_trip)
+
+    @pytest.mark.asyncio
+    async def test_manual_create_trip_invalid_expenses_save_nothing(
+        self, service, trip_repo, category_repo, customization_repo, mock_customization, mock_category, user_id
+    ):
+        started_time = datetime.now(timezone.utc)
+        mock_category.rate_customization_id = mock_customization.id
+        dto = ManualCreateTripDTO(
+            start_address="123 Main St",
+            end_address="456 Oak Ave",
+            miles=25.5,
+            started_at=started_time,
+            ended_at=started_time + timedelta(hours=2),
+            rate_customization_id=mock_customization.id,
+            rate_category_id=mock_category.id,
+            expenses=[{"type": "Parking", "amount": 1.0}, {"type": "parking", "amount": 2.0}]
+        )
+        customization_repo.get.return_value = mock_customization
+        category_repo.get.return_value = mock_category
+        service.expense_service = ExpensesService(AsyncMock(spec=ExpenseRepo), trip_repo)
+
+        with pytest.raises(DuplicateExpenseError):
+            await service.manual_create_trip(user_id, dto)
+
+        trip_repo.add.assert_not_called()
+        trip_repo.save.assert_not_called()
 
 
 class TestTripsServiceGetTripById:
@@ -563,7 +630,7 @@ class TestTripsServiceGetTripById:
         result = await service.get_trip_by_id(user_id, trip_id)
 
         assert result == mock_trip
-        trip_repo.get.assert_called_once_with(trip_id, user_id)
+        trip_repo.get.assert_called_once_with(trip_id, user_id, with_geometry=False)
 
     @pytest.mark.asyncio
     async def test_get_trip_by_id_not_found(self, service, trip_repo, user_id):
@@ -586,6 +653,7 @@ class TestTripsServiceEndTrip:
         repo = AsyncMock(spec=TripRepo)
         repo.db = MagicMock()
         repo.db.rollback = AsyncMock()
+        repo.get_point_chunks.return_value = []
         return repo
 
     @pytest.fixture
@@ -668,6 +736,7 @@ class TestTripsServiceEditTrip:
         repo = AsyncMock(spec=TripRepo)
         repo.db = MagicMock()
         repo.db.rollback = AsyncMock()
+        repo.get_point_chunks.return_value = []
         return repo
 
     @pytest.fixture
@@ -723,6 +792,29 @@ class TestTripsServiceEditTrip:
         assert mock_trip.purpose == "Updated purpose"
         trip_repo.save.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_edit_trip_reads_trip_under_lock(self, service, trip_repo, mock_trip, user_id):
+        calls = []
+        trip_repo.lock.side_effect = lambda *args: calls.append("lock") or True
+        trip_repo.get.side_effect = lambda *args, **kwargs: calls.append("get") or mock_trip
+        trip_repo.save.return_value = mock_trip
+
+        await service.edit_trip(user_id, mock_trip.id, EditTripDTO(purpose="Updated purpose"))
+
+        assert calls == ["lock", "get"]
+        trip_repo.lock.assert_called_once_with(mock_trip.id, user_id)
+
+    @pytest.mark.asyncio
+    async def test_edit_trip_rejected_releases_lock(self, service, customization_repo, trip_repo, mock_trip, user_id):
+        trip_repo.get.return_value = mock_trip
+        customization_repo.get.return_value = None
+
+        with pytest.raises(TripPersistenceError):
+            await service.edit_trip(user_id, mock_trip.id, EditTripDTO(rate_customization_id=uuid4()))
+
+        trip_repo.rollback.assert_called_once()
+        trip_repo.save.assert_not_called()
+
     @pytest.mark.asyncio
     async def test_edit_trip_vehicle_only(self, service, trip_repo, vehicle_repo, mock_trip, mock_vehicle, user_id):
         trip_id = uuid4()
@@ -961,3 +1053,564 @@ class TestTripsServiceGetMonthlyStats:
         assert result['total_drives'] == 0
         assert result['total_miles'] == 0
         assert result['total_reimbursement'] == 0.0
+
+
+class TestTripsServiceGetTripSummaries:
+
+    @pytest.fixture
+    def user_id(self):
+        return uuid4()
+
+    @pytest.fixture
+    def trip_repo(self):
+        return AsyncMock(spec=TripRepo)
+
+    @pytest.fixture
+    def service(self, trip_repo):
+        return TripsService(trip_repo, AsyncMock(spec=RateCategoryRepo), AsyncMock(spec=RateCustomizationRepo))
+
+    def _row(self, started_at):
+        row = MagicMock()
+        row.id = uuid4()
+        row.started_at = started_at
+        return row
+
+    @pytest.mark.asyncio
+    async def test_get_trip_summaries_returns_next_cursor_when_more_rows(self, service, trip_repo, user_id):
+        now = datetime.now(timezone.utc)
+        rows = [self._row(now - timedelta(hours=i)) for i in range(3)]
+        trip_repo.get_user_trip_summaries.return_value = rows
+
+        page, next_cursor = await service.get_trip_summaries(user_id, limit=2)
+
+        trip_repo.get_user_trip_summaries.assert_called_once_with(user_id, 3, None)
+        assert page == rows[:2]
+        assert next_cursor is not None
+
+        await service.get_trip_summaries(user_id, limit=2, cursor=next_cursor)
+        _, _, after = trip_repo.get_user_trip_summaries.call_args.args
+        assert after == (rows[1].started_at, rows[1].id)
+
+    @pytest.mark.asyncio
+    async def test_get_trip_summaries_last_page_has_no_cursor(self, service, trip_repo, user_id):
+        rows = [self._row(datetime.now(timezone.utc))]
+        trip_repo.get_user_trip_summaries.return_value = rows
+
+        page, next_cursor = await service.get_trip_summaries(user_id, limit=2)
+
+        assert page == rows
+        assert next_cursor is None
+
+    @pytest.mark.asyncio
+    async def test_get_trip_summaries_invalid_cursor(self, service, trip_repo, user_id):
+        with pytest.raises(InvalidTripDataError) as exc_info:
+            await service.get_trip_summaries(user_id, limit=2, cursor="not-a-cursor")
+        assert "Invalid cursor" in str(exc_info.value)
+        trip_repo.get_user_trip_summaries.assert_not_called()
+
+
+class TestTripsServiceGetMonthlyStatsRange:
+
+    @pytest.fixture
+    def user_id(self):
+        return uuid4()
+
+    @pytest.fixture
+    def trips_service(self):
+        repo = AsyncMock(spec=TripRepo)
+        return TripsService(repo, AsyncMock(spec=RateCategoryRepo), AsyncMock(spec=RateCustomizationRepo))
+
+    @pytest.mark.asyncio
+    async def test_get_monthly_stats_range_fills_empty_months(self, trips_service, user_id):
+        trips_service.repo.get_monthly_stats_range.return_value = {
+            (2025, 12): {
+                'total_drives': 2,
+                'total_miles': 40.0,
+                'total_mileage_reimbursement': 20.0,
+                'total_expense_reimbursement': 5.0
+            }
+        }
+
+        result = await trips_service.get_monthly_stats_range(user_id, 2025, 11, 2026, 1)
+
+        trips_service.repo.get_monthly_stats_range.assert_called_once_with(
+            user_id,
+            datetime(2025, 11, 1, tzinfo=timezone.utc),
+            datetime(2026, 2, 1, tzinfo=timezone.utc),
+        )
+        assert [(r['year'], r['month']) for r in result] == [(2025, 11), (2025, 12), (2026, 1)]
+        assert result[0]['total_drives'] == 0
+        assert result[1]['total_reimbursement'] == 25.0
+        assert result[2]['total_miles'] == 0.0
+
+    @pytest.mark.asyncio
+    async def test_get_monthly_stats_range_end_before_start(self, trips_service, user_id):
+        with pytest.raises(InvalidTripDataError):
+            await trips_service.get_monthly_stats_range(user_id, 2025, 6, 2025, 5)
+        trips_service.repo.get_monthly_stats_range.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_get_monthly_stats_range_too_many_months(self, trips_service, user_id):
+        with pytest.raises(InvalidTripDataError):
+            await trips_service.get_monthly_stats_range(user_id, 2020, 1, 2025, 1)
+
+    @pytest.mark.asyncio
+    async def test_get_monthly_stats_invalid_month(self, trips_service, user_id):
+        with pytest.raises(InvalidTripDataError):
+            await trips_service.get_monthly_stats(user_id, 13, 2025)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("start, end", [((0, 1), (0, 2)), ((9999, 11), (9999, 12))])
+    async def test_get_monthly_stats_range_year_out_of_range(self, trips_service, user_id, start, end):
+        with pytest.raises(InvalidTripDataError):
+            await trips_service.get_monthly_stats_range(user_id, *start, *end)
+        trips_service.repo.get_monthly_stats_range.assert_not_called()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("month, year", [(1, 0), (12, 9999)])
+    async def test_get_monthly_stats_year_out_of_range(self, trips_service, user_id, month, year):
+        with pytest.raises(InvalidTripDataError):
+            await trips_service.get_monthly_stats(user_id, month, year)
+        trips_service.repo.get_monthly_stats.assert_not_called()
+
+
+class TestTripsServiceGetTripGeometry:
+
+    @pytest.fixture
+    def user_id(self):
+        return uuid4()
+
+    @pytest.fixture
+    def trips_service(self):
+        repo = AsyncMock(spec=TripRepo)
+        repo.get_point_chunks.return_value = []
+        repo.get_geometry_version.return_value = MagicMock(status=TripStatus.completed, updated_at=datetime(2025, 3, 10, tzinfo=timezone.utc))
+        return TripsService(repo, AsyncMock(spec=RateCategoryRepo), AsyncMock(spec=RateCustomizationRepo))
+
+    @pytest.fixture
+    def levels(self):
+        return [
+            MagicMock(level=1, tolerance_meters=5.0, point_count=800),
+            MagicMock(level=2, tolerance_meters=20.0, point_count=90),
+            MagicMock(level=3, tolerance_meters=80.0, point_count=12),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_point_budget_picks_most_detailed_fitting_level(self, trips_service, user_id, levels):
+        trip_id = uuid4()
+        trips_service.repo.get_geometry_levels.return_value = levels
+        trips_service.repo.get_geometry_level.return_value = b"level-2"
+
+        result = await trips_service.get_trip_geometry(user_id, trip_id, max_points=100)
+
+        trips_service.repo.get_geometry_level.assert_called_once_with(trip_id, 2)
+        assert result['level'] == 2
+        assert result['point_count'] == 90
+        assert result['geometry_encrypted'] == b"level-2"
+
+    @pytest.mark.asyncio
+    async def test_point_budget_below_every_level_uses_coarsest(self, trips_service, user_id, levels):
+        trips_service.repo.get_geometry_levels.return_value = levels
+
+        result = await trips_service.get_trip_geometry(user_id, uuid4(), max_points=5)
+
+        assert result['level'] == 3
+
+    @pytest.mark.asyncio
+    async def test_zoom_picks_level_under_a_pixel(self, trips_service, user_id, levels):
+        trips_service.repo.get_geometry_levels.return_value = levels
+
+        #~38m per pixel at zoom 12
+        result = await trips_service.get_trip_geometry(user_id, uuid4(), zoom=12)
+
+        assert result['level'] == 2
+
+    @pytest.mark.asyncio
+    async def test_high_zoom_returns_full_route(self, trips_service, user_id, levels):
+        trips_service.repo.get_geometry_levels.return_value = levels
+        trips_service.repo.get_geometry.return_value = MagicMock(geometry_encrypted=b"full")
+
+        result = await trips_service.get_trip_geometry(user_id, uuid4(), zoom=18)
+
+        trips_service.repo.get_geometry_level.assert_not_called()
+        assert result['level'] == 0
+        assert result['geometry_encrypted'] == b"full"
+
+    @pytest.mark.asyncio
+    async def test_trip_without_levels_returns_full_route(self, trips_service, user_id):
+        trips_service.repo.get_geometry_levels.return_value = []
+        trips_service.repo.get_geometry.return_value = MagicMock(geometry_encrypted=b"full")
+
+        result = await trips_service.get_trip_geometry(user_id, uuid4(), max_points=100)
+
+        assert result['level'] == 0
+
+    @pytest.mark.asyncio
+    async def test_trip_not_found(self, trips_service, user_id):
+        trips_service.repo.get_geometry_version.return_value = None
+
+        with pytest.raises(TripNotFoundError):
+            await trips_service.get_trip_geometry(user_id, uuid4())
+
+        trips_service.repo.get_geometry_levels.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_matching_etag_skips_loading_geometry(self, trips_service, user_id, levels):
+        trip_id = uuid4()
+        trips_service.repo.get_geometry_levels.return_value = levels
+
+        first = await trips_service.get_trip_geometry(user_id, trip_id, max_points=100)
+        second = await trips_service.get_trip_geometry(user_id, trip_id, max_points=100, if_none_match=first['etag'])
+
+        assert first['not_modified'] is False
+        assert first['completed'] is True
+        assert second['not_modified'] is True
+        assert second['etag'] == first['etag']
+        trips_service.repo.get_geometry_level.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_etag_differs_per_level(self, trips_service, user_id, levels):
+        trip_id = uuid4()
+        trips_service.repo.get_geometry_levels.return_value = levels
+
+        coarse = await trips_service.get_trip_geometry(user_id, trip_id, max_points=20)
+        detailed = await trips_service.get_trip_geometry(user_id, trip_id, max_points=1000, if_none_match=coarse['etag'])
+
+        assert detailed['not_modified'] is False
+        assert detailed['etag'] != coarse['etag']
+
+    @pytest.mark.asyncio
+    async def test_invalid_zoom(self, trips_service, user_id):
+        with pytest.raises(InvalidTripDataError):
+            await trips_service.get_trip_geometry(user_id, uuid4(), zoom=30)
+        trips_service.repo.get_geometry_levels.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_end_trip_stores_geometry_levels(self, trips_service, user_id):
+        trip = MagicMock(spec=Trip)
+        trip.id = uuid4()
+        trip.status = TripStatus.active
+        trip.reimbursement_rate = 0.65
+        trips_service.repo.get.return_value = trip
+        trips_service.repo.save.return_value = trip
+        coordinates = [[-122.4194 + i * 0.0001, 37.7749 + (0.0001 if i % 2 else 0.0)] for i in range(50)]
+        dto = EndTripDTO(end_address="456 Oak Ave", geometry={"type":"LineString","coordinates":coordinates}, distance_meters=1000.0)
+
+        await trips_service.end_trip(user_id, trip.id, dto)
+
+        trip_id, stored = trips_service.repo.replace_geometry_levels.call_args.args
+        assert trip_id == trip.id
+        assert stored
+        assert [level.level for level in stored] == list(range(1, len(stored) + 1))
+        assert all(level.trip_id == trip.id for level in stored)
+
+
+
+class TestTripsServiceDistanceCheck:
+
+    @pytest.fixture
+    def user_id(self):
+        return uuid4()
+
+    @pytest.fixture
+    def trip_repo(self):
+        repo = AsyncMock(spec=TripRepo)
+        repo.db = MagicMock()
+        repo.db.rollback = AsyncMock()
+        repo.get_point_chunks.return_value = []
+        return repo
+
+    @pytest.fixture
+    def service(self, trip_repo):
+        return TripsService(trip_repo, AsyncMock(), AsyncMock())
+
+    @pytest.fixture
+    def mock_trip(self, trip_repo):
+        trip = MagicMock(spec=Trip)
+        trip.id = uuid4()
+        trip.status = TripStatus.active
+        trip.reimbursement_rate = 0.65
+        trip_repo.get.return_value = trip
+        trip_repo.save.return_value = trip
+        return trip
+
+    @pytest.fixture
+    def geometry(self):
+        #~1.42km
+        return {"type":"LineString","coordinates":[[-122.4194,37.7749],[-122.4094,37.7849]]}
+
+    @pytest.mark.asyncio
+    async def test_end_trip_matching_distance_not_flagged(self, service, mock_trip, user_id, geometry):
+        dto = EndTripDTO(end_address="456 Oak Ave", geometry=geometry, distance_meters=1500.0)
+
+        await service.end_trip(user_id, mock_trip.id, dto)
+
+        assert mock_trip.distance_flagged is False
+        assert mock_trip.computed_miles == pytest.approx(0.88, abs=0.01)
+        assert mock_trip.miles == dto.miles
+
+    @pytest.mark.asyncio
+    async def test_end_trip_inflated_distance_flagged(self, service, mock_trip, user_id, geometry):
+        dto = EndTripDTO(end_address="456 Oak Ave", geometry=geometry, distance_meters=81320.0)
+
+        await service.end_trip(user_id, mock_trip.id, dto)
+
+        assert mock_trip.distance_flagged is True
+        #flagged trips still keep the reported distance
+        assert mock_trip.miles == 50.53
+
+    @pytest.mark.asyncio
+    async def test_end_trip_inflated_distance_rejected(self, service, trip_repo, mock_trip, user_id, geometry):
+        dto = EndTripDTO(end_address="456 Oak Ave", geometry=geometry, distance_meters=81320.0)
+
+        with patch('app.modules.trips.service.settings.TRIP_DISTANCE_REJECT', True):
+            with pytest.raises(InvalidTripDataError):
+                await service.end_trip(user_id, mock_trip.id, dto)
+
+        trip_repo.save.assert_not_called()
+
+
+class TestTripsServiceAppendTripPoints:
+
+    @pytest.fixture
+    def user_id(self):
+        return uuid4()
+
+    @pytest.fixture
+    def trip_repo(self):
+        repo = AsyncMock(spec=TripRepo)
+        repo.db = MagicMock()
+        repo.db.rollback = AsyncMock()
+        repo.get_point_recording.return_value = MagicMock(status=TripStatus.active, recorded_meters=None)
+        repo.get_last_point_chunk.return_value = None
+        repo.get_point_progress.return_value = MagicMock(chunk_count=1, point_count=2, recorded_meters=1420.0)
+        return repo
+
+    @pytest.fixture
+    def service(self, trip_repo):
+        return TripsService(trip_repo, AsyncMock(), AsyncMock())
+
+    @pytest.fixture
+    def batch(self):
+        return AppendTripPointsDTO(sequence=0, coordinates=[[-122.4194,37.7749],[-122.4094,37.7849]])
+
+    @pytest.mark.asyncio
+    async def test_first_batch_is_stored(self, service, trip_repo, batch, user_id):
+        trip_id = uuid4()
+
+        result = await service.append_trip_points(user_id, trip_id, batch)
+
+        chunk, meters = trip_repo.add_point_chunk.call_args.args
+        assert chunk.trip_id == trip_id
+        assert chunk.sequence == 0
+        assert chunk.point_count == 2
+        assert meters == pytest.approx(1420, rel=0.01)
+        assert result['chunk_count'] == 1
+        assert result['recorded_meters'] == 1420.0
+
+    @pytest.mark.asyncio
+    async def test_next_batch_is_measured_from_previous_last_point(self, service, trip_repo, user_id):
+        last = {"type":"LineString","coordinates":[[-122.4194,37.7749],[-122.4094,37.7849]]}
+        trip_repo.get_last_point_chunk.return_value = MagicMock(sequence=0, geometry_encrypted=b"chunk")
+        batch = AppendTripPointsDTO(sequence=1, coordinates=[[-122.4194,37.7749]])
+
+        with patch('app.modules.trips.service.decrypt_geometry', return_value=last):
+            await service.append_trip_points(user_id, uuid4(), batch)
+
+        chunk, meters = trip_repo.add_point_chunk.call_args.args
+        assert chunk.sequence == 1
+        assert meters == pytest.approx(1420, rel=0.01)
+
+    @pytest.mark.asyncio
+    async def test_retried_batch_is_not_stored_twice(self, service, trip_repo, batch, user_id):
+        trip_repo.get_last_point_chunk.return_value = MagicMock(sequence=0, geometry_encrypted=b"chunk")
+
+        result = await service.append_trip_points(user_id, uuid4(), batch)
+
+        trip_repo.add_point_chunk.assert_not_called()
+        assert result['chunk_count'] == 1
+
+    @pytest.mark.asyncio
+    async def test_sequence_gap_rejected(self, service, trip_repo, user_id):
+        batch = AppendTripPointsDTO(sequence=3, coordinates=[[-122.4194,37.7749]])
+
+        with pytest.raises(InvalidTripDataError):
+            await service.append_trip_points(user_id, uuid4(), batch)
+
+        trip_repo.add_point_chunk.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_trip_not_active(self, service, trip_repo, batch, user_id):
+        trip_repo.get_point_recording.return_value = MagicMock(status=TripStatus.completed, recorded_meters=None)
+
+        with pytest.raises(InvalidTripDataError):
+            await service.append_trip_points(user_id, uuid4(), batch)
+
+    @pytest.mark.asyncio
+    async def test_trip_locked_before_recording_is_read(self, service, trip_repo, batch, user_id):
+        calls = []
+        trip_repo.lock.side_effect = lambda *args: calls.append("lock") or True
+        trip_repo.get_point_recording.side_effect = lambda *args: calls.append("recording") or MagicMock(status=TripStatus.active, recorded_meters=None)
+
+        await service.append_trip_points(user_id, uuid4(), batch)
+
+        assert calls == ["lock", "recording"]
+
+    @pytest.mark.asyncio
+    async def test_rejected_batch_releases_lock(self, service, trip_repo, user_id):
+        with pytest.raises(InvalidTripDataError):
+            await service.append_trip_points(user_id, uuid4(), AppendTripPointsDTO(sequence=3, coordinates=[[-122.4194,37.7749]]))
+
+        trip_repo.rollback.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_retried_batch_releases_lock(self, service, trip_repo, batch, user_id):
+        trip_repo.get_last_point_chunk.return_value = MagicMock(sequence=0, geometry_encrypted=b"chunk")
+
+        await service.append_trip_points(user_id, uuid4(), batch)
+
+        trip_repo.commit.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_trip_not_found_by_lock(self, service, trip_repo, batch, user_id):
+        trip_repo.lock.return_value = False
+
+        with pytest.raises(TripNotFoundError):
+            await service.append_trip_points(user_id, uuid4(), batch)
+
+        trip_repo.get_point_recording.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_trip_not_found(self, service, trip_repo, batch, user_id):
+        trip_repo.get_point_recording.return_value = None
+
+        with pytest.raises(TripNotFoundError):
+            await service.append_trip_points(user_id, uuid4(), batch)
+
+    @pytest.mark.asyncio
+    async def test_end_trip_finalizes_from_chunks(self, service, trip_repo, user_id):
+        trip = MagicMock(spec=Trip)
+        trip.id = uuid4()
+        trip.status = TripStatus.active
+        trip.reimbursement_rate = 0.65
+        trip.recorded_meters = 1420.0
+        trip_repo.get.return_value = trip
+        trip_repo.save.return_value = trip
+        trip_repo.get_point_chunks.return_value = [b"first", b"second"]
+        chunks = {
+            b"first": {"type":"LineString","coordinates":[[-122.4194,37.7749]]},
+            b"second": {"type":"LineString","coordinates":[[-122.4094,37.7849]]},
+        }
+        dto = EndTripDTO(end_address="456 Oak Ave", distance_meters=1500.0)
+
+        with patch('app.modules.trips.service.decrypt_geometry', side_effect=chunks.get):
+            with patch('app.modules.trips.service.encrypt_geometry', return_value=b"route") as mock_encrypt:
+                await service.end_trip(user_id, trip.id, dto)
+
+        mock_encrypt.assert_called_once_with({"type":"LineString","coordinates":[[-122.4194,37.7749],[-122.4094,37.7849]]})
+        assert trip.computed_miles == 0.88
+        assert trip.distance_flagged is False
+        trip_repo.delete_point_chunks.assert_called_once_with(trip.id)
+
+    @pytest.mark.asyncio
+    async def test_end_trip_reads_chunks_under_lock(self, service, trip_repo, user_id):
+        trip = MagicMock(spec=Trip)
+        trip.id = uuid4()
+        trip.status = TripStatus.active
+        trip.reimbursement_rate = 0.65
+        trip.recorded_meters = 1420.0
+        trip_repo.get.return_value = trip
+        trip_repo.save.return_value = trip
+        calls = []
+        trip_repo.lock.side_effect = lambda *args: calls.append("lock") or True
+        trip_repo.get_point_chunks.side_effect = lambda *args: calls.append("chunks") or [b"first"]
+
+        with patch('app.modules.trips.service.decrypt_geometry', return_value={"type":"LineString","coordinates":[[-122.4194,37.7749],[-122.4094,37.7849]]}):
+            await service.end_trip(user_id, trip.id, EndTripDTO(end_address="456 Oak Ave", distance_meters=1500.0))
+
+        assert calls == ["lock", "chunks"]
+        trip_repo.lock.assert_called_once_with(trip.id, user_id)
+
+    @pytest.mark.asyncio
+    async def test_end_trip_rejected_releases_lock(self, service, trip_repo, user_id):
+        trip = MagicMock(spec=Trip)
+        trip.status = TripStatus.completed
+        trip_repo.get.return_value = trip
+
+        with pytest.raises(InvalidTripDataError):
+            await service.end_trip(user_id, uuid4(), EndTripDTO(end_address="456 Oak Ave", distance_meters=1500.0))
+
+        trip_repo.rollback.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_end_trip_without_route(self, service, trip_repo, user_id):
+        trip = MagicMock(spec=Trip)
+        trip.status = TripStatus.active
+        trip_repo.get.return_value = trip
+        trip_repo.get_point_chunks.return_value = []
+
+        with pytest.raises(InvalidTripDataError):
+            await service.end_trip(user_id, uuid4(), EndTripDTO(end_address="456 Oak Ave", distance_meters=1500.0))
+
+        trip_repo.save.assert_not_called()
+
+
+class TestTripsServiceSearchTrips:
+
+    @pytest.fixture
+    def user_id(self):
+        return uuid4()
+
+    @pytest.fixture
+    def trip_repo(self):
+        return AsyncMock(spec=TripRepo)
+
+    @pytest.fixture
+    def service(self, trip_repo):
+        return TripsService(trip_repo, AsyncMock(spec=RateCategoryRepo), AsyncMock(spec=RateCustomizationRepo))
+
+    @pytest.mark.asyncio
+    async def test_search_by_words(self, service, trip_repo, user_id):
+        trip_repo.search_trip_summaries.return_value = ["row"]
+
+        result = await service.search_trips(user_id, query="client plaza", limit=10)
+
+        assert result == ["row"]
+        trip_repo.search_trip_summaries.assert_called_once_with(user_id, word_tokens(user_id, "client plaza"), 10)
+
+    @pytest.mark.asyncio
+    async def test_exact_search_uses_full_address_token(self, service, trip_repo, user_id):
+        await service.search_trips(user_id, query="500 Client Plaza", exact=True)
+
+        tokens = trip_repo.search_trip_summaries.call_args.args[1]
+        assert tokens == [full_address_token(user_id, "500 client plaza")]
+
+    @pytest.mark.asyncio
+    async def test_search_by_common_place(self, service, trip_repo, user_id):
+        place_id = uuid4()
+        trip_repo.get_common_place_tokens.return_value = [b"t" * 16, b"u" * 16]
+
+        await service.search_trips(user_id, common_place_id=place_id)
+
+        trip_repo.get_common_place_tokens.assert_called_once_with(place_id, user_id)
+        assert trip_repo.search_trip_summaries.call_args.args[1] == [b"t" * 16, b"u" * 16]
+
+    @pytest.mark.asyncio
+    async def test_unknown_common_place(self, service, trip_repo, user_id):
+        trip_repo.get_common_place_tokens.return_value = []
+
+        with pytest.raises(CommonPlaceNotFoundError):
+            await service.search_trips(user_id, common_place_id=uuid4())
+
+    @pytest.mark.asyncio
+    async def test_needs_exactly_one_of_query_or_place(self, service, trip_repo, user_id):
+        with pytest.raises(InvalidTripDataError):
+            await service.search_trips(user_id)
+        with pytest.raises(InvalidTripDataError):
+            await service.search_trips(user_id, query="main", common_place_id=uuid4())
+        trip_repo.search_trip_summaries.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_query_without_words(self, service, trip_repo, user_id):
+        with pytest.raises(InvalidTripDataError):
+            await service.search_trips(user_id, query="#.,")
@@ -0,0 +1,82 @@
+import math
+
+import numpy as np
+
+from app.modules.trips.utils.simplify import LEVEL_TOLERANCES_METERS, douglas_peucker_mask, simplify_levels
+
+
+def _wiggly_route(points: int = 10_000):
+    #~50km drive heading north east with a few meters of gps jitter and some real turns
+    return {
+        "type": "LineString",
+        "coordinates": [
+            [
+                -122.4194 + i * 0.00004 + 0.00008 * math.sin(i / 3) + 0.003 * math.sin(i / 800),
+                37.7749 + i * 0.00003 + 0.00008 * math.cos(i / 5),
+            ]
+            for i in range(points)
+        ],
+    }
+
+
+class TestDouglasPeuckerMask:
+
+    def test_straight_line_keeps_endpoints_only(self):
+        points = np.column_stack((np.arange(100, dtype=float), np.zeros(100)))
+
+        keep = douglas_peucker_mask(points, 1.0)
+
+        assert np.flatnonzero(keep).tolist() == [0, 99]
+
+    def test_keeps_corner_beyond_tolerance(self):
+        points = np.array([[0.0, 0.0], [5.0, 0.1], [10.0, 0.0], [10.0, 10.0]])
+
+        keep = douglas_peucker_mask(points, 1.0)
+
+        assert keep.tolist() == [True, False, True, True]
+
+    def test_round_trip_back_to_start_is_kept(self):
+        #first and last point are the same, so distance to the line would be meaningless
+        points = np.array([[0.0, 0.0], [50.0, 0.0], [50.0, 50.0], [0.0, 0.0]])
+
+        keep = douglas_peucker_mask(points, 1.0)
+
+        assert keep.sum() >= 3
+
+    def test_empty(self):
+        assert douglas_peucker_mask(np.empty((0, 2)), 1.0).tolist() == []
+
+
+class TestSimplifyLevels:
+
+    def test_levels_get_coarser(self):
+        geometry = _wiggly_route()
+
+        levels = simplify_levels(geometry)
+        counts = [len(level["coordinates"]) for _, level in levels]
+
+        assert [tolerance for tolerance, _ in levels] == list(LEVEL_TOLERANCES_METERS)
+        assert counts == sorted(counts, reverse=True)
+        assert counts[0] < len(geometry["coordinates"])
+        assert counts[-1] <= 100
+
+    def test_levels_keep_original_endpoints_and_points(self):
+        geometry = _wiggly_route(500)
+        original = {tuple(point) for point in geometry["coordinates"]}
+
+        for _, level in simplify_levels(geometry):
+            assert level["type"] == "LineString"
+            assert level["coordinates"][0] == geometry["coordinates"][0]
+            assert level["coordinates"][-1] == geometry["coordinates"][-1]
+            assert all(tuple(point) in original for point in level["coordinates"])
+
+    def test_short_route_has_no_levels(self):
+        geometry = {"type":"LineString","coordinates":[[-122.4194,37.7749],[-122.4094,37.7849]]}
+
+        assert simplify_levels(geometry) == []
+
+    def test_non_linestring_has_no_levels(self):
+        geometry = {"type":"Polygon","coordinates":[[[-122.4,37.8],[-122.4,37.7],[-122.3,37.7],[-122.4,37.8]]]}
+
+        assert simplify_levels(geometry) == []
+        assert simplify_levels({}) == []